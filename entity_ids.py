@@ -0,0 +1,57 @@
+"""
+实体ID分配
+
+为坦克和子弹分配紧凑的整数ID。ID单调递增，到达上限后从头回绕并跳过仍在使用的ID，
+保证同一时刻存活的实体ID唯一。上限与二进制快照中的16位实体ID一致。
+分配和释放的同时记录生成/消失事件，主机随快照把事件发给客户端。
+"""
+
+from typing import List, Set, Tuple
+
+MAX_ENTITY_ID = 0xFFFF
+
+# 实体事件
+EVENT_SPAWN = "spawn"
+EVENT_DESPAWN = "despawn"
+
+# 实体类型
+KIND_TANK = "tank"
+KIND_BULLET = "bullet"
+
+
+class EntityIdAllocator:
+    """单调递增的实体ID分配器（ID 0 保留不用）"""
+
+    def __init__(self, max_id: int = MAX_ENTITY_ID):
+        self.max_id = max_id
+        self.next_id = 1
+        self.live_ids: Set[int] = set()
+        self.events: List[Tuple[str, str, int]] = []  # (事件, 实体类型, 实体ID)
+
+    def allocate(self, kind: str) -> int:
+        """分配一个新ID并记录生成事件"""
+        if len(self.live_ids) >= self.max_id:
+            raise RuntimeError("实体ID已耗尽")
+        while self.next_id in self.live_ids:
+            self._advance()
+        entity_id = self.next_id
+        self._advance()
+        self.live_ids.add(entity_id)
+        self.events.append((EVENT_SPAWN, kind, entity_id))
+        return entity_id
+
+    def release(self, kind: str, entity_id) -> bool:
+        """释放ID并记录消失事件，ID未在使用时返回False"""
+        if entity_id not in self.live_ids:
+            return False
+        self.live_ids.discard(entity_id)
+        self.events.append((EVENT_DESPAWN, kind, entity_id))
+        return True
+
+    def drain_events(self) -> List[Tuple[str, str, int]]:
+        """取出自上次调用以来的所有事件"""
+        events, self.events = self.events, []
+        return events
+
+    def _advance(self):
+        self.next_id = self.next_id + 1 if self.next_id < self.max_id else 1
@@ -0,0 +1,103 @@
+"""
+固定步长推进与渲染插值
+
+渲染帧率和物理步长解耦：每帧把经过的时间放入累加器，按固定步长推进模拟，
+负载高时一帧内补跑多步（不超过上限，超出的时间直接丢弃，避免越补越慢），
+高刷新率屏幕上则有的帧不推进。子弹反弹等结果因此与帧率无关。
+
+绘制时精灵位于最近两次物理状态之间（按累加器剩余时间插值），
+绘制完成后恢复为物理状态，快照、射击等逻辑始终读取真实位置。本模块不依赖arcade。
+"""
+
+import math
+from typing import Dict, Iterable, Tuple
+
+FIXED_STEP = 1.0 / 60.0      # 固定物理步长(秒)
+DEFAULT_SUBSTEPS = 1         # 每个固定步长内的物理子步数
+MAX_STEPS_PER_FRAME = 5      # 一帧最多补跑的步数
+TELEPORT_DISTANCE = 64.0     # 一步内移动超过该距离视为瞬移（例如回合开始回到出生点），不插值
+
+
+class FixedTimestep:
+    """固定步长累加器"""
+
+    def __init__(self, step: float = FIXED_STEP, substeps: int = DEFAULT_SUBSTEPS,
+                 max_steps: int = MAX_STEPS_PER_FRAME):
+        if step <= 0 or substeps < 1 or max_steps < 1:
+            raise ValueError("步长必须大于0，子步数和最大步数至少为1")
+        self.step = step
+        self.substeps = substeps
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.steps = 0            # 累计推进的固定步数
+        self.dropped_time = 0.0   # 超过补跑上限被丢弃的时间
+
+    @property
+    def substep_dt(self) -> float:
+        return self.step / self.substeps
+
+    @property
+    def alpha(self) -> float:
+        """当前渲染时刻在最近两次物理状态之间的位置（0..1）"""
+        return min(1.0, self.accumulator / self.step)
+
+    def advance(self, frame_dt: float) -> int:
+        """加入一帧经过的时间，返回本帧应推进的固定步数"""
+        self.accumulator += max(0.0, frame_dt)
+        steps = int(self.accumulator / self.step + 1e-9)
+        if steps > self.max_steps:
+            # 落后太多时只补跑上限步数，剩余时间丢弃，只保留不足一步的部分用于插值
+            excess = self.accumulator - self.max_steps * self.step
+            kept = math.fmod(excess, self.step)
+            self.dropped_time += excess - kept
+            self.accumulator = self.max_steps * self.step + kept
+            steps = self.max_steps
+        self.accumulator = max(0.0, self.accumulator - steps * self.step)
+        self.steps += steps
+        return steps
+
+    def reset(self):
+        self.accumulator = 0.0
+
+
+class PoseInterpolator:
+    """记录实体在上一次物理状态中的位姿，绘制时插值，绘制后恢复"""
+
+    def __init__(self, teleport_distance: float = TELEPORT_DISTANCE):
+        self.teleport_distance = teleport_distance
+        self.previous: Dict[int, Tuple[object, float, float, float]] = {}
+        self.applied: Dict[int, Tuple[object, float, float, float]] = {}
+
+    def capture(self, entities: Iterable[object]):
+        """在推进一步之前调用：记录各实体的当前位姿作为上一次物理状态"""
+        self.previous = {id(entity): (entity, entity.center_x, entity.center_y, entity.angle) for entity in entities}
+
+    def apply(self, entities: Iterable[object], alpha: float):
+        """把实体移到上一次与当前物理状态之间的插值位姿；新出现或瞬移的实体保持当前位姿"""
+        self.applied = {}
+        for entity in entities:
+            prev = self.previous.get(id(entity))
+            if prev is None or prev[0] is not entity:
+                continue
+            x, y, angle = entity.center_x, entity.center_y, entity.angle
+            _, px, py, pangle = prev
+            if abs(x - px) > self.teleport_distance or abs(y - py) > self.teleport_distance:
+                continue
+            self.applied[id(entity)] = (entity, x, y, angle)
+            # 角度按最短方向插值
+            delta_angle = (angle - pangle + 180.0) % 360.0 - 180.0
+            entity.center_x = px + (x - px) * alpha
+            entity.center_y = py + (y - py) * alpha
+            entity.angle = angle - delta_angle * (1.0 - alpha)
+
+    def restore(self):
+        """绘制完成后恢复为物理状态"""
+        for entity, x, y, angle in self.applied.values():
+            entity.center_x = x
+            entity.center_y = y
+            entity.angle = angle
+        self.applied = {}
+
+    def clear(self):
+        self.previous = {}
+        self.applied = {}
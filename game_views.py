@@ -1,9 +1,17 @@
 import arcade
-import math
-import pymunk
 import os # 添加os模块导入
-from tank_sprites import (Tank, PLAYER_IMAGE_PATH_GREEN, PLAYER_IMAGE_PATH_DESERT,PLAYER_IMAGE_PATH_BLUE, PLAYER_IMAGE_PATH_GREY, PLAYER_MOVEMENT_SPEED, PLAYER_TURN_SPEED, COLLISION_TYPE_BULLET, COLLISION_TYPE_WALL, COLLISION_TYPE_TANK)
-from maps import get_random_map_layout # <--- 修改导入路径
+from itertools import chain
+from tank_sprites import (Tank, Bullet, PLAYER_IMAGE_PATH_GREEN, PLAYER_IMAGE_PATH_DESERT,PLAYER_IMAGE_PATH_BLUE, PLAYER_IMAGE_PATH_GREY,
+                          BULLET_COLORS_BY_TANK_TYPE)
+from entity_ids import KIND_TANK
+from maps import ALL_MAP_LAYOUTS
+from tank_controls import CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT, CONTROL_FIRE
+from fixed_timestep import FixedTimestep, PoseInterpolator
+from replay import MatchRecorder, ReplayFormatError, default_replay_path, list_replays, prune_replays
+# 场地常量与游戏规则由无界面的Simulation提供，GameView只负责渲染和按键
+from simulation import (Simulation, SCREEN_WIDTH, SCREEN_HEIGHT, TOP_UI_PANEL_HEIGHT, BOTTOM_UI_PANEL_HEIGHT,
+                        GAME_AREA_BOTTOM_Y, GAME_AREA_TOP_Y, WALL_THICKNESS,
+                        VERSUS_MODES, BULLET_RADIUS, BULLET_SPEED_MAGNITUDE, tank_type_from_image)
 
 # 获取 game_views.py 文件所在的目录
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,25 +20,38 @@ MAIN_MENU_BACKGROUND_IMAGE = os.path.join(BASE_DIR, "tank_background", "main_gro
 MODE_SELECT_BACKGROUND_IMAGE = os.path.join(BASE_DIR, "tank_background", "ground_720_2.png")
 
 # --- 常量 ---
-# 根据用户反馈调整窗口大小，使其更接近参考图的比例
-SCREEN_WIDTH = 1280
-SCREEN_HEIGHT = 720
 # SCREEN_TITLE 在主程序中定义
 
-# UI 面板的高度
-TOP_UI_PANEL_HEIGHT = 30
-BOTTOM_UI_PANEL_HEIGHT = 60 # 给血条和胜场留足空间
-
-# 游戏可玩区域的边界
-GAME_AREA_BOTTOM_Y = BOTTOM_UI_PANEL_HEIGHT
-GAME_AREA_TOP_Y = SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT
-GAME_AREA_HEIGHT = GAME_AREA_TOP_Y - GAME_AREA_BOTTOM_Y
-
-
-# 调整后的坦克缩放和墙壁厚度
+# 调整后的坦克缩放
 NEW_PLAYER_SCALE = 0.08 # 调整坦克大小
-WALL_THICKNESS = 10    # 墙壁改薄
-WALL_ELASTICITY = 0.7 # 墙壁弹性
+
+# 本地双人对战的按键映射
+PLAYER1_KEY_CONTROLS = {
+    arcade.key.W: CONTROL_FORWARD,
+    arcade.key.S: CONTROL_BACKWARD,
+    arcade.key.A: CONTROL_TURN_LEFT,
+    arcade.key.D: CONTROL_TURN_RIGHT,
+    arcade.key.SPACE: CONTROL_FIRE,
+}
+PLAYER2_KEY_CONTROLS = {
+    arcade.key.UP: CONTROL_FORWARD,
+    arcade.key.DOWN: CONTROL_BACKWARD,
+    arcade.key.LEFT: CONTROL_TURN_LEFT,
+    arcade.key.RIGHT: CONTROL_TURN_RIGHT,
+    arcade.key.ENTER: CONTROL_FIRE,
+    arcade.key.RSHIFT: CONTROL_FIRE,
+}
+# 同一台电脑上的玩家按顺序使用的按键映射（双人对战中玩家1、玩家2）
+LOCAL_KEY_BINDINGS = (PLAYER1_KEY_CONTROLS, PLAYER2_KEY_CONTROLS)
+
+# 没有选择坦克的玩家按槽位依次使用的坦克图片
+DEFAULT_TANK_IMAGES = (PLAYER_IMAGE_PATH_GREEN, PLAYER_IMAGE_PATH_DESERT, PLAYER_IMAGE_PATH_BLUE, PLAYER_IMAGE_PATH_GREY)
+
+# 底部每个玩家一栏，栏宽不足时胜场显示在血条上方
+HUD_SINGLE_ROW_MIN_WIDTH = 280
+
+# 自动录像的模式（录像保存在 replays 目录，在模式选择界面按3回放最近一局）
+RECORDED_MODES = ("pvp", "network_host")
 
 class MainMenu(arcade.View):
     """ 主菜单视图 """
@@ -85,6 +106,8 @@ class ModeSelectView(arcade.View):
                          arcade.color.WHITE, font_size=30, anchor_x="center")
         arcade.draw_text("2. 多人联机", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 50,
                          arcade.color.WHITE, font_size=30, anchor_x="center")
+        arcade.draw_text("3. 观看最近一局录像", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
+                         arcade.color.WHITE, font_size=30, anchor_x="center")
         arcade.draw_text("按 Esc 返回主菜单", SCREEN_WIDTH / 2, 50,
                             arcade.color.WHITE, font_size=20, anchor_x="center")
 
@@ -104,306 +127,279 @@ class ModeSelectView(arcade.View):
             from multiplayer.network_views import RoomBrowserView
             room_browser_view = RoomBrowserView()
             self.window.show_view(room_browser_view)
+        elif key == arcade.key.KEY_3:
+            replays = list_replays()
+            if not replays:
+                print("还没有录像，先进行一局对战")
+                return
+            print(f"回放录像: {replays[-1]}")
+            from replay_view import ReplayView
+            try:
+                replay_view = ReplayView(replays[-1])
+            except (OSError, ReplayFormatError) as e:
+                print(f"无法读取录像: {e}")
+                return
+            self.window.show_view(replay_view)
 
 
 class GameView(arcade.View):
-    """ 游戏主视图 """
-    def __init__(self, mode="pvc", player1_tank_image=PLAYER_IMAGE_PATH_GREEN, player2_tank_image=PLAYER_IMAGE_PATH_DESERT):
+    """ 游戏主视图：渲染Simulation的状态并把按键转换为控制指令 """
+    def __init__(self, mode="pvc", player1_tank_image=PLAYER_IMAGE_PATH_GREEN, player2_tank_image=PLAYER_IMAGE_PATH_DESERT,
+                 tank_images=None, player_ids=None):
         super().__init__()
         self.mode = mode
-        self.player1_tank_image = player1_tank_image  # 玩家1选择的坦克图片
-        self.player2_tank_image = player2_tank_image  # 玩家2选择的坦克图片
-        self.player_tank = None # 玩家1
-        self.player2_tank = None # 玩家2
+        # 每个槽位玩家的坦克图片（多于两名玩家时通过tank_images传入）
+        self.tank_images = list(tank_images) if tank_images else [player1_tank_image, player2_tank_image]
+        # 每个槽位的玩家标识（网络游戏中由主机设置为玩家ID）
+        self.player_ids = list(player_ids) if player_ids else [f"player{i + 1}" for i in range(len(self.tank_images))]
+        self.map_index = None # 地图编号，None表示随机（网络对战中使用主机选择的地图）
         self.player_list = None # 包含所有玩家坦克
         self.bullet_list = None # 用于存放子弹
         self.wall_list = None   # 用于存放墙壁
-        self.player1_score = 0
-        self.player2_score = 0
-        self.round_over = False # 标记当前回合是否结束
-        self.round_over_timer = 0.0 # 回合结束后的等待计时器
-        self.round_over_delay = 2.0 # 回合结束后等待2秒开始下一回合或结束游戏
-        self.max_score = 2 # 获胜需要的胜场数
-        self.round_result_text = "" # 用于显示回合结束提示
         # self.enemy_list = None # TODO: 之后添加敌人
         # self.powerup_list = None # TODO: 之后添加道具
 
-        # Pymunk物理空间
-        self.space = pymunk.Space()
-        self.space.gravity = (0, 0)
-        self.space.damping = 0.8
-        # 物理空间的阻尼，模拟空气阻力，damping越大，物体运动越慢
-
-        # 用于在碰撞回调后安全移除Pymunk body和Arcade sprite
-        self.pymunk_bodies_to_remove_post_step = []
-        self.arcade_sprites_to_remove_post_step = []
-
-        # 游戏总运行时间，用于射击冷却
-        self.total_time = 0.0
-
-        self._setup_collision_handlers()
-
-    def _setup_collision_handlers(self):
-        """设置Pymunk碰撞处理器"""
-        # 子弹 vs 墙壁
-        handler_bullet_wall = self.space.add_collision_handler(COLLISION_TYPE_BULLET, COLLISION_TYPE_WALL)
-        handler_bullet_wall.pre_solve = self._bullet_hit_wall_handler # pre_solve在物理计算前，允许修改碰撞属性或忽略碰撞
-
-        # 子弹 vs 坦克
-        handler_bullet_tank = self.space.add_collision_handler(COLLISION_TYPE_BULLET, COLLISION_TYPE_TANK)
-        handler_bullet_tank.pre_solve = self._bullet_hit_tank_handler
-
-    def _bullet_hit_wall_handler(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data):
-        """Pymunk回调：子弹撞墙"""
-        bullet_shape, wall_shape = arbiter.shapes
-        bullet_sprite = bullet_shape.body.sprite # 我们在创建时关联了sprite
-
-        bullet_sprite.bounce_count += 1
-        if bullet_sprite.bounce_count >= bullet_sprite.max_bounces:
-            if bullet_shape.body not in self.pymunk_bodies_to_remove_post_step:
-                self.pymunk_bodies_to_remove_post_step.append(bullet_shape.body)
-            if bullet_sprite not in self.arcade_sprites_to_remove_post_step:
-                self.arcade_sprites_to_remove_post_step.append(bullet_sprite)
-            return False # 阻止碰撞的物理反弹，因为子弹要消失了
-        else:
-            # Pymunk的 shape.elasticity 会处理反弹的物理效果。
-            # 如果需要更精确的角度控制，可以在这里修改arbiter的restitution或surface_velocity
-            # 但通常依赖elasticity即可。我们已经在Bullet的shape上设置了elasticity=0.7
-            # print(f"Bullet {id(bullet_sprite)} bounced off wall. Bounces: {bullet_sprite.bounce_count}")
-            # Pymunk的弹性已处理反弹，这里返回True让物理引擎继续处理
-            # 如果我们想手动计算反弹角度，可以在这里修改bullet_shape.body.velocity和angle
-            # 但Pymunk的弹性通常更真实。
-            # 注意：如果子弹的弹性很高，它可能会多次快速碰撞同一面墙，导致bounce_count迅速增加。
-            # 可能需要一个冷却时间或者更复杂的反弹逻辑。
-            # 简单的处理是让Pymunk的弹性起作用。
-            pass
-        return True # 允许碰撞发生并由Pymunk处理物理反弹
-
-    def _bullet_hit_tank_handler(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data):
-        """Pymunk回调：子弹撞坦克"""
-        bullet_shape, tank_shape = arbiter.shapes
-
-        # 确保获取到正确的bullet和tank shape (arbiter.shapes顺序不保证)
-        if bullet_shape.collision_type == COLLISION_TYPE_BULLET:
-            bullet_sprite = bullet_shape.body.sprite
-            tank_sprite = tank_shape.body.sprite
-        else: #顺序反了
-            bullet_sprite = tank_shape.body.sprite # 这实际上是bullet
-            tank_sprite = bullet_shape.body.sprite # 这实际上是tank
-            # 更严谨的检查：
-            if not (bullet_sprite.pymunk_shape.collision_type == COLLISION_TYPE_BULLET and \
-                    tank_sprite.pymunk_shape.collision_type == COLLISION_TYPE_TANK):
-                print("ERROR: Collision handler shape order assumption wrong and recovery failed.")
-                return False # 忽略此碰撞
-
-        if bullet_sprite.owner is not tank_sprite and tank_sprite.is_alive():
-            if not self.round_over: # 只有在回合进行中才处理伤害
-                tank_sprite.take_damage(1)
-                # 子弹击中坦克后消失
-                if bullet_shape.body not in self.pymunk_bodies_to_remove_post_step:
-                    self.pymunk_bodies_to_remove_post_step.append(bullet_shape.body)
-                if bullet_sprite not in self.arcade_sprites_to_remove_post_step:
-                    self.arcade_sprites_to_remove_post_step.append(bullet_sprite)
-
-                if not tank_sprite.is_alive():
-                    # print(f"Tank ({tank_sprite.center_x:.0f},{tank_sprite.center_y:.0f}) destroyed by Pymunk bullet!")
-                    if not self.round_over: # 再次检查，因为伤害可能导致回合结束
-                        self.round_over = True
-                        self.round_over_timer = self.round_over_delay
-                        if tank_sprite is self.player_tank:
-                            if self.mode == "pvp":
-                                self.player2_score += 1
-                                self.round_result_text = "玩家2 本回合胜利!"
-                        elif self.mode == "pvp" and tank_sprite is self.player2_tank:
-                            self.player1_score += 1
-                            self.round_result_text = "玩家1 本回合胜利!"
-            return False # 子弹击中坦克后应该消失，不发生物理反弹
-        return False # 如果是自己的子弹或坦克已死亡，忽略碰撞的物理效果
+        # 权威游戏模拟（物理、碰撞、比分、回合），在setup中创建
+        self.simulation = None
+        # 本帧待应用的控制指令 {玩家ID: [(控制指令, 是否按下), ...]}，在on_update中交给模拟
+        self.pending_inputs = {}
+        # 每个固定步长推进之前调用，可在其中 queue_input（网络主机借此每步为每个客户端应用一条输入指令）
+        self.before_step = None
+        self.game_over_shown = False
+        # 固定步长推进模拟，绘制时在最近两次物理状态之间插值
+        self.timestep = FixedTimestep()
+        self.interpolator = PoseInterpolator()
+        # 比赛录像：record_path为None时保存到默认的录像目录
+        self.record_replay = mode in RECORDED_MODES
+        self.record_path = None
+        self.recorder = None
+
+    # --- 兼容属性：转发到Simulation ---
+    @property
+    def space(self):
+        return self.simulation.space if self.simulation else None
+
+    @property
+    def entity_ids(self):
+        return self.simulation.entity_ids if self.simulation else None
+
+    @property
+    def player1_tank_image(self):
+        return self.tank_images[0]
+
+    @property
+    def player2_tank_image(self):
+        return self.tank_images[1] if len(self.tank_images) > 1 else None
+
+    @property
+    def player1_id(self):
+        return self.player_ids[0]
+
+    @player1_id.setter
+    def player1_id(self, value):
+        self.player_ids[0] = value
+
+    @property
+    def player2_id(self):
+        return self.player_ids[1]
+
+    @player2_id.setter
+    def player2_id(self, value):
+        self.player_ids[1] = value
+
+    @property
+    def player_tank(self):
+        return self._tank_in_slot(0)
+
+    @property
+    def player2_tank(self):
+        return self._tank_in_slot(1)
+
+    def _tank_in_slot(self, slot):
+        if self.simulation and slot < len(self.simulation.tanks):
+            return self.simulation.tanks[slot]
+        return None
+
+    @property
+    def player1_score(self):
+        return self.simulation.scores[0] if self.simulation else 0
+
+    @player1_score.setter
+    def player1_score(self, value):
+        # 网络客户端用主机快照中的比分覆盖本地比分
+        if self.simulation:
+            self.simulation.scores[0] = value
+
+    @property
+    def player2_score(self):
+        return self.simulation.scores[1] if self.simulation else 0
+
+    @player2_score.setter
+    def player2_score(self, value):
+        if self.simulation:
+            self.simulation.scores[1] = value
+
+    def set_scores(self, scores):
+        """用主机快照中的比分（按槽位）覆盖本地比分"""
+        if self.simulation:
+            self.simulation.scores = list(scores)
+
+    @property
+    def round_over(self):
+        return self.simulation.round_over if self.simulation else False
+
+    @round_over.setter
+    def round_over(self, value):
+        if self.simulation:
+            self.simulation.round_over = value
+
+    @property
+    def round_over_timer(self):
+        return self.simulation.round_over_timer if self.simulation else 0.0
+
+    @property
+    def round_result_text(self):
+        return self.simulation.round_result_text if self.simulation else ""
+
+    @property
+    def max_score(self):
+        return self.simulation.max_score if self.simulation else 2
+
+    @property
+    def total_time(self):
+        return self.simulation.total_time if self.simulation else 0.0
+
+    def _create_tank_sprite(self, slot, x, y):
+        """Simulation的坦克工厂：按玩家选择的图片创建坦克精灵"""
+        image = self.tank_images[slot] if slot < len(self.tank_images) else None
+        return Tank(image or DEFAULT_TANK_IMAGES[slot % len(DEFAULT_TANK_IMAGES)], NEW_PLAYER_SCALE, x, y)
+
+    def _create_bullet_sprite(self, owner, x, y, angle_degrees):
+        """Simulation的子弹工厂（还原状态时使用）：按发射者的坦克类型着色"""
+        color = BULLET_COLORS_BY_TANK_TYPE.get(getattr(owner, "tank_type", None), arcade.color.YELLOW_ORANGE)
+        return Bullet(BULLET_RADIUS, owner, x, y, angle_degrees, BULLET_SPEED_MAGNITUDE, color)
+
+    def _on_entity_spawn(self, kind, entity):
+        """模拟中生成实体时加入对应的精灵列表"""
+        sprite_list = self.player_list if kind == KIND_TANK else self.bullet_list
+        sprite_list.append(entity)
+
+    def _on_entity_despawn(self, kind, entity):
+        """模拟中实体消失时移出精灵列表"""
+        sprite_list = self.player_list if kind == KIND_TANK else self.bullet_list
+        if entity in sprite_list:
+            sprite_list.remove(entity)
 
     def start_new_round(self):
         """开始一个新回合或重置当前回合的坦克状态"""
         print("Starting new round / Resetting tanks...")
-        self.round_result_text = "" # 清除上一回合的提示
-        self.round_over = False
-        self.round_over_timer = 0.0
-        if self.bullet_list: # 确保bullet_list已初始化
-            self.bullet_list.clear() # 清空所有子弹
-        else:
-            self.bullet_list = arcade.SpriteList()        # 重置/创建 玩家1 坦克
-        p1_start_x = WALL_THICKNESS * 3
-        p1_start_y = GAME_AREA_BOTTOM_Y + GAME_AREA_HEIGHT / 2
-
-        # 确保player_list存在
-        if self.player_list is None:
-            self.player_list = arcade.SpriteList()
-
-        # 检查坦克是否存在且是否在列表中
-        if self.player_tank and self.player_tank in self.player_list:
-            # 如果坦克死亡，从列表中移除
-            if not self.player_tank.is_alive():
-                self.player_list.remove(self.player_tank)
-                self.player_tank = None
-
-        # 如果坦克不存在，创建新的
-        if not self.player_tank:
-            self.player_tank = Tank(self.player1_tank_image, NEW_PLAYER_SCALE, p1_start_x, p1_start_y)
-            self.player_list.append(self.player_tank)
-            # 添加到Pymunk空间
-            if self.player_tank.pymunk_body and self.player_tank.pymunk_shape:
-                self.space.add(self.player_tank.pymunk_body, self.player_tank.pymunk_shape)
-        else:
-            # 坦克存在，重置状态
-            self.player_tank.health = self.player_tank.max_health
-            # 重置Pymunk body的状态
-            if self.player_tank.pymunk_body:
-                self.player_tank.pymunk_body.position = p1_start_x, p1_start_y
-                self.player_tank.pymunk_body.angle = math.radians(90)  # Pymunk角度是弧度
-                self.player_tank.pymunk_body.velocity = (0, 0)
-                self.player_tank.pymunk_body.angular_velocity = 0
-            # 同步Arcade Sprite
-            self.player_tank.sync_with_pymunk_body()
-
-          # 重置/创建 玩家2 坦克 (仅PVP)
-        if self.mode == "pvp":
-            p2_start_x = SCREEN_WIDTH - (WALL_THICKNESS * 3)
-            p2_start_y = GAME_AREA_BOTTOM_Y + GAME_AREA_HEIGHT / 2
-
-            # 检查坦克是否存在且是否在列表中
-            if self.player2_tank and self.player2_tank in self.player_list:
-                # 如果坦克死亡，从列表中移除
-                if not self.player2_tank.is_alive():
-                    self.player_list.remove(self.player2_tank)
-                    self.player2_tank = None
-
-            # 如果坦克不存在，创建新的
-            if not self.player2_tank:
-                self.player2_tank = Tank(self.player2_tank_image, NEW_PLAYER_SCALE, p2_start_x, p2_start_y)
-                self.player_list.append(self.player2_tank)
-                # 添加到Pymunk空间
-                if self.player2_tank.pymunk_body and self.player2_tank.pymunk_shape:
-                    self.space.add(self.player2_tank.pymunk_body, self.player2_tank.pymunk_shape)
-            else:
-                # 坦克存在，重置状态
-                self.player2_tank.health = self.player2_tank.max_health
-                # 重置Pymunk body的状态
-                if self.player2_tank.pymunk_body:
-                    self.player2_tank.pymunk_body.position = p2_start_x, p2_start_y
-                    self.player2_tank.pymunk_body.angle = math.radians(90)
-                    self.player2_tank.pymunk_body.velocity = (0, 0)
-                    self.player2_tank.pymunk_body.angular_velocity = 0
-                # 同步Arcade Sprite
-                self.player2_tank.sync_with_pymunk_body()
-
-        # 确保player_list是最新的 (如果坦克是重新创建的)
-        # 上面的逻辑已经尝试处理了player_list的更新，但更稳妥的方式可能是在setup中完全重建
-        # 但由于start_new_round可能在setup之外被调用，我们需要确保player_list正确
-        # 考虑到坦克可能被设为None，然后从player_list移除，这里需要确保它们被重新添加
-        # 一个简化的方法是，如果坦克对象被重新创建，就确保它在player_list里
-        # （上面的逻辑已经包含了这个）
+        self.simulation.start_new_round()
 
     def setup(self):
-        """ 设置游戏元素: 创建列表、墙壁、UI背景，然后开始第一回合 """
+        """ 设置游戏元素: 创建列表和模拟，再按模拟的地图创建墙壁精灵 """
         self.player_list = arcade.SpriteList()
         self.bullet_list = arcade.SpriteList()
         self.wall_list = arcade.SpriteList(use_spatial_hash=True)
+        self.pending_inputs = {}
+        self.game_over_shown = False
+        self.timestep.reset()
+        self.interpolator.clear()
+
+        # 创建模拟时会开始第一回合，坦克通过回调加入player_list
+        self.simulation = self._create_simulation()
+        self._build_wall_sprites()
+        self.start_recording()
 
+        arcade.set_background_color(arcade.color.LIGHT_GRAY)
+
+    def _create_simulation(self):
+        map_layout = ALL_MAP_LAYOUTS[self.map_index] if self.map_index is not None else None
+        return Simulation(
+            mode=self.mode,
+            player_ids=self.player_ids,
+            map_layout=map_layout,
+            tank_types=[tank_type_from_image(image) for image in self.tank_images],
+            tank_factory=self._create_tank_sprite,
+            bullet_factory=self._create_bullet_sprite,
+            on_spawn=self._on_entity_spawn,
+            on_despawn=self._on_entity_despawn,
+        )
+
+    def _build_wall_sprites(self):
+        """按模拟的地图创建墙壁精灵（Pymunk形状由Simulation创建）"""
         current_wall_thickness = WALL_THICKNESS
         wall_color = arcade.color.DARK_SLATE_GRAY
 
-        # --- 创建地图墙壁 (Arcade Sprites 和 Pymunk Shapes) ---
+        # --- 创建地图墙壁的Arcade Sprites（Pymunk形状由Simulation创建） ---
         # 边界墙壁
         # 底部
-        body_bottom = pymunk.Body(body_type=pymunk.Body.STATIC)
-        shape_bottom = pymunk.Segment(body_bottom, (0, GAME_AREA_BOTTOM_Y), (SCREEN_WIDTH, GAME_AREA_BOTTOM_Y), current_wall_thickness / 2)
-        shape_bottom.collision_type = COLLISION_TYPE_WALL
-        shape_bottom.friction = 0.8
-        shape_bottom.elasticity = WALL_ELASTICITY # 为墙壁设置弹性
-        self.space.add(body_bottom, shape_bottom)
         for x_coord in range(0, SCREEN_WIDTH, current_wall_thickness):
             wall = arcade.SpriteSolidColor(current_wall_thickness, current_wall_thickness, wall_color)
             wall.center_x = x_coord + current_wall_thickness / 2
             wall.center_y = GAME_AREA_BOTTOM_Y + current_wall_thickness / 2 # 确保与Pymunk形状对齐
             self.wall_list.append(wall)
         # 顶部
-        body_top = pymunk.Body(body_type=pymunk.Body.STATIC)
-        shape_top = pymunk.Segment(body_top, (0, GAME_AREA_TOP_Y), (SCREEN_WIDTH, GAME_AREA_TOP_Y), current_wall_thickness / 2)
-        shape_top.collision_type = COLLISION_TYPE_WALL
-        shape_top.friction = 0.8
-        shape_top.elasticity = WALL_ELASTICITY # 为墙壁设置弹性
-        self.space.add(body_top, shape_top)
         for x_coord in range(0, SCREEN_WIDTH, current_wall_thickness):
             wall = arcade.SpriteSolidColor(current_wall_thickness, current_wall_thickness, wall_color)
             wall.center_x = x_coord + current_wall_thickness / 2
             wall.center_y = GAME_AREA_TOP_Y - current_wall_thickness / 2
             self.wall_list.append(wall)
         # 左侧
-        body_left = pymunk.Body(body_type=pymunk.Body.STATIC)
-        shape_left = pymunk.Segment(body_left, (0, GAME_AREA_BOTTOM_Y), (0, GAME_AREA_TOP_Y), current_wall_thickness / 2)
-        shape_left.collision_type = COLLISION_TYPE_WALL
-        shape_left.friction = 0.8
-        shape_left.elasticity = WALL_ELASTICITY # 为墙壁设置弹性
-        self.space.add(body_left, shape_left)
         for y_coord in range(int(GAME_AREA_BOTTOM_Y), int(GAME_AREA_TOP_Y + current_wall_thickness), current_wall_thickness): # 调整循环确保覆盖
             wall = arcade.SpriteSolidColor(current_wall_thickness, current_wall_thickness, wall_color)
             wall.center_x = current_wall_thickness / 2
             wall.center_y = y_coord + current_wall_thickness / 2
             self.wall_list.append(wall)
         # 右侧
-        body_right = pymunk.Body(body_type=pymunk.Body.STATIC)
-        shape_right = pymunk.Segment(body_right, (SCREEN_WIDTH, GAME_AREA_BOTTOM_Y), (SCREEN_WIDTH, GAME_AREA_TOP_Y), current_wall_thickness / 2)
-        shape_right.collision_type = COLLISION_TYPE_WALL
-        shape_right.friction = 0.8
-        shape_right.elasticity = WALL_ELASTICITY # 为墙壁设置弹性
-        self.space.add(body_right, shape_right)
         for y_coord in range(int(GAME_AREA_BOTTOM_Y), int(GAME_AREA_TOP_Y + current_wall_thickness), current_wall_thickness): # 调整循环确保覆盖
             wall = arcade.SpriteSolidColor(current_wall_thickness, current_wall_thickness, wall_color)
             wall.center_x = SCREEN_WIDTH - current_wall_thickness / 2
             wall.center_y = y_coord + current_wall_thickness / 2
             self.wall_list.append(wall)
 
-        # --- 创建随机选择的内部地图墙壁 ---
-        selected_map_layout = get_random_map_layout()
-        for cx, cy, w, h in selected_map_layout:
-            # 创建 Arcade Sprite
+        # --- 模拟随机选择的内部地图墙壁 ---
+        for cx, cy, w, h in self.simulation.map_layout:
             wall_sprite = arcade.SpriteSolidColor(int(w), int(h), wall_color)
             wall_sprite.center_x = int(cx)
             wall_sprite.center_y = int(cy)
             self.wall_list.append(wall_sprite)
 
-            # 创建 Pymunk 静态形状
-            half_w = w / 2
-            half_h = h / 2
-            points = [(-half_w, -half_h), (half_w, -half_h), (half_w, half_h), (-half_w, half_h)]
-            body = pymunk.Body(body_type=pymunk.Body.STATIC)
-            body.position = (cx, cy) # Pymunk body的position是形状的重心
-            shape = pymunk.Poly(body, points)
-            shape.collision_type = COLLISION_TYPE_WALL
-            shape.friction = 0.8    # 与边界墙壁一致
-            shape.elasticity = WALL_ELASTICITY  # 与边界墙壁一致
-            self.space.add(body, shape)
-
-        # UI面板背景 (可选) - 注意：这些绘制应该在 on_draw 中，setup只负责创建对象
-        # 我将暂时注释掉这里的绘制，UI面板的视觉效果可以在on_draw中实现
-        # # 顶部UI面板
-        # arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH,
-        #                                   SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT, SCREEN_HEIGHT,
-        #                                   arcade.color.LIGHT_STEEL_BLUE)
-        # # 底部UI面板
-        # arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH,
-        #                                   0, BOTTOM_UI_PANEL_HEIGHT,
-        #                                   arcade.color.LIGHT_STEEL_BLUE)
+    def start_recording(self):
+        """对战模式下开始录制本局比赛（默认目录只保留最近的若干个录像）"""
+        self.stop_recording()
+        if not self.record_replay:
+            return
+        path = self.record_path or default_replay_path()
+        try:
+            self.recorder = MatchRecorder(self.simulation, path)
+        except OSError as e:
+            print(f"无法创建录像文件 {path}: {e}")
+            return
+        if self.record_path is None:
+            prune_replays()
 
-        arcade.set_background_color(arcade.color.LIGHT_GRAY)
-        self.start_new_round() # 初始化第一回合
+    def stop_recording(self):
+        """写完并关闭当前录像"""
+        if self.recorder:
+            self.recorder.close()
+            if self.recorder.ticks_recorded:
+                print(f"录像已保存: {self.recorder.path} ({self.recorder.bytes_written} 字节)")
+            self.recorder = None
 
     def on_show_view(self):
         self.setup()
 
+    def on_hide_view(self):
+        self.stop_recording()
+
     def on_draw(self):
         self.clear()
         self.wall_list.draw()
+        # 坦克和子弹按插值位姿绘制，绘制后恢复为物理状态
+        self.interpolator.apply(self._moving_sprites(), self.timestep.alpha)
         self.player_list.draw()
         self.bullet_list.draw()
+        self.interpolator.restore()
 
         # 绘制坦克的碰撞体积描线 (用于调试)
         # if self.player_list:
@@ -421,47 +417,8 @@ class GameView(arcade.View):
                          SCREEN_WIDTH - 20, SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT / 2,
                          ui_text_color, font_size=20, anchor_x="right", anchor_y="center")
 
-        # 底部UI
-        # 玩家1 UI
-        p1_ui_y_text = BOTTOM_UI_PANEL_HEIGHT - 15 # 文字稍高
-        p1_ui_y_bar = BOTTOM_UI_PANEL_HEIGHT - 35  # 血条稍低
-        if self.player_tank and self.player_tank.is_alive():
-            arcade.draw_text("P1", 30, p1_ui_y_text, ui_text_color, font_size=18, anchor_y="center")
-            self.draw_health_bar(70, p1_ui_y_bar, self.player_tank.health, self.player_tank.max_health)
-        arcade.draw_text(f"胜场: {self.player1_score}", 200, p1_ui_y_bar + 7, ui_text_color, font_size=16, anchor_y="center") # 与血条对齐
-
-        # 玩家2 UI (仅PVP模式)
-        if self.mode == "pvp":
-            # P2 胜场 (最右侧)
-            p2_wins_x = SCREEN_WIDTH - 10 # 调整P2胜场X坐标，更靠右
-            arcade.draw_text(f"胜场: {self.player2_score}",
-                             p2_wins_x,
-                             p1_ui_y_bar + 7, # Y坐标与P1胜场对齐
-                             ui_text_color,
-                             font_size=16,
-                             anchor_x="right", anchor_y="center")
-
-            # P2 血条 (在胜场的左边)
-            # 假设胜场文字大致宽度为80 (估算值，"胜场: 0" 大约4个汉字宽度 + 数字)
-            # 您可以根据实际显示效果微调这个估算宽度或固定间距
-            estimated_wins_text_width = 80 # 根据 "胜场: X" 调整
-            health_bar_margin = 20 # 血条与胜场文字的间距
-            p2_health_bar_right_x = p2_wins_x - estimated_wins_text_width - health_bar_margin
-            p2_health_bar_x = p2_health_bar_right_x - 100 # bar_width 默认为100
-
-            if self.player2_tank and self.player2_tank.is_alive():
-                self.draw_health_bar(p2_health_bar_x, p1_ui_y_bar, self.player2_tank.health, self.player2_tank.max_health)
-
-                # P2 标识 (在血条的左边)
-                p2_label_margin = 10 # P2标识与血条的间距
-                # 假设 "P2" 标识宽度约30-40
-                # estimated_p2_label_width = 40
-                # p2_label_x = p2_health_bar_x - p2_label_margin - estimated_p2_label_width / 2 # 以中心点定位
-                # 为了简单，直接给一个固定X，然后调整
-                # arcade.draw_text("P2", p2_health_bar_x - p2_label_margin - 15 , p1_ui_y_text, ui_text_color, font_size=18, anchor_x="center", anchor_y="center")
-                # 更精确的定位：
-                p2_text_x_for_label = p2_health_bar_x - p2_label_margin
-                arcade.draw_text("P2", p2_text_x_for_label, p1_ui_y_text, ui_text_color, font_size=18, anchor_x="right", anchor_y="center")
+        # 底部UI：每个玩家一栏（标识、血条、胜场），人数越多栏越窄
+        self.draw_player_panels(ui_text_color)
 
         # 绘制回合结束提示
         if self.round_over and self.round_over_timer > 0 and self.round_result_text:
@@ -481,6 +438,30 @@ class GameView(arcade.View):
                              anchor_x="center", anchor_y="center", bold=True)
 
 
+    def draw_player_panels(self, ui_text_color):
+        """按槽位把底部面板均分给每个玩家，栏宽不足时胜场改为显示在血条上方"""
+        slot_count = len(self.simulation.tanks)
+        if self.mode in VERSUS_MODES:
+            slot_count = max(slot_count, len(self.simulation.scores))
+        if slot_count == 0:
+            return
+        column_width = SCREEN_WIDTH / slot_count
+        stacked = column_width < HUD_SINGLE_ROW_MIN_WIDTH
+        ui_y_text = BOTTOM_UI_PANEL_HEIGHT - 15 # 文字稍高
+        ui_y_bar = BOTTOM_UI_PANEL_HEIGHT - 35  # 血条稍低
+
+        for slot in range(slot_count):
+            left = slot * column_width + 30
+            tank = self._tank_in_slot(slot)
+            score = self.simulation.scores[slot] if slot < len(self.simulation.scores) else 0
+            arcade.draw_text(f"P{slot + 1}", left, ui_y_text, ui_text_color, font_size=18, anchor_y="center")
+            if tank and tank.is_alive():
+                self.draw_health_bar(left + 40, ui_y_bar, tank.health, tank.max_health)
+            if stacked:
+                arcade.draw_text(f"胜场: {score}", left + 40, ui_y_text, ui_text_color, font_size=12, anchor_y="center")
+            else:
+                arcade.draw_text(f"胜场: {score}", left + 170, ui_y_bar + 7, ui_text_color, font_size=16, anchor_y="center") # 与血条对齐
+
     def draw_health_bar(self, x, y, current_health, max_health, bar_width=100, bar_height=15, heart_size=12):
         """绘制血条，用小方块代表血量"""
         # border_color = arcade.color.BLACK
@@ -512,108 +493,34 @@ class GameView(arcade.View):
             arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.BLACK, border_width=1) # Corrected: lrbt
 
 
-    def on_update(self, delta_time):
-        """ 游戏逻辑更新 """
-
-        # 累积游戏总时间
-        self.total_time += delta_time
-
-        if self.round_over:
-            self.round_over_timer -= delta_time
-            if self.round_over_timer <= 0:
-                print(f"DEBUG: Round over timer ended. P1 Score: {self.player1_score}, P2 Score: {self.player2_score}, Max Score: {self.max_score}")
-                if self.player1_score >= self.max_score:
-                    print("DEBUG: Player 1 wins the game! Showing GameOverView.")
-                    game_over_view = GameOverView(
-                        f"玩家1 最终胜利!",
-                        self.mode,
-                        self.player1_tank_image,
-                        self.player2_tank_image
-                    )
-                    self.window.show_view(game_over_view)
-                elif self.mode == "pvp" and self.player2_score >= self.max_score:
-                    print("DEBUG: Player 2 wins the game! Showing GameOverView.")
-                    game_over_view = GameOverView(
-                        f"玩家2 最终胜利!",
-                        self.mode,
-                        self.player1_tank_image,
-                        self.player2_tank_image
-                    )
-                    self.window.show_view(game_over_view)
-                else:
-                    print("DEBUG: No winner yet, starting new round.")
-                    self.start_new_round()
-            return
+    def _moving_sprites(self):
+        return chain(self.player_list, self.bullet_list)
 
-        # 更新物理空间
-        # 启用小步长更新，提高物理模拟精度，减少穿模
-        # 限制最大步长，防止在帧率过低时物理模拟不稳定
-        delta_time = min(delta_time, 1.0 / 60.0) # 限制最大步长为1/60秒，确保至少60FPS的物理更新
-        self.space.step(delta_time) # 进行一次物理更新
-
-
-        # Arcade SpriteList的 .update() 仍然需要调用，以便执行Sprite自己的update（如果有的话）
-        # 但坦克的移动现在由Pymunk控制，所以Tank.update()方法已变为空或只做同步。
-        if self.player_list:
-            self.player_list.update() # 调用每个Tank Sprite的update
-
-        # 同步Arcade Tank Sprites到Pymunk bodies的位置和角度
-        if self.player_list:
-            for tank_sprite in self.player_list:
-                if tank_sprite and hasattr(tank_sprite, 'sync_with_pymunk_body'):
-                    tank_sprite.sync_with_pymunk_body()
-
-        # 同步并处理子弹 (Pymunk版)
-        bullets_to_remove_arcade = [] # 存储待移除的Arcade Sprite
-        bodies_to_remove_pymunk = []  # 存储待移除的Pymunk Body
-
-        if self.bullet_list:
-            for bullet_sprite in self.bullet_list:
-                if bullet_sprite and hasattr(bullet_sprite, 'sync_with_pymunk_body'):
-                    bullet_sprite.sync_with_pymunk_body()
-
-                # 检查飞出屏幕的子弹 (基于Pymunk body的位置)
-                if bullet_sprite.pymunk_body:
-                    pos = bullet_sprite.pymunk_body.position
-                    if pos.y > GAME_AREA_TOP_Y + bullet_sprite.height or \
-                       pos.y < GAME_AREA_BOTTOM_Y - bullet_sprite.height or \
-                       pos.x < -bullet_sprite.width or \
-                       pos.x > SCREEN_WIDTH + bullet_sprite.width:
-
-                        bullets_to_remove_arcade.append(bullet_sprite)
-                        if bullet_sprite.pymunk_body not in bodies_to_remove_pymunk:
-                             bodies_to_remove_pymunk.append(bullet_sprite.pymunk_body)
-
-            # 移除旧的Arcade子弹碰撞检测逻辑
-            # hit_walls = arcade.check_for_collision_with_list(bullet, self.wall_list) ...
-            # hit_tanks = arcade.check_for_collision_with_list(bullet, self.player_list) ...
-
-        # 执行移除操作 (在space.step()之后进行)
-        for sprite_to_remove in self.arcade_sprites_to_remove_post_step:
-            if sprite_to_remove in self.bullet_list: # 假设只移除子弹
-                self.bullet_list.remove(sprite_to_remove)
-            # 如果也可能移除坦克，需要检查player_list
-            # elif sprite_to_remove in self.player_list:
-            #     self.player_list.remove(sprite_to_remove)
-            #     if sprite_to_remove is self.player_tank: self.player_tank = None
-            #     elif sprite_to_remove is self.player2_tank: self.player2_tank = None
-
-        for body_to_remove in self.pymunk_bodies_to_remove_post_step:
-            if body_to_remove in self.space.bodies:
-                 self.space.remove(body_to_remove, *body_to_remove.shapes)
-
-        self.arcade_sprites_to_remove_post_step.clear()
-        self.pymunk_bodies_to_remove_post_step.clear()
-
-
-        # 子弹与坦克的碰撞伤害逻辑 (现在由Pymunk碰撞处理器处理)
-        # 坦克与坦克的碰撞检测 (现在由Pymunk处理)
-        # if self.mode == "pvp" and \
-        #    self.player_tank and self.player_tank.is_alive() and \
-        #    self.player2_tank and self.player2_tank.is_alive():
-        #     if arcade.check_for_collision(self.player_tank, self.player2_tank):
-        #         # ... (旧的碰撞回退代码) ...
-        #         print("Tanks collided!")
+    def on_update(self, delta_time):
+        """ 游戏逻辑更新：按固定步长推进模拟，本帧的按键在第一步之前应用（本帧不推进时留到下一帧） """
+        steps = self.timestep.advance(delta_time)
+        for _ in range(steps):
+            if self.before_step:
+                self.before_step()
+            inputs, self.pending_inputs = self.pending_inputs or None, {}
+            self.interpolator.capture(self._moving_sprites())
+            for _ in range(self.timestep.substeps):
+                self.simulation.step(self.timestep.substep_dt, inputs)
+                inputs = None
+
+        # 网络客户端的比赛结果以主机快照为准
+        if self.simulation.game_over and not self.game_over_shown and self.mode != "network_client":
+            self.game_over_shown = True
+            self.stop_recording()
+            winner = self.simulation.winner + 1
+            print(f"DEBUG: Player {winner} wins the game! Showing GameOverView.")
+            game_over_view = GameOverView(
+                f"玩家{winner} 最终胜利!",
+                self.mode,
+                self.player1_tank_image,
+                self.player2_tank_image
+            )
+            self.window.show_view(game_over_view)
 
     def on_key_press(self, key, modifiers):
         """ 处理按键按下事件 """
@@ -622,86 +529,23 @@ class GameView(arcade.View):
             main_menu_view = MainMenu() # 暂时直接返回主菜单
             self.window.show_view(main_menu_view)
 
-        # 玩家1 (WASD) 控制 - Pymunk版
-        if self.player_tank and self.player_tank.pymunk_body: # 确保坦克及其Pymunk body存在
-            body = self.player_tank.pymunk_body
-            # 定义坦克的移动速度和旋转速度 (这些值可能需要调整以获得好的手感)
-            # PLAYER_MOVEMENT_SPEED 和 PLAYER_TURN_SPEED 来自 tank_sprites.py 或在此处定义
-            # 我们需要将 PLAYER_TURN_SPEED (度/帧) 转换为 弧度/秒 给 Pymunk
-            # 假设帧率为60FPS
-            PYMUNK_PLAYER_MAX_SPEED = PLAYER_MOVEMENT_SPEED * 60 # 增大移动速度倍率
-            PYMUNK_PLAYER_TURN_RAD_PER_SEC = math.radians(PLAYER_TURN_SPEED * 60 * 1.0) # 增大旋转速度倍率
-
-            if key == arcade.key.W:
-                # 根据当前角度计算速度向量
-                # 根据Pymunk body的当前角度计算速度向量
-                # Pymunk的0弧度是X轴正方向，逆时针为正
-                # 坦克图片默认向上（Arcade 0度），对应Pymunk的math.pi/2
-                # 所以，如果body.angle是Pymunk的角度，那么前进方向的X分量是cos(body.angle)，Y分量是sin(body.angle)
-                vx = PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle)
-                vy = PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle)
-                body.velocity = (vx, vy)
-            elif key == arcade.key.S:
-                vx = -PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle) # 反向
-                vy = -PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle) # 反向
-                body.velocity = (vx, vy)
-            elif key == arcade.key.A: # 顺时针 (Pymunk中负角速度是顺时针)
-                body.angular_velocity = PYMUNK_PLAYER_TURN_RAD_PER_SEC # 原D键逻辑
-            elif key == arcade.key.D: # 逆时针
-                body.angular_velocity = -PYMUNK_PLAYER_TURN_RAD_PER_SEC # 原A键逻辑
-            elif key == arcade.key.SPACE: # 玩家1射击键
-                if self.player_tank and self.player_tank.pymunk_body: # 确保坦克和其body存在
-                    # 调用shoot方法并传递当前时间
-                    bullet = self.player_tank.shoot(self.total_time)
-                    if bullet: # 只有当shoot返回子弹时才添加
-                        self.bullet_list.append(bullet)
-                        if bullet.pymunk_body and bullet.pymunk_shape:
-                            self.space.add(bullet.pymunk_body, bullet.pymunk_shape)
-
-        # 玩家2 (上下左右箭头) 控制 - Pymunk版
-        if self.mode == "pvp" and self.player2_tank and self.player2_tank.pymunk_body:
-            body = self.player2_tank.pymunk_body
-            PYMUNK_PLAYER_MAX_SPEED = PLAYER_MOVEMENT_SPEED * 60 # 增大移动速度倍率
-            PYMUNK_PLAYER_TURN_RAD_PER_SEC = math.radians(PLAYER_TURN_SPEED * 60 * 1.0) # 增大旋转速度倍率
-
-            if key == arcade.key.UP:
-                # 根据Pymunk body的当前角度计算速度向量
-                vx = PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle)
-                vy = PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle)
-                body.velocity = (vx, vy)
-            elif key == arcade.key.DOWN:
-                vx = -PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle)
-                vy = -PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle)
-                body.velocity = (vx, vy)
-            elif key == arcade.key.LEFT: # 顺时针
-                body.angular_velocity = PYMUNK_PLAYER_TURN_RAD_PER_SEC
-            elif key == arcade.key.RIGHT: # 逆时针
-                body.angular_velocity = -PYMUNK_PLAYER_TURN_RAD_PER_SEC
-            elif key == arcade.key.ENTER or key == arcade.key.RSHIFT:
-                if self.player2_tank and self.player2_tank.pymunk_body: # 确保坦克和其body存在
-                    # 调用shoot方法并传递当前时间
-                    bullet = self.player2_tank.shoot(self.total_time)
-                    if bullet: # 只有当shoot返回子弹时才添加
-                        self.bullet_list.append(bullet)
-                        if bullet.pymunk_body and bullet.pymunk_shape:
-                            self.space.add(bullet.pymunk_body, bullet.pymunk_shape)
-
+        self._queue_local_key(key, True)
 
     def on_key_release(self, key, modifiers):
-        """ 处理按键释放事件 - Pymunk版 """
-        # 玩家1
-        if self.player_tank and self.player_tank.pymunk_body:
-            if key == arcade.key.W or key == arcade.key.S:
-                self.player_tank.pymunk_body.velocity = (0, 0)
-            elif key == arcade.key.A or key == arcade.key.D:
-                self.player_tank.pymunk_body.angular_velocity = 0
-
-        # 玩家2
-        if self.mode == "pvp" and self.player2_tank and self.player2_tank.pymunk_body:
-            if key == arcade.key.UP or key == arcade.key.DOWN:
-                self.player2_tank.pymunk_body.velocity = (0, 0)
-            elif key == arcade.key.LEFT or key == arcade.key.RIGHT:
-                self.player2_tank.pymunk_body.angular_velocity = 0
+        """ 处理按键释放事件 """
+        self._queue_local_key(key, False)
+
+    def _queue_local_key(self, key, pressed):
+        """按本机玩家的按键映射把按键转换为控制指令（双人对战两名玩家共用键盘，其他模式只有玩家1）"""
+        local_players = len(LOCAL_KEY_BINDINGS) if self.mode == "pvp" else 1
+        for slot, key_controls in enumerate(LOCAL_KEY_BINDINGS[:local_players]):
+            control = key_controls.get(key)
+            if control:
+                self.queue_input(self.player_ids[slot], control, pressed)
+
+    def queue_input(self, player_id, control, pressed):
+        """ 记录一个控制指令，下一次on_update时交给模拟（本地按键和网络输入共用） """
+        self.pending_inputs.setdefault(player_id, []).append((control, pressed))
 
 
 class GameOverView(arcade.View):
@@ -120,13 +120,49 @@ MAP_3_WALLS = [
 
 ALL_MAP_LAYOUTS = [MAP_1_WALLS, MAP_2_WALLS, MAP_3_WALLS]
 
-def get_random_map_layout():
-    """随机选择并返回一个地图布局数据。"""
-    return random.choice(ALL_MAP_LAYOUTS) # 恢复随机选择
+def get_random_map_layout(rng=None):
+    """随机选择并返回一个地图布局数据。rng为带种子的random.Random时结果可复现（确定性模式）。"""
+    return (rng or random).choice(ALL_MAP_LAYOUTS) # 恢复随机选择
     # return MAP_1_WALLS # 固定返回地图1进行测试
     # return MAP_2_WALLS # 固定返回地图2进行测试
     # return MAP_3_WALLS # 固定返回地图3进行测试
 
+def get_random_map_index(rng=None):
+    """随机选择一个地图编号（ALL_MAP_LAYOUTS的下标），网络对战中由主机选择并告知客户端。"""
+    return (rng or random).randrange(len(ALL_MAP_LAYOUTS))
+
+# --- 出生点 ---
+# 坦克出生时朝上，出生点周围需要空出的半宽/半高（坦克图片缩放后约 34x86，再留一些余量）
+SPAWN_HALF_WIDTH = 17 + 10
+SPAWN_HALF_HEIGHT = 43 + 10
+SPAWN_EDGE_MARGIN = 70  # 上下两排出生点距离游戏区域边界的距离
+
+def _spawn_candidates():
+    """候选出生点，按优先顺序：前两个与双人对战的左右出生点相同，之后是四角和上下边"""
+    mid_y = GAME_AREA_BOTTOM_Y + (GAME_AREA_TOP_Y - GAME_AREA_BOTTOM_Y) / 2
+    low_y = GAME_AREA_BOTTOM_Y + SPAWN_EDGE_MARGIN
+    high_y = GAME_AREA_TOP_Y - SPAWN_EDGE_MARGIN
+    return [
+        (P1_START_X, mid_y), (P2_START_X, mid_y),
+        (P1_START_X, high_y), (P2_START_X, low_y),
+        (P2_START_X, high_y), (P1_START_X, low_y),
+        (SCREEN_WIDTH * 0.5, high_y), (SCREEN_WIDTH * 0.5, low_y),
+        (SCREEN_WIDTH * 0.25, low_y), (SCREEN_WIDTH * 0.75, high_y),
+        (SCREEN_WIDTH * 0.25, high_y), (SCREEN_WIDTH * 0.75, low_y),
+    ]
+
+def _spawn_blocked(x, y, map_layout):
+    """出生点附近是否有地图墙壁"""
+    for cx, cy, w, h in map_layout:
+        if abs(cx - x) < w / 2 + SPAWN_HALF_WIDTH and abs(cy - y) < h / 2 + SPAWN_HALF_HEIGHT:
+            return True
+    return False
+
+def get_spawn_points(map_layout, count):
+    """按地图返回count个出生点 [(x, y), ...]，跳过被墙壁挡住的候选点；候选点不够时循环使用"""
+    points = [(x, y) for x, y in _spawn_candidates() if not _spawn_blocked(x, y, map_layout)]
+    return [points[i % len(points)] for i in range(count)]
+
 def get_map_constants():
     """返回地图设计时可能需要的常量，方便GameView使用。"""
     return {
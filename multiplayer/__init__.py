@@ -11,13 +11,13 @@
 1. 主机端：创建房间并等待玩家加入
 2. 客户端：搜索并加入房间
 3. 开始多人游戏
+4. 专用服务器：python -m multiplayer.server --room "房间名"
 """
 
 from .udp_discovery import RoomDiscovery
 from .udp_host import GameHost
 from .udp_client import GameClient
 from .udp_messages import MessageType, UDPMessage
-from .network_views import NetworkHostView, NetworkClientView, RoomBrowserView
 
 __all__ = [
     'RoomDiscovery',
@@ -25,11 +25,16 @@ __all__ = [
     'GameClient',
     'MessageType',
     'UDPMessage',
-    'NetworkHostView',
-    'NetworkClientView', 
-    'RoomBrowserView'
 ]
 
+# 界面视图依赖arcade；专用服务器 (python -m multiplayer.server) 在没有arcade的机器上也能导入本包
+try:
+    from .network_views import NetworkHostView, NetworkClientView, RoomBrowserView
+except ImportError:
+    pass
+else:
+    __all__ += ['NetworkHostView', 'NetworkClientView', 'RoomBrowserView']
+
 # 网络配置常量
 DISCOVERY_PORT = 12345
 GAME_PORT = 12346
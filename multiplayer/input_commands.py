@@ -0,0 +1,176 @@
+"""
+逐tick输入指令流
+
+客户端不再发送按键的按下/释放事件（丢失一个释放事件会让坦克一直开下去），而是按固定频率
+（INPUT_COMMAND_RATE）采样当前按住的控制，生成带序号的输入指令：一个位掩码
+（前进/后退/左转/右转/射击）。每个输入数据包携带最近 INPUT_REDUNDANCY 条指令，
+丢失的包由后续包中的冗余副本补上；每条指令都是完整的按住状态，即使连续丢包超过冗余条数，
+下一条到达的指令也会把坦克恢复到正确的状态。
+
+主机端每个客户端一个指令队列：按序号去重、排队，每个模拟tick应用一条，
+把相邻指令之间的位变化转换为模拟使用的 (控制指令, 是否按下) 事件。
+队列积压超过 MAX_QUEUED_COMMANDS 条时一次多应用几条，追上客户端。
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tank_controls import (CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT,
+                           CONTROL_TURN_RIGHT, CONTROL_FIRE, REMOTE_KEY_CONTROLS)
+
+INPUT_COMMAND_RATE = 60    # 客户端每秒采样/发送的指令数，与模拟tick频率一致
+INPUT_REDUNDANCY = 4       # 每个数据包携带的最近指令数
+MAX_QUEUED_COMMANDS = 3    # 主机端每个客户端最多积压的指令数，超出时追赶
+
+# 控制指令 -> 指令位掩码中的位
+CONTROL_BITS = {
+    CONTROL_FORWARD: 0x01,
+    CONTROL_BACKWARD: 0x02,
+    CONTROL_TURN_LEFT: 0x04,
+    CONTROL_TURN_RIGHT: 0x08,
+    CONTROL_FIRE: 0x10,
+}
+ALL_CONTROL_BITS = sum(CONTROL_BITS.values())
+
+Command = Tuple[int, int]  # (序号, 位掩码)
+
+
+def keys_to_mask(keys: Iterable[str]) -> int:
+    """把按住的网络按键名称转换为位掩码，未知按键被忽略"""
+    mask = 0
+    for key in keys:
+        control = REMOTE_KEY_CONTROLS.get(key)
+        if control:
+            mask |= CONTROL_BITS[control]
+    return mask
+
+
+def mask_controls(mask: int) -> set:
+    """位掩码中按住的控制指令"""
+    return {control for control, bit in CONTROL_BITS.items() if mask & bit}
+
+
+def mask_events(previous: int, mask: int) -> List[Tuple[str, bool]]:
+    """相邻两条指令之间的变化 -> [(控制指令, 是否按下), ...]
+
+    先松开后按下：从前进直接换成后退时，松开前进清零的速度不会覆盖后退。
+    """
+    changed = previous ^ mask
+    if not changed:
+        return []
+    released = [(control, False) for control, bit in CONTROL_BITS.items() if changed & bit and not mask & bit]
+    pressed = [(control, True) for control, bit in CONTROL_BITS.items() if changed & bit and mask & bit]
+    return released + pressed
+
+
+class InputCommandStream:
+    """客户端的输入指令流：记录按住的控制，按tick采样并保留最近几条指令用于冗余发送
+
+    采样之间按下又松开的控制（例如轻点射击）在该tick的指令中仍然置位，不会丢失。
+    调用方负责加锁。
+    """
+
+    def __init__(self, redundancy: int = INPUT_REDUNDANCY):
+        self.seq = 0          # 最近一条已采样指令的序号
+        self.held = 0         # 当前按住的控制
+        self.latched = 0      # 本次采样前按下过的控制
+        self.last_mask = 0    # 最近一条已采样指令的位掩码
+        self.history: deque = deque(maxlen=redundancy)
+
+    def update(self, mask: int) -> Optional[int]:
+        """按住状态变为mask，返回主机将看到这一变化的指令序号（没有变化时返回None）"""
+        if mask == self.held:
+            return None
+        pressed = mask & ~self.held
+        released = self.held & ~mask
+        self.held = mask
+        self.latched |= pressed
+        # 本次采样前按下过的控制在下一条指令中仍然置位，松开要到再下一条指令才体现
+        if released & self.latched:
+            return self.seq + 2
+        return self.seq + 1
+
+    def sample(self) -> Tuple[int, List[int]]:
+        """生成下一条指令，返回 (最新指令序号, 最近几条指令的位掩码，从旧到新)"""
+        mask = self.held | self.latched
+        self.latched = 0
+        self.seq += 1
+        self.last_mask = mask
+        self.history.append(mask)
+        return self.seq, list(self.history)
+
+    def reset(self):
+        self.seq = 0
+        self.held = 0
+        self.latched = 0
+        self.last_mask = 0
+        self.history.clear()
+
+
+def unpack_commands(seq: int, masks: List[int]) -> List[Command]:
+    """输入数据包中的 (最新序号, 从旧到新的位掩码) -> [(序号, 位掩码), ...]"""
+    first = seq - len(masks) + 1
+    return [(first + i, mask & ALL_CONTROL_BITS) for i, mask in enumerate(masks)]
+
+
+class CommandQueue:
+    """主机端一个客户端的待应用指令"""
+
+    def __init__(self):
+        self.pending: deque = deque()
+        self.mask = 0           # 已应用的最新按住状态
+        self.applied_seq = 0    # 已应用的最新指令序号
+        self.skipped = 0        # 为追赶而在同一tick中额外应用的指令数
+
+    def extend(self, commands: Iterable[Command]):
+        """加入新收到的指令（已按序号去重并排序）"""
+        for seq, mask in commands:
+            if seq > self.applied_seq and (not self.pending or seq > self.pending[-1][0]):
+                self.pending.append((seq, mask))
+
+    def advance(self) -> Tuple[List[Tuple[str, bool]], Optional[int]]:
+        """应用本tick的指令，返回 (控制事件, 其中最后一条改变了按住状态的指令序号)
+
+        队列为空时保持上一条指令的状态，不产生事件。
+        """
+        events: List[Tuple[str, bool]] = []
+        changed_seq = None
+        count = min(len(self.pending), max(1, len(self.pending) - MAX_QUEUED_COMMANDS))
+        self.skipped += max(0, count - 1)
+        for _ in range(count):
+            seq, mask = self.pending.popleft()
+            step = mask_events(self.mask, mask)
+            if step:
+                events.extend(step)
+                changed_seq = seq
+            self.mask = mask
+            self.applied_seq = seq
+        return events, changed_seq
+
+
+class CommandScheduler:
+    """主机端所有客户端的指令队列，模拟每个tick为每个客户端应用一条指令"""
+
+    def __init__(self):
+        self.queues: Dict[str, CommandQueue] = {}
+
+    def add(self, client_id: str, commands: Iterable[Command]):
+        self.queues.setdefault(client_id, CommandQueue()).extend(commands)
+
+    def remove(self, client_id: str):
+        self.queues.pop(client_id, None)
+
+    def clear(self):
+        self.queues.clear()
+
+    def advance(self) -> Tuple[Dict[str, List[Tuple[str, bool]]], Dict[str, int]]:
+        """推进一个tick，返回 (模拟输入 {客户端ID: 控制事件}, {客户端ID: 改变了按住状态的指令序号})"""
+        inputs: Dict[str, List[Tuple[str, bool]]] = {}
+        changed: Dict[str, int] = {}
+        for client_id, queue in self.queues.items():
+            events, changed_seq = queue.advance()
+            if events:
+                inputs[client_id] = events
+            if changed_seq is not None:
+                changed[client_id] = changed_seq
+        return inputs, changed
@@ -0,0 +1,115 @@
+"""
+客户端快照插值
+
+客户端以本地接收时间为每个快照打时间戳，渲染时回退一个固定的插值延迟，
+在渲染时刻两侧的两个快照之间对坦克和子弹的位置、角度做线性插值。
+快照迟到时基于最近两个快照做有上限的外推，避免画面停顿或飞出过远。
+"""
+
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+DEFAULT_INTERPOLATION_DELAY = 0.1   # 插值延迟(秒)，约为3个30Hz快照间隔
+DEFAULT_MAX_EXTRAPOLATION = 0.1     # 最大外推时间(秒)
+
+
+def _lerp(a: float, b: float, t: float) -> float:
+    return a + (b - a) * t
+
+
+def _lerp_angle(a: float, b: float, t: float) -> float:
+    """沿最短方向插值角度（度）"""
+    diff = (b - a + 180.0) % 360.0 - 180.0
+    return a + diff * t
+
+
+def _entity_key(entity: Dict[str, Any], index: int):
+    entity_id = entity.get("id")
+    return entity_id if entity_id is not None else ("#", index)
+
+
+def _interpolate_entities(older: List[Dict[str, Any]], newer: List[Dict[str, Any]],
+                          t: float) -> List[Dict[str, Any]]:
+    """以较旧快照的实体集合为准，对同时存在于较新快照中的实体插值"""
+    newer_by_key = {_entity_key(e, i): e for i, e in enumerate(newer)}
+    result = []
+    for i, entity in enumerate(older):
+        target = newer_by_key.get(_entity_key(entity, i))
+        if target is None or "pos" not in entity or "pos" not in target:
+            result.append(entity)
+            continue
+        blended = dict(entity)
+        blended["pos"] = [_lerp(entity["pos"][0], target["pos"][0], t),
+                          _lerp(entity["pos"][1], target["pos"][1], t)]
+        if "ang" in entity and "ang" in target:
+            blended["ang"] = _lerp_angle(entity["ang"], target["ang"], t)
+        result.append(blended)
+    return result
+
+
+class SnapshotInterpolator:
+    """带时间戳的快照缓冲区"""
+
+    def __init__(self, interpolation_delay: float = DEFAULT_INTERPOLATION_DELAY,
+                 max_extrapolation: float = DEFAULT_MAX_EXTRAPOLATION,
+                 capacity: int = 32):
+        self.interpolation_delay = interpolation_delay
+        self.max_extrapolation = max_extrapolation
+        self.snapshots: deque = deque(maxlen=capacity)  # (接收时间, 快照)
+
+    def push(self, state: Dict[str, Any], receive_time: Optional[float] = None):
+        """加入一个新快照（时间戳必须单调不减，乱序快照被丢弃）"""
+        if receive_time is None:
+            receive_time = time.time()
+        if self.snapshots and receive_time < self.snapshots[-1][0]:
+            return
+        self.snapshots.append((receive_time, state))
+
+    def clear(self):
+        """清空缓冲区"""
+        self.snapshots.clear()
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最新收到的快照"""
+        return self.snapshots[-1][1] if self.snapshots else None
+
+    def sample(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """返回渲染时刻 (now - interpolation_delay) 的插值快照"""
+        if not self.snapshots:
+            return None
+        if now is None:
+            now = time.time()
+        render_time = now - self.interpolation_delay
+
+        # 丢弃渲染时刻之前不再需要的旧快照（至少保留两个用于外推）
+        while len(self.snapshots) >= 3 and self.snapshots[1][0] <= render_time:
+            self.snapshots.popleft()
+
+        if len(self.snapshots) == 1:
+            return self.snapshots[0][1]
+
+        older_time, older = self.snapshots[0]
+        if render_time <= older_time:
+            return older
+
+        newer_time, newer = self.snapshots[1]
+        if render_time > newer_time:
+            # 快照迟到：沿最近两个快照的运动方向外推，外推时间有上限
+            render_time = min(render_time, newer_time + self.max_extrapolation)
+        span = newer_time - older_time
+        if span <= 0:
+            return newer
+        t = (render_time - older_time) / span
+        return self._blend(older, newer, t)
+
+    def _blend(self, older: Dict[str, Any], newer: Dict[str, Any], t: float) -> Dict[str, Any]:
+        if t >= 1.0:
+            # 外推时以较新快照为基准，实体集合和离散字段取自较新快照
+            base, other, t = newer, older, 1.0 - t
+        else:
+            base, other = older, newer
+        state = dict(base)
+        state["tanks"] = _interpolate_entities(base.get("tanks", []), other.get("tanks", []), t)
+        state["bullets"] = _interpolate_entities(base.get("bullets", []), other.get("bullets", []), t)
+        return state
@@ -0,0 +1,67 @@
+"""
+网络线程到主线程的有界信箱
+
+单生产者（网络引擎线程）/单消费者（渲染或tick线程）。底层是带maxlen的 collections.deque，
+CPython中 append 和 popleft 都是原子操作，两端不需要加锁：
+- 生产者 put 永不阻塞；信箱满时丢弃最旧的一项并计入 dropped
+- 消费者 drain 一次取出全部待处理项；take_latest 只取最新一项，其余计入 coalesced
+
+卡顿的一帧之后最多只需处理 capacity 项，不会积压过时的状态。
+"""
+
+from collections import deque
+from typing import Any, List, Optional
+
+
+class Mailbox:
+    """有界单生产者/单消费者信箱"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("信箱容量必须大于0")
+        self.capacity = capacity
+        self._items = deque(maxlen=capacity)
+
+        # 统计（每个计数只由一端写入）
+        self.received = 0   # 生产者：放入的总数
+        self.dropped = 0    # 生产者：信箱满时被挤掉的旧项数
+        self.coalesced = 0  # 消费者：被更新的项取代而未单独处理的项数
+
+    def put(self, item: Any):
+        """生产者放入一项，信箱满时最旧的一项被丢弃"""
+        if len(self._items) >= self.capacity:
+            self.dropped += 1
+        self._items.append(item)
+        self.received += 1
+
+    def drain(self) -> List[Any]:
+        """消费者取出全部待处理项（从旧到新）"""
+        items = []
+        try:
+            while True:
+                items.append(self._items.popleft())
+        except IndexError:
+            return items
+
+    def take_latest(self) -> Optional[Any]:
+        """消费者只取最新一项，较旧的项计入 coalesced；信箱为空时返回None"""
+        items = self.drain()
+        if not items:
+            return None
+        self.coalesced += len(items) - 1
+        return items[-1]
+
+    def clear(self):
+        """消费者丢弃全部待处理项（不计入统计）"""
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "pending": len(self._items),
+        }
@@ -0,0 +1,203 @@
+"""
+asyncio网络引擎
+
+进程内所有UDP端点（主机、客户端、房间发现、房间广播）共用一个asyncio事件循环：
+- 收包由 DatagramProtocol 在数据到达时立即回调，不再用 settimeout(0.1) 轮询
+- 心跳、广播和超时检查使用事件循环定时器，按实际截止时间唤醒
+- 事件循环运行在一个后台线程中，arcade主循环照常运行，回调在该线程中执行（与原来的网络线程相同）
+
+发送仍直接调用套接字的 sendto（非阻塞UDP套接字可以从任何线程发送），
+游戏线程发送输入和快照不需要等待事件循环。
+"""
+
+import asyncio
+import socket
+import threading
+from typing import Callable, Optional, Tuple
+
+ENDPOINT_OPEN_TIMEOUT = 2.0  # 等待事件循环创建端点的时间(秒)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """把收到的数据包交给端点的回调"""
+
+    def __init__(self, on_datagram: Callable[[bytes, Tuple[str, int]], None], name: str):
+        self.on_datagram = on_datagram
+        self.name = name
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        try:
+            self.on_datagram(data, addr)
+        except Exception as e:
+            print(f"{self.name}处理数据包错误: {e}")
+
+    def error_received(self, exc: Exception):
+        # UDP的ICMP错误（例如对端端口未打开）不影响继续收包
+        pass
+
+
+class Endpoint:
+    """事件循环上的一个UDP端点"""
+
+    def __init__(self, engine: "NetworkEngine", transport: Optional[asyncio.DatagramTransport]):
+        self.engine = engine
+        self.transport = transport
+        self.closed = False
+
+    def close(self):
+        """停止收包并关闭套接字（等待事件循环执行完毕）"""
+        self.closed = True
+        if self.transport is not None:
+            self.engine.run_sync(self.transport.close)
+            self.transport = None
+
+    def _on_opened(self, task: "asyncio.Task"):
+        """在事件循环线程中异步创建的端点就绪"""
+        if task.cancelled() or task.exception() is not None:
+            print(f"创建网络端点失败: {task.exception() if not task.cancelled() else '已取消'}")
+            return
+        transport, _ = task.result()
+        if self.closed:
+            transport.close()
+        else:
+            self.transport = transport
+
+
+class Timer:
+    """事件循环定时器，可从任何线程取消"""
+
+    def __init__(self, engine: "NetworkEngine", callback: Callable, interval: Optional[float] = None):
+        self.engine = engine
+        self.callback = callback
+        self.interval = interval  # None 表示只触发一次
+        self.cancelled = False
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.handle is not None:
+            self.engine.call_soon(self.handle.cancel)
+
+    def _schedule(self, delay: float):
+        if not self.cancelled:
+            self.handle = self.engine.loop.call_later(delay, self._fire)
+
+    def _fire(self):
+        if self.cancelled:
+            return
+        if self.interval is not None:
+            # 先安排下一次，回调耗时不会累积成漂移
+            self._schedule(self.interval)
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"网络定时器错误: {e}")
+
+
+class NetworkEngine:
+    """在后台线程中运行的asyncio事件循环"""
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """按需启动事件循环线程"""
+        with self.start_lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(ready,), name="network-engine", daemon=True)
+            self.thread.start()
+            ready.wait()
+
+    def stop(self):
+        """停止事件循环（进程退出前可选调用）"""
+        with self.start_lock:
+            if self.loop is None or self.thread is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def in_loop_thread(self) -> bool:
+        return self.thread is not None and threading.current_thread() is self.thread
+
+    def open_endpoint(self, sock: socket.socket, on_datagram: Callable[[bytes, Tuple[str, int]], None],
+                      name: str = "网络") -> Endpoint:
+        """用已绑定的套接字创建端点，数据包到达时在事件循环线程中调用 on_datagram(data, addr)
+
+        在事件循环线程中调用（例如在收包回调里）时不能等待，端点在下一轮循环就绪，
+        此前到达的数据包留在套接字缓冲区中。
+        """
+        self.start()
+        sock.setblocking(False)
+        coroutine = self.loop.create_datagram_endpoint(lambda: _DatagramProtocol(on_datagram, name), sock=sock)
+        if self.in_loop_thread():
+            endpoint = Endpoint(self, None)
+            self.loop.create_task(coroutine).add_done_callback(endpoint._on_opened)
+            return endpoint
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        transport, _ = future.result(timeout=ENDPOINT_OPEN_TIMEOUT)
+        return Endpoint(self, transport)
+
+    def call_soon(self, callback: Callable, *args):
+        """在事件循环线程中尽快执行回调（线程安全）"""
+        self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay: float, callback: Callable) -> Timer:
+        """delay秒后在事件循环线程中执行一次回调"""
+        timer = Timer(self, callback)
+        self._start_timer(timer, delay)
+        return timer
+
+    def call_every(self, interval: float, callback: Callable, first_delay: float = 0.0) -> Timer:
+        """每隔interval秒执行一次回调，第一次在first_delay秒后"""
+        timer = Timer(self, callback, interval)
+        self._start_timer(timer, first_delay)
+        return timer
+
+    def run_sync(self, callback: Callable):
+        """在事件循环线程中执行回调并等待完成"""
+        if self.loop is None or self.thread is None or self.in_loop_thread():
+            return callback()
+        done = threading.Event()
+        result = []
+
+        def wrapper():
+            try:
+                result.append(callback())
+            finally:
+                done.set()
+
+        self.loop.call_soon_threadsafe(wrapper)
+        done.wait(timeout=ENDPOINT_OPEN_TIMEOUT)
+        return result[0] if result else None
+
+    def _start_timer(self, timer: Timer, delay: float):
+        self.start()
+        if self.in_loop_thread():
+            timer._schedule(delay)
+        else:
+            self.loop.call_soon_threadsafe(timer._schedule, delay)
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+
+_engine: Optional[NetworkEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> NetworkEngine:
+    """进程内共享的网络引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = NetworkEngine()
+        return _engine
@@ -0,0 +1,335 @@
+"""
+网络条件模拟器
+
+在本机回环上复现真实链路的延迟、抖动、丢包、重复、乱序和带宽限制，用于测试和基准：
+
+- ImpairedSocket：包装已有套接字的 sendto，只影响该套接字发出的数据，
+  例如 host.host_socket = ImpairedSocket(host.host_socket, PROFILES["wifi"])
+- NetSimRelay：本地UDP中继，客户端连接中继端口，中继转发到主机，
+  每个客户端有独立的上行/下行链路，不需要修改 GameHost / GameClient：
+
+      relay = NetSimRelay(("127.0.0.1", 12346), PROFILES["mobile"])
+      relay.start()
+      client.connect_to_host("127.0.0.1", relay.port, "玩家")
+
+延迟发送由网络引擎的定时器完成；脚本（SCRIPTS）按时间切换链路条件，模拟信号波动和短暂中断。
+"""
+
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .net_engine import get_engine, Endpoint, Timer
+
+REORDER_DELAY = 0.03   # 被乱序的数据报额外延迟的下限(秒)
+
+
+class NetProfile:
+    """一个方向上的链路条件"""
+
+    def __init__(self, name: str = "custom", latency: float = 0.0, jitter: float = 0.0,
+                 loss: float = 0.0, duplicate: float = 0.0, reorder: float = 0.0,
+                 bandwidth: Optional[float] = None, queue_limit: float = 0.25):
+        self.name = name
+        self.latency = latency          # 单向延迟(秒)
+        self.jitter = jitter            # 延迟在 ±jitter 内均匀抖动(秒)
+        self.loss = loss                # 丢包概率
+        self.duplicate = duplicate      # 重复发送概率
+        self.reorder = reorder          # 额外延迟（被后面的数据报超过）的概率
+        self.bandwidth = bandwidth      # 带宽上限(字节/秒)，None表示不限
+        self.queue_limit = queue_limit  # 带宽受限时排队超过该时间(秒)的数据报被尾部丢弃
+
+    def __repr__(self):
+        return f"NetProfile({self.name})"
+
+
+# 预设链路条件（单向）
+PROFILES: Dict[str, NetProfile] = {
+    "loopback": NetProfile("loopback"),
+    "lan": NetProfile("lan", latency=0.001, jitter=0.0005),
+    "wifi": NetProfile("wifi", latency=0.015, jitter=0.01, loss=0.01, reorder=0.005),
+    "dsl": NetProfile("dsl", latency=0.04, jitter=0.005, loss=0.005, bandwidth=128_000),
+    "mobile": NetProfile("mobile", latency=0.06, jitter=0.03, loss=0.03, duplicate=0.005, reorder=0.02),
+    "congested": NetProfile("congested", latency=0.12, jitter=0.06, loss=0.08, reorder=0.03,
+                            bandwidth=32_000, queue_limit=0.2),
+    "lossy": NetProfile("lossy", latency=0.02, jitter=0.005, loss=0.1),
+    "blackout": NetProfile("blackout", loss=1.0),
+}
+
+# 脚本：[(持续时间(秒), 链路条件名)]，播放到最后一段后保持
+SCRIPTS: Dict[str, List[Tuple[float, str]]] = {
+    "wifi_spike": [(3.0, "wifi"), (1.5, "congested"), (3.0, "wifi")],
+    "mobile_handover": [(3.0, "mobile"), (0.5, "blackout"), (3.0, "mobile")],
+    "degrading": [(2.0, "lan"), (2.0, "wifi"), (2.0, "mobile"), (2.0, "congested")],
+}
+
+ProfileLike = Union[NetProfile, str]
+
+
+def _resolve(profile: Optional[ProfileLike]) -> NetProfile:
+    if profile is None:
+        return PROFILES["loopback"]
+    if isinstance(profile, str):
+        return PROFILES[profile]
+    return profile
+
+
+class LinkImpairment:
+    """按链路条件为每个数据报决定送达时间（不做实际发送）"""
+
+    def __init__(self, profile: Optional[ProfileLike] = None, seed: Optional[int] = None):
+        self.profile = _resolve(profile)
+        self.rng = random.Random(seed)
+        self.link_free_at = 0.0  # 带宽受限时链路空闲的时间
+
+        # 统计
+        self.packets = 0
+        self.dropped = 0
+        self.queue_drops = 0
+        self.duplicated = 0
+        self.reordered = 0
+
+    def set_profile(self, profile: ProfileLike):
+        self.profile = _resolve(profile)
+
+    def plan(self, size: int, now: float) -> List[float]:
+        """返回该数据报各副本的送达时间，空列表表示丢弃"""
+        profile = self.profile
+        self.packets += 1
+        if profile.loss > 0 and self.rng.random() < profile.loss:
+            self.dropped += 1
+            return []
+
+        departure = now
+        if profile.bandwidth:
+            start = max(now, self.link_free_at)
+            if start - now > profile.queue_limit:
+                self.queue_drops += 1
+                return []
+            self.link_free_at = start + size / profile.bandwidth
+            departure = self.link_free_at
+
+        copies = 1
+        if profile.duplicate > 0 and self.rng.random() < profile.duplicate:
+            copies = 2
+            self.duplicated += 1
+
+        times = []
+        for _ in range(copies):
+            delay = profile.latency
+            if profile.jitter:
+                delay += self.rng.uniform(-profile.jitter, profile.jitter)
+            if profile.reorder > 0 and self.rng.random() < profile.reorder:
+                delay += max(REORDER_DELAY, profile.latency)
+                self.reordered += 1
+            times.append(departure + max(0.0, delay))
+        return times
+
+    def stats(self) -> dict:
+        return {
+            "packets": self.packets,
+            "dropped": self.dropped,
+            "queue_drops": self.queue_drops,
+            "duplicated": self.duplicated,
+            "reordered": self.reordered,
+        }
+
+
+def _deliver_later(delay: float, send, data: bytes, addr):
+    """delay秒后在网络引擎中发送；立即送达的数据报直接发送"""
+    if delay <= 0:
+        send(data, addr)
+    else:
+        get_engine().call_later(delay, lambda: send(data, addr))
+
+
+class ImpairedSocket:
+    """给套接字发出的数据施加链路条件的包装，其余属性转给原套接字"""
+
+    def __init__(self, sock, profile: Optional[ProfileLike] = None, seed: Optional[int] = None):
+        self.sock = sock
+        self.link = LinkImpairment(profile, seed)
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def sendto(self, data: bytes, addr) -> int:
+        now = time.time()
+        with self.lock:
+            times = self.link.plan(len(data), now)
+        for at in times:
+            _deliver_later(at - now, self._send_now, data, addr)
+        return len(data)
+
+    def set_profile(self, profile: ProfileLike):
+        with self.lock:
+            self.link.set_profile(profile)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+
+    def _send_now(self, data: bytes, addr):
+        if self.closed:
+            return
+        try:
+            self.sock.sendto(data, addr)
+        except OSError:
+            # 模拟的链路上发送失败与丢包等同
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class _RelaySession:
+    """中继中一个客户端的上下行链路和通往主机的套接字"""
+
+    def __init__(self, client_addr, upstream: LinkImpairment, downstream: LinkImpairment):
+        self.client_addr = client_addr
+        self.upstream = upstream
+        self.downstream = downstream
+        self.sock: Optional[socket.socket] = None
+        self.endpoint: Optional[Endpoint] = None
+
+
+class NetSimRelay:
+    """施加链路条件的本地UDP中继"""
+
+    def __init__(self, target: Tuple[str, int], upstream: Optional[ProfileLike] = None,
+                 downstream: Optional[ProfileLike] = None, listen_port: int = 0,
+                 seed: Optional[int] = None):
+        self.target = target
+        self.upstream_profile = _resolve(upstream)
+        # 只给出一个方向时两个方向使用相同条件
+        self.downstream_profile = _resolve(downstream) if downstream is not None else self.upstream_profile
+        self.listen_port = listen_port
+        self.seed = seed
+
+        self.sock: Optional[socket.socket] = None
+        self.endpoint: Optional[Endpoint] = None
+        self.port = 0
+        self.running = False
+        self.sessions: Dict[Tuple[str, int], _RelaySession] = {}
+        self.lock = threading.Lock()
+        self.script_timers: List[Timer] = []
+
+    def start(self) -> bool:
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(("127.0.0.1", self.listen_port))
+        except OSError as e:
+            print(f"启动网络模拟中继失败: {e}")
+            self.sock = None
+            return False
+        self.port = self.sock.getsockname()[1]
+        self.running = True
+        self.endpoint = get_engine().open_endpoint(self.sock, self._on_client_datagram, "网络模拟中继")
+        print(f"网络模拟中继已启动: 端口 {self.port} -> {self.target[0]}:{self.target[1]} "
+              f"(上行 {self.upstream_profile.name}, 下行 {self.downstream_profile.name})")
+        return True
+
+    def stop(self):
+        self.running = False
+        for timer in self.script_timers:
+            timer.cancel()
+        self.script_timers.clear()
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            if session.endpoint:
+                session.endpoint.close()
+            if session.sock:
+                session.sock.close()
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        print("网络模拟中继已停止")
+
+    def set_profile(self, upstream: ProfileLike, downstream: Optional[ProfileLike] = None):
+        """切换所有客户端（包括之后加入的）的链路条件"""
+        with self.lock:
+            self.upstream_profile = _resolve(upstream)
+            self.downstream_profile = _resolve(downstream) if downstream is not None else self.upstream_profile
+            for session in self.sessions.values():
+                session.upstream.set_profile(self.upstream_profile)
+                session.downstream.set_profile(self.downstream_profile)
+
+    def run_script(self, script: Union[str, Sequence[Tuple[float, ProfileLike]]]):
+        """按脚本依次切换链路条件（两个方向相同），最后一段保持"""
+        stages = SCRIPTS[script] if isinstance(script, str) else list(script)
+        for timer in self.script_timers:
+            timer.cancel()
+        self.script_timers = []
+        start = 0.0
+        engine = get_engine()
+        for duration, profile in stages:
+            self.script_timers.append(engine.call_later(start, lambda p=profile: self.set_profile(p)))
+            start += duration
+
+    def stats(self) -> dict:
+        """所有客户端上行/下行的合计统计"""
+        totals = {"upstream": {}, "downstream": {}}
+        with self.lock:
+            for session in self.sessions.values():
+                for direction, link in (("upstream", session.upstream), ("downstream", session.downstream)):
+                    for key, value in link.stats().items():
+                        totals[direction][key] = totals[direction].get(key, 0) + value
+        return totals
+
+    def _session_for(self, addr) -> Optional[_RelaySession]:
+        with self.lock:
+            session = self.sessions.get(addr)
+            if session is not None or not self.running:
+                return session
+            seed = None if self.seed is None else self.seed + 2 * len(self.sessions)
+            session = _RelaySession(
+                addr,
+                LinkImpairment(self.upstream_profile, seed),
+                LinkImpairment(self.downstream_profile, None if seed is None else seed + 1),
+            )
+            self.sessions[addr] = session
+
+        # 每个客户端一个通往主机的套接字，主机看到的客户端地址各不相同
+        session.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        session.sock.bind(("127.0.0.1", 0))
+        session.endpoint = get_engine().open_endpoint(
+            session.sock, lambda data, _addr: self._on_host_datagram(session, data), "网络模拟中继")
+        return session
+
+    def _on_client_datagram(self, data: bytes, addr):
+        session = self._session_for(addr)
+        if session is None:
+            return
+        self._forward(session.upstream, self._send_upstream(session), data, self.target)
+
+    def _on_host_datagram(self, session: _RelaySession, data: bytes):
+        self._forward(session.downstream, self._send_downstream, data, session.client_addr)
+
+    def _forward(self, link: LinkImpairment, send, data: bytes, addr):
+        now = time.time()
+        with self.lock:
+            times = link.plan(len(data), now)
+        for at in times:
+            _deliver_later(at - now, send, data, addr)
+
+    def _send_upstream(self, session: _RelaySession):
+        def send(data, addr):
+            if self.running and session.sock is not None:
+                try:
+                    session.sock.sendto(data, addr)
+                except OSError:
+                    pass
+        return send
+
+    def _send_downstream(self, data: bytes, addr):
+        if self.running and self.sock is not None:
+            try:
+                self.sock.sendto(data, addr)
+            except OSError:
+                pass
@@ -7,10 +7,52 @@
 import arcade
 import threading
 import math
-from typing import Dict, Optional, List
+import time
+from collections import deque
+from typing import Dict, Optional, List, Tuple
 from .udp_discovery import RoomDiscovery, RoomInfo
 from .udp_host import GameHost
 from .udp_client import GameClient
+from .mailbox import Mailbox
+from .interpolation import SnapshotInterpolator, DEFAULT_INTERPOLATION_DELAY
+from .prediction import LocalTankPredictor
+from .state_snapshot import build_game_state
+from .telemetry import format_stats
+from .input_commands import CommandScheduler
+from tank_controls import REMOTE_KEY_CONTROLS
+from maps import get_random_map_index
+from tank_sprites import (Tank, RenderBullet, BULLET_COLORS_BY_TANK_TYPE, TANK_IMAGE_PATHS_BY_TYPE,
+                          PLAYER_IMAGE_PATH_GREEN)
+from entity_ids import EVENT_DESPAWN, KIND_BULLET, KIND_TANK
+
+SNAPSHOT_MAILBOX_CAPACITY = 8   # 客户端最多保留的待处理快照数（30Hz下约0.27秒）
+INPUT_MAILBOX_CAPACITY = 256    # 主机每帧最多保留的待处理客户端输入数
+NET_STATS_KEY = arcade.key.F3   # 切换网络统计叠加层
+NET_STATS_REFRESH = 0.5         # 叠加层刷新间隔(秒)
+
+
+class NetStatsOverlay:
+    """屏幕左上角的网络统计叠加层，按F3切换；统计按固定间隔刷新，不必每帧计算"""
+
+    def __init__(self, collect_lines):
+        self.collect_lines = collect_lines  # () -> List[str]
+        self.visible = False
+        self.lines: List[str] = []
+        self.last_refresh = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.last_refresh = 0.0
+
+    def draw(self, window):
+        if not self.visible:
+            return
+        now = time.time()
+        if now - self.last_refresh >= NET_STATS_REFRESH:
+            self.lines = self.collect_lines()
+            self.last_refresh = now
+        for i, line in enumerate(self.lines):
+            arcade.draw_text(line, 10, window.height - 60 - i * 20, arcade.color.YELLOW, font_size=12)
 
 
 class RoomBrowserView(arcade.View):
@@ -23,9 +65,9 @@ class RoomBrowserView(arcade.View):
         self.selected_room_index = 0
         self.player_name = "Player"
 
-        # UI状态
-        self.refresh_timer = 0
-        self.refresh_interval = 1.0  # 1秒刷新一次显示
+        # 房间列表只在发现有变化时重建：网络线程只标记，主线程重建每行的文字对象
+        self.rooms_dirty = False
+        self.room_rows: List[Tuple[arcade.Text, arcade.Text]] = []
 
         # 房间名输入状态
         self.input_mode = False  # 是否在输入房间名
@@ -37,8 +79,8 @@ class RoomBrowserView(arcade.View):
         """显示视图时的初始化"""
         arcade.set_background_color(arcade.color.DARK_BLUE_GRAY)
 
-        # 设置房间更新回调
-        self.room_discovery.set_room_update_callback(self._on_rooms_updated)
+        # 设置房间变化回调
+        self.room_discovery.set_room_change_callback(self._on_rooms_changed)
 
         # 开始房间发现
         self.room_discovery.start_discovery()
@@ -66,37 +108,24 @@ class RoomBrowserView(arcade.View):
                         arcade.color.WHITE, font_size=32, anchor_x="center")
 
         # 操作说明
-        arcade.draw_text("↑↓ 选择房间 | Enter 加入 | C 创建房间 | Esc 返回",
+        arcade.draw_text("↑↓ 选择房间 | Enter 加入 | V 观战 | R 刷新 | C 创建房间 | Esc 返回",
                         self.window.width // 2, self.window.height - 120,
                         arcade.color.LIGHT_GRAY, font_size=16, anchor_x="center")
 
         # 房间列表
-        if self.available_rooms:
-            y_start = self.window.height - 200
-            room_list = list(self.available_rooms.values())
-
-            for i, room in enumerate(room_list):
-                y_pos = y_start - i * 60
-
+        if self.room_rows:
+            for i, (room_text, host_text) in enumerate(self.room_rows):
                 # 选中高亮
                 if i == self.selected_room_index:
+                    y_pos = self._room_row_y(i)
                     # 使用新的API绘制矩形
                     arcade.draw_lrbt_rectangle_filled(
                         50, self.window.width - 50,  # bottom, top
                         y_pos - 50, y_pos + 50,      # left, right
                         arcade.color.DARK_GRAY
                     )
-
-                # 房间信息
-                room_text = f"{room.room_name} ({room.current_players}/{room.max_players})"
-                arcade.draw_text(room_text,
-                               self.window.width // 2, y_pos + 10,
-                               arcade.color.WHITE, font_size=18, anchor_x="center")
-
-                # 主机IP
-                arcade.draw_text(f"主机: {room.host_ip}",
-                               self.window.width // 2, y_pos - 10,
-                               arcade.color.WHITE, font_size=12, anchor_x="center")
+                room_text.draw()
+                host_text.draw()
         else:
             arcade.draw_text("正在搜索房间...",
                            self.window.width // 2, self.window.height // 2,
@@ -147,12 +176,41 @@ class RoomBrowserView(arcade.View):
                         self.window.width // 2, self.window.height // 2 - 100,
                         arcade.color.LIGHT_GRAY, font_size=16, anchor_x="center")
 
+    def _room_row_y(self, index: int) -> int:
+        return self.window.height - 200 - index * 60
+
+    def _rebuild_room_rows(self):
+        """读取最新的可用房间列表并重建每行的文字，尽量保持选中同一个房间"""
+        room_keys = list(self.available_rooms)
+        selected_key = room_keys[self.selected_room_index] if self.selected_room_index < len(room_keys) else None
+
+        self.available_rooms = self.room_discovery.get_available_rooms()
+        room_keys = list(self.available_rooms)
+        if selected_key in self.available_rooms:
+            self.selected_room_index = room_keys.index(selected_key)
+        elif self.selected_room_index >= len(room_keys):
+            # 确保选中索引有效
+            self.selected_room_index = max(0, len(room_keys) - 1)
+
+        self.room_rows = []
+        for i, room in enumerate(self.available_rooms.values()):
+            y_pos = self._room_row_y(i)
+            # 房间信息和主机IP
+            self.room_rows.append((
+                arcade.Text(f"{room.room_name} ({room.current_players}/{room.max_players})",
+                            self.window.width // 2, y_pos + 10,
+                            arcade.color.WHITE, font_size=18, anchor_x="center"),
+                arcade.Text(f"主机: {room.host_ip}",
+                            self.window.width // 2, y_pos - 10,
+                            arcade.color.WHITE, font_size=12, anchor_x="center"),
+            ))
+
     def on_update(self, delta_time):
         """更新逻辑"""
-        self.refresh_timer += delta_time
-        if self.refresh_timer >= self.refresh_interval:
-            self.refresh_timer = 0
-            # 触发重绘以更新房间列表显示
+        # 房间列表有变化时才重建
+        if self.rooms_dirty:
+            self.rooms_dirty = False
+            self._rebuild_room_rows()
 
         # 处理光标闪烁
         if self.input_mode:
@@ -215,6 +273,14 @@ class RoomBrowserView(arcade.View):
             # 加入选中的房间
             self._join_selected_room()
 
+        elif key == arcade.key.V:
+            # 观战选中的房间
+            self._join_selected_room(spectator=True)
+
+        elif key == arcade.key.R:
+            # 重新查询房间，主机立即回复
+            self.room_discovery.query_rooms()
+
         elif key == arcade.key.C:
             # 进入房间名输入模式
             self.input_mode = True
@@ -222,15 +288,13 @@ class RoomBrowserView(arcade.View):
             self.cursor_visible = True
             self.cursor_timer = 0
 
-    def _on_rooms_updated(self, rooms: Dict[str, RoomInfo]):
-        """房间列表更新回调"""
-        self.available_rooms = rooms
-        # 确保选中索引有效
-        if self.selected_room_index >= len(rooms):
-            self.selected_room_index = max(0, len(rooms) - 1)
+    def _on_rooms_changed(self, added: Dict[str, RoomInfo], updated: Dict[str, RoomInfo],
+                          removed: Dict[str, RoomInfo]):
+        """房间变化回调（网络线程）：只标记，由主线程重建房间列表"""
+        self.rooms_dirty = True
 
-    def _join_selected_room(self):
-        """加入选中的房间 - 直接连接到主机"""
+    def _join_selected_room(self, spectator: bool = False):
+        """加入选中的房间 - 直接连接到主机（spectator为True时只观战）"""
         if not self.available_rooms:
             return
 
@@ -240,7 +304,8 @@ class RoomBrowserView(arcade.View):
 
             # 直接进入网络客户端视图
             client_view = NetworkClientView()
-            if client_view.connect_to_room(selected_room.host_ip, 12346, self.player_name):
+            if client_view.connect_to_room(selected_room.host_ip, selected_room.host_port, self.player_name,
+                                           selected_room.room_id, spectator):
                 self.window.show_view(client_view)
             else:
                 print("连接到房间失败")
@@ -282,6 +347,21 @@ class NetworkHostView(arcade.View):
         # 坦克选择信息（从NetworkTankSelectionView传递过来）
         self.tank_selections = {}  # {player_id: {"tank_type": str, "tank_image_path": str}}
 
+        # 网络线程收到的客户端输入指令，在主线程中排队 (client_id, [(指令序号, 位掩码), ...])
+        self.pending_inputs = Mailbox(INPUT_MAILBOX_CAPACITY)
+        # 每个客户端的输入指令队列，每个模拟步长应用一条
+        self.commands = CommandScheduler()
+        # 每个客户端最近一次改变按住状态的指令序号和应用时间，随快照回传用于客户端校正
+        self.applied_inputs: Dict[str, tuple] = {}
+
+        # 网络统计叠加层（F3）
+        self.net_stats = NetStatsOverlay(self._net_stats_lines)
+
+    def _net_stats_lines(self) -> List[str]:
+        stats = self.game_host.get_network_stats()
+        lines = [format_stats(info["name"], info) for info in stats["clients"].values()]
+        return lines or ["没有已连接的客户端"]
+
     def start_game_directly(self):
         """直接开始游戏（从坦克选择视图调用）"""
         self.game_phase = "playing"
@@ -296,6 +376,8 @@ class NetworkHostView(arcade.View):
             client_leave=self._on_client_leave,
             input_received=self._on_input_received
         )
+        # 主机选择地图，随加入响应告知客户端
+        self.game_host.map_index = get_random_map_index()
 
         return self.game_host.start_hosting(room_name)
 
@@ -305,6 +387,8 @@ class NetworkHostView(arcade.View):
 
     def on_hide_view(self):
         """隐藏视图时的清理"""
+        if self.game_view:
+            self.game_view.stop_recording()
         self.game_host.stop_hosting()
 
     def on_draw(self):
@@ -338,9 +422,14 @@ class NetworkHostView(arcade.View):
             if self.game_view:
                 self.game_view.on_draw()
 
+        self.net_stats.draw(self.window)
+
     def on_key_press(self, key, modifiers):
         """处理按键事件"""
-        if key == arcade.key.ESCAPE and self.game_phase == "waiting":
+        if key == NET_STATS_KEY:
+            self.net_stats.toggle()
+
+        elif key == arcade.key.ESCAPE and self.game_phase == "waiting":
             # 返回房间浏览
             browser_view = RoomBrowserView()
             self.window.show_view(browser_view)
@@ -358,14 +447,21 @@ class NetworkHostView(arcade.View):
             # 转发给游戏视图
             self.game_view.on_key_press(key, modifiers)
 
+    def on_key_release(self, key, modifiers):
+        """处理按键释放事件"""
+        if self.game_started and self.game_view:
+            self.game_view.on_key_release(key, modifiers)
+
     def on_update(self, delta_time):
         """更新逻辑"""
         if self.game_started and self.game_view:
+            steps_before = self.game_view.timestep.steps
             self.game_view.on_update(delta_time)
 
-            # 广播游戏状态
-            game_state = self._get_game_state()
-            self.game_host.broadcast_game_state(game_state)
+            # 模拟推进后广播游戏状态（高刷新率下不推进的帧没有新状态）
+            if self.game_view.timestep.steps != steps_before:
+                game_state = self._get_game_state()
+                self.game_host.broadcast_game_state(game_state)
 
     def _on_client_join(self, client_id: str, player_name: str):
         """客户端加入回调"""
@@ -379,12 +475,22 @@ class NetworkHostView(arcade.View):
                                 if not p.endswith(f"({client_id})")]
         print(f"玩家离开: {client_id} ({reason})")
 
-    def _on_input_received(self, client_id: str, keys_pressed: List[str], keys_released: List[str]):
-        """输入接收回调"""
+    def _on_input_received(self, client_id: str, commands: list):
+        """输入接收回调 - 线程安全，指令在主线程中逐个模拟步长应用"""
         if self.game_started and self.game_view:
-            # 将客户端输入应用到对应的坦克
-            # 这里需要根据实际游戏逻辑来实现
-            pass
+            self.pending_inputs.put((client_id, list(commands)))
+
+    def _apply_pending_inputs(self):
+        """在每个固定步长之前调用：为每个客户端应用一条输入指令，与本地按键一起交给模拟"""
+        for client_id, commands in self.pending_inputs.drain():
+            self.commands.add(client_id, commands)
+        inputs, changed = self.commands.advance()
+        for client_id, events in inputs.items():
+            for control, pressed in events:
+                self.game_view.queue_input(client_id, control, pressed)
+        now = time.time()
+        for client_id, seq in changed.items():
+            self.applied_inputs[client_id] = (seq, now)
 
     def _start_game_with_selections(self):
         """使用坦克选择信息开始游戏"""
@@ -395,38 +501,38 @@ class NetworkHostView(arcade.View):
             # 如果相对导入失败，尝试绝对导入
             from game_views import GameView
 
-        # 从坦克选择信息中获取坦克图片
-        player1_tank_image = None
-        player2_tank_image = None
-
-        # 主机坦克
-        host_tank_info = self.tank_selections.get("host")
-        if host_tank_info:
-            player1_tank_image = host_tank_info.get("tank_image_path")
-
-        # 第一个客户端坦克
-        client_ids = [pid for pid in self.tank_selections.keys() if pid != "host"]
-        if client_ids:
-            first_client_info = self.tank_selections.get(client_ids[0])
-            if first_client_info:
-                player2_tank_image = first_client_info.get("tank_image_path")
-
-        # 如果没有坦克选择信息，使用默认值
-        if not player1_tank_image:
-            from tank_sprites import PLAYER_IMAGE_PATH_GREEN
-            player1_tank_image = PLAYER_IMAGE_PATH_GREEN
-        if not player2_tank_image:
-            from tank_sprites import PLAYER_IMAGE_PATH_BLUE
-            player2_tank_image = PLAYER_IMAGE_PATH_BLUE
-
+        from tank_sprites import (PLAYER_IMAGE_PATH_GREEN, PLAYER_IMAGE_PATH_BLUE,
+                                  PLAYER_IMAGE_PATH_DESERT, PLAYER_IMAGE_PATH_GREY)
+        default_images = (PLAYER_IMAGE_PATH_GREEN, PLAYER_IMAGE_PATH_BLUE, PLAYER_IMAGE_PATH_DESERT, PLAYER_IMAGE_PATH_GREY)
+
+        # 主机占第一个槽位，其余槽位按加入顺序分给客户端（最多为房间人数上限）
+        client_ids = [pid for pid in self.game_host.get_connected_players() if pid != self.game_host.host_player_id]
+        client_ids = client_ids[:max(1, self.game_host.max_players - 1)]
+        player_ids = [self.game_host.host_player_id] + client_ids
+        selection_keys = ["host"] + client_ids
+
+        # 从坦克选择信息中获取坦克图片，没有选择的玩家按槽位使用默认坦克
+        tank_images = []
+        for slot, key in enumerate(selection_keys):
+            tank_info = self.tank_selections.get(key) or {}
+            tank_images.append(tank_info.get("tank_image_path") or default_images[slot % len(default_images)])
+        if len(player_ids) < 2:
+            # 没有客户端时保留第二个槽位，与原来的双人对战一致
+            player_ids.append("player2")
+            tank_images.append(default_images[1])
+
+        # 坦克使用玩家ID作为标识，保证快照中的坦克ID唯一
         self.game_view = GameView(
             mode="network_host",
-            player1_tank_image=player1_tank_image,
-            player2_tank_image=player2_tank_image
+            tank_images=tank_images,
+            player_ids=player_ids
         )
+        self.game_view.map_index = self.game_host.map_index
+        # 与专用服务器的tick一致：每个固定步长为每个客户端应用一条输入指令
+        self.game_view.before_step = self._apply_pending_inputs
         self.game_view.setup()
         self.game_started = True
-        print(f"游戏开始! 主机坦克: {player1_tank_image}, 客户端坦克: {player2_tank_image}")
+        print(f"游戏开始! {len(player_ids)} 名玩家, 坦克: {tank_images}")
 
     def _start_game(self):
         """开始游戏（兼容旧方法）"""
@@ -436,68 +542,32 @@ class NetworkHostView(arcade.View):
         """获取当前游戏状态"""
         if not self.game_view:
             return {}
-
-        # 提取游戏状态信息
-        tanks = []
-        bullets = []
-
-        # 坦克状态 - 优化数据大小
-        for tank in self.game_view.player_list:
-            # 简化坦克图片信息，只传递类型而不是完整路径
-            tank_image_file = getattr(tank, 'tank_image_file', '')
-            tank_type = "green"  # 默认
-            if tank_image_file:
-                if 'green' in tank_image_file.lower():
-                    tank_type = "green"
-                elif 'desert' in tank_image_file.lower() or 'yellow' in tank_image_file.lower():
-                    tank_type = "yellow"
-                elif 'blue' in tank_image_file.lower():
-                    tank_type = "blue"
-                elif 'grey' in tank_image_file.lower():
-                    tank_type = "grey"
-
-            tank_data = {
-                "id": getattr(tank, 'player_id', 'unknown'),
-                "pos": [round(tank.center_x, 1), round(tank.center_y, 1)],  # 减少精度
-                "ang": round(tank.angle, 1),
-                "hp": tank.health,
-                "type": tank_type
-            }
-            tanks.append(tank_data)
-
-        # 子弹状态 - 优化数据大小
-        for i, bullet in enumerate(self.game_view.bullet_list):
-            bullet_data = {
-                "id": i,  # 使用索引而不是内存地址
-                "pos": [round(bullet.center_x, 1), round(bullet.center_y, 1)],
-                "ang": round(bullet.angle, 1),
-                "own": getattr(bullet.owner, 'player_id', 'unk') if bullet.owner else 'unk'
-            }
-            bullets.append(bullet_data)
-
-        # 回合信息 - 优化数据大小
-        round_info = {
-            "sc": [self.game_view.player1_score, self.game_view.player2_score],
-            "ro": self.game_view.round_over,
-            "go": max(self.game_view.player1_score, self.game_view.player2_score) >= self.game_view.max_score
-        }
-
-        return {
-            "tanks": tanks,
-            "bullets": bullets,
-            "round_info": round_info
-        }
+        return build_game_state(self.game_view.simulation, self.applied_inputs)
 
 
 class NetworkClientView(arcade.View):
     """网络客户端视图 - 重构版，集成完整游戏逻辑"""
 
-    def __init__(self):
+    def __init__(self, interpolation_delay: float = DEFAULT_INTERPOLATION_DELAY):
         super().__init__()
         self.game_client = GameClient()
         self.game_state = {}
         self.connected = False
 
+        # 快照插值缓冲区：渲染时刻回退 interpolation_delay 秒，平滑30Hz快照和网络抖动
+        self.interpolator = SnapshotInterpolator(interpolation_delay)
+
+        # 本地坦克预测：按键立即生效，收到权威快照时校正并重放未确认的输入
+        self.predictor: Optional[LocalTankPredictor] = None
+        self.local_tank = None
+
+        # 客户端实体表：按主机分配的实体ID查找 {实体ID: 精灵}
+        self.render_bullets: Dict[int, RenderBullet] = {}
+        self.tank_sprites: Dict[int, object] = {}
+        # 收到的消失事件按接收时间延迟到渲染时刻再执行 (接收时间, 实体类型, 实体ID)
+        self.pending_despawns = deque()
+        self.resync_pending = False
+
         # 游戏阶段管理
         self.game_phase = "connecting"  # connecting -> playing
 
@@ -508,13 +578,20 @@ class NetworkClientView(arcade.View):
         self.game_view = None
         self.game_initialized = False
 
-        # 线程安全的状态更新队列
-        self.pending_updates = []
+        # 线程安全的状态更新信箱：只保留最新的若干快照，卡顿后不会积压过时状态
+        self.pending_updates = Mailbox(SNAPSHOT_MAILBOX_CAPACITY)
+        self.dropped_updates = 0  # 已处理的信箱丢弃数
         self.pending_disconnection = None
         self.pending_tank_selection = None  # 待处理的坦克选择开始消息
 
-    def connect_to_room(self, host_ip: str, host_port: int, player_name: str) -> bool:
-        """连接到房间"""
+        # 网络统计叠加层（F3）
+        self.net_stats = NetStatsOverlay(
+            lambda: [format_stats("主机", self.game_client.get_network_stats()["host"])]
+        )
+
+    def connect_to_room(self, host_ip: str, host_port: int, player_name: str,
+                        room_id: Optional[int] = None, spectator: bool = False) -> bool:
+        """连接到房间（room_id为多房间服务器中的房间编号，spectator为True时只观战）"""
         # 设置回调
         self.game_client.set_callbacks(
             connection=self._on_connected,
@@ -522,7 +599,7 @@ class NetworkClientView(arcade.View):
             game_state=self._on_game_state_update
         )
 
-        return self.game_client.connect_to_host(host_ip, host_port, player_name)
+        return self.game_client.connect_to_host(host_ip, host_port, player_name, room_id, spectator)
 
     def on_show_view(self):
         """显示视图时的初始化"""
@@ -535,10 +612,40 @@ class NetworkClientView(arcade.View):
 
     def on_update(self, delta_time):
         """主线程更新 - 处理网络线程的回调"""
-        # 处理待处理的游戏状态更新
-        while self.pending_updates:
-            game_state = self.pending_updates.pop(0)
-            self._sync_game_state(game_state)
+        # 将网络线程收到的快照全部放入插值缓冲区（不合并），本地坦克只用其中最新的权威状态校正
+        updates = self.pending_updates.drain()
+        if updates:
+            self._reconcile_local_tank(updates[-1][1])
+        if self.pending_updates.dropped != self.dropped_updates:
+            # 被丢弃的快照中的生成/消失事件已丢失，按实体集合重新对齐
+            self.dropped_updates = self.pending_updates.dropped
+            self.resync_pending = True
+        for receive_time, game_state in updates:
+            self.interpolator.push(game_state, receive_time)
+            for _, event, kind, entity_id in game_state.get("events", []):
+                if event == EVENT_DESPAWN:
+                    self.pending_despawns.append((receive_time, kind, entity_id))
+            if game_state.get("resync"):
+                self.resync_pending = True
+            # 收到第一个快照后开始渲染游戏
+            if self.game_phase == "connecting":
+                self.game_phase = "playing"
+
+        # 渲染时刻已经越过的消失事件
+        render_time = time.time() - self.interpolator.interpolation_delay
+        while self.pending_despawns and self.pending_despawns[0][0] <= render_time:
+            _, kind, entity_id = self.pending_despawns.popleft()
+            self._despawn_entity(kind, entity_id)
+
+        # 本地坦克按预测推进，不等待主机往返
+        if self.predictor and self.local_tank:
+            self.predictor.step(delta_time)
+            self.local_tank.sync_with_pymunk_body()
+
+        # 按渲染时刻插值后同步到游戏视图
+        interpolated_state = self.interpolator.sample()
+        if interpolated_state is not None:
+            self._sync_game_state(interpolated_state)
 
         # 处理断开连接
         if self.pending_disconnection:
@@ -568,7 +675,8 @@ class NetworkClientView(arcade.View):
             self.game_view.on_draw()
 
             # 绘制网络状态信息
-            arcade.draw_text(f"客户端 - 玩家ID: {self.game_client.get_player_id()}",
+            role = "观战中 - 观众ID" if self.game_client.spectator else "客户端 - 玩家ID"
+            arcade.draw_text(f"{role}: {self.game_client.get_player_id()}",
                            10, self.window.height - 30,
                            arcade.color.WHITE, font_size=16)
         else:
@@ -576,9 +684,13 @@ class NetworkClientView(arcade.View):
                            self.window.width // 2, self.window.height // 2,
                            arcade.color.BLACK, font_size=24, anchor_x="center")
 
+        self.net_stats.draw(self.window)
+
     def on_key_press(self, key, modifiers):
         """处理按键事件"""
-        if key == arcade.key.ESCAPE:
+        if key == NET_STATS_KEY:
+            self.net_stats.toggle()
+        elif key == arcade.key.ESCAPE:
             # 返回房间浏览
             browser_view = RoomBrowserView()
             self.window.show_view(browser_view)
@@ -589,13 +701,32 @@ class NetworkClientView(arcade.View):
             # 发送按键到服务器
             key_name = self._get_key_name(key)
             if key_name:
-                self.game_client.send_key_press(key_name)
+                seq = self.game_client.send_key_press(key_name)
+                self._predict_input(seq, key_name, True)
 
     def on_key_release(self, key, modifiers):
         """处理按键释放事件"""
         key_name = self._get_key_name(key)
         if key_name:
-            self.game_client.send_key_release(key_name)
+            seq = self.game_client.send_key_release(key_name)
+            self._predict_input(seq, key_name, False)
+
+    def _predict_input(self, seq: Optional[int], key_name: str, pressed: bool):
+        """将已发送的输入立即应用到本地预测的坦克"""
+        if seq is not None and self.predictor:
+            self.predictor.apply_input(seq, REMOTE_KEY_CONTROLS.get(key_name), pressed)
+
+    def _reconcile_local_tank(self, game_state: dict):
+        """用权威快照中的本地坦克状态校正预测"""
+        if not self.predictor:
+            return
+        player_id = self.game_client.get_player_id()
+        for tank_data in game_state.get("tanks", []):
+            if tank_data.get("id") == player_id:
+                self.predictor.reconcile(tank_data)
+                if self.local_tank:
+                    self.local_tank.sync_with_pymunk_body()
+                break
 
     def _get_key_name(self, key) -> Optional[str]:
         """获取按键名称"""
@@ -626,8 +757,8 @@ class NetworkClientView(arcade.View):
 
     def _on_game_state_update(self, game_state: dict):
         """游戏状态更新回调 - 线程安全"""
-        # 将游戏状态更新放入队列，在主线程中处理
-        self.pending_updates.append(game_state.copy())
+        # 将游戏状态更新连同接收时间放入队列，在主线程中处理
+        self.pending_updates.put((time.time(), game_state.copy()))
 
     def _initialize_game_view(self):
         """初始化完整的游戏视图"""
@@ -652,6 +783,7 @@ class NetworkClientView(arcade.View):
                 player1_tank_image=player1_tank_image,  # 主机坦克
                 player2_tank_image=player2_tank_image   # 客户端坦克
             )
+            self.game_view.map_index = self.game_client.map_index  # 与主机使用同一张地图
             self.game_view.setup()
             self.game_initialized = True
             print("客户端游戏视图初始化完成")
@@ -663,87 +795,129 @@ class NetworkClientView(arcade.View):
             import traceback
             traceback.print_exc()
 
+    @staticmethod
+    def _tank_key(tank_data: dict):
+        """坦克的实体表键：实体ID，旧格式快照退回玩家ID"""
+        eid = tank_data.get("eid")
+        return eid if eid is not None else tank_data.get("id")
+
+    def _tank_for(self, tank_data: dict):
+        """查找实体对应的坦克精灵，新实体绑定到空闲精灵或新建精灵"""
+        key = self._tank_key(tank_data)
+        tank = self.tank_sprites.get(key)
+        if tank is not None:
+            return tank
+
+        bound = set(id(t) for t in self.tank_sprites.values())
+        tank = next((t for t in self.game_view.player_list if id(t) not in bound), None)
+        if tank is None:
+            from game_views import NEW_PLAYER_SCALE
+            image = TANK_IMAGE_PATHS_BY_TYPE.get(tank_data.get("type"), PLAYER_IMAGE_PATH_GREEN)
+            pos = tank_data.get("pos", [0, 0])
+            tank = Tank(image, NEW_PLAYER_SCALE, pos[0], pos[1])
+            self.game_view.player_list.append(tank)
+            # 超出本地槽位的玩家按出现顺序追加，底部面板随之增加一栏
+            self.game_view.simulation.tanks.append(tank)
+            if tank.pymunk_body and tank.pymunk_shape:
+                self.game_view.space.add(tank.pymunk_body, tank.pymunk_shape)
+        tank.player_id = tank_data.get("id")
+        tank.entity_id = tank_data.get("eid")
+        self.tank_sprites[key] = tank
+        return tank
+
+    def _despawn_entity(self, kind: str, entity_id):
+        """处理实体消失：移除子弹精灵，坦克精灵解除绑定留给重生的坦克复用"""
+        if kind == KIND_BULLET:
+            bullet = self.render_bullets.pop(entity_id, None)
+            if bullet is not None and bullet in self.game_view.bullet_list:
+                self.game_view.bullet_list.remove(bullet)
+        else:
+            tank = self.tank_sprites.pop(entity_id, None)
+            if tank is not None and tank is self.local_tank:
+                self.predictor = None
+                self.local_tank = None
+
     def _sync_game_state(self, game_state: dict):
         """同步服务器游戏状态到本地游戏视图"""
         if not self.game_view:
             return
 
         try:
-            # 同步坦克状态
+            # 同步坦克状态：按实体ID查找绑定的坦克精灵
             tanks_data = game_state.get("tanks", [])
-            if self.game_view.player_list and len(tanks_data) > 0:
-                # 确保坦克列表有足够的坦克对象
-                while len(self.game_view.player_list) < len(tanks_data):
-                    # 如果坦克数量不足，创建新的坦克（这种情况不应该经常发生）
-                    print(f"警告: 需要创建额外的坦克对象 ({len(self.game_view.player_list)} < {len(tanks_data)})")
-
-                for i, tank_data in enumerate(tanks_data):
-                    if i < len(self.game_view.player_list):
-                        tank = self.game_view.player_list[i]
-
-                        # 适配优化后的数据格式
-                        if "pos" in tank_data:  # 新格式
-                            tank.center_x = tank_data["pos"][0]
-                            tank.center_y = tank_data["pos"][1]
-                            tank.angle = tank_data["ang"]
-                            tank.health = tank_data.get("hp", 5)
-                        else:  # 兼容旧格式
-                            tank.center_x = tank_data["position"][0]
-                            tank.center_y = tank_data["position"][1]
-                            tank.angle = tank_data["angle"]
-                            tank.health = tank_data.get("health", 5)
-
-                        # 同步Pymunk body位置（如果存在）
-                        if hasattr(tank, 'pymunk_body') and tank.pymunk_body:
-                            tank.pymunk_body.position = (tank.center_x, tank.center_y)
-                            tank.pymunk_body.angle = math.radians(tank.angle + 90)  # 转换角度
-
-                        # 确保坦克可见
-                        if hasattr(tank, 'visible'):
-                            tank.visible = True
-
-            # 同步子弹状态
+            local_id = self.game_client.get_player_id()
+            for tank_data in tanks_data:
+                tank = self._tank_for(tank_data)
+
+                # 本地坦克的位置由预测器负责，只同步血量
+                if self.predictor and tank is self.local_tank:
+                    tank.health = tank_data.get("hp", tank.health)
+                    continue
+
+                # 适配优化后的数据格式
+                if "pos" in tank_data:  # 新格式
+                    tank.center_x = tank_data["pos"][0]
+                    tank.center_y = tank_data["pos"][1]
+                    tank.angle = tank_data["ang"]
+                    tank.health = tank_data.get("hp", 5)
+                else:  # 兼容旧格式
+                    tank.center_x = tank_data["position"][0]
+                    tank.center_y = tank_data["position"][1]
+                    tank.angle = tank_data["angle"]
+                    tank.health = tank_data.get("health", 5)
+
+                # 同步Pymunk body位置（如果存在）
+                if hasattr(tank, 'pymunk_body') and tank.pymunk_body:
+                    tank.pymunk_body.position = (tank.center_x, tank.center_y)
+                    tank.pymunk_body.angle = math.radians(90 - tank.angle)  # Arcade角度转换为Pymunk角度
+
+                    # 首次同步到本地坦克（或本地坦克重生后）开始预测
+                    if local_id is not None and tank_data.get("id") == local_id:
+                        self.local_tank = tank
+                        self.predictor = LocalTankPredictor(tank.pymunk_body, self.game_view.space)
+
+                # 确保坦克可见
+                if hasattr(tank, 'visible'):
+                    tank.visible = True
+
+            # 同步子弹状态：按ID原地更新，只有新增和消失的子弹才分配/释放精灵
             bullets_data = game_state.get("bullets", [])
-            # 清空现有子弹
-            self.game_view.bullet_list.clear()
-
-            # 重新创建子弹（修复构造函数参数）
-            for bullet_data in bullets_data:
-                try:
-                    from tank_sprites import Bullet
-
-                    # 适配优化后的数据格式
-                    if "pos" in bullet_data:  # 新格式
-                        bullet_x = bullet_data["pos"][0]
-                        bullet_y = bullet_data["pos"][1]
-                        bullet_angle = bullet_data["ang"]
-                    else:  # 兼容旧格式
-                        bullet_x = bullet_data["position"][0]
-                        bullet_y = bullet_data["position"][1]
-                        bullet_angle = bullet_data["angle"]
-
-                    # 使用正确的Bullet构造函数参数
-                    bullet = Bullet(
-                        radius=4,  # 默认子弹半径
-                        owner=None,  # 客户端显示用，不需要owner
-                        tank_center_x=bullet_x,
-                        tank_center_y=bullet_y,
-                        actual_emission_angle_degrees=bullet_angle,
-                        speed_magnitude=16,  # 默认速度
-                        color=arcade.color.YELLOW_ORANGE  # 默认颜色
-                    )
-
+            bullet_colors = {t.get("id"): BULLET_COLORS_BY_TANK_TYPE.get(t.get("type"), arcade.color.YELLOW_ORANGE)
+                             for t in tanks_data}
+            seen_ids = set()
+            for i, bullet_data in enumerate(bullets_data):
+                # 适配优化后的数据格式
+                if "pos" in bullet_data:  # 新格式
+                    bullet_x, bullet_y = bullet_data["pos"]
+                    bullet_angle = bullet_data.get("ang", 0)
+                else:  # 兼容旧格式
+                    bullet_x, bullet_y = bullet_data["position"]
+                    bullet_angle = bullet_data.get("angle", 0)
+
+                bullet_id = bullet_data.get("id", i)
+                seen_ids.add(bullet_id)
+                bullet = self.render_bullets.get(bullet_id)
+                if bullet:
+                    bullet.set_state(bullet_x, bullet_y, bullet_angle)
+                else:
+                    color = bullet_colors.get(bullet_data.get("own"), arcade.color.YELLOW_ORANGE)
+                    bullet = RenderBullet(bullet_id, bullet_x, bullet_y, bullet_angle, color)
+                    self.render_bullets[bullet_id] = bullet
                     self.game_view.bullet_list.append(bullet)
-                except Exception as e:
-                    print(f"创建子弹失败: {e}")
+
+            # 完整快照后按实体集合对齐一次（正常情况下消失由事件驱动）
+            if self.resync_pending:
+                self.resync_pending = False
+                for bullet_id in [bid for bid in self.render_bullets if bid not in seen_ids]:
+                    self._despawn_entity(KIND_BULLET, bullet_id)
+                tank_keys = {self._tank_key(tank_data) for tank_data in tanks_data}
+                for tank_key in [key for key in self.tank_sprites if key not in tank_keys]:
+                    self._despawn_entity(KIND_TANK, tank_key)
 
             # 同步回合信息
             round_info = game_state.get("round_info", {})
             if "sc" in round_info:  # 新格式
-                scores = round_info["sc"]
-                if len(scores) >= 2:
-                    self.game_view.player1_score = scores[0]
-                    self.game_view.player2_score = scores[1]
+                self.game_view.set_scores(round_info["sc"])
                 self.game_view.round_over = round_info.get("ro", False)
             elif "scores" in round_info:  # 兼容旧格式
                 self.game_view.player1_score = round_info["scores"].get("player1", 0)
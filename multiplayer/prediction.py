@@ -0,0 +1,188 @@
+"""
+客户端本地预测与服务器校正
+
+客户端按下按键后不等待主机，用与主机相同的控制规则 (tank_controls) 驱动本地坦克。
+预测与主机一样按固定步长 (fixed_timestep.FixedTimestep) 推进，每个步长应用一条指令（同一序号的输入），
+并逐步记录预测历史，重放时的结果因此与主机的计算一致。主机在快照中回传该玩家已处理的最新输入序号 (seq)
+和应用时间，客户端按快照的发送时间算出处理后经过的毫秒数 (age)，据此找到快照对应的本地帧：
+误差很小时保留预测；否则以服务器状态为起点，重放之后所有帧的输入和步长。
+"""
+
+import math
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from fixed_timestep import FixedTimestep, FIXED_STEP
+from tank_controls import CONTROL_FIRE, apply_control_press, apply_control_release
+
+DEFAULT_POSITION_TOLERANCE = 2.0   # 位置误差容忍度(像素)，超过则重放
+DEFAULT_ANGLE_TOLERANCE = 2.0      # 角度误差容忍度(度)
+
+
+class PredictedFrame:
+    """一个固定步长的本地预测：步长开始时应用的输入、步长以及步进后的body状态"""
+
+    __slots__ = ("end_time", "dt", "inputs", "position", "angle",
+                 "velocity", "angular_velocity")
+
+    def __init__(self, end_time: float, dt: float, inputs: List[Tuple[int, str, bool]]):
+        self.end_time = end_time
+        self.dt = dt
+        self.inputs = inputs
+        self.position = (0.0, 0.0)
+        self.angle = 0.0
+        self.velocity = (0.0, 0.0)
+        self.angular_velocity = 0.0
+
+    def capture(self, body):
+        """记录步进后的body状态"""
+        self.position = (body.position.x, body.position.y)
+        self.angle = body.angle
+        self.velocity = (body.velocity.x, body.velocity.y)
+        self.angular_velocity = body.angular_velocity
+
+
+class LocalTankPredictor:
+    """本地坦克预测器，驱动本地坦克的Pymunk body并与服务器快照校正"""
+
+    def __init__(self, body, space, max_frames: int = 240,
+                 position_tolerance: float = DEFAULT_POSITION_TOLERANCE,
+                 angle_tolerance: float = DEFAULT_ANGLE_TOLERANCE,
+                 step: float = FIXED_STEP):
+        self.body = body
+        self.space = space
+        self.position_tolerance = position_tolerance
+        self.angle_tolerance = angle_tolerance
+        self.timestep = FixedTimestep(step)  # 与主机相同的固定步长
+
+        self.frames: deque = deque(maxlen=max_frames)
+        self.pending_inputs: deque = deque()                 # 尚未应用的输入 (序号, 控制指令, 是否按下)
+        self.input_times: Dict[int, float] = {}              # 输入序号 -> 本地应用时间
+        self.last_input_seq = 0
+        self.acked_seq = 0
+        self.corrections = 0  # 发生重放校正的次数（调试用）
+
+    def apply_input(self, seq: int, control: Optional[str], pressed: bool,
+                    now: Optional[float] = None):
+        """记录一个本地输入，在下一个固定步长开始时应用（与主机一样每步一条指令），射击由主机处理"""
+        if now is None:
+            now = time.time()
+        self.last_input_seq = max(self.last_input_seq, seq)
+        self.input_times[seq] = now
+        if not control or control == CONTROL_FIRE:
+            return
+        self.pending_inputs.append((seq, control, pressed))
+
+    def step(self, frame_dt: float, now: Optional[float] = None) -> int:
+        """加入一帧经过的时间，按固定步长推进本地物理并记录预测，返回推进的步数"""
+        if now is None:
+            now = time.time()
+        steps = self.timestep.advance(frame_dt)
+        dt = self.timestep.step
+        for i in range(steps):
+            inputs = self._next_command()
+            for _, control, pressed in inputs:
+                self._apply(control, pressed)
+            # 同一帧内推进的多步按步长倒推各自的结束时刻
+            frame = PredictedFrame(now - (steps - 1 - i) * dt, dt, inputs)
+            self._step_space(dt)
+            frame.capture(self.body)
+            self.frames.append(frame)
+        return steps
+
+    def _next_command(self) -> List[Tuple[int, str, bool]]:
+        """取出最早一条指令（同一序号）的全部输入"""
+        inputs = []
+        if self.pending_inputs:
+            seq = self.pending_inputs[0][0]
+            while self.pending_inputs and self.pending_inputs[0][0] == seq:
+                inputs.append(self.pending_inputs.popleft())
+        return inputs
+
+    def _step_space(self, dt: float):
+        substeps = self.timestep.substeps
+        for _ in range(substeps):
+            self.space.step(dt / substeps)
+
+    def reconcile(self, server_tank: Dict[str, Any]) -> bool:
+        """用服务器快照中的本地坦克状态校正预测，返回是否进行了重放"""
+        if "pos" not in server_tank:
+            return False
+        seq = server_tank.get("seq", 0)
+        if seq < self.acked_seq:
+            return False  # 乱序到达的旧快照
+
+        if seq == 0:
+            if self.last_input_seq:
+                return False  # 首个输入尚未被主机处理，继续相信本地预测
+            self._snap_to(server_tank)
+            return False
+
+        input_time = self.input_times.get(seq)
+        self.acked_seq = seq
+        for old_seq in [s for s in self.input_times if s < seq]:
+            del self.input_times[old_seq]
+        if input_time is None:
+            self._snap_to(server_tank)
+            return True
+
+        # 快照对应的本地时刻 = 输入在本地应用的时刻 + 主机处理该输入后经过的时间
+        server_time = input_time + server_tank.get("age", 0) / 1000.0
+        base = None
+        while self.frames and self.frames[0].end_time <= server_time:
+            base = self.frames.popleft()
+
+        if base is not None and self._within_tolerance(base, server_tank):
+            self.frames.appendleft(base)  # 保留基准帧，下次校正可能仍以它为起点
+            return False
+
+        # 从服务器状态开始重放之后的所有帧
+        self._set_pose(server_tank)
+        if base is not None:
+            self.body.velocity = base.velocity
+            self.body.angular_velocity = base.angular_velocity
+        for frame in self.frames:
+            for _, control, pressed in frame.inputs:
+                self._apply(control, pressed)
+            self._step_space(frame.dt)
+            frame.capture(self.body)
+        self.corrections += 1
+        return True
+
+    def reset(self):
+        """清空预测历史（回合重置或断线时调用）"""
+        self.frames.clear()
+        self.pending_inputs.clear()
+        self.timestep.reset()
+        self.input_times.clear()
+        self.last_input_seq = 0
+        self.acked_seq = 0
+
+    def _apply(self, control: str, pressed: bool):
+        if pressed:
+            apply_control_press(self.body, control)
+        else:
+            apply_control_release(self.body, control)
+
+    def _within_tolerance(self, frame: PredictedFrame, server_tank: Dict[str, Any]) -> bool:
+        dx = frame.position[0] - server_tank["pos"][0]
+        dy = frame.position[1] - server_tank["pos"][1]
+        if math.hypot(dx, dy) > self.position_tolerance:
+            return False
+        if "ang" in server_tank:
+            predicted_ang = 90 - math.degrees(frame.angle)
+            diff = (predicted_ang - server_tank["ang"] + 180.0) % 360.0 - 180.0
+            if abs(diff) > self.angle_tolerance:
+                return False
+        return True
+
+    def _set_pose(self, server_tank: Dict[str, Any]):
+        self.body.position = (server_tank["pos"][0], server_tank["pos"][1])
+        if "ang" in server_tank:
+            # Arcade的0度（向上）对应Pymunk的math.pi/2
+            self.body.angle = math.radians(90 - server_tank["ang"])
+
+    def _snap_to(self, server_tank: Dict[str, Any]):
+        self._set_pose(server_tank)
+        self.frames.clear()
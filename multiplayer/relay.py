@@ -0,0 +1,166 @@
+"""
+观战中继
+
+中继以观众身份订阅一个主机，把收到的快照延迟后转发给任意多名观众：
+
+    python -m multiplayer.relay --host 192.168.1.10 --port 12346 --listen 12347 --delay 3
+
+- 主机只向中继发送一路快照，发送开销与观众人数无关
+- 观众一侧复用 GameHost：编码协商、按各观众的确认发送增量、自适应频率、批量发送和超时检查
+- 延迟缓冲：快照按收到的时间排队，满 delay 秒后才转发（锦标赛直播防止选手通过观战获取信息）
+- 同一轮到期的多个快照只转发最新的一个，其余快照的生成/消失事件并入其中
+- 上游发来完整快照（中继可能漏掉了事件）时，所有观众下一次也收到完整快照重新对齐
+- 中继只接受观众，玩家的加入请求被拒绝；上游断开时中继通知所有观众后停止
+"""
+
+import argparse
+import time
+from collections import deque
+from typing import Optional
+
+from . import GAME_PORT
+from .net_engine import get_engine, Timer
+from .udp_client import GameClient
+from .udp_host import GameHost
+
+DEFAULT_RELAY_PORT = GAME_PORT + 1
+DEFAULT_RELAY_ROOM_NAME = "观战中继"
+DEFAULT_MAX_SPECTATORS = 256
+RELEASE_INTERVAL = 1.0 / 60.0  # 检查延迟缓冲的周期(秒)
+
+
+class SpectatorRelay:
+    """观战中继：一路上游快照扇出给多名观众"""
+
+    def __init__(self, host_ip: str, host_port: int = GAME_PORT, listen_port: int = DEFAULT_RELAY_PORT,
+                 delay: float = 0.0, room_id: Optional[int] = None,
+                 room_name: str = DEFAULT_RELAY_ROOM_NAME, max_spectators: int = DEFAULT_MAX_SPECTATORS):
+        self.host_address = (host_ip, host_port)
+        self.room_id = room_id
+        self.room_name = room_name
+        self.delay = delay
+
+        # 上游：作为主机的一名观众
+        self.upstream = GameClient()
+        # 下游：只接受观众的主机
+        self.downstream = GameHost(host_port=listen_port, max_players=0, local_player=False,
+                                   max_spectators=max_spectators)
+
+        self.buffer = deque()  # (收到时间, 快照)
+        self.release_timer: Optional[Timer] = None
+        self.running = False
+
+        # 统计
+        self.received = 0
+        self.relayed = 0
+
+    def start(self) -> bool:
+        """连接上游主机并开始接受观众"""
+        self.upstream.set_callbacks(disconnection=self._on_upstream_lost, game_state=self._on_upstream_state)
+        host_ip, host_port = self.host_address
+        if not self.upstream.connect_to_host(host_ip, host_port, self.room_name, self.room_id, spectator=True):
+            return False
+
+        # 观众使用与上游相同的地图
+        self.downstream.map_index = self.upstream.map_index
+        if not self.downstream.start_hosting(self.room_name):
+            self.upstream.disconnect()
+            return False
+
+        self.running = True
+        self.release_timer = get_engine().call_every(RELEASE_INTERVAL, self.release_due)
+        print(f"观战中继已启动: {host_ip}:{host_port} -> 端口 {self.downstream.host_port} (延迟 {self.delay}秒)")
+        return True
+
+    def stop(self):
+        """断开上游并通知所有观众"""
+        if not self.running:
+            return
+        self.running = False
+        if self.release_timer:
+            self.release_timer.cancel()
+            self.release_timer = None
+        self.upstream.disconnect()
+        self.downstream.stop_hosting()
+        self.buffer.clear()
+        print(f"观战中继已停止 (转发 {self.relayed}/{self.received} 个快照)")
+
+    def run(self) -> bool:
+        """启动中继并运行，直到上游断开或Ctrl+C"""
+        if not self.start():
+            return False
+        try:
+            while self.running:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("收到中断信号，正在关闭中继...")
+        finally:
+            self.stop()
+        return True
+
+    def get_spectator_count(self) -> int:
+        return self.downstream.get_spectator_count()
+
+    def release_due(self, now: Optional[float] = None) -> int:
+        """转发延迟已满的快照，返回本次合并的快照数"""
+        now = time.time() if now is None else now
+        due = []
+        while self.buffer and now - self.buffer[0][0] >= self.delay:
+            due.append(self.buffer.popleft()[1])
+        if not due:
+            return 0
+
+        # 事件去掉上游的tick，由下游主机按自己的tick重新编号
+        events = [event[1:] for state in due for event in state.get("events", [])]
+        if any(state.get("resync") for state in due):
+            self.downstream.resync_clients()
+        latest = due[-1]
+        # 释放时机由延迟缓冲决定，不再受下游主机的广播间隔限制
+        sent = self.downstream.broadcast_game_state({
+            "tanks": latest.get("tanks", []),
+            "bullets": latest.get("bullets", []),
+            "round_info": latest.get("round_info", {}),
+            "events": events,
+        }, force=True)
+        if sent:
+            self.relayed += 1
+        return len(due)
+
+    # --- 上游回调（网络线程） ---
+    def _on_upstream_state(self, game_state: dict):
+        self.received += 1
+        self.buffer.append((time.time(), game_state))
+
+    def _on_upstream_lost(self, reason: str):
+        if self.running and reason != "user_disconnect":
+            print(f"上游主机断开: {reason}")
+            self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m multiplayer.relay", description="坦克动荡观战中继")
+    parser.add_argument("--host", required=True, help="上游主机IP")
+    parser.add_argument("--port", type=int, default=GAME_PORT, help=f"上游主机端口 (默认 {GAME_PORT})")
+    parser.add_argument("--room-id", type=int, default=None, help="多房间服务器中的房间编号")
+    parser.add_argument("--listen", type=int, default=DEFAULT_RELAY_PORT,
+                        help=f"观众连接的端口 (默认 {DEFAULT_RELAY_PORT})")
+    parser.add_argument("--delay", type=float, default=0.0, help="转发延迟(秒)，默认不延迟")
+    parser.add_argument("--room", default=DEFAULT_RELAY_ROOM_NAME, help="广播的房间名")
+    parser.add_argument("--max-spectators", type=int, default=DEFAULT_MAX_SPECTATORS, help="观众上限")
+    args = parser.parse_args(argv)
+    if args.delay < 0:
+        parser.error("--delay 不能小于0")
+    if args.max_spectators <= 0:
+        parser.error("--max-spectators 必须大于0")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    relay = SpectatorRelay(args.host, args.port, args.listen, args.delay, args.room_id,
+                           args.room, args.max_spectators)
+    return 0 if relay.run() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+"""
+UDP上的可靠有序控制通道
+
+加入响应、坦克选择和游戏开始/结束等控制消息丢失一个数据报就可能卡住大厅流程。
+每对主机-客户端各有一个 ReliableChannel，与不可靠的快照通道分开：
+- 可靠消息的JSON信封携带递增的 "rseq"，发送方保留到被确认为止，超时按指数退避重传
+- 接收方按序交付：重复的消息丢弃，提前到达的消息暂存到缺口补齐
+- 确认是累计的 "rack"（已按序收到的最大序号），捎带在发往对方的下一条消息上
+  （客户端的快照确认、心跳、输入；主机的二进制快照在包尾追加，见 state_codec.append_ack）；
+  ACK_DELAY 内没有可捎带的消息时单独发送 reliable_ack
+- 快照本身不可靠，不分配序号
+
+通道只维护状态，收发由所有者（GameHost / GameClient）完成；可以从网络线程和游戏线程同时调用。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .net_engine import get_engine
+from .udp_messages import UDPMessage, MessageType
+
+# 需要可靠送达的控制消息（失败的加入响应没有会话，仍然直接发送；断开通知见 DISCONNECT_REPEATS）
+RELIABLE_TYPES = frozenset([
+    MessageType.JOIN_RESPONSE,
+    MessageType.GAME_START,
+    MessageType.GAME_END,
+    MessageType.TANK_SELECTION_START,
+    MessageType.TANK_SELECTED,
+    MessageType.TANK_SELECTION_SYNC,
+    MessageType.TANK_SELECTION_READY,
+    MessageType.TANK_SELECTION_CONFLICT,
+])
+
+INITIAL_RTO = 0.2         # 首次重传超时(秒)
+MAX_RTO = 1.0             # 重传超时上限(秒)
+MAX_RETRANSMITS = 15      # 超过后放弃该消息（对方多半已经离线，由心跳超时处理）
+ACK_DELAY = 0.02          # 等待捎带确认的时间(秒)
+MAX_HELD_MESSAGES = 64    # 乱序暂存上限
+DISCONNECT_REPEATS = 3    # 断开通知发出后套接字随即关闭，无法重传，改为冗余发送
+
+
+class _Pending:
+    """等待确认的消息"""
+
+    __slots__ = ("data", "next_time", "rto", "attempts")
+
+    def __init__(self, data: bytes, next_time: float):
+        self.data = data
+        self.next_time = next_time
+        self.rto = INITIAL_RTO
+        self.attempts = 0
+
+
+class ReliableChannel:
+    """一个方向对上的可靠有序通道"""
+
+    def __init__(self, player_id: Optional[str] = None):
+        self.player_id = player_id  # 单独发送确认时填入的发送方ID（客户端→主机需要用于分发）
+        self.lock = threading.Lock()
+
+        # 发送方向
+        self.next_seq = 1
+        self.unacked: "OrderedDict[int, _Pending]" = OrderedDict()
+
+        # 接收方向
+        self.delivered = 0                     # 已按序交付的最大序号
+        self.held: Dict[int, UDPMessage] = {}  # 提前到达、等待缺口补齐的消息
+        self.ack_due: Optional[float] = None   # 需要发送确认的截止时间，None表示没有待发确认
+
+        # 统计
+        self.retransmits = 0
+        self.duplicates = 0
+        self.given_up = 0
+
+    # --- 发送 ---
+    def prepare(self, message: UDPMessage, now: float) -> bytes:
+        """为可靠消息分配序号并记录，返回要发送的字节"""
+        with self.lock:
+            message.reliable_seq = self.next_seq
+            self.next_seq += 1
+            message.ack = self._take_ack()
+            data = message.to_bytes()
+            self.unacked[message.reliable_seq] = _Pending(data, now + INITIAL_RTO)
+            return data
+
+    def stamp(self, message: UDPMessage):
+        """在发往对方的普通消息上捎带待发的确认"""
+        with self.lock:
+            message.ack = self._take_ack()
+
+    def take_ack(self) -> Optional[int]:
+        """取出待发的确认（没有时为None），由调用方附在已序列化的数据上发送"""
+        with self.lock:
+            return self._take_ack()
+
+    def poll(self, now: float) -> List[bytes]:
+        """返回到期需要重传的消息，以及到期仍未捎带的单独确认"""
+        out = []
+        with self.lock:
+            for seq, pending in list(self.unacked.items()):
+                if pending.next_time > now:
+                    continue
+                if pending.attempts >= MAX_RETRANSMITS:
+                    del self.unacked[seq]
+                    self.given_up += 1
+                    continue
+                pending.attempts += 1
+                pending.rto = min(pending.rto * 2, MAX_RTO)
+                pending.next_time = now + pending.rto
+                self.retransmits += 1
+                out.append(pending.data)
+
+            if self.ack_due is not None and self.ack_due <= now:
+                ack_message = UDPMessage(MessageType.RELIABLE_ACK, {}, self.player_id)
+                ack_message.ack = self._take_ack()
+                out.append(ack_message.to_bytes())
+        return out
+
+    def next_deadline(self) -> Optional[float]:
+        """下一次需要调用 poll 的时间，没有待处理的工作时为None"""
+        with self.lock:
+            times = [pending.next_time for pending in self.unacked.values()]
+            if self.ack_due is not None:
+                times.append(self.ack_due)
+        return min(times) if times else None
+
+    # --- 接收 ---
+    def receive(self, message: UDPMessage, now: float) -> List[UDPMessage]:
+        """处理收到的消息，返回按序可交付的消息（普通消息原样返回）"""
+        with self.lock:
+            if message.ack is not None:
+                while self.unacked:
+                    seq = next(iter(self.unacked))
+                    if seq > message.ack:
+                        break
+                    del self.unacked[seq]
+
+            seq = message.reliable_seq
+            if seq is None:
+                return [] if message.type == MessageType.RELIABLE_ACK else [message]
+
+            # 无论是否重复都要确认，对方可能没收到上一次的确认
+            if self.ack_due is None:
+                self.ack_due = now + ACK_DELAY
+            if seq <= self.delivered or seq in self.held:
+                self.duplicates += 1
+                return []
+            if seq != self.delivered + 1:
+                if len(self.held) < MAX_HELD_MESSAGES:
+                    self.held[seq] = message
+                return []
+
+            ready = [message]
+            self.delivered = seq
+            while self.delivered + 1 in self.held:
+                self.delivered += 1
+                ready.append(self.held.pop(self.delivered))
+            return ready
+
+    def _take_ack(self) -> Optional[int]:
+        """取出待发确认（调用方持有锁）"""
+        if self.ack_due is None:
+            return None
+        self.ack_due = None
+        return self.delivered
+
+
+class ReliableTimer:
+    """按通道的最早截止时间安排 service 回调的网络引擎定时器"""
+
+    def __init__(self, service: Callable[[], None]):
+        self.service = service
+        self.lock = threading.Lock()
+        self.timer = None
+        self.due: Optional[float] = None
+
+    def schedule(self, deadline: Optional[float], now: float):
+        """确保在deadline之前调用一次service"""
+        if deadline is None:
+            return
+        with self.lock:
+            if self.due is not None and self.due <= deadline:
+                return
+            if self.timer is not None:
+                self.timer.cancel()
+            self.due = deadline
+            self.timer = get_engine().call_later(max(0.0, deadline - now), self._fire)
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = None
+            self.due = None
+
+    def _fire(self):
+        with self.lock:
+            self.timer = None
+            self.due = None
+        self.service()
@@ -0,0 +1,188 @@
+"""
+多房间专用服务器
+
+一个进程运行多场相互独立的比赛（每个房间有自己的 Simulation 和 pymunk.Space），
+所有房间共用一个UDP套接字，收包和超时检查由网络引擎的事件循环完成：
+
+    python -m multiplayer.server --rooms 16 --room "锦标赛" --port 12346
+
+- 加入请求携带 room_id，按房间分发；之后的消息按客户端ID找到所在房间
+- 每个房间的 GameHost 使用共享套接字发送快照，收包和超时检查由本服务器代为调用
+- 所有房间的快照放入同一个发送批次，每个tick统一冲刷一次
+- 各房间可靠控制通道的重传和单独确认由一个周期定时器统一处理
+- 所有房间的列表由 MultiRoomAdvertiser 在一个广播周期内发出
+"""
+
+import socket
+from typing import Dict, Optional, Tuple
+
+from . import GAME_PORT, DISCOVERY_PORT
+from .net_engine import get_engine, Endpoint, Timer
+from .send_batch import SendBatch
+from .server import GameServer, DEFAULT_ROOM_NAME, DEFAULT_TICK_RATE, DEFAULT_PLAYERS, run_at_fixed_rate
+from .udp_discovery import MultiRoomAdvertiser, DEFAULT_DISCOVERY_MODE, open_game_socket
+from .udp_messages import UDPMessage, MessageType, MessageFactory
+
+RELIABLE_SERVICE_INTERVAL = 0.05  # 可靠控制通道重传/确认的检查周期(秒)
+
+
+class MultiRoomServer:
+    """在一个进程中托管多个房间的专用服务器"""
+
+    def __init__(self, room_count: int, room_name: str = DEFAULT_ROOM_NAME, port: int = GAME_PORT,
+                 tick_rate: int = DEFAULT_TICK_RATE, map_index: Optional[int] = None,
+                 broadcast_port: int = DISCOVERY_PORT, players: int = DEFAULT_PLAYERS,
+                 discovery_mode: str = DEFAULT_DISCOVERY_MODE):
+        self.port = port
+        self.tick_rate = tick_rate
+        self.tick_interval = 1.0 / tick_rate
+
+        # 房间编号从1开始
+        self.rooms: Dict[int, GameServer] = {
+            room_id: GameServer(f"{room_name} #{room_id}", port, tick_rate, map_index, players)
+            for room_id in range(1, room_count + 1)
+        }
+        self.client_rooms: Dict[str, int] = {}  # 客户端ID -> 房间编号
+
+        # 所有房间共用一个发送批次，每个tick冲刷一次
+        self.send_batch = SendBatch()
+        for room in self.rooms.values():
+            room.game_host.send_batch = self.send_batch
+            room.game_host.auto_flush = False
+
+        self.server_socket: Optional[socket.socket] = None
+        self.running = False
+        self.endpoint: Optional[Endpoint] = None
+        self.timeout_timer: Optional[Timer] = None
+        self.reliable_timer: Optional[Timer] = None
+        self.advertiser = MultiRoomAdvertiser(broadcast_port, mode=discovery_mode)
+
+    def start(self) -> bool:
+        """绑定共享套接字，开始收包和房间列表广播"""
+        try:
+            self.server_socket = open_game_socket(self.advertiser.mode, self.port)
+        except Exception as e:
+            print(f"启动多房间服务器失败: {e}")
+            self.server_socket = None
+            return False
+
+        for room in self.rooms.values():
+            room.game_host.attach_socket(self.server_socket, room.room_name)
+            room.running = True
+
+        self.running = True
+        self.endpoint = get_engine().open_endpoint(self.server_socket, self.handle_packet, "多房间服务器")
+        self._schedule_timeout_check()
+        self.reliable_timer = get_engine().call_every(RELIABLE_SERVICE_INTERVAL, self._service_reliable)
+        self.advertiser.start_advertising(self.port, self.get_room_list)
+
+        print(f"多房间服务器已启动: {len(self.rooms)} 个房间 (端口 {self.port}, tick频率 {self.tick_rate}Hz)")
+        return True
+
+    def stop(self):
+        """停止所有房间并关闭共享套接字"""
+        self.running = False
+        self.advertiser.stop_advertising()
+
+        if self.timeout_timer:
+            self.timeout_timer.cancel()
+            self.timeout_timer = None
+        if self.reliable_timer:
+            self.reliable_timer.cancel()
+            self.reliable_timer = None
+
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+
+        # 各房间通知自己的客户端断开，共享套接字最后统一关闭
+        for room in self.rooms.values():
+            room.stop()
+        self.client_rooms.clear()
+
+        if self.server_socket:
+            self.server_socket.close()
+            self.server_socket = None
+        print("多房间服务器已停止")
+
+    def run(self):
+        """按固定tick频率运行所有房间，直到stop()或Ctrl+C"""
+        return run_at_fixed_rate(self)
+
+    def tick(self, dt: float):
+        """推进所有房间一个tick，然后一次性发出所有房间的快照"""
+        for room in self.rooms.values():
+            room.tick(dt)
+        self.send_batch.flush(self.server_socket)
+
+    def get_room_list(self) -> list:
+        """房间列表广播的内容"""
+        return [
+            {
+                "room_id": room_id,
+                "room_name": room.room_name,
+                "current_players": room.game_host.get_current_player_count(),
+                "max_players": room.game_host.max_players,
+                "game_mode": "pvp"
+            }
+            for room_id, room in self.rooms.items()
+        ]
+
+    def _schedule_timeout_check(self):
+        """在所有房间中最早的客户端超时截止时间安排下一次检查"""
+        delay = min(room.game_host.next_timeout_delay() for room in self.rooms.values())
+        self.timeout_timer = get_engine().call_later(delay, self._on_timeout_timer)
+
+    def _on_timeout_timer(self):
+        if not self.running:
+            return
+        for room in self.rooms.values():
+            room.game_host._check_client_timeouts()
+        self._prune_client_rooms()
+        self._schedule_timeout_check()
+
+    def _service_reliable(self):
+        if self.running:
+            for room in self.rooms.values():
+                room.game_host.service_reliable()
+
+    def handle_packet(self, data: bytes, addr: Tuple[str, int]):
+        """解析数据包并分发到对应房间"""
+        try:
+            message = UDPMessage.from_bytes(data)
+        except ValueError:
+            # 忽略无效消息
+            return
+
+        if message.type == MessageType.JOIN_REQUEST:
+            room_id = message.data.get("room_id")
+            room = self.rooms.get(room_id)
+            if room is None:
+                response = MessageFactory.create_join_response(False, reason="房间不存在")
+                self._send_to_address(addr, response)
+                return
+            known = set(room.game_host.clients)
+            room.game_host.handle_message(message, addr)
+            for client_id in room.game_host.clients:
+                if client_id not in known:
+                    self.client_rooms[client_id] = room_id
+            return
+
+        room_id = self.client_rooms.get(message.player_id)
+        if room_id is not None:
+            self.rooms[room_id].game_host.handle_message(message, addr, len(data))
+            if message.type == MessageType.PLAYER_DISCONNECT:
+                self._prune_client_rooms()
+
+    def _prune_client_rooms(self):
+        """移除已离开房间的客户端"""
+        stale = [client_id for client_id, room_id in self.client_rooms.items()
+                 if client_id not in self.rooms[room_id].game_host.clients]
+        for client_id in stale:
+            del self.client_rooms[client_id]
+
+    def _send_to_address(self, addr: Tuple[str, int], message: UDPMessage):
+        try:
+            self.server_socket.sendto(message.to_bytes(), addr)
+        except Exception as e:
+            print(f"发送消息失败: {e}")
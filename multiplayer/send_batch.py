@@ -0,0 +1,66 @@
+"""
+批量发送层
+
+广播时先把每个目的地址的数据报放入批次，tick结束时一次性发出：
+- 序列化在入队前完成，相同内容的数据报共用同一个bytes对象
+- 发送失败计入客户端的 send_errors（没有客户端信息时按地址计数），不再逐条打印
+- 发送成功的数据报计入客户端的网络遥测
+- 多房间服务器的所有房间共用一个批次，每个tick只冲刷一次
+
+Python标准库没有 sendmmsg，socket.sendmsg 每次调用也只发送一个数据报，
+因此冲刷是一个不做其他工作的紧凑 sendto 循环。
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class SendBatch:
+    """按tick冲刷的UDP发送批次"""
+
+    def __init__(self):
+        self.queue: List[tuple] = []  # (数据, 地址, 客户端信息或None)
+        self.errors_by_address: Dict[Tuple[str, int], int] = {}
+
+        # 统计
+        self.datagrams_sent = 0
+        self.bytes_sent = 0
+        self.flushes = 0
+
+    def add(self, data: bytes, addr: Tuple[str, int], client=None):
+        """把一个数据报加入批次；client 为 ClientInfo 时发送失败计入其 send_errors，成功计入其遥测"""
+        self.queue.append((data, addr, client))
+
+    def flush(self, sock) -> int:
+        """用sock发出批次中的全部数据报，返回成功发送的数量"""
+        if not self.queue:
+            return 0
+        queue, self.queue = self.queue, []
+        self.flushes += 1
+        if sock is None:
+            return 0
+
+        sendto = sock.sendto
+        now = time.time()
+        sent = 0
+        sent_bytes = 0
+        for data, addr, client in queue:
+            try:
+                sendto(data, addr)
+            except OSError:
+                if client is not None:
+                    client.send_errors += 1
+                else:
+                    self.errors_by_address[addr] = self.errors_by_address.get(addr, 0) + 1
+                continue
+            if client is not None:
+                client.telemetry.on_sent(len(data), now)
+            sent += 1
+            sent_bytes += len(data)
+
+        self.datagrams_sent += sent
+        self.bytes_sent += sent_bytes
+        return sent
+
+    def __len__(self) -> int:
+        return len(self.queue)
@@ -0,0 +1,77 @@
+"""
+按客户端调整快照发送
+
+- 自适应发送频率：根据客户端确认(STATE_ACK)测得的往返时间和丢包率，
+  为每个客户端选择 30/15/10Hz，拥塞的Wi-Fi链路不会被快照淹没
+- 兴趣过滤：距离客户端坦克较远且正在远离的子弹不再发给该客户端，
+  以一个针对该客户端的消失事件通知；子弹重新接近或进入兴趣半径后再次发送
+"""
+
+import math
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+# 自适应频率：(往返时间下限(秒), 丢包率下限, 降频倍数)，按从差到好的顺序匹配
+RATE_TIERS = [
+    (0.30, 0.20, 3),   # 10Hz
+    (0.15, 0.08, 2),   # 15Hz
+]
+RTT_SMOOTHING = 0.125     # 往返时间指数平滑系数 (与TCP SRTT相同)
+LOSS_SMOOTHING = 0.1      # 丢包率指数平滑系数
+MAX_TRACKED_SENDS = 64    # 每个客户端记录的未确认发送数上限
+
+# 兴趣过滤
+INTEREST_RADIUS = 450.0   # 超过该距离且正在远离的子弹不发送(像素)
+CULL_HOLD_TIME = 0.25     # 子弹被过滤后至少保持的时间(秒)，长于客户端插值延迟，避免刚消失又出现
+
+
+class LinkQuality:
+    """从快照发送和确认估计一个客户端的往返时间和丢包率"""
+
+    def __init__(self):
+        self.sent_times: "OrderedDict[int, float]" = OrderedDict()  # 未确认的tick -> 发送时间
+        self.rtt: Optional[float] = None
+        self.loss_rate = 0.0
+
+    def on_sent(self, tick: int, now: float):
+        self.sent_times[tick] = now
+        while len(self.sent_times) > MAX_TRACKED_SENDS:
+            self.sent_times.popitem(last=False)
+
+    def on_ack(self, tick: int, now: float):
+        """客户端确认了tick：更新往返时间；比它更早仍未确认的发送视为丢失"""
+        sent_at = self.sent_times.get(tick)
+        if sent_at is None:
+            return
+        sample = now - sent_at
+        self.rtt = sample if self.rtt is None else self.rtt + RTT_SMOOTHING * (sample - self.rtt)
+
+        lost = 0
+        while self.sent_times:
+            oldest, _ = next(iter(self.sent_times.items()))
+            if oldest > tick:
+                break
+            self.sent_times.popitem(last=False)
+            if oldest < tick:
+                lost += 1
+        self.loss_rate += LOSS_SMOOTHING * (lost / (lost + 1) - self.loss_rate)
+
+
+def choose_rate_divisor(rtt: Optional[float], loss_rate: float) -> int:
+    """根据链路质量选择降频倍数：1 为主机的完整广播频率，2 为一半，依此类推"""
+    for min_rtt, min_loss, divisor in RATE_TIERS:
+        if (rtt is not None and rtt >= min_rtt) or loss_rate >= min_loss:
+            return divisor
+    return 1
+
+
+def bullet_out_of_interest(tank_pos: Sequence[float], bullet_pos: Sequence[float],
+                           previous_pos: Optional[Sequence[float]], radius: float = INTEREST_RADIUS) -> bool:
+    """子弹是否在兴趣半径之外并且正在远离坦克（没有上一帧位置时不过滤）"""
+    if previous_pos is None:
+        return False
+    distance = math.hypot(bullet_pos[0] - tank_pos[0], bullet_pos[1] - tank_pos[1])
+    if distance <= radius:
+        return False
+    previous_distance = math.hypot(previous_pos[0] - tank_pos[0], previous_pos[1] - tank_pos[1])
+    return distance > previous_distance
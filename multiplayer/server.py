@@ -0,0 +1,273 @@
+"""
+专用无界面游戏服务器
+
+在没有窗口的机器上运行权威模拟、GameHost和房间广播，按固定tick频率推进：
+
+    python -m multiplayer.server --port 12346 --room "局域网服务器" --map 2 --tick-rate 60
+
+服务器本身不是玩家，所有槽位都由客户端占据（--players 设置每局人数，默认2人）。所有槽位都有玩家时开始比赛；
+有玩家离开时暂停，等待新玩家补位后重新开始；比赛结束后等待一段时间自动开始下一局。
+玩家机器上的渲染卡顿不会再影响其他人的游戏。
+
+--record PATH 把服务器上进行的所有比赛录制到一个录像文件中（见 replay.py），可在客户端回放。
+--discovery 选择房间广播方式：子网广播（默认）、IPv4组播或IPv6组播（见 udp_discovery.py）。
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from maps import ALL_MAP_LAYOUTS, get_random_map_index
+from replay import MatchRecorder
+from simulation import Simulation, MAX_STEP, MAX_PLAYERS
+from . import GAME_PORT
+from .udp_host import GameHost
+from .udp_discovery import DISCOVERY_MODES, DEFAULT_DISCOVERY_MODE
+from .mailbox import Mailbox
+from .input_commands import CommandScheduler
+from .state_snapshot import build_game_state
+
+DEFAULT_TICK_RATE = 60
+DEFAULT_ROOM_NAME = "专用服务器"
+MATCH_RESTART_DELAY = 5.0  # 比赛结束后自动开始下一局的等待时间(秒)
+INPUT_MAILBOX_CAPACITY = 256  # 每个tick最多保留的待处理客户端输入数
+SERVER_TANK_TYPES = ("green", "blue", "yellow", "grey")  # 按槽位循环使用，前两个与客户端默认的坦克颜色一致
+DEFAULT_PLAYERS = 2
+
+
+class GameServer:
+    """专用游戏服务器：固定tick推进模拟并广播快照"""
+
+    def __init__(self, room_name: str = DEFAULT_ROOM_NAME, port: int = GAME_PORT,
+                 tick_rate: int = DEFAULT_TICK_RATE, map_index: Optional[int] = None,
+                 players: int = DEFAULT_PLAYERS, seed: Optional[int] = None,
+                 record_path: Optional[str] = None, discovery_mode: str = DEFAULT_DISCOVERY_MODE):
+        self.room_name = room_name
+        self.tick_rate = tick_rate
+        self.tick_interval = 1.0 / tick_rate
+        # 每个tick的物理子步数，低tick频率下仍保持与客户端相同的物理步长上限
+        self.substeps = max(1, math.ceil(self.tick_interval / MAX_STEP - 1e-9))
+        # 指定种子时地图选择和模拟都可复现（确定性模式）
+        self.seed = seed
+        rng = random.Random(seed) if seed is not None else None
+        self.map_index = get_random_map_index(rng) if map_index is None else map_index
+
+        self.game_host = GameHost(host_port=port, max_players=players, local_player=False,
+                                  discovery_mode=discovery_mode)
+        self.game_host.map_index = self.map_index
+
+        self.simulation = Simulation(
+            mode="network_host",
+            player_ids=[None] * players,
+            map_layout=ALL_MAP_LAYOUTS[self.map_index],
+            tank_types=[SERVER_TANK_TYPES[slot % len(SERVER_TANK_TYPES)] for slot in range(players)],
+            seed=seed,
+        )
+        self.slots: List[Optional[str]] = [None] * len(self.simulation.tanks)  # 槽位 -> 客户端ID
+        # 比赛录像（只记录比赛进行中的tick）
+        self.recorder = MatchRecorder(self.simulation, record_path) if record_path else None
+        self.match_running = False
+        self.restart_timer = 0.0
+        self.running = False
+        self.tick_count = 0
+
+        # 网络线程收到的事件，在tick中处理
+        self.pending_inputs = Mailbox(INPUT_MAILBOX_CAPACITY)  # (client_id, [(指令序号, 位掩码), ...])
+        self.pending_members = []  # (是否加入, client_id)
+        # 每个客户端的输入指令队列，每个tick应用一条
+        self.commands = CommandScheduler()
+        # 每个客户端最近一次改变按住状态的指令序号和应用时间，随快照回传用于客户端校正
+        self.applied_inputs: Dict[str, Tuple[int, float]] = {}
+
+        self.game_host.set_callbacks(
+            client_join=self._on_client_join,
+            client_leave=self._on_client_leave,
+            input_received=self._on_input_received
+        )
+
+    def start(self) -> bool:
+        """开始监听并广播房间"""
+        if not self.game_host.start_hosting(self.room_name):
+            return False
+        self.running = True
+        print(f"专用服务器已启动: 地图 {self.map_index + 1}, tick频率 {self.tick_rate}Hz")
+        return True
+
+    def stop(self):
+        """停止服务器"""
+        self.running = False
+        self.game_host.stop_hosting()
+        if self.recorder:
+            self.recorder.close()
+            print(f"录像已保存: {self.recorder.path}")
+
+    def run(self):
+        """按固定tick频率运行，直到stop()或Ctrl+C"""
+        return run_at_fixed_rate(self)
+
+    def tick(self, dt: float):
+        """处理玩家进出和输入，推进模拟一个tick并广播快照"""
+        self.tick_count += 1
+        self._process_members()
+        inputs = self._drain_inputs()
+        if not self.match_running:
+            return
+
+        # 输入在第一个子步之前应用
+        for i in range(self.substeps):
+            self.simulation.step(dt / self.substeps, inputs if i == 0 else None)
+
+        if self.simulation.game_over:
+            self.restart_timer += dt
+            if self.restart_timer >= MATCH_RESTART_DELAY:
+                self.restart_timer = 0.0
+                print("开始新的一局比赛")
+                self._reset_match()
+
+        self.game_host.broadcast_game_state(build_game_state(self.simulation, self.applied_inputs))
+
+    # --- 网络回调（网络线程） ---
+    def _on_client_join(self, client_id: str, player_name: str):
+        self.pending_members.append((True, client_id))
+
+    def _on_client_leave(self, client_id: str, reason: str):
+        self.pending_members.append((False, client_id))
+
+    def _on_input_received(self, client_id: str, commands: List[Tuple[int, int]]):
+        self.pending_inputs.put((client_id, list(commands)))
+
+    # --- tick内处理 ---
+    def _process_members(self):
+        """分配/释放槽位，槽位变化时开始或暂停比赛"""
+        while self.pending_members:
+            joined, client_id = self.pending_members.pop(0)
+            if joined and client_id not in self.slots and None in self.slots:
+                slot = self.slots.index(None)
+                self.slots[slot] = client_id
+                self.simulation.set_player(slot, client_id)
+                print(f"玩家 {client_id} 进入槽位 {slot + 1}")
+            elif not joined and client_id in self.slots:
+                slot = self.slots.index(client_id)
+                self.slots[slot] = None
+                self.simulation.set_player(slot, None)
+                self.commands.remove(client_id)
+                self.applied_inputs.pop(client_id, None)
+                if self.match_running:
+                    self.match_running = False
+                    print("有玩家离开，比赛暂停，等待新玩家加入")
+
+        if not self.match_running and None not in self.slots:
+            self.match_running = True
+            self.restart_timer = 0.0
+            self._reset_match()
+            print(f"比赛开始: {' vs '.join(self.slots)}")
+
+    def _reset_match(self):
+        self.simulation.reset_match()
+        if self.recorder:
+            self.recorder.keyframe_next()  # 模拟在step之外被重置，录像需要新的关键帧
+
+    def _drain_inputs(self) -> Dict[str, list]:
+        """把收到的输入指令排入各客户端的队列，并为每个客户端应用本tick的一条指令"""
+        for client_id, commands in self.pending_inputs.drain():
+            self.commands.add(client_id, commands)
+
+        inputs, changed = self.commands.advance()
+        now = time.time()
+        for client_id, seq in changed.items():
+            self.applied_inputs[client_id] = (seq, now)
+        return inputs
+
+
+def run_at_fixed_rate(server) -> bool:
+    """启动服务器并按固定tick频率调用 server.tick，直到 server.running 变为False或Ctrl+C"""
+    if not server.start():
+        return False
+    next_tick = time.perf_counter()
+    try:
+        while server.running:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            server.tick(server.tick_interval)
+            next_tick += server.tick_interval
+            # 落后太多（例如机器休眠）时不补跑，从当前时刻继续
+            if now - next_tick > server.tick_interval * 5:
+                next_tick = now
+    except KeyboardInterrupt:
+        print("收到中断信号，正在关闭服务器...")
+    finally:
+        server.stop()
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m multiplayer.server", description="坦克动荡专用游戏服务器")
+    parser.add_argument("--port", type=int, default=GAME_PORT, help=f"游戏端口 (默认 {GAME_PORT})")
+    parser.add_argument("--room", default=DEFAULT_ROOM_NAME, help="广播的房间名")
+    parser.add_argument("--map", type=int, choices=range(1, len(ALL_MAP_LAYOUTS) + 1), default=None,
+                        help="地图编号，默认随机")
+    parser.add_argument("--tick-rate", type=int, default=DEFAULT_TICK_RATE, help="模拟tick频率(Hz)")
+    parser.add_argument("--players", type=int, default=DEFAULT_PLAYERS,
+                        help=f"每局比赛的玩家数 (2-{MAX_PLAYERS}，默认 {DEFAULT_PLAYERS})")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="随机种子：地图选择和模拟可复现，每步记录状态哈希（确定性模式）")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="把比赛录制到录像文件（只支持单房间服务器）")
+    parser.add_argument("--discovery", choices=DISCOVERY_MODES, default=DEFAULT_DISCOVERY_MODE,
+                        help="房间广播方式：子网广播、IPv4组播或IPv6组播")
+    parser.add_argument("--rooms", type=int, default=1, help="同一进程中运行的房间数，大于1时所有房间共用一个端口")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="把房间分片到多少个工作进程 (0 表示在单进程中运行)")
+    args = parser.parse_args(argv)
+    if args.tick_rate <= 0:
+        parser.error("--tick-rate 必须大于0")
+    if not 2 <= args.players <= MAX_PLAYERS:
+        parser.error(f"--players 必须在2到{MAX_PLAYERS}之间")
+    if args.seed is not None and round(1.0 / MAX_STEP) % args.tick_rate != 0:
+        parser.error("确定性模式按固定步长推进，--tick-rate 必须整除60")
+    if args.seed is not None and (args.rooms > 1 or args.workers > 0):
+        parser.error("--seed 只支持单房间服务器")
+    if args.record is not None and (args.rooms > 1 or args.workers > 0):
+        parser.error("--record 只支持单房间服务器")
+    if args.rooms <= 0:
+        parser.error("--rooms 必须大于0")
+    if args.workers < 0:
+        parser.error("--workers 不能小于0")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    map_index = args.map - 1 if args.map else None
+    if args.workers > 0:
+        from .sharded_server import ShardedServer
+        server = ShardedServer(args.rooms, args.workers, room_name=args.room, port=args.port,
+                               tick_rate=args.tick_rate, map_index=map_index, players=args.players,
+                               discovery_mode=args.discovery)
+        return 0 if server.run() else 1
+    if args.rooms > 1:
+        from .room_server import MultiRoomServer
+        server = MultiRoomServer(args.rooms, room_name=args.room, port=args.port,
+                                 tick_rate=args.tick_rate, map_index=map_index, players=args.players,
+                                 discovery_mode=args.discovery)
+        return 0 if server.run() else 1
+
+    server = GameServer(
+        room_name=args.room,
+        port=args.port,
+        tick_rate=args.tick_rate,
+        map_index=map_index,
+        players=args.players,
+        seed=args.seed,
+        record_path=args.record,
+        discovery_mode=args.discovery,
+    )
+    return 0 if server.run() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,465 @@
+"""
+多进程分片服务器
+
+pymunk的物理步进和Python侧的碰撞回调都受GIL限制，多房间服务器用线程无法利用多个CPU核心。
+ShardedServer 作为主管进程只负责收发包和房间广播，比赛分到 multiprocessing 工作进程中运行：
+
+    python -m multiplayer.server --rooms 32 --workers 4 --port 12346
+
+- 主管进程持有共享UDP套接字，收到的数据包按房间/客户端ID经队列转发给房间所在的工作进程
+- 工作进程中每个房间是一个 GameServer，发送写入发件箱，每轮循环整批放入回传队列，
+  由主管进程从共享端口发出（客户端只看到一个端口）
+- 房间在第一位玩家加入时分配给活跃房间最少的工作进程；房间里的玩家全部离开（比赛结束）后
+  关闭并释放，下一场比赛重新分配，从而在比赛之间重新平衡负载
+"""
+
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from maps import get_random_map_index
+from . import GAME_PORT, DISCOVERY_PORT
+from .net_engine import get_engine, Endpoint
+from .server import GameServer, DEFAULT_ROOM_NAME, DEFAULT_TICK_RATE, DEFAULT_PLAYERS
+from .udp_discovery import MultiRoomAdvertiser, DEFAULT_DISCOVERY_MODE, open_game_socket
+from .udp_messages import UDPMessage, MessageType, MessageFactory
+
+WORKER_START_TIMEOUT = 15.0  # 等待工作进程就绪的时间(秒)
+
+
+class _OutboxSocket:
+    """工作进程中的套接字替身：发送先写入发件箱，由工作进程整批交给主管进程"""
+
+    def __init__(self):
+        self.packets: List[Tuple[bytes, Tuple[str, int]]] = []
+
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> int:
+        self.packets.append((data, addr))
+        return len(data)
+
+    def take(self) -> List[Tuple[bytes, Tuple[str, int]]]:
+        packets, self.packets = self.packets, []
+        return packets
+
+
+class ShardWorker:
+    """工作进程：运行分配到本进程的房间
+
+    收件队列消息:
+        ("open", 房间编号, 代次, 房间名, 地图编号)
+        ("packet", 房间编号, 数据, 地址)
+        ("close", 房间编号, 代次)
+        ("stop",)
+    回传队列消息:
+        ("ready", 工作进程编号)
+        ("send", [(数据, 地址), ...])
+        ("client", 房间编号, 客户端ID, 是否加入)
+        ("status", 工作进程编号, {房间编号: (代次, 玩家数, 已处理的加入请求数)})
+    """
+
+    def __init__(self, worker_id: int, inbound, outbound, port: int = GAME_PORT,
+                 tick_rate: int = DEFAULT_TICK_RATE, players: int = DEFAULT_PLAYERS):
+        self.worker_id = worker_id
+        self.players = players
+        self.inbound = inbound
+        self.outbound = outbound
+        self.port = port
+        self.tick_rate = tick_rate
+        self.tick_interval = 1.0 / tick_rate
+
+        self.rooms: Dict[int, GameServer] = {}
+        self.generations: Dict[int, int] = {}
+        self.joins_seen: Dict[int, int] = {}
+        self.members: Dict[int, set] = {}
+        self.outbox = _OutboxSocket()
+        self.last_status: Dict[int, tuple] = {}
+        self.running = False
+
+    def run(self):
+        """按固定tick频率运行本进程的房间，空闲时间用于接收主管进程转发的数据包"""
+        self.running = True
+        self.outbound.put(("ready", self.worker_id))
+        next_tick = time.perf_counter()
+        while self.running:
+            self._drain_inbound(max(0.0, next_tick - time.perf_counter()))
+
+            now = time.perf_counter()
+            if now >= next_tick:
+                self.tick(self.tick_interval)
+                next_tick += self.tick_interval
+                # 落后太多时不补跑，从当前时刻继续
+                if now - next_tick > self.tick_interval * 5:
+                    next_tick = now
+
+            self.flush()
+
+        for room_id in list(self.rooms):
+            self._close_room(room_id)
+        self.flush()
+
+    def tick(self, dt: float):
+        """推进所有房间一个tick，检查客户端超时并处理可靠控制通道的重传"""
+        for room_id, room in self.rooms.items():
+            room.tick(dt)
+            room.game_host._check_client_timeouts()
+            room.game_host.service_reliable()
+            self._report_members(room_id)
+
+    def flush(self):
+        """把发件箱和房间状态的变化交给主管进程"""
+        packets = self.outbox.take()
+        if packets:
+            self.outbound.put(("send", packets))
+
+        status = {
+            room_id: (self.generations[room_id], room.game_host.get_current_player_count(),
+                      self.joins_seen[room_id])
+            for room_id, room in self.rooms.items()
+        }
+        if status != self.last_status:
+            self.outbound.put(("status", self.worker_id, status))
+            self.last_status = status
+
+    def handle(self, item: tuple):
+        """处理一条主管进程发来的消息"""
+        kind = item[0]
+        if kind == "packet":
+            _, room_id, data, addr = item
+            self._handle_packet(room_id, data, addr)
+        elif kind == "open":
+            _, room_id, generation, room_name, map_index = item
+            self._open_room(room_id, generation, room_name, map_index)
+        elif kind == "close":
+            _, room_id, generation = item
+            if self.generations.get(room_id) == generation:
+                self._close_room(room_id)
+        elif kind == "stop":
+            self.running = False
+
+    def _drain_inbound(self, timeout: float):
+        """等待最多timeout秒，然后取出收件队列中已有的全部消息"""
+        try:
+            item = self.inbound.get(timeout=timeout) if timeout > 0 else self.inbound.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            self.handle(item)
+            try:
+                item = self.inbound.get_nowait()
+            except queue.Empty:
+                return
+
+    def _handle_packet(self, room_id: int, data: bytes, addr: Tuple[str, int]):
+        room = self.rooms.get(room_id)
+        if room is None:
+            # 房间已关闭，丢弃迟到的数据包
+            return
+        try:
+            message = UDPMessage.from_bytes(data)
+        except ValueError:
+            room.game_host.record_decode_failure(addr)
+            return
+
+        room.game_host.handle_message(message, addr, len(data))
+        if message.type == MessageType.JOIN_REQUEST:
+            self.joins_seen[room_id] += 1
+            # 加入通知先于发件箱中的加入响应到达主管进程，客户端的后续消息才能找到房间
+            self._report_members(room_id)
+
+    def _open_room(self, room_id: int, generation: int, room_name: str, map_index: int):
+        room = GameServer(room_name, self.port, self.tick_rate, map_index, self.players)
+        room.game_host.attach_socket(self.outbox, room_name)
+        room.running = True
+        self.rooms[room_id] = room
+        self.generations[room_id] = generation
+        self.joins_seen[room_id] = 0
+        self.members[room_id] = set()
+
+    def _close_room(self, room_id: int):
+        room = self.rooms.pop(room_id)
+        room.stop()
+        self._report_members(room_id, set())
+        del self.generations[room_id]
+        del self.joins_seen[room_id]
+        del self.members[room_id]
+
+    def _report_members(self, room_id: int, current: Optional[set] = None):
+        """通知主管进程房间成员的变化，用于按客户端ID分发数据包"""
+        if current is None:
+            current = set(self.rooms[room_id].game_host.clients)
+        known = self.members[room_id]
+        for client_id in current - known:
+            self.outbound.put(("client", room_id, client_id, True))
+        for client_id in known - current:
+            self.outbound.put(("client", room_id, client_id, False))
+        self.members[room_id] = current
+
+
+def _worker_main(worker_id: int, inbound, outbound, port: int, tick_rate: int, players: int = DEFAULT_PLAYERS):
+    """工作进程入口"""
+    try:
+        ShardWorker(worker_id, inbound, outbound, port, tick_rate, players).run()
+    except KeyboardInterrupt:
+        # Ctrl+C 由主管进程统一处理
+        pass
+
+
+class _RoomSlot:
+    """主管进程记录的房间分配状态"""
+
+    def __init__(self, room_id: int, room_name: str, map_index: int):
+        self.room_id = room_id
+        self.room_name = room_name
+        self.map_index = map_index
+        self.worker: Optional[int] = None  # 所在工作进程，None表示空闲未分配
+        self.generation = 0                # 每次分配递增，忽略旧分配迟到的状态
+        self.player_count = 0
+        self.joins_forwarded = 0           # 本次分配中转发的加入请求数
+
+
+class ShardedServer:
+    """把房间分片到多个工作进程的主管服务器"""
+
+    def __init__(self, room_count: int, worker_count: Optional[int] = None,
+                 room_name: str = DEFAULT_ROOM_NAME, port: int = GAME_PORT,
+                 tick_rate: int = DEFAULT_TICK_RATE, map_index: Optional[int] = None,
+                 broadcast_port: int = DISCOVERY_PORT, players: int = DEFAULT_PLAYERS,
+                 discovery_mode: str = DEFAULT_DISCOVERY_MODE):
+        self.port = port
+        self.tick_rate = tick_rate
+        self.players = players
+        self.worker_count = max(1, min(worker_count or os.cpu_count() or 1, room_count))
+
+        # 房间编号从1开始；地图在主管进程选定，重新分配后保持不变
+        self.rooms: Dict[int, _RoomSlot] = {
+            room_id: _RoomSlot(room_id, f"{room_name} #{room_id}",
+                               get_random_map_index() if map_index is None else map_index)
+            for room_id in range(1, room_count + 1)
+        }
+        self.client_rooms: Dict[str, int] = {}  # 客户端ID -> 房间编号
+        self.next_generation = 0
+        self.lock = threading.Lock()  # 收包线程和回传线程共用房间分配表
+
+        self.worker_queues: List = []
+        self.workers: List = []
+        self.outbound = None
+
+        self.server_socket: Optional[socket.socket] = None
+        self.running = False
+        self.dispatching = False
+        self.endpoint: Optional[Endpoint] = None
+        self.dispatch_thread: Optional[threading.Thread] = None
+        self.advertiser = MultiRoomAdvertiser(broadcast_port, mode=discovery_mode)
+
+    def start(self) -> bool:
+        """启动工作进程，绑定共享套接字，开始收包和房间列表广播"""
+        try:
+            self.server_socket = open_game_socket(self.advertiser.mode, self.port)
+        except Exception as e:
+            print(f"启动分片服务器失败: {e}")
+            self.server_socket = None
+            return False
+
+        # spawn 在各平台行为一致，也避免在已有线程的进程中fork
+        context = multiprocessing.get_context("spawn")
+        self.outbound = context.Queue()
+        for worker_id in range(self.worker_count):
+            inbound = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, inbound, self.outbound, self.port, self.tick_rate, self.players),
+                name=f"shard-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self.worker_queues.append(inbound)
+            self.workers.append(process)
+
+        if not self._wait_for_workers():
+            self.stop()
+            return False
+
+        self.running = True
+        self.dispatching = True
+        self.endpoint = get_engine().open_endpoint(self.server_socket, self.handle_packet, "分片服务器")
+        self.dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatch_thread.start()
+        self.advertiser.start_advertising(self.port, self.get_room_list)
+
+        print(f"分片服务器已启动: {len(self.rooms)} 个房间, {self.worker_count} 个工作进程 "
+              f"(端口 {self.port}, tick频率 {self.tick_rate}Hz)")
+        return True
+
+    def stop(self):
+        """停止工作进程，发出它们最后的消息后关闭共享套接字"""
+        self.running = False
+        self.advertiser.stop_advertising()
+
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+
+        for inbound in self.worker_queues:
+            inbound.put(("stop",))
+        for process in self.workers:
+            process.join(timeout=3.0)
+            if process.is_alive():
+                process.terminate()
+        self.workers = []
+        self.worker_queues = []
+
+        self.dispatching = False
+        if self.dispatch_thread:
+            self.dispatch_thread.join(timeout=2.0)
+            self.dispatch_thread = None
+        # 发出工作进程关闭房间时的断开通知
+        while self.outbound is not None:
+            try:
+                self._handle_outbound(self.outbound.get_nowait())
+            except queue.Empty:
+                break
+        self.client_rooms.clear()
+
+        if self.server_socket:
+            self.server_socket.close()
+            self.server_socket = None
+        print("分片服务器已停止")
+
+    def run(self) -> bool:
+        """启动并运行，直到stop()或Ctrl+C；tick在工作进程中进行"""
+        if not self.start():
+            return False
+        try:
+            while self.running:
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            print("收到中断信号，正在关闭服务器...")
+        finally:
+            self.stop()
+        return True
+
+    def get_room_list(self) -> list:
+        """房间列表广播的内容"""
+        with self.lock:
+            return [
+                {
+                    "room_id": room_id,
+                    "room_name": slot.room_name,
+                    "current_players": slot.player_count,
+                    "max_players": self.players,
+                    "game_mode": "pvp"
+                }
+                for room_id, slot in self.rooms.items()
+            ]
+
+    def get_worker_loads(self) -> List[int]:
+        """每个工作进程上的活跃房间数"""
+        loads = [0] * self.worker_count
+        for slot in self.rooms.values():
+            if slot.worker is not None:
+                loads[slot.worker] += 1
+        return loads
+
+    def _wait_for_workers(self) -> bool:
+        ready = set()
+        deadline = time.time() + WORKER_START_TIMEOUT
+        while len(ready) < self.worker_count:
+            try:
+                item = self.outbound.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                print("工作进程启动超时")
+                return False
+            if item[0] == "ready":
+                ready.add(item[1])
+        return True
+
+    def _dispatch_loop(self):
+        """处理工作进程回传的数据包和状态"""
+        while self.dispatching:
+            try:
+                item = self.outbound.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self._handle_outbound(item)
+
+    def handle_packet(self, data: bytes, addr: Tuple[str, int]):
+        """解析数据包并转发到房间所在的工作进程"""
+        try:
+            message = UDPMessage.from_bytes(data)
+        except ValueError:
+            # 忽略无效消息
+            return
+
+        with self.lock:
+            if message.type == MessageType.JOIN_REQUEST:
+                slot = self.rooms.get(message.data.get("room_id"))
+                if slot is None:
+                    response = MessageFactory.create_join_response(False, reason="房间不存在")
+                    self._send_to_address(addr, response)
+                    return
+                if slot.worker is None:
+                    self._assign_worker(slot)
+                slot.joins_forwarded += 1
+            else:
+                slot = self.rooms.get(self.client_rooms.get(message.player_id))
+                if slot is None or slot.worker is None:
+                    return
+            self.worker_queues[slot.worker].put(("packet", slot.room_id, data, addr))
+
+    def _assign_worker(self, slot: _RoomSlot):
+        """把空闲房间分配给活跃房间最少的工作进程"""
+        loads = self.get_worker_loads()
+        worker = loads.index(min(loads))
+        self.next_generation += 1
+        slot.worker = worker
+        slot.generation = self.next_generation
+        slot.player_count = 0
+        slot.joins_forwarded = 0
+        self.worker_queues[worker].put(("open", slot.room_id, slot.generation, slot.room_name, slot.map_index))
+        print(f"{slot.room_name} 分配到工作进程 {worker} (负载 {loads})")
+
+    def _release_room(self, slot: _RoomSlot):
+        """房间空出后关闭，下一场比赛重新分配"""
+        self.worker_queues[slot.worker].put(("close", slot.room_id, slot.generation))
+        print(f"{slot.room_name} 已空出，释放工作进程 {slot.worker}")
+        slot.worker = None
+        slot.player_count = 0
+
+    def _handle_outbound(self, item: tuple):
+        kind = item[0]
+        if kind == "send":
+            for data, addr in item[1]:
+                try:
+                    self.server_socket.sendto(data, addr)
+                except Exception as e:
+                    print(f"发送消息失败: {e}")
+            return
+
+        with self.lock:
+            if kind == "client":
+                _, room_id, client_id, joined = item
+                if joined:
+                    self.client_rooms[client_id] = room_id
+                elif self.client_rooms.get(client_id) == room_id:
+                    del self.client_rooms[client_id]
+
+            elif kind == "status":
+                _, worker_id, status = item
+                for room_id, (generation, player_count, joins_seen) in status.items():
+                    slot = self.rooms[room_id]
+                    if slot.worker != worker_id or slot.generation != generation:
+                        continue
+                    slot.player_count = player_count
+                    # 转发中的加入请求都已处理且房间为空时才释放
+                    if player_count == 0 and joins_seen == slot.joins_forwarded and self.running:
+                        self._release_room(slot)
+
+    def _send_to_address(self, addr: Tuple[str, int], message: UDPMessage):
+        try:
+            self.server_socket.sendto(message.to_bytes(), addr)
+        except Exception as e:
+            print(f"发送消息失败: {e}")
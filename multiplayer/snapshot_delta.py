@@ -0,0 +1,135 @@
+"""
+游戏状态增量快照
+
+主机为每个已广播的快照分配递增的tick并保存在历史环中，客户端确认(ACK)
+最后应用的tick后，主机只发送相对该基准快照发生变化的字段：
+- tanks / bullets: 新增实体的完整数据，或已有实体变化字段 ({"id": ..., 变化字段})
+- removed: 已消失的子弹ID列表
+- order: 坦克ID顺序发生变化时的完整顺序（隐含坦克的增删）
+- round_info: 仅在回合信息变化时出现
+
+增量消息额外携带 "tick" 和 "base" 字段；不含 "base" 的消息即为完整快照。
+坦克和子弹的 "eid"/"id" 来自主机的实体ID分配器，实体生成/消失事件单独放在 "events" 中。
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+TANK_FIELDS = ("pos", "ang", "hp", "type", "seq", "at", "eid")
+BULLET_FIELDS = ("pos", "ang", "own")
+
+
+class SnapshotHistory:
+    """固定容量的快照历史环（按tick索引）"""
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self._ticks = deque()
+        self._states: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, tick: int, state: Dict[str, Any]):
+        """记录一个快照，超出容量时丢弃最旧的快照"""
+        if tick not in self._states:
+            self._ticks.append(tick)
+        self._states[tick] = state
+        while len(self._ticks) > self.capacity:
+            del self._states[self._ticks.popleft()]
+
+    def get(self, tick: Optional[int]) -> Optional[Dict[str, Any]]:
+        """获取指定tick的快照，不存在时返回None"""
+        if tick is None:
+            return None
+        return self._states.get(tick)
+
+    def clear(self):
+        """清空历史"""
+        self._ticks.clear()
+        self._states.clear()
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+
+def _diff_entity(old: Dict[str, Any], new: Dict[str, Any], fields) -> Optional[Dict[str, Any]]:
+    """比较单个实体，返回只含变化字段的字典；无变化时返回None"""
+    changes = {f: new[f] for f in fields if f in new and new[f] != old.get(f)}
+    if not changes:
+        return None
+    changes["id"] = new.get("id")
+    return changes
+
+
+def _diff_entities(old_list: List[Dict[str, Any]], new_list: List[Dict[str, Any]], fields) -> List[Dict[str, Any]]:
+    old_by_id = {entity.get("id"): entity for entity in old_list}
+    changed = []
+    for entity in new_list:
+        old = old_by_id.get(entity.get("id"))
+        if old is None:
+            changed.append(entity)
+        else:
+            diff = _diff_entity(old, entity, fields)
+            if diff:
+                changed.append(diff)
+    return changed
+
+
+def compute_delta(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """计算当前快照相对基准快照的增量"""
+    base_tanks = baseline.get("tanks", [])
+    cur_tanks = current.get("tanks", [])
+    base_bullets = baseline.get("bullets", [])
+    cur_bullets = current.get("bullets", [])
+
+    delta: Dict[str, Any] = {
+        "tanks": _diff_entities(base_tanks, cur_tanks, TANK_FIELDS),
+        "bullets": _diff_entities(base_bullets, cur_bullets, BULLET_FIELDS),
+    }
+
+    cur_order = [tank.get("id") for tank in cur_tanks]
+    if cur_order != [tank.get("id") for tank in base_tanks]:
+        delta["order"] = cur_order
+
+    cur_bullet_ids = {bullet.get("id") for bullet in cur_bullets}
+    delta["removed"] = [bullet.get("id") for bullet in base_bullets
+                        if bullet.get("id") not in cur_bullet_ids]
+
+    round_info = current.get("round_info", {})
+    if round_info != baseline.get("round_info", {}):
+        delta["round_info"] = round_info
+
+    return delta
+
+
+def _merge_entities(base_list: List[Dict[str, Any]], changes: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    merged = {entity.get("id"): entity for entity in base_list}
+    for change in changes:
+        entity_id = change.get("id")
+        old = merged.get(entity_id)
+        merged[entity_id] = {**old, **change} if old is not None else dict(change)
+    return merged
+
+
+def apply_delta(baseline: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """将增量应用到基准快照上，返回新的完整快照（不修改基准快照）"""
+    base_tanks = baseline.get("tanks", [])
+    tanks_by_id = _merge_entities(base_tanks, delta.get("tanks", []))
+    order = delta.get("order")
+    if order is None:
+        order = [tank.get("id") for tank in base_tanks]
+        order.extend(change.get("id") for change in delta.get("tanks", [])
+                     if change.get("id") not in order)
+    tanks = [tanks_by_id[tank_id] for tank_id in order if tank_id in tanks_by_id]
+
+    base_bullets = baseline.get("bullets", [])
+    bullets_by_id = _merge_entities(base_bullets, delta.get("bullets", []))
+    for bullet_id in delta.get("removed", []):
+        bullets_by_id.pop(bullet_id, None)
+
+    state = {
+        "tanks": tanks,
+        "bullets": list(bullets_by_id.values()),
+        "round_info": delta.get("round_info", baseline.get("round_info", {}))
+    }
+    if "tick" in delta:
+        state["tick"] = delta["tick"]
+    return state
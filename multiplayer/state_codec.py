@@ -0,0 +1,414 @@
+"""
+游戏状态二进制编解码
+
+为30Hz的GAME_STATE快照提供定长二进制格式，替代逐字段重复键名的JSON：
+- 位置量化为 1/16 像素的 int16
+- 角度量化为 uint16 (一整圈 = 65536)
+- 玩家ID通过包内字符串表映射为小整数索引
+- 坦克类型映射为枚举索引
+- 每条实体记录带字段掩码，同一格式既可表示完整快照也可表示增量快照
+  (增量语义见 snapshot_delta.py)
+- 实体生成/消失事件按 (tick, 事件码, 实体ID) 定长编码
+- 可选的状态哈希 "h"（uint32，附在包尾），客户端还原快照后用 state_hash 校验
+- 可选的主机发送时间 "t"（毫秒，uint32回绕，附在包尾）；坦克的 "at" 是主机应用该玩家
+  最新输入的时间，只在输入序号变化时改变，客户端用 t - at 得到预测校正需要的经过时间
+- 可选的可靠通道累计确认 "rack"（uint32，附在包尾最后），由 append_ack 按客户端追加到
+  已序列化的快照上，多个客户端仍可共用同一份序列化结果
+
+编解码格式通过JOIN握手按会话协商，JSON始终作为回退格式保留。
+"""
+
+import struct
+import zlib
+from typing import Any, Dict, List, Optional
+
+# 编码格式名称（用于握手协商）
+CODEC_JSON = "json"
+CODEC_BINARY = "bin4"
+
+# 本端支持的编码格式，按优先级排序
+SUPPORTED_CODECS = [CODEC_BINARY, CODEC_JSON]
+
+# 二进制包头魔数，与JSON的 '{' (0x7B) 区分
+BINARY_MAGIC = 0xA7
+BINARY_VERSION = 4
+
+# 量化参数
+POSITION_SCALE = 16            # 1/16 像素精度
+ANGLE_UNITS = 65536            # 一整圈的量化单位数
+NO_INDEX = 0xFF                # 未知玩家索引
+NONE_ID_LENGTH = 0xFF          # 字符串表中表示 None 的长度标记
+
+# 坦克类型枚举（与 NetworkHostView._get_game_state 中的类型一致）
+TANK_TYPES = ["green", "yellow", "blue", "grey"]
+_TANK_TYPE_INDEX = {name: i for i, name in enumerate(TANK_TYPES)}
+
+# 包头: 魔数, 版本, 标志位, 字符串表长度, 分数个数, 坦克数, 坦克顺序长度,
+#       子弹数, 移除子弹数, 事件数, tick, 基准tick
+_HEADER = struct.Struct("<BBBBBBBHHHII")
+
+_FLAG_ROUND_OVER = 0x01
+_FLAG_GAME_OVER = 0x02
+_FLAG_HAS_ROUND_INFO = 0x04
+_FLAG_DELTA = 0x08
+_FLAG_HAS_ORDER = 0x10
+_FLAG_HAS_HASH = 0x20
+_FLAG_HAS_TIME = 0x40
+_FLAG_HAS_ACK = 0x80
+_FLAGS_OFFSET = 2      # 标志位在包头中的字节偏移
+
+# 实体字段掩码
+_FIELD_POS = 0x01
+_FIELD_ANG = 0x02
+_FIELD_HP = 0x04       # 仅坦克
+_FIELD_TYPE = 0x08     # 仅坦克
+_FIELD_OWN = 0x04      # 仅子弹
+_FIELD_SEQ = 0x10      # 仅坦克：主机已处理的该玩家最新输入序号
+_FIELD_AT = 0x20       # 仅坦克：主机应用该输入的时间(毫秒)
+_FIELD_EID = 0x40      # 仅坦克：实体ID
+
+_TANK_FULL_MASK = _FIELD_POS | _FIELD_ANG | _FIELD_HP | _FIELD_TYPE
+_BULLET_FULL_MASK = _FIELD_POS | _FIELD_ANG | _FIELD_OWN
+
+_TANK_KEY = struct.Struct("<BB")      # 玩家索引, 字段掩码
+_BULLET_KEY = struct.Struct("<HB")    # 子弹ID, 字段掩码
+_POS = struct.Struct("<hh")
+_ANG = struct.Struct("<H")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_EVENT = struct.Struct("<IBH")       # tick, 事件码, 实体ID
+
+# 事件码：bit0 = 消失(否则为生成)，bit1 = 坦克(否则为子弹)
+_EVENT_DESPAWN = 0x01
+_EVENT_TANK = 0x02
+
+_POS_MIN = -32768
+_POS_MAX = 32767
+
+
+def is_binary_payload(data: bytes) -> bool:
+    """判断数据是否为二进制快照"""
+    return len(data) > 0 and data[0] == BINARY_MAGIC
+
+
+def negotiate_codec(offered: Optional[List[str]], supported: List[str] = None) -> str:
+    """从对端提供的编码列表中选择本端最优先支持的格式"""
+    supported = supported or SUPPORTED_CODECS
+    if not offered:
+        return CODEC_JSON
+    for codec in supported:
+        if codec in offered:
+            return codec
+    return CODEC_JSON
+
+
+def timestamp_ms(seconds: float) -> int:
+    """快照中的时间戳：毫秒，按uint32回绕"""
+    return int(seconds * 1000) & 0xFFFFFFFF
+
+
+def elapsed_ms(later: int, earlier: int) -> int:
+    """两个回绕时间戳之间经过的毫秒数"""
+    return (later - earlier) & 0xFFFFFFFF
+
+
+def _quantize_position(value: float) -> int:
+    q = int(round(value * POSITION_SCALE))
+    if q < _POS_MIN:
+        return _POS_MIN
+    if q > _POS_MAX:
+        return _POS_MAX
+    return q
+
+
+def _quantize_angle(degrees: float) -> int:
+    return int(round((degrees % 360.0) * ANGLE_UNITS / 360.0)) % ANGLE_UNITS
+
+
+def _dequantize_angle(units: int) -> float:
+    # 保留4位小数：再次量化时得到同一个值，客户端还原的状态可以与主机的状态哈希比对
+    return round(units * 360.0 / ANGLE_UNITS, 4)
+
+
+def state_hash(state: Dict[str, Any]) -> int:
+    """快照内容的CRC32，主机和客户端按同一规则计算
+
+    位置和角度按二进制格式的精度量化，因此无论会话使用JSON还是二进制编码，
+    客户端由（增量）快照还原出的状态与主机发出的状态哈希相同。
+    输入序号和应用时间只用于预测校正，不参与校验。
+    """
+    tanks = sorted(state.get("tanks", []), key=lambda tank: str(tank.get("id")))
+    bullets = sorted(state.get("bullets", []), key=lambda bullet: int(bullet.get("id", 0)) & 0xFFFF)
+    round_info = state.get("round_info") or {}
+    items = [
+        [(tank.get("id"), tank.get("eid"), *_hash_pose(tank), tank.get("hp"), tank.get("type")) for tank in tanks],
+        [(int(bullet.get("id", 0)) & 0xFFFF, *_hash_pose(bullet), bullet.get("own")) for bullet in bullets],
+        (list(round_info.get("sc", [])), bool(round_info.get("ro")), bool(round_info.get("go"))),
+    ]
+    return zlib.crc32(repr(items).encode('utf-8'))
+
+
+def _hash_pose(entity: Dict[str, Any]) -> tuple:
+    pos = entity.get("pos")
+    ang = entity.get("ang")
+    return (None if pos is None else (_quantize_position(pos[0]), _quantize_position(pos[1])),
+            None if ang is None else _quantize_angle(ang))
+
+
+def encode_game_state(data: Dict[str, Any]) -> bytes:
+    """将游戏状态字典（完整或增量）编码为二进制快照"""
+    tanks = data.get("tanks", [])
+    bullets = data.get("bullets", [])
+    removed = data.get("removed", [])
+    order = data.get("order")
+    round_info = data.get("round_info")
+    is_delta = "base" in data
+
+    # 构建玩家ID字符串表
+    id_table: List[Optional[str]] = []
+    id_index: Dict[Optional[str], int] = {}
+
+    def index_of(player_id) -> int:
+        if player_id not in id_index:
+            if len(id_table) >= NO_INDEX:
+                return NO_INDEX
+            id_index[player_id] = len(id_table)
+            id_table.append(player_id)
+        return id_index[player_id]
+
+    parts = []
+
+    for tank in tanks:
+        mask = 0
+        fields = []
+        if "pos" in tank:
+            mask |= _FIELD_POS
+            fields.append(_POS.pack(_quantize_position(tank["pos"][0]),
+                                    _quantize_position(tank["pos"][1])))
+        if "ang" in tank:
+            mask |= _FIELD_ANG
+            fields.append(_ANG.pack(_quantize_angle(tank["ang"])))
+        if "hp" in tank:
+            mask |= _FIELD_HP
+            fields.append(_U8.pack(max(0, min(255, int(tank["hp"])))))
+        if "type" in tank:
+            mask |= _FIELD_TYPE
+            fields.append(_U8.pack(_TANK_TYPE_INDEX.get(tank["type"], 0)))
+        if "seq" in tank:
+            mask |= _FIELD_SEQ
+            fields.append(_U32.pack(int(tank["seq"]) & 0xFFFFFFFF))
+        if "at" in tank:
+            mask |= _FIELD_AT
+            fields.append(_U32.pack(int(tank["at"]) & 0xFFFFFFFF))
+        if "eid" in tank:
+            mask |= _FIELD_EID
+            fields.append(_U16.pack(int(tank["eid"]) & 0xFFFF))
+        parts.append(_TANK_KEY.pack(index_of(tank.get("id")), mask))
+        parts.extend(fields)
+
+    if order is not None:
+        parts.append(bytes(index_of(player_id) for player_id in order))
+
+    for bullet in bullets:
+        mask = 0
+        fields = []
+        if "pos" in bullet:
+            mask |= _FIELD_POS
+            fields.append(_POS.pack(_quantize_position(bullet["pos"][0]),
+                                    _quantize_position(bullet["pos"][1])))
+        if "ang" in bullet:
+            mask |= _FIELD_ANG
+            fields.append(_ANG.pack(_quantize_angle(bullet["ang"])))
+        if "own" in bullet:
+            mask |= _FIELD_OWN
+            fields.append(_U8.pack(index_of(bullet["own"])))
+        parts.append(_BULLET_KEY.pack(int(bullet.get("id", 0)) & 0xFFFF, mask))
+        parts.extend(fields)
+
+    for bullet_id in removed:
+        parts.append(_U16.pack(int(bullet_id) & 0xFFFF))
+
+    events = data.get("events", [])
+    for event_tick, event, kind, entity_id in events:
+        code = (_EVENT_DESPAWN if event == "despawn" else 0) | (_EVENT_TANK if kind == "tank" else 0)
+        parts.append(_EVENT.pack(int(event_tick) & 0xFFFFFFFF, code, int(entity_id) & 0xFFFF))
+
+    flags = 0
+    if "h" in data:
+        flags |= _FLAG_HAS_HASH
+        parts.append(_U32.pack(int(data["h"]) & 0xFFFFFFFF))
+    if "t" in data:
+        flags |= _FLAG_HAS_TIME
+        parts.append(_U32.pack(int(data["t"]) & 0xFFFFFFFF))
+    scores = b""
+    if is_delta:
+        flags |= _FLAG_DELTA
+    if order is not None:
+        flags |= _FLAG_HAS_ORDER
+    if round_info is not None or not is_delta:
+        round_info = round_info or {}
+        flags |= _FLAG_HAS_ROUND_INFO
+        scores = bytes(max(0, min(255, int(s))) for s in round_info.get("sc", [])[:255])
+        if round_info.get("ro"):
+            flags |= _FLAG_ROUND_OVER
+        if round_info.get("go"):
+            flags |= _FLAG_GAME_OVER
+
+    id_blob = []
+    for player_id in id_table:
+        if player_id is None:
+            id_blob.append(bytes([NONE_ID_LENGTH]))
+        else:
+            raw = str(player_id).encode('utf-8')[:NONE_ID_LENGTH - 1]
+            id_blob.append(bytes([len(raw)]) + raw)
+
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags,
+                          len(id_table), len(scores), len(tanks),
+                          len(order) if order is not None else 0,
+                          len(bullets), len(removed), len(events),
+                          int(data.get("tick", 0)) & 0xFFFFFFFF,
+                          int(data.get("base", 0)) & 0xFFFFFFFF)
+    return b"".join([header, *id_blob, scores, *parts])
+
+
+def append_ack(payload: bytes, ack: int) -> bytes:
+    """在已编码的二进制快照末尾追加可靠通道的累计确认"""
+    flags = payload[_FLAGS_OFFSET] | _FLAG_HAS_ACK
+    return b"".join([payload[:_FLAGS_OFFSET], bytes([flags]), payload[_FLAGS_OFFSET + 1:],
+                     _U32.pack(int(ack) & 0xFFFFFFFF)])
+
+
+def decode_game_state(payload: bytes) -> Dict[str, Any]:
+    """将二进制快照解码为与JSON格式一致的游戏状态字典"""
+    try:
+        (magic, version, flags, n_ids, n_scores, n_tanks, n_order,
+         n_bullets, n_removed, n_events, tick, base) = _HEADER.unpack_from(payload, 0)
+    except struct.error as e:
+        raise ValueError(f"Invalid binary game state: {e}")
+
+    if magic != BINARY_MAGIC:
+        raise ValueError("Invalid binary game state: bad magic")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary game state version: {version}")
+
+    offset = _HEADER.size
+    try:
+        id_table: List[Optional[str]] = []
+        for _ in range(n_ids):
+            length = payload[offset]
+            offset += 1
+            if length == NONE_ID_LENGTH:
+                id_table.append(None)
+            else:
+                id_table.append(payload[offset:offset + length].decode('utf-8'))
+                offset += length
+
+        def player_at(index: int) -> Optional[str]:
+            return id_table[index] if index < n_ids else None
+
+        scores = list(payload[offset:offset + n_scores])
+        offset += n_scores
+
+        tanks = []
+        for _ in range(n_tanks):
+            player_index, mask = _TANK_KEY.unpack_from(payload, offset)
+            offset += _TANK_KEY.size
+            tank: Dict[str, Any] = {"id": player_at(player_index)}
+            if mask & _FIELD_POS:
+                x, y = _POS.unpack_from(payload, offset)
+                offset += _POS.size
+                tank["pos"] = [x / POSITION_SCALE, y / POSITION_SCALE]
+            if mask & _FIELD_ANG:
+                tank["ang"] = _dequantize_angle(_ANG.unpack_from(payload, offset)[0])
+                offset += _ANG.size
+            if mask & _FIELD_HP:
+                tank["hp"] = payload[offset]
+                offset += 1
+            if mask & _FIELD_TYPE:
+                type_index = payload[offset]
+                offset += 1
+                tank["type"] = TANK_TYPES[type_index] if type_index < len(TANK_TYPES) else TANK_TYPES[0]
+            if mask & _FIELD_SEQ:
+                tank["seq"] = _U32.unpack_from(payload, offset)[0]
+                offset += _U32.size
+            if mask & _FIELD_AT:
+                tank["at"] = _U32.unpack_from(payload, offset)[0]
+                offset += _U32.size
+            if mask & _FIELD_EID:
+                tank["eid"] = _U16.unpack_from(payload, offset)[0]
+                offset += _U16.size
+            tanks.append(tank)
+
+        order = None
+        if flags & _FLAG_HAS_ORDER:
+            order = [player_at(index) for index in payload[offset:offset + n_order]]
+            offset += n_order
+
+        bullets = []
+        for _ in range(n_bullets):
+            bullet_id, mask = _BULLET_KEY.unpack_from(payload, offset)
+            offset += _BULLET_KEY.size
+            bullet: Dict[str, Any] = {"id": bullet_id}
+            if mask & _FIELD_POS:
+                x, y = _POS.unpack_from(payload, offset)
+                offset += _POS.size
+                bullet["pos"] = [x / POSITION_SCALE, y / POSITION_SCALE]
+            if mask & _FIELD_ANG:
+                bullet["ang"] = _dequantize_angle(_ANG.unpack_from(payload, offset)[0])
+                offset += _ANG.size
+            if mask & _FIELD_OWN:
+                bullet["own"] = player_at(payload[offset])
+                offset += 1
+            bullets.append(bullet)
+
+        removed = [bullet_id for (bullet_id,) in
+                   _U16.iter_unpack(payload[offset:offset + 2 * n_removed])]
+        offset += 2 * n_removed
+
+        events = []
+        for _ in range(n_events):
+            event_tick, code, entity_id = _EVENT.unpack_from(payload, offset)
+            offset += _EVENT.size
+            events.append([event_tick,
+                           "despawn" if code & _EVENT_DESPAWN else "spawn",
+                           "tank" if code & _EVENT_TANK else "bullet",
+                           entity_id])
+        state_hash = None
+        if flags & _FLAG_HAS_HASH:
+            state_hash = _U32.unpack_from(payload, offset)[0]
+            offset += _U32.size
+        host_time = None
+        if flags & _FLAG_HAS_TIME:
+            host_time = _U32.unpack_from(payload, offset)[0]
+            offset += _U32.size
+        ack = None
+        if flags & _FLAG_HAS_ACK:
+            ack = _U32.unpack_from(payload, offset)[0]
+            offset += _U32.size
+        if offset > len(payload) or len(removed) != n_removed:
+            raise ValueError("Invalid binary game state: truncated")
+    except (IndexError, UnicodeDecodeError, struct.error) as e:
+        raise ValueError(f"Invalid binary game state: {e}")
+
+    state: Dict[str, Any] = {"tick": tick, "tanks": tanks, "bullets": bullets}
+    if events:
+        state["events"] = events
+    if state_hash is not None:
+        state["h"] = state_hash
+    if host_time is not None:
+        state["t"] = host_time
+    if ack is not None:
+        state["rack"] = ack
+    if flags & _FLAG_HAS_ROUND_INFO:
+        state["round_info"] = {
+            "sc": scores,
+            "ro": bool(flags & _FLAG_ROUND_OVER),
+            "go": bool(flags & _FLAG_GAME_OVER)
+        }
+    if flags & _FLAG_DELTA:
+        state["base"] = base
+        state["removed"] = removed
+        if order is not None:
+            state["order"] = order
+    return state
@@ -0,0 +1,67 @@
+"""
+从模拟生成网络快照
+
+把 Simulation 的坦克、子弹和回合状态整理为 GameHost.broadcast_game_state 需要的字典。
+NetworkHostView 和专用服务器共用，本模块不依赖arcade。
+"""
+
+from typing import Dict, Optional, Tuple
+
+from simulation import tank_type_from_image
+from .state_codec import timestamp_ms
+
+
+def build_game_state(simulation, applied_inputs: Optional[Dict[str, Tuple[int, float]]] = None) -> dict:
+    """生成当前游戏状态
+
+    applied_inputs: {玩家ID: (已应用的输入序号, 应用时间)}，随坦克回传用于客户端校正预测。
+    应用时间只在序号变化时改变，增量快照不会每个tick都重发；经过的时间由客户端按快照的发送时间计算。
+    同时取出实体分配器中自上次调用以来的生成/消失事件。
+    """
+    applied_inputs = applied_inputs or {}
+
+    # 坦克状态 - 优化数据大小
+    tanks = []
+    for tank in simulation.live_tanks():
+        # 只传递坦克类型而不是完整图片路径
+        tank_type = getattr(tank, 'tank_type', None) or tank_type_from_image(getattr(tank, 'tank_image_file', ''))
+        tank_data = {
+            "id": getattr(tank, 'player_id', None) or 'unknown',
+            "eid": getattr(tank, 'entity_id', None) or 0,
+            "pos": [round(tank.center_x, 1), round(tank.center_y, 1)],  # 减少精度
+            "ang": round(tank.angle, 1),
+            "hp": tank.health,
+            "type": tank_type
+        }
+        applied = applied_inputs.get(tank_data["id"])
+        if applied:
+            tank_data["seq"] = applied[0]
+            tank_data["at"] = timestamp_ms(applied[1])
+        tanks.append(tank_data)
+
+    # 子弹状态 - 稳定实体ID，客户端按ID原地更新
+    bullets = []
+    for i, bullet in enumerate(simulation.bullets):
+        entity_id = getattr(bullet, 'entity_id', None)
+        bullets.append({
+            "id": entity_id if entity_id is not None else i,
+            "pos": [round(bullet.center_x, 1), round(bullet.center_y, 1)],
+            "ang": round(bullet.angle, 1),
+            "own": getattr(bullet.owner, 'player_id', 'unk') if bullet.owner else 'unk'
+        })
+
+    # 回合信息 - 优化数据大小
+    scores = simulation.scores
+    round_info = {
+        "sc": list(scores),
+        "ro": simulation.round_over,
+        "go": simulation.game_over or max(scores) >= simulation.max_score
+    }
+
+    return {
+        "tanks": tanks,
+        "bullets": bullets,
+        "round_info": round_info,
+        # 自上次调用以来的实体生成/消失事件，由GameHost分配到下一个发出的tick
+        "events": [list(event) for event in simulation.entity_ids.drain_events()]
+    }
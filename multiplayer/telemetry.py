@@ -0,0 +1,203 @@
+"""
+网络遥测
+
+每个对端（主机上的每个客户端、客户端上的主机）一个 PeerTelemetry：
+- 计数：收发字节数和数据包数、解码失败、乱序到达
+- 往返时间和抖动：客户端心跳携带 "ping" 发送时间，主机立即回一个带 "pong" 的心跳，
+  客户端据此计算往返时间，并在下一个心跳中把 "rtt" / "jit" 报告给主机
+- 丢包：超过 PING_TIMEOUT 仍未收到回应的ping计为丢失（平滑）
+- 滚动窗口：按秒分桶，stats() 给出最近 WINDOW_SECONDS 秒的收发速率
+
+TelemetryDumper 按固定间隔把统计以JSON行追加到文件，或交给回调。
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+from .net_engine import get_engine
+
+WINDOW_SECONDS = 5        # 速率统计的滚动窗口(秒)
+RTT_SMOOTHING = 0.125     # 往返时间指数平滑系数
+JITTER_SMOOTHING = 0.0625 # 抖动指数平滑系数 (与RFC 3550相同)
+LOSS_SMOOTHING = 0.1      # ping丢失率指数平滑系数
+PING_TIMEOUT = 2.0        # ping超过该时间未收到回应视为丢失(秒)
+
+
+class PeerTelemetry:
+    """一个对端的网络统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # 累计计数
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.decode_failures = 0
+        self.out_of_order = 0
+        self.desyncs = 0  # 状态哈希校验失败的快照数
+
+        # 按秒分桶: [秒, 收到字节, 发送字节, 收到包数, 发送包数]
+        self.buckets = deque(maxlen=WINDOW_SECONDS + 1)
+
+        # 往返时间与抖动（秒）
+        self.rtt: Optional[float] = None
+        self.jitter = 0.0
+        self.last_rtt_sample: Optional[float] = None
+        # 对端报告的往返时间和抖动（主机从客户端心跳得到）
+        self.reported_rtt: Optional[float] = None
+        self.reported_jitter: Optional[float] = None
+
+        # ping丢失
+        self.outstanding_pings: "OrderedDict[float, None]" = OrderedDict()
+        self.loss_rate = 0.0
+
+    # --- 计数 ---
+    def on_sent(self, size: int, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.bytes_sent += size
+            self.packets_sent += 1
+            bucket = self._bucket(now)
+            bucket[2] += size
+            bucket[4] += 1
+
+    def on_received(self, size: int, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.bytes_received += size
+            self.packets_received += 1
+            bucket = self._bucket(now)
+            bucket[1] += size
+            bucket[3] += 1
+
+    def on_decode_failure(self):
+        with self.lock:
+            self.decode_failures += 1
+
+    def on_out_of_order(self):
+        with self.lock:
+            self.out_of_order += 1
+
+    def on_desync(self):
+        with self.lock:
+            self.desyncs += 1
+
+    # --- 往返时间 ---
+    def on_ping_sent(self, sent_at: float):
+        """记录发出的ping，并把超时未回应的ping计为丢失"""
+        with self.lock:
+            self._expire_pings(sent_at)
+            self.outstanding_pings[sent_at] = None
+
+    def on_pong(self, sent_at, now: Optional[float] = None):
+        """收到对ping的回应：sent_at为ping中携带的本端发送时间"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if sent_at not in self.outstanding_pings:
+                return  # 重复或已计为丢失的回应
+            del self.outstanding_pings[sent_at]
+            sample = max(0.0, now - sent_at)
+            if self.last_rtt_sample is not None:
+                self.jitter += JITTER_SMOOTHING * (abs(sample - self.last_rtt_sample) - self.jitter)
+            self.last_rtt_sample = sample
+            self.rtt = sample if self.rtt is None else self.rtt + RTT_SMOOTHING * (sample - self.rtt)
+            self.loss_rate += LOSS_SMOOTHING * (0.0 - self.loss_rate)
+
+    def on_report(self, rtt_ms, jitter_ms):
+        """对端报告的往返时间和抖动（毫秒）"""
+        with self.lock:
+            if isinstance(rtt_ms, (int, float)):
+                self.reported_rtt = rtt_ms / 1000.0
+            if isinstance(jitter_ms, (int, float)):
+                self.reported_jitter = jitter_ms / 1000.0
+
+    # --- 汇总 ---
+    def stats(self, now: Optional[float] = None) -> dict:
+        """累计计数和最近 WINDOW_SECONDS 秒的速率（往返时间和抖动以毫秒表示）"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self._expire_pings(now)
+            current = int(now)
+            window = [b for b in self.buckets if current - WINDOW_SECONDS < b[0] <= current]
+            rtt = self.rtt if self.rtt is not None else self.reported_rtt
+            jitter = self.jitter if self.rtt is not None else self.reported_jitter
+            return {
+                "rtt_ms": None if rtt is None else round(rtt * 1000, 1),
+                "jitter_ms": None if jitter is None else round(jitter * 1000, 1),
+                "loss": round(self.loss_rate, 3),
+                "kbps_in": round(sum(b[1] for b in window) * 8 / 1000 / WINDOW_SECONDS, 1),
+                "kbps_out": round(sum(b[2] for b in window) * 8 / 1000 / WINDOW_SECONDS, 1),
+                "pps_in": round(sum(b[3] for b in window) / WINDOW_SECONDS, 1),
+                "pps_out": round(sum(b[4] for b in window) / WINDOW_SECONDS, 1),
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "packets_sent": self.packets_sent,
+                "packets_received": self.packets_received,
+                "decode_failures": self.decode_failures,
+                "out_of_order": self.out_of_order,
+                "desyncs": self.desyncs,
+            }
+
+    def _bucket(self, now: float) -> list:
+        """当前秒的分桶（调用方持有锁）"""
+        second = int(now)
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append([second, 0, 0, 0, 0])
+        return self.buckets[-1]
+
+    def _expire_pings(self, now: float):
+        """超时未回应的ping计为丢失（调用方持有锁）"""
+        while self.outstanding_pings:
+            sent_at = next(iter(self.outstanding_pings))
+            if now - sent_at < PING_TIMEOUT:
+                break
+            del self.outstanding_pings[sent_at]
+            self.loss_rate += LOSS_SMOOTHING * (1.0 - self.loss_rate)
+
+
+def format_stats(label: str, stats: dict) -> str:
+    """屏幕叠加层中的一行统计"""
+    rtt = "-" if stats.get("rtt_ms") is None else f"{stats['rtt_ms']:.0f}"
+    jitter = "-" if stats.get("jitter_ms") is None else f"{stats['jitter_ms']:.0f}"
+    return (f"{label}  RTT {rtt}ms ±{jitter}  丢包 {stats.get('loss', 0) * 100:.1f}%  "
+            f"↓{stats.get('kbps_in', 0):.0f} ↑{stats.get('kbps_out', 0):.0f} kbps  "
+            f"乱序 {stats.get('out_of_order', 0)}  解码失败 {stats.get('decode_failures', 0)}")
+
+
+class TelemetryDumper:
+    """按固定间隔导出统计：写入JSON行文件和/或调用回调"""
+
+    def __init__(self, collect: Callable[[], dict], path: Optional[str] = None,
+                 interval: float = 1.0, callback: Optional[Callable[[dict], None]] = None):
+        self.collect = collect
+        self.path = path
+        self.interval = interval
+        self.callback = callback
+        self.timer = None
+
+    def start(self):
+        if self.timer is None:
+            self.timer = get_engine().call_every(self.interval, self.dump, first_delay=self.interval)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def dump(self) -> dict:
+        """立即导出一次，返回导出的记录"""
+        record = {"time": round(time.time(), 3), **self.collect()}
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"写入网络遥测失败: {e}")
+        if self.callback:
+            self.callback(record)
+        return record
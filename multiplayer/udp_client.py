@@ -7,8 +7,17 @@
 import socket
 import threading
 import time
-from typing import Optional, Callable, Tuple, List, Set
+from typing import Optional, Callable, Tuple, Set
+from .net_engine import get_engine, Endpoint, Timer
 from .udp_messages import UDPMessage, MessageType, MessageFactory
+from .reliable import ReliableChannel, ReliableTimer, RELIABLE_TYPES, DISCONNECT_REPEATS
+from .state_codec import CODEC_JSON, SUPPORTED_CODECS, state_hash, elapsed_ms
+from .snapshot_delta import SnapshotHistory, apply_delta
+from .telemetry import PeerTelemetry, TelemetryDumper
+from .input_commands import InputCommandStream, INPUT_COMMAND_RATE, keys_to_mask
+
+JOIN_TIMEOUT = 5.0           # 加入超时(秒)
+JOIN_RETRY_INTERVAL = 0.25   # 收到响应前重发加入请求的间隔(秒)
 
 
 class GameClient:
@@ -19,19 +28,38 @@ class GameClient:
         self.client_socket: Optional[socket.socket] = None
         self.host_address: Optional[Tuple[str, int]] = None
         self.running = False
-        self.network_thread: Optional[threading.Thread] = None
-        self.heartbeat_thread: Optional[threading.Thread] = None
+        self.endpoint: Optional[Endpoint] = None  # 网络引擎上的收包端点
+
+        # 与主机之间的可靠控制通道（加入成功后建立）
+        self.channel: Optional[ReliableChannel] = None
+        self.reliable_timer = ReliableTimer(self._service_reliable)
+
+        # 与主机之间的网络遥测（心跳ping测量往返时间）
+        self.telemetry = PeerTelemetry()
+        self.telemetry_dumper: Optional[TelemetryDumper] = None
 
         # 客户端状态
         self.player_id: Optional[str] = None
         self.player_name = ""
         self.connected = False
+        # 观众只接收快照，不发送输入
+        self.spectator = False
 
-        # 输入状态
+        # 游戏状态编码格式（由主机在JOIN响应中确定）
+        self.supported_codecs = list(SUPPORTED_CODECS)
+        self.state_codec = CODEC_JSON
+        # 主机选择的地图编号（由主机在JOIN响应中告知，旧主机不携带时为None）
+        self.map_index: Optional[int] = None
+
+        # 增量快照：已应用的完整快照历史（作为主机增量的基准）
+        self.snapshot_history = SnapshotHistory(capacity=64)
+        self.last_state_tick = 0
+
+        # 输入状态：按住的按键，按tick采样为带序号的输入指令发给主机
         self.current_keys: Set[str] = set()
-        self.pending_key_presses: List[str] = []
-        self.pending_key_releases: List[str] = []
+        self.input_commands = InputCommandStream()
         self.input_lock = threading.Lock()
+        self.input_timer: Optional[Timer] = None
 
         # 回调函数
         self.connection_callback: Optional[Callable] = None
@@ -41,7 +69,7 @@ class GameClient:
 
         # 心跳
         self.heartbeat_interval = 1.0  # 1秒发送一次心跳
-        self.last_heartbeat_time = 0
+        self.heartbeat_timer: Optional[Timer] = None
 
     def set_callbacks(self, connection: Callable = None, disconnection: Callable = None,
                      game_state: Callable = None):
@@ -57,44 +85,61 @@ class GameClient:
         """设置坦克选择回调函数"""
         self.tank_selection_callback = callback
 
-    def connect_to_host(self, host_ip: str, host_port: int, player_name: str) -> bool:
-        """连接到游戏主机"""
+    def connect_to_host(self, host_ip: str, host_port: int, player_name: str,
+                        room_id: Optional[int] = None, spectator: bool = False) -> bool:
+        """连接到游戏主机（room_id为多房间服务器中的房间编号，spectator为True时以观众身份加入）"""
         if self.connected:
             return False
 
         self.player_name = player_name
         self.host_address = (host_ip, host_port)
+        self.spectator = spectator
 
         try:
-            # 创建UDP套接字
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.client_socket.settimeout(5.0)  # 5秒连接超时
-
-            # 发送加入请求
-            join_request = MessageFactory.create_join_request(player_name)
-            self.client_socket.sendto(join_request.to_bytes(), self.host_address)
-
-            # 等待响应
-            data, addr = self.client_socket.recvfrom(8192)
-            response = UDPMessage.from_bytes(data)
-
-            if response.type == MessageType.JOIN_RESPONSE and response.data.get("success"):
+            # 创建UDP套接字（IPv6组播发现到的主机地址为IPv6地址）
+            family = socket.AF_INET6 if ":" in host_ip else socket.AF_INET
+            self.client_socket = socket.socket(family, socket.SOCK_DGRAM)
+            self.client_socket.settimeout(JOIN_RETRY_INTERVAL)
+
+            # 发送加入请求，收到响应前定期重发（主机按地址去重）
+            join_bytes = MessageFactory.create_join_request(player_name, self.supported_codecs, room_id,
+                                                            spectator).to_bytes()
+            deadline = time.time() + JOIN_TIMEOUT
+            response = None
+            while response is None:
+                if time.time() >= deadline:
+                    raise socket.timeout("等待加入响应超时")
+                self.client_socket.sendto(join_bytes, self.host_address)
+                try:
+                    data, addr = self.client_socket.recvfrom(8192)
+                    candidate = UDPMessage.from_bytes(data)
+                except (socket.timeout, ValueError):
+                    continue
+                if candidate.type == MessageType.JOIN_RESPONSE:
+                    response = candidate
+
+            if response.data.get("success"):
                 self.player_id = response.data.get("player_id")
+                self.state_codec = response.data.get("codec") or CODEC_JSON
+                self.map_index = response.data.get("map")
                 self.connected = True
+                self.telemetry = PeerTelemetry()
 
-                # 设置非阻塞模式
-                self.client_socket.settimeout(0.1)
+                # 加入响应是主机可靠通道的第一条消息，交给通道记录以便确认
+                self.channel = ReliableChannel(self.player_id)
+                self.channel.receive(response, time.time())
 
-                # 启动网络线程
+                # 交给网络引擎收包，心跳由定时器发送
                 self.running = True
-                self.network_thread = threading.Thread(target=self._network_loop, daemon=True)
-                self.network_thread.start()
+                engine = get_engine()
+                self.endpoint = engine.open_endpoint(self.client_socket, self._on_datagram, "客户端")
+                self.heartbeat_timer = engine.call_every(self.heartbeat_interval, self._send_heartbeat)
+                if not spectator:
+                    self.input_timer = engine.call_every(1.0 / INPUT_COMMAND_RATE, self._send_input_command)
+                self._schedule_reliable()
 
-                # 启动心跳线程
-                self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
-                self.heartbeat_thread.start()
-
-                print(f"成功连接到主机 {host_ip}:{host_port} (玩家ID: {self.player_id})")
+                role = "观众" if spectator else "玩家"
+                print(f"成功连接到主机 {host_ip}:{host_port} ({role}ID: {self.player_id})")
 
                 # 通知连接成功
                 if self.connection_callback:
@@ -117,37 +162,29 @@ class GameClient:
         if not self.connected:
             return
 
-        # 发送断开连接消息
+        # 发送断开连接消息（套接字随即关闭，无法重传，冗余发送几次）
         if self.client_socket and self.host_address and self.player_id:
             try:
-                disconnect_msg = MessageFactory.create_disconnect(self.player_id)
-                self.client_socket.sendto(disconnect_msg.to_bytes(), self.host_address)
+                disconnect_bytes = MessageFactory.create_disconnect(self.player_id).to_bytes()
+                for _ in range(DISCONNECT_REPEATS):
+                    self.client_socket.sendto(disconnect_bytes, self.host_address)
             except:
                 pass
 
         # 停止网络处理
-        self.running = False
         self.connected = False
-
-        if self.client_socket:
-            self.client_socket.close()
-            self.client_socket = None
-
-        if self.network_thread:
-            self.network_thread.join(timeout=2.0)
-            self.network_thread = None
-
-        if self.heartbeat_thread:
-            self.heartbeat_thread.join(timeout=2.0)
-            self.heartbeat_thread = None
+        self._stop_network()
 
         # 清理状态
         self.player_id = None
         self.host_address = None
+        self.channel = None
+        self.state_codec = CODEC_JSON
+        self.snapshot_history.clear()
+        self.last_state_tick = 0
         with self.input_lock:
             self.current_keys.clear()
-            self.pending_key_presses.clear()
-            self.pending_key_releases.clear()
+            self.input_commands.reset()
 
         print("已断开连接")
 
@@ -155,25 +192,23 @@ class GameClient:
         if self.disconnection_callback:
             self.disconnection_callback("user_disconnect")
 
-    def send_key_press(self, key: str):
-        """发送按键按下事件"""
-        if not self.connected:
-            return
+    def send_key_press(self, key: str) -> Optional[int]:
+        """按下按键，返回主机将看到这一变化的指令序号（按住的控制没有变化或观战时返回None）"""
+        if not self.connected or self.spectator:
+            return None
 
         with self.input_lock:
-            if key not in self.current_keys:
-                self.current_keys.add(key)
-                self.pending_key_presses.append(key)
+            self.current_keys.add(key)
+            return self.input_commands.update(keys_to_mask(self.current_keys))
 
-    def send_key_release(self, key: str):
-        """发送按键释放事件"""
-        if not self.connected:
-            return
+    def send_key_release(self, key: str) -> Optional[int]:
+        """松开按键，返回主机将看到这一变化的指令序号（按住的控制没有变化或观战时返回None）"""
+        if not self.connected or self.spectator:
+            return None
 
         with self.input_lock:
-            if key in self.current_keys:
-                self.current_keys.remove(key)
-                self.pending_key_releases.append(key)
+            self.current_keys.discard(key)
+            return self.input_commands.update(keys_to_mask(self.current_keys))
 
     def send_message(self, message: UDPMessage):
         """发送消息到主机"""
@@ -181,57 +216,112 @@ class GameClient:
             return
 
         try:
-            self.client_socket.sendto(message.to_bytes(), self.host_address)
+            self._send(message)
         except Exception as e:
             print(f"发送消息失败: {e}")
 
-    def _network_loop(self):
-        """网络处理主循环"""
-        while self.running and self.connected:
+    def _send(self, message: UDPMessage):
+        """发送消息到主机：控制消息走可靠通道，其他消息捎带待发的确认"""
+        if self.channel is None:
+            data = message.to_bytes()
+        elif message.type in RELIABLE_TYPES:
+            data = self.channel.prepare(message, time.time())
+        else:
+            self.channel.stamp(message)
+            data = message.to_bytes()
+        self.client_socket.sendto(data, self.host_address)
+        self.telemetry.on_sent(len(data))
+        self._schedule_reliable()
+
+    def _schedule_reliable(self):
+        """按可靠通道的截止时间安排下一次重传/确认"""
+        if self.running and self.channel is not None:
+            self.reliable_timer.schedule(self.channel.next_deadline(), time.time())
+
+    def _service_reliable(self):
+        """重传到期的可靠消息并发出到期的单独确认"""
+        channel = self.channel
+        if not (self.running and self.connected) or channel is None:
+            return
+        for data in channel.poll(time.time()):
             try:
-                # 发送待处理的输入
-                self._send_pending_input()
+                self.client_socket.sendto(data, self.host_address)
+                self.telemetry.on_sent(len(data))
+            except OSError as e:
+                print(f"可靠消息重传失败: {e}")
+        self._schedule_reliable()
+
+    def _stop_network(self):
+        """停止心跳定时器和收包端点并关闭套接字"""
+        self.running = False
+        if self.heartbeat_timer:
+            self.heartbeat_timer.cancel()
+            self.heartbeat_timer = None
+        if self.input_timer:
+            self.input_timer.cancel()
+            self.input_timer = None
+        self.reliable_timer.cancel()
+        self.stop_telemetry_dump()
+
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
 
-                # 接收消息 - 增加缓冲区大小
-                try:
-                    data, addr = self.client_socket.recvfrom(8192)  # 从1024增加到8192
-                    self._handle_server_message(data)
-                except socket.timeout:
-                    # 超时是正常的，继续循环
-                    pass
-
-            except Exception as e:
-                if self.running:
-                    print(f"网络处理错误: {e}")
-                    self._handle_connection_lost("network_error")
-                    break
-
-    def _send_pending_input(self):
-        """发送待处理的输入"""
-        with self.input_lock:
-            if self.pending_key_presses or self.pending_key_releases:
-                input_msg = MessageFactory.create_player_input(
-                    self.player_id,
-                    self.pending_key_presses.copy(),
-                    self.pending_key_releases.copy()
-                )
+        if self.client_socket:
+            self.client_socket.close()
+            self.client_socket = None
 
-                try:
-                    self.client_socket.sendto(input_msg.to_bytes(), self.host_address)
-                    self.pending_key_presses.clear()
-                    self.pending_key_releases.clear()
-                except Exception as e:
-                    print(f"发送输入失败: {e}")
+    def _on_datagram(self, data: bytes, addr: Tuple[str, int]):
+        """网络引擎收到数据包"""
+        if self.running and self.connected:
+            self.telemetry.on_received(len(data))
+            self._handle_server_message(data)
+
+    def _send_input_command(self):
+        """输入定时器回调：采样本tick的输入指令，连同最近几条指令一起发送"""
+        if not (self.running and self.connected):
+            return
+        with self.input_lock:
+            seq, commands = self.input_commands.sample()
+        try:
+            self._send(MessageFactory.create_player_input(self.player_id, seq, commands))
+        except Exception as e:
+            print(f"发送输入失败: {e}")
 
     def _handle_server_message(self, data: bytes):
         """处理服务器消息"""
         try:
             message = UDPMessage.from_bytes(data)
+        except ValueError:
+            # 忽略无效消息
+            self.telemetry.on_decode_failure()
+            return
 
+        # 控制消息经过可靠通道去重并按序交付；快照不带序号，直接处理
+        if self.channel is not None and (message.reliable_seq is not None or message.ack is not None):
+            delivered = self.channel.receive(message, time.time())
+            self._schedule_reliable()
+        else:
+            delivered = [message]
+        for ready in delivered:
+            self._dispatch_server_message(ready)
+
+    def _dispatch_server_message(self, message: UDPMessage):
+        """按消息类型分发"""
+        try:
             if message.type == MessageType.GAME_STATE:
+                # 还原增量快照并确认，乱序或缺少基准的快照直接丢弃
+                game_state = self._resolve_game_state(message.data)
+                if game_state is None:
+                    return
+
                 # 处理游戏状态更新
                 if self.game_state_callback:
-                    self.game_state_callback(message.data)
+                    self.game_state_callback(game_state)
+
+            elif message.type == MessageType.HEARTBEAT:
+                if "pong" in message.data:
+                    self.telemetry.on_pong(message.data["pong"])
 
             elif message.type == MessageType.PLAYER_DISCONNECT:
                 # 服务器通知断开连接
@@ -247,33 +337,95 @@ class GameClient:
             # 忽略无效消息
             pass
 
-    def _heartbeat_loop(self):
-        """心跳发送循环"""
-        while self.running and self.connected:
-            try:
-                current_time = time.time()
-                if current_time - self.last_heartbeat_time >= self.heartbeat_interval:
-                    heartbeat_msg = MessageFactory.create_heartbeat(self.player_id)
-                    self.client_socket.sendto(heartbeat_msg.to_bytes(), self.host_address)
-                    self.last_heartbeat_time = current_time
+    def _resolve_game_state(self, data: dict) -> Optional[dict]:
+        """将收到的（增量）游戏状态还原为完整快照，并向主机确认tick"""
+        tick = data.get("tick")
+        if not tick:
+            # 不带tick的旧格式快照，直接使用
+            return data
+
+        if tick <= self.last_state_tick:
+            self.telemetry.on_out_of_order()
+            return None
+
+        if "base" in data:
+            baseline = self.snapshot_history.get(data["base"])
+            if baseline is None:
+                return None
+            game_state = apply_delta(baseline, data)
+        else:
+            game_state = data
+            game_state["resync"] = True  # 完整快照：可能漏掉了事件，视图需按实体集合重新对齐
+
+        # 主机附带的状态哈希与还原结果不一致：丢弃且不确认，主机继续以更早的已确认快照为基准
+        if "h" in data and state_hash(game_state) != data["h"]:
+            self.telemetry.on_desync()
+            print(f"快照 {tick} 状态校验失败，等待重新同步")
+            return None
+
+        # 主机应用输入到发出本快照经过的毫秒数，供本地预测校正
+        # （未变化的坦克与基准快照共用字典，复制后再写入）
+        if "t" in data:
+            game_state["tanks"] = [{**tank, "age": elapsed_ms(data["t"], tank["at"])} if "at" in tank else tank
+                                   for tank in game_state.get("tanks", [])]
+
+        # 增量携带基准之后所有tick的事件，只保留尚未处理过的
+        game_state["events"] = [event for event in data.get("events", [])
+                                if event[0] > self.last_state_tick]
+
+        self.snapshot_history.add(tick, game_state)
+        self.last_state_tick = tick
+
+        try:
+            ack_msg = MessageFactory.create_state_ack(self.player_id, tick)
+            self._send(ack_msg)
+        except Exception as e:
+            print(f"发送状态确认失败: {e}")
 
-                time.sleep(0.1)  # 100ms检查间隔
+        return game_state
 
-            except Exception as e:
-                if self.running:
-                    print(f"心跳发送错误: {e}")
-                    break
+    def _send_heartbeat(self):
+        """心跳定时器回调：携带ping，并报告上次测得的往返时间和抖动"""
+        if not (self.running and self.connected):
+            return
+        try:
+            stats = self.telemetry.stats()
+            ping = time.time()
+            self.telemetry.on_ping_sent(ping)
+            heartbeat_msg = MessageFactory.create_heartbeat(
+                self.player_id, ping=ping, rtt_ms=stats["rtt_ms"], jitter_ms=stats["jitter_ms"]
+            )
+            self._send(heartbeat_msg)
+        except Exception as e:
+            print(f"心跳发送错误: {e}")
 
     def _handle_connection_lost(self, reason: str):
         """处理连接丢失"""
         if self.connected:
             self.connected = False
+            self._stop_network()
             print(f"连接丢失: {reason}")
 
             # 通知断开连接
             if self.disconnection_callback:
                 self.disconnection_callback(reason)
 
+    def get_network_stats(self) -> dict:
+        """与主机之间的网络统计"""
+        return {"host": self.telemetry.stats()}
+
+    def start_telemetry_dump(self, path: Optional[str] = None, interval: float = 1.0,
+                             callback: Optional[Callable[[dict], None]] = None):
+        """按固定间隔把网络统计以JSON行写入path和/或交给callback"""
+        self.stop_telemetry_dump()
+        self.telemetry_dumper = TelemetryDumper(self.get_network_stats, path, interval, callback)
+        self.telemetry_dumper.start()
+
+    def stop_telemetry_dump(self):
+        if self.telemetry_dumper:
+            self.telemetry_dumper.stop()
+            self.telemetry_dumper = None
+
     def is_connected(self) -> bool:
         """检查是否已连接"""
         return self.connected
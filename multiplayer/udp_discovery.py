@@ -2,51 +2,178 @@
 UDP房间发现和广播功能
 
 实现局域网内游戏房间的自动发现和广播机制
+
+房间发现按变化通知：只有房间出现、显示的信息改变或房间消失（满员或过期）时才回调，
+重复的广播包不会触发房间列表刷新。过期检查使用按最后收到时间排序的堆，
+只在最早的截止时间触发一次，而不是定期扫描所有房间。
+
+发现模式：子网广播（默认）、IPv4组播或IPv6链路本地组播。组播只送达加入了发现组的机器。
+无论哪种模式，房间发现启动时都发出一次房间查询，主机立即以单播回复自己的房间广播，
+房间列表不必等待下一轮定期广播。
 """
 
+import heapq
 import socket
+import struct
 import threading
 import time
-from typing import Dict, Callable, Optional, Tuple
+from typing import Dict, Callable, List, Optional, Tuple
+from .net_engine import get_engine, Endpoint, Timer
 from .udp_messages import UDPMessage, MessageType, MessageFactory
 
+ROOM_TIMEOUT = 5.0          # 超过该时间没有收到广播的房间视为已关闭(秒)
+EXPIRY_CHECK_SLACK = 0.05   # 过期检查比最早的截止时间稍晚触发，确保已经过期
+
+# 发现模式
+DISCOVERY_BROADCAST = "broadcast"     # 子网广播
+DISCOVERY_MULTICAST = "multicast"     # IPv4组播
+DISCOVERY_MULTICAST6 = "multicast6"   # IPv6链路本地组播
+DISCOVERY_MODES = (DISCOVERY_BROADCAST, DISCOVERY_MULTICAST, DISCOVERY_MULTICAST6)
+DEFAULT_DISCOVERY_MODE = DISCOVERY_BROADCAST
+
+MULTICAST_GROUP_V4 = "239.255.77.77"  # 管理范围组播地址，不会被路由出本站点
+MULTICAST_GROUP_V6 = "ff02::7a4b"     # 链路本地范围
+MULTICAST_TTL = 1                     # 组播只发到本网段
+
+
+def discovery_address(mode: str, port: int) -> tuple:
+    """发现模式对应的广播/组播目的地址"""
+    if mode == DISCOVERY_MULTICAST:
+        return (MULTICAST_GROUP_V4, port)
+    if mode == DISCOVERY_MULTICAST6:
+        return (MULTICAST_GROUP_V6, port)
+    return ('<broadcast>', port)
+
+
+def open_discovery_socket(mode: str, port: Optional[int] = None) -> socket.socket:
+    """创建房间发现/广播使用的UDP套接字
+
+    port 为None时不绑定（只发送）；为0时绑定临时端口；否则与同一台机器上的其他发现套接字
+    共享绑定该端口并加入模式对应的组播组。广播模式的套接字也尝试加入IPv4组播组，
+    这样也能收到组播模式主机的广播，加入失败（例如没有组播路由）时只收广播。
+    """
+    family = socket.AF_INET6 if mode == DISCOVERY_MULTICAST6 else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, MULTICAST_TTL)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+        if port is None:
+            return sock
+        if port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', port))
+        if port:
+            try:
+                if family == socket.AF_INET6:
+                    group = socket.inet_pton(socket.AF_INET6, MULTICAST_GROUP_V6) + struct.pack("@I", 0)
+                    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP, group)
+                else:
+                    group = socket.inet_aton(MULTICAST_GROUP_V4) + socket.inet_aton("0.0.0.0")
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group)
+            except OSError:
+                if mode != DISCOVERY_BROADCAST:
+                    raise
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def open_game_socket(mode: str, port: int) -> socket.socket:
+    """创建绑定游戏端口的套接字：IPv6组播发现到的主机地址是IPv6地址，此时使用同时接受IPv4客户端的双栈套接字"""
+    if mode == DISCOVERY_MULTICAST6:
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def peer_host(addr: tuple) -> str:
+    """数据包来源地址 -> 连接用的主机地址（IPv6链路本地地址带上接口编号）"""
+    host = addr[0]
+    if len(addr) > 3 and addr[3] and "%" not in host:
+        host = f"{host}%{addr[3]}"
+    return host
+
 
 class RoomInfo:
     """房间信息类"""
     
     def __init__(self, host_ip: str, room_name: str, current_players: int, 
-                 max_players: int, game_mode: str = "pvp"):
+                 max_players: int, game_mode: str = "pvp", host_port: int = 12346,
+                 room_id: Optional[int] = None):
         self.host_ip = host_ip
+        self.host_port = host_port
+        self.room_id = room_id  # 多房间服务器中的房间编号，单房间主机为None
         self.room_name = room_name
         self.current_players = current_players
         self.max_players = max_players
         self.game_mode = game_mode
         self.last_seen = time.time()
     
-    def is_expired(self, timeout: float = 5.0) -> bool:
+    def is_expired(self, timeout: float = ROOM_TIMEOUT, now: Optional[float] = None) -> bool:
         """检查房间信息是否过期"""
-        return time.time() - self.last_seen > timeout
+        return (time.time() if now is None else now) - self.last_seen > timeout
     
-    def update(self, current_players: int):
-        """更新房间信息"""
+    def update(self, current_players: int, room_name: Optional[str] = None,
+               max_players: Optional[int] = None, now: Optional[float] = None) -> bool:
+        """更新房间信息，返回房间列表中显示的内容是否有变化"""
+        self.last_seen = time.time() if now is None else now
+        shown = (self.room_name, self.current_players, self.max_players)
         self.current_players = current_players
-        self.last_seen = time.time()
+        if room_name is not None:
+            self.room_name = room_name
+        if max_players is not None:
+            self.max_players = max_players
+        return shown != (self.room_name, self.current_players, self.max_players)
+
+    def is_joinable(self) -> bool:
+        """房间是否未满员"""
+        return self.current_players < self.max_players
 
 
 class RoomDiscovery:
     """房间发现管理器"""
     
-    def __init__(self, broadcast_port: int = 12345):
+    def __init__(self, broadcast_port: int = 12345, room_timeout: float = ROOM_TIMEOUT,
+                 mode: str = DEFAULT_DISCOVERY_MODE):
         self.broadcast_port = broadcast_port
-        self.rooms: Dict[str, RoomInfo] = {}  # host_ip -> RoomInfo
-        self.discovery_socket: Optional[socket.socket] = None
+        self.room_timeout = room_timeout
+        self.mode = mode
+        self.rooms: Dict[str, RoomInfo] = {}  # host_ip（多房间服务器为 host_ip#room_id） -> RoomInfo
+        # 可加入（未满员、未过期）的房间，按出现顺序
+        self.available: Dict[str, RoomInfo] = {}
+        # 过期堆：(截止时间, 房间键)，每个房间一项；收到广播时不更新，弹出时按最后收到时间重新入堆
+        self.expiry_heap: List[Tuple[float, str]] = []
+        # 房间表由网络线程修改，界面线程读取
+        self.lock = threading.Lock()
+        # 监听发现端口的套接字（IPv4，IPv6组播模式再加一个IPv6），以及发送查询、接收单播回复的临时端口套接字
+        self.sockets: List[socket.socket] = []
+        self.query_socket: Optional[socket.socket] = None
         self.running = False
-        self.discovery_thread: Optional[threading.Thread] = None
+        self.endpoints: List[Endpoint] = []
+        self.expiry_timer: Optional[Timer] = None
         self.room_update_callback: Optional[Callable] = None
+        self.room_change_callback: Optional[Callable] = None
         
     def set_room_update_callback(self, callback: Callable[[Dict[str, RoomInfo]], None]):
-        """设置房间列表更新回调"""
+        """设置房间列表更新回调（列表有变化时收到完整的可用房间列表）"""
         self.room_update_callback = callback
+
+    def set_room_change_callback(self, callback: Callable[[Dict[str, RoomInfo], Dict[str, RoomInfo],
+                                                          Dict[str, RoomInfo]], None]):
+        """设置房间变化回调：callback(新增, 更新, 移除)，每个参数都是 房间键 -> RoomInfo"""
+        self.room_change_callback = callback
     
     def start_discovery(self):
         """开始房间发现"""
@@ -54,17 +181,21 @@ class RoomDiscovery:
             return
             
         try:
-            self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            self.discovery_socket.bind(('', self.broadcast_port))
-            self.discovery_socket.settimeout(1.0)  # 1秒超时
+            ipv4_mode = DISCOVERY_BROADCAST if self.mode == DISCOVERY_MULTICAST6 else self.mode
+            self.sockets.append(open_discovery_socket(ipv4_mode, self.broadcast_port))
+            if self.mode == DISCOVERY_MULTICAST6:
+                self.sockets.append(open_discovery_socket(DISCOVERY_MULTICAST6, self.broadcast_port))
+            # 主机的单播回复发到查询套接字的临时端口（发现端口在同一台机器上由多个套接字共享，单播只送达其中一个）
+            self.query_socket = open_discovery_socket(self.mode, 0)
             
             self.running = True
-            self.discovery_thread = threading.Thread(target=self._discovery_loop, daemon=True)
-            self.discovery_thread.start()
+            engine = get_engine()
+            for sock in self.sockets + [self.query_socket]:
+                self.endpoints.append(engine.open_endpoint(sock, self._on_datagram, "房间发现"))
+            self._schedule_expiry()
             
-            print(f"房间发现已启动，监听端口 {self.broadcast_port}")
+            print(f"房间发现已启动，监听端口 {self.broadcast_port} ({self.mode})")
+            self.query_rooms()
             
         except Exception as e:
             print(f"启动房间发现失败: {e}")
@@ -74,96 +205,240 @@ class RoomDiscovery:
         """停止房间发现"""
         self.running = False
         
-        if self.discovery_socket:
-            self.discovery_socket.close()
-            self.discovery_socket = None
+        if self.expiry_timer:
+            self.expiry_timer.cancel()
+            self.expiry_timer = None
+            
+        for endpoint in self.endpoints:
+            endpoint.close()
+        self.endpoints = []
             
-        if self.discovery_thread:
-            self.discovery_thread.join(timeout=2.0)
-            self.discovery_thread = None
+        for sock in self.sockets + ([self.query_socket] if self.query_socket else []):
+            sock.close()
+        self.sockets = []
+        self.query_socket = None
             
         print("房间发现已停止")
+
+    def query_rooms(self, address: Optional[tuple] = None) -> bool:
+        """发出房间查询（默认发到发现模式的广播/组播地址），主机以单播回复房间广播"""
+        if not self.running or self.query_socket is None:
+            return False
+        try:
+            self.query_socket.sendto(MessageFactory.create_room_query().to_bytes(),
+                                     address or discovery_address(self.mode, self.broadcast_port))
+            return True
+        except OSError as e:
+            print(f"发送房间查询失败: {e}")
+            return False
     
-    def _discovery_loop(self):
-        """房间发现主循环"""
-        while self.running:
-            try:
-                # 接收广播消息
-                data, addr = self.discovery_socket.recvfrom(1024)
-                self._handle_discovery_message(data, addr[0])
-                
-            except socket.timeout:
-                # 超时是正常的，继续循环
-                pass
-            except Exception as e:
-                if self.running:  # 只在运行时报告错误
-                    print(f"房间发现错误: {e}")
-            
-            # 清理过期房间
-            self._cleanup_expired_rooms()
+    def _on_datagram(self, data: bytes, addr: tuple):
+        """网络引擎收到广播消息或查询回复"""
+        if self.running:
+            self._handle_discovery_message(data, peer_host(addr))
     
     def _handle_discovery_message(self, data: bytes, host_ip: str):
-        """处理发现消息"""
+        """处理发现消息，房间列表有变化时通知"""
         try:
             message = UDPMessage.from_bytes(data)
-            
-            if message.type == MessageType.ROOM_ADVERTISE:
-                room_data = message.data
-                room_name = room_data.get("room_name", "Unknown Room")
-                current_players = room_data.get("current_players", 0)
-                max_players = room_data.get("max_players", 4)
-                game_mode = room_data.get("game_mode", "pvp")
-                
-                # 更新或创建房间信息
-                if host_ip in self.rooms:
-                    self.rooms[host_ip].update(current_players)
-                else:
-                    self.rooms[host_ip] = RoomInfo(
-                        host_ip, room_name, current_players, max_players, game_mode
-                    )
-                
-                # 通知房间列表更新
-                if self.room_update_callback:
-                    self.room_update_callback(self.get_available_rooms())
-                    
-        except ValueError as e:
+        except ValueError:
             # 忽略无效消息
-            pass
-    
-    def _cleanup_expired_rooms(self):
-        """清理过期房间"""
-        expired_rooms = [ip for ip, room in self.rooms.items() if room.is_expired()]
-        
-        for ip in expired_rooms:
-            del self.rooms[ip]
-            
-        if expired_rooms and self.room_update_callback:
+            return
+
+        now = time.time()
+        changes = ({}, {}, {})  # 新增, 更新, 移除
+        created = False
+        with self.lock:
+            if message.type == MessageType.ROOM_ADVERTISE:
+                created = self._upsert_room(host_ip, host_ip, message.data, 4,
+                                            message.data.get("host_port", 12346), None, now, changes)
+
+            elif message.type == MessageType.ROOM_LIST_ADVERTISE:
+                host_port = message.data.get("host_port", 12346)
+                for room_data in message.data.get("rooms", []):
+                    room_id = room_data.get("room_id")
+                    created |= self._upsert_room(f"{host_ip}#{room_id}", host_ip, room_data, 2,
+                                                 host_port, room_id, now, changes)
+            else:
+                return
+
+        self._notify(*changes)
+        if created:
+            self._schedule_expiry()
+
+    def _upsert_room(self, key: str, host_ip: str, room_data: dict, default_max_players: int,
+                     host_port: int, room_id: Optional[int], now: float, changes: tuple) -> bool:
+        """更新或创建一个房间，按可加入状态的变化记入 changes (新增, 更新, 移除)，返回是否新建了房间"""
+        added, updated, removed = changes
+        room = self.rooms.get(key)
+        current_players = room_data.get("current_players", 0)
+        created = room is None
+        if created:
+            room = RoomInfo(
+                host_ip, room_data.get("room_name", "Unknown Room"), current_players,
+                room_data.get("max_players", default_max_players), room_data.get("game_mode", "pvp"),
+                host_port, room_id
+            )
+            room.last_seen = now
+            self.rooms[key] = room
+            heapq.heappush(self.expiry_heap, (now + self.room_timeout, key))
+            changed = True
+        else:
+            changed = room.update(current_players, room_data.get("room_name"), room_data.get("max_players"), now)
+
+        if room.is_joinable():
+            if key not in self.available:
+                self.available[key] = room
+                added[key] = room
+            elif changed:
+                updated[key] = room
+        elif key in self.available:
+            del self.available[key]
+            removed[key] = room
+        return created
+
+    def expire_rooms(self, now: Optional[float] = None) -> Dict[str, RoomInfo]:
+        """移除超时没有收到广播的房间，返回其中原本可加入的房间"""
+        now = time.time() if now is None else now
+        removed = {}
+        with self.lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                _, key = heapq.heappop(self.expiry_heap)
+                room = self.rooms.get(key)
+                if room is None:
+                    continue
+                deadline = room.last_seen + self.room_timeout
+                if deadline > now:
+                    # 之后又收到过广播，按最后收到时间重新入堆
+                    heapq.heappush(self.expiry_heap, (deadline, key))
+                    continue
+                del self.rooms[key]
+                if self.available.pop(key, None) is not None:
+                    removed[key] = room
+        self._notify({}, {}, removed)
+        return removed
+
+    def _schedule_expiry(self):
+        """在最早的房间截止时间安排一次过期检查（已有待触发的检查时不重复安排）"""
+        if not self.running or self.expiry_timer is not None or not self.expiry_heap:
+            return
+        delay = max(0.0, self.expiry_heap[0][0] - time.time()) + EXPIRY_CHECK_SLACK
+        self.expiry_timer = get_engine().call_later(delay, self._on_expiry_timer)
+
+    def _on_expiry_timer(self):
+        self.expiry_timer = None
+        if not self.running:
+            return
+        self.expire_rooms()
+        self._schedule_expiry()
+
+    def _notify(self, added: dict, updated: dict, removed: dict):
+        """房间列表有变化时通知回调"""
+        if not (added or updated or removed):
+            return
+        if self.room_change_callback:
+            self.room_change_callback(added, updated, removed)
+        if self.room_update_callback:
             self.room_update_callback(self.get_available_rooms())
     
     def get_available_rooms(self) -> Dict[str, RoomInfo]:
-        """获取可用房间列表"""
-        return {ip: room for ip, room in self.rooms.items() 
-                if not room.is_expired() and room.current_players < room.max_players}
+        """获取可用房间列表（副本）"""
+        with self.lock:
+            return dict(self.available)
 
 
-class RoomAdvertiser:
-    """房间广播器"""
-    
-    def __init__(self, broadcast_port: int = 12345, broadcast_interval: float = 2.0):
+class _Advertiser:
+    """房间广播器的公共部分：定期向发现地址发出房间广播，并以单播立即回复房间查询"""
+
+    def __init__(self, broadcast_port: int, broadcast_interval: float, mode: str):
         self.broadcast_port = broadcast_port
         self.broadcast_interval = broadcast_interval
+        self.mode = mode
         self.broadcast_socket: Optional[socket.socket] = None
+        self.endpoint: Optional[Endpoint] = None
+        self.running = False
+        self.broadcast_timer: Optional[Timer] = None
+        self.queries_answered = 0
+
+    def build_messages(self) -> list:
+        """本次广播/回复的消息"""
+        raise NotImplementedError
+
+    def _open(self):
+        """打开广播套接字并开始定期广播；绑定发现端口以收到房间查询，端口无法绑定时只定期广播"""
+        engine = get_engine()
+        try:
+            self.broadcast_socket = open_discovery_socket(self.mode, self.broadcast_port)
+            self.endpoint = engine.open_endpoint(self.broadcast_socket, self._on_datagram, "房间广播")
+        except OSError as e:
+            print(f"无法监听房间查询 ({e})，只定期广播")
+            self.broadcast_socket = open_discovery_socket(self.mode)
+        self.running = True
+        self.broadcast_timer = engine.call_every(self.broadcast_interval, self._broadcast_once)
+
+    def _close(self):
         self.running = False
-        self.broadcast_thread: Optional[threading.Thread] = None
+
+        if self.broadcast_timer:
+            self.broadcast_timer.cancel()
+            self.broadcast_timer = None
+
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+
+        if self.broadcast_socket:
+            self.broadcast_socket.close()
+            self.broadcast_socket = None
+
+    def _on_datagram(self, data: bytes, addr: tuple):
+        """收到发现端口上的数据包：回复房间查询，忽略其他主机的广播"""
+        if not self.running:
+            return
+        try:
+            message = UDPMessage.from_bytes(data)
+        except ValueError:
+            return
+        if message.type != MessageType.ROOM_QUERY:
+            return
+        try:
+            for reply in self.build_messages():
+                self.broadcast_socket.sendto(reply.to_bytes(), addr)
+            self.queries_answered += 1
+        except OSError as e:
+            print(f"回复房间查询失败: {e}")
+
+    def _broadcast_once(self):
+        """广播定时器回调：发出一轮房间广播"""
+        if not self.running:
+            return
+        try:
+            target = discovery_address(self.mode, self.broadcast_port)
+            for message in self.build_messages():
+                self.broadcast_socket.sendto(message.to_bytes(), target)
+
+        except Exception as e:
+            # 广播失败（例如网络不支持广播）时停止定期广播，仍然回复查询
+            print(f"房间广播错误: {e}")
+            self.broadcast_timer.cancel()
+
+
+class RoomAdvertiser(_Advertiser):
+    """房间广播器"""
+    
+    def __init__(self, broadcast_port: int = 12345, broadcast_interval: float = 2.0,
+                 mode: str = DEFAULT_DISCOVERY_MODE):
+        super().__init__(broadcast_port, broadcast_interval, mode)
         
         # 房间信息
         self.room_name = ""
         self.current_players = 0
         self.max_players = 4
         self.game_mode = "pvp"
+        self.host_port: Optional[int] = None  # 游戏端口
     
     def start_advertising(self, room_name: str, current_players: int = 1, 
-                         max_players: int = 4, game_mode: str = "pvp"):
+                         max_players: int = 4, game_mode: str = "pvp", host_port: Optional[int] = None):
         """开始广播房间"""
         if self.running:
             return
@@ -172,15 +447,10 @@ class RoomAdvertiser:
         self.current_players = current_players
         self.max_players = max_players
         self.game_mode = game_mode
+        self.host_port = host_port
         
         try:
-            self.broadcast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.broadcast_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            
-            self.running = True
-            self.broadcast_thread = threading.Thread(target=self._broadcast_loop, daemon=True)
-            self.broadcast_thread.start()
-            
+            self._open()
             print(f"开始广播房间: {room_name}")
             
         except Exception as e:
@@ -189,41 +459,55 @@ class RoomAdvertiser:
     
     def stop_advertising(self):
         """停止广播房间"""
-        self.running = False
-        
-        if self.broadcast_socket:
-            self.broadcast_socket.close()
-            self.broadcast_socket = None
-            
-        if self.broadcast_thread:
-            self.broadcast_thread.join(timeout=2.0)
-            self.broadcast_thread = None
-            
+        self._close()
         print("房间广播已停止")
     
     def update_player_count(self, current_players: int):
         """更新玩家数量"""
         self.current_players = current_players
-    
-    def _broadcast_loop(self):
-        """广播主循环"""
-        while self.running:
-            try:
-                # 创建房间广播消息
-                message = MessageFactory.create_room_advertise(
-                    self.room_name, self.current_players, self.max_players, self.game_mode
-                )
-                
-                # 广播消息
-                self.broadcast_socket.sendto(
-                    message.to_bytes(), 
-                    ('<broadcast>', self.broadcast_port)
-                )
-                
-                # 等待下次广播
-                time.sleep(self.broadcast_interval)
-                
-            except Exception as e:
-                if self.running:  # 只在运行时报告错误
-                    print(f"房间广播错误: {e}")
-                    break
+
+    def build_messages(self) -> list:
+        """房间广播消息"""
+        return [MessageFactory.create_room_advertise(
+            self.room_name, self.current_players, self.max_players, self.game_mode, self.host_port
+        )]
+
+
+class MultiRoomAdvertiser(_Advertiser):
+    """多房间广播器：一个广播周期内发出服务器上所有房间的列表"""
+
+    ROOMS_PER_MESSAGE = 8  # 每个广播包最多携带的房间数，避免超过以太网MTU
+
+    def __init__(self, broadcast_port: int = 12345, broadcast_interval: float = 2.0,
+                 mode: str = DEFAULT_DISCOVERY_MODE):
+        super().__init__(broadcast_port, broadcast_interval, mode)
+        self.host_port = 12346
+        self.rooms_provider: Optional[Callable[[], list]] = None
+
+    def start_advertising(self, host_port: int, rooms_provider: Callable[[], list]):
+        """开始广播，rooms_provider每次广播时返回最新的房间列表"""
+        if self.running:
+            return
+
+        self.host_port = host_port
+        self.rooms_provider = rooms_provider
+
+        try:
+            self._open()
+            print(f"开始广播房间列表 (端口 {host_port})")
+
+        except Exception as e:
+            print(f"启动房间广播失败: {e}")
+            self.stop_advertising()
+
+    def stop_advertising(self):
+        """停止广播"""
+        self._close()
+
+    def build_messages(self) -> list:
+        """把房间列表按 ROOMS_PER_MESSAGE 分成若干广播消息"""
+        rooms = self.rooms_provider() if self.rooms_provider else []
+        return [
+            MessageFactory.create_room_list_advertise(rooms[i:i + self.ROOMS_PER_MESSAGE], self.host_port)
+            for i in range(0, len(rooms), self.ROOMS_PER_MESSAGE)
+        ]
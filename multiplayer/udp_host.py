@@ -5,61 +5,123 @@
 """
 
 import socket
-import threading
 import time
 import uuid
 from typing import Dict, Optional, Callable, Tuple, List
+from .net_engine import get_engine, Endpoint, Timer
+from .send_batch import SendBatch
+from .reliable import ReliableChannel, ReliableTimer, RELIABLE_TYPES, DISCONNECT_REPEATS
 from .udp_messages import UDPMessage, MessageType, MessageFactory
-from .udp_discovery import RoomAdvertiser
+from .state_codec import (CODEC_JSON, SUPPORTED_CODECS, negotiate_codec, state_hash, timestamp_ms,
+                          is_binary_payload, append_ack)
+from .snapshot_delta import SnapshotHistory, compute_delta
+from .udp_discovery import RoomAdvertiser, DEFAULT_DISCOVERY_MODE, open_game_socket
+from .telemetry import PeerTelemetry, TelemetryDumper
+from .input_commands import Command, unpack_commands, mask_controls
+from .send_policy import (LinkQuality, choose_rate_divisor, bullet_out_of_interest,
+                          INTEREST_RADIUS, CULL_HOLD_TIME)
+from entity_ids import EVENT_DESPAWN, KIND_BULLET
+
+CLIENT_TIMEOUT = 3.0          # 客户端心跳超时(秒)
+TIMEOUT_CHECK_SLACK = 0.01    # 超时检查比截止时间稍晚触发，确保已经超时
+STATE_HASH_INTERVAL = 10      # 每隔多少个tick在快照中附带状态哈希供客户端校验（0表示不附带）
+MAX_SPECTATORS = 8            # 直接连接主机的观众上限，更多观众通过观战中继（relay.py）连接
 
 
 class ClientInfo:
     """客户端信息类"""
 
-    def __init__(self, client_id: str, address: Tuple[str, int], player_name: str):
+    def __init__(self, client_id: str, address: Tuple[str, int], player_name: str,
+                 codec: str = CODEC_JSON, spectator: bool = False):
         self.client_id = client_id
         self.address = address
         self.player_name = player_name
         self.last_heartbeat = time.time()
         self.connected = True
+        # 观众只接收快照：不占玩家名额，不发送输入，不参与坦克选择
+        self.spectator = spectator
 
-        # 玩家输入状态
-        self.current_keys = set()
+        # 会话协商的游戏状态编码格式
+        self.codec = codec
+
+        # 客户端已确认的最新快照tick（增量快照的基准）
+        self.acked_tick: Optional[int] = None
+
+        # 玩家输入指令流
+        self.input_mask = 0      # 最新收到的指令位掩码
+        self.last_input_seq = 0  # 已收到的最新指令序号
+
+        # 批量发送时发给该客户端失败的次数
+        self.send_errors = 0
+
+        # 自适应发送频率：链路质量、降频倍数和下次可发送的时间
+        self.link = LinkQuality()
+        self.rate_divisor = 1
+        self.next_send_time = 0.0
+
+        # 发给该客户端的状态（兴趣过滤后）历史，作为增量基准；以及针对该客户端的过滤事件
+        self.sent_history = SnapshotHistory(capacity=32)
+        self.cull_events = SnapshotHistory(capacity=32)
+        self.culled_bullets: Dict[int, float] = {}  # 被过滤的子弹ID -> 开始过滤的时间
+
+        # 与该客户端之间的可靠控制通道
+        self.channel = ReliableChannel()
+
+        # 网络遥测：收发计数、客户端报告的往返时间
+        self.telemetry = PeerTelemetry()
 
     def update_heartbeat(self):
         """更新心跳时间"""
         self.last_heartbeat = time.time()
 
-    def is_timeout(self, timeout: float = 3.0) -> bool:
+    def is_timeout(self, timeout: float = CLIENT_TIMEOUT) -> bool:
         """检查是否超时"""
         return time.time() - self.last_heartbeat > timeout
 
-    def update_input(self, keys_pressed: List[str], keys_released: List[str]):
-        """更新输入状态"""
-        for key in keys_pressed:
-            self.current_keys.add(key)
-        for key in keys_released:
-            self.current_keys.discard(key)
+    def receive_commands(self, seq: int, masks: List[int]) -> List[Command]:
+        """收到一个输入数据包，返回其中尚未收到过的指令（按序号从旧到新）
+
+        数据包中的冗余副本补上之前丢失的包；整个数据包都是旧指令时返回空列表。
+        """
+        commands = [command for command in unpack_commands(seq, masks) if command[0] > self.last_input_seq]
+        if commands:
+            self.last_input_seq = commands[-1][0]
+            self.input_mask = commands[-1][1]
+        return commands
 
 
 class GameHost:
     """游戏主机类"""
 
-    def __init__(self, host_port: int = 12346, max_players: int = 4):
+    def __init__(self, host_port: int = 12346, max_players: int = 4, local_player: bool = True,
+                 max_spectators: int = MAX_SPECTATORS, discovery_mode: str = DEFAULT_DISCOVERY_MODE):
         self.host_port = host_port
         self.max_players = max_players
+        self.max_spectators = max_spectators
+        # 主机本身是否是玩家（专用服务器没有本地玩家）
+        self.local_player = local_player
+        # 本局使用的地图编号，随加入响应发给客户端
+        self.map_index: Optional[int] = None
+        # 套接字由多房间服务器共享时，停止时不关闭
+        self.shared_socket = False
 
         # 网络相关
         self.host_socket: Optional[socket.socket] = None
         self.running = False
-        self.network_thread: Optional[threading.Thread] = None
+        self.endpoint: Optional[Endpoint] = None  # 网络引擎上的收包端点
+        self.timeout_timer: Optional[Timer] = None
+        # 可靠控制通道的重传和单独确认（共享套接字时由服务器调用 service_reliable）
+        self.reliable_timer = ReliableTimer(self.service_reliable)
+        # 无法归属到客户端的解码失败数；遥测导出
+        self.decode_failures = 0
+        self.telemetry_dumper: Optional[TelemetryDumper] = None
 
         # 客户端管理
         self.clients: Dict[str, ClientInfo] = {}
         self.host_player_id = "host"
 
-        # 房间广播
-        self.room_advertiser = RoomAdvertiser()
+        # 房间广播（discovery_mode见 udp_discovery.py）
+        self.room_advertiser = RoomAdvertiser(mode=discovery_mode)
         self.room_name = ""
 
         # 回调函数
@@ -70,8 +132,29 @@ class GameHost:
 
         # 游戏状态广播
         self.game_state_callback: Optional[Callable] = None
-        self.broadcast_interval = 1.0 / 30.0  # 30Hz
+        self.broadcast_interval = 1.0 / 30.0  # 30Hz，各客户端发送频率的上限
         self.last_broadcast_time = 0
+        # 按客户端链路质量降低发送频率；远离客户端坦克的子弹不发送（None表示不过滤）
+        self.adaptive_rate = True
+        self.interest_radius: Optional[float] = INTEREST_RADIUS
+
+        # 批量发送：广播先入队，广播结束时冲刷；auto_flush为False时由多房间服务器每个tick统一冲刷
+        self.send_batch = SendBatch()
+        self.auto_flush = True
+
+        # 主机支持的游戏状态编码格式（按优先级）
+        self.supported_codecs = list(SUPPORTED_CODECS)
+
+        # 增量快照：tick计数与快照历史环
+        self.state_tick = 0
+        self.max_delta_age = 30  # 基准超过30个tick(约1秒)则发送完整快照
+        self.snapshot_history = SnapshotHistory(capacity=self.max_delta_age + 1)
+
+        # 实体生成/消失事件：尚未分配tick的事件，以及每个tick的事件历史
+        self.pending_events: List[list] = []
+        self.event_history = SnapshotHistory(capacity=self.max_delta_age + 1)
+        # 定期附带状态哈希，客户端发现还原结果不一致时丢弃该快照且不确认，之后收到完整快照重新同步
+        self.state_hash_interval = STATE_HASH_INTERVAL
 
     def set_callbacks(self, client_join: Callable = None, client_leave: Callable = None,
                      input_received: Callable = None, game_state: Callable = None):
@@ -97,21 +180,18 @@ class GameHost:
         self.room_name = room_name
 
         try:
-            # 创建UDP套接字
-            self.host_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.host_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.host_socket.bind(('', self.host_port))
-            self.host_socket.settimeout(0.1)  # 100ms超时
+            # 创建UDP套接字（按发现模式选择地址族）
+            self.host_socket = open_game_socket(self.room_advertiser.mode, self.host_port)
 
             self.running = True
 
-            # 启动网络处理线程
-            self.network_thread = threading.Thread(target=self._network_loop, daemon=True)
-            self.network_thread.start()
+            # 交给网络引擎收包，客户端超时按截止时间检查
+            self.endpoint = get_engine().open_endpoint(self.host_socket, self._handle_client_message, "游戏主机")
+            self.schedule_timeout_check()
 
             # 开始房间广播
             self.room_advertiser.start_advertising(
-                room_name, self.get_current_player_count(), self.max_players
+                room_name, self.get_current_player_count(), self.max_players, host_port=self.host_port
             )
 
             print(f"游戏主机已启动: {room_name} (端口 {self.host_port})")
@@ -122,6 +202,13 @@ class GameHost:
             self.stop_hosting()
             return False
 
+    def attach_socket(self, shared_socket: socket.socket, room_name: str):
+        """使用多房间服务器共享的套接字，收包和超时检查由服务器代为调用"""
+        self.host_socket = shared_socket
+        self.shared_socket = True
+        self.room_name = room_name
+        self.running = True
+
     def stop_hosting(self):
         """停止主机服务"""
         self.running = False
@@ -129,71 +216,225 @@ class GameHost:
         # 停止房间广播
         self.room_advertiser.stop_advertising()
 
-        # 通知所有客户端断开连接
+        # 通知所有客户端断开连接（之后无法重传，冗余发送几次）
         for client in self.clients.values():
-            self._send_to_client(client, MessageFactory.create_disconnect(
-                self.host_player_id, "host_shutdown"
-            ))
+            for _ in range(DISCONNECT_REPEATS):
+                self._send_to_client(client, MessageFactory.create_disconnect(
+                    self.host_player_id, "host_shutdown"
+                ))
 
         # 关闭网络
+        if self.timeout_timer:
+            self.timeout_timer.cancel()
+            self.timeout_timer = None
+        self.reliable_timer.cancel()
+        self.stop_telemetry_dump()
+
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+
         if self.host_socket:
-            self.host_socket.close()
+            if not self.shared_socket:
+                self.host_socket.close()
             self.host_socket = None
 
-        if self.network_thread:
-            self.network_thread.join(timeout=2.0)
-            self.network_thread = None
-
         self.clients.clear()
+        self.snapshot_history.clear()
+        self.event_history.clear()
+        self.pending_events = []
         print("游戏主机已停止")
 
     def get_current_player_count(self) -> int:
-        """获取当前玩家数量（包括主机）"""
-        return 1 + len([c for c in self.clients.values() if c.connected])
+        """获取当前玩家数量（包括作为玩家的主机，不包括观众）"""
+        local = 1 if self.local_player else 0
+        return local + len([c for c in self.clients.values() if c.connected and not c.spectator])
+
+    def get_spectator_count(self) -> int:
+        """获取当前观众数量"""
+        return len([c for c in self.clients.values() if c.connected and c.spectator])
 
     def get_connected_players(self) -> List[str]:
-        """获取所有连接的玩家ID"""
-        players = [self.host_player_id]
-        players.extend([c.client_id for c in self.clients.values() if c.connected])
+        """获取所有连接的玩家ID（不包括观众）"""
+        players = [self.host_player_id] if self.local_player else []
+        players.extend([c.client_id for c in self.clients.values() if c.connected and not c.spectator])
         return players
 
-    def broadcast_game_state(self, game_state_data: dict):
-        """广播游戏状态"""
-        current_time = time.time()
-        if current_time - self.last_broadcast_time < self.broadcast_interval:
-            return
+    def resync_clients(self):
+        """让所有客户端下一次收到完整快照（例如观战中继的上游漏掉了事件）"""
+        for client in self.clients.values():
+            client.acked_tick = None
 
-        message = MessageFactory.create_game_state(
-            game_state_data.get("tanks", []),
-            game_state_data.get("bullets", []),
-            game_state_data.get("round_info", {})
-        )
+    def broadcast_game_state(self, game_state_data: dict, force: bool = False) -> bool:
+        """广播游戏状态，返回本次是否分配了新的tick（间隔未到时只累积事件）
 
-        # 监控数据包大小
-        message_bytes = message.to_bytes()
-        message_size = len(message_bytes)
-        if message_size > 1400:  # 接近以太网MTU
-            print(f"⚠️ 警告: 游戏状态数据包过大 ({message_size} 字节)")
+        每次广播分配一个新的tick并记入快照历史。已确认过快照的客户端收到相对其
+        确认基准的增量，基准过旧或尚未确认的客户端收到完整快照。
+        game_state_data中的 "events" 会累积到下一个实际发出的tick；增量携带
+        基准之后所有tick的事件，客户端按事件tick去重。
+
+        每个客户端按自己的链路质量决定本tick是否发送（自适应频率），并只收到
+        兴趣范围内的子弹；发给客户端的状态记入该客户端自己的历史，作为增量基准。
+        观众没有自己的坦克，收到不经兴趣过滤的完整状态。
+
+        force: 跳过广播间隔限制，由调用方决定发送时机（例如观战中继按延迟释放快照）。
+        """
+        self.pending_events.extend(game_state_data.get("events", []))
+        current_time = time.time()
+        if not force and current_time - self.last_broadcast_time < self.broadcast_interval:
+            return False
+
+        self.state_tick += 1
+        tick = self.state_tick
+        current_state = {
+            "tanks": game_state_data.get("tanks", []),
+            "bullets": game_state_data.get("bullets", []),
+            "round_info": game_state_data.get("round_info", {})
+        }
+        self.snapshot_history.add(tick, current_state)
+        self.event_history.add(tick, [[tick, *event] for event in self.pending_events])
+        self.pending_events = []
+
+        # 相同基准只计算一次增量，相同(编码格式, 基准, 状态)只序列化一次
+        deltas: Dict[Tuple[int, int], dict] = {}
+        encoded: Dict[tuple, bytes] = {}
+        hashes: Dict[int, int] = {}
+        send_hash = self.state_hash_interval and tick % self.state_hash_interval == 0
+        host_time = timestamp_ms(current_time)
 
         # 发送给所有连接的客户端
-        for client in self.clients.values():
-            if client.connected:
-                try:
-                    self.host_socket.sendto(message_bytes, client.address)
-                except Exception as e:
-                    print(f"发送游戏状态给客户端失败: {e}")
+        for client in list(self.clients.values()):
+            if not client.connected:
+                continue
+            if self.adaptive_rate and current_time < client.next_send_time:
+                continue
+
+            client_state = self._client_view(client, current_state, tick, current_time)
+            client.sent_history.add(tick, client_state)
+
+            base_tick = client.acked_tick
+            baseline = None
+            if base_tick is not None and tick - base_tick <= self.max_delta_age:
+                baseline = client.sent_history.get(base_tick)
+            if baseline is None:
+                base_tick = None
+
+            # 针对该客户端的过滤事件无法与其他客户端共用序列化结果
+            first_event_tick = tick if base_tick is None else base_tick + 1
+            cull_events = []
+            for event_tick in range(first_event_tick, tick + 1):
+                cull_events.extend(client.cull_events.get(event_tick) or [])
+            cache_key = None if cull_events else (client.codec, base_tick, id(baseline), id(client_state))
+
+            message_bytes = encoded.get(cache_key) if cache_key else None
+            if message_bytes is None:
+                client_hash = None
+                if send_hash:
+                    if id(client_state) not in hashes:
+                        hashes[id(client_state)] = state_hash(client_state)
+                    client_hash = hashes[id(client_state)]
+                if baseline is None:
+                    message = MessageFactory.create_game_state(
+                        client_state["tanks"], client_state["bullets"],
+                        client_state["round_info"], tick,
+                        events=(self.event_history.get(tick) or []) + cull_events,
+                        state_hash=client_hash, host_time=host_time
+                    )
+                else:
+                    delta_key = (id(baseline), id(client_state))
+                    if delta_key not in deltas:
+                        deltas[delta_key] = compute_delta(baseline, client_state)
+                    events = []
+                    for event_tick in range(base_tick + 1, tick + 1):
+                        events.extend(self.event_history.get(event_tick) or [])
+                    message = MessageFactory.create_game_state_delta(
+                        tick, base_tick, deltas[delta_key], events=events + cull_events,
+                        state_hash=client_hash, host_time=host_time
+                    )
+                message_bytes = message.to_bytes(client.codec)
+                if cache_key:
+                    encoded[cache_key] = message_bytes
+
+                # 监控数据包大小
+                message_size = len(message_bytes)
+                if message_size > 1400:  # 接近以太网MTU
+                    print(f"⚠️ 警告: 游戏状态数据包过大 ({message_size} 字节, {client.codec})")
+            # 二进制快照在包尾捎带该客户端待发的可靠通道确认，序列化结果仍可共用
+            if is_binary_payload(message_bytes):
+                ack = client.channel.take_ack()
+                if ack is not None:
+                    message_bytes = append_ack(message_bytes, ack)
+            self.send_batch.add(message_bytes, client.address, client)
+            client.link.on_sent(tick, current_time)
+            # 留半个广播间隔的余量，避免帧时间抖动让合格的客户端错过一次发送
+            client.next_send_time = current_time + self.broadcast_interval * (client.rate_divisor - 0.5)
 
         self.last_broadcast_time = current_time
+        if self.auto_flush:
+            self.flush_sends()
+        return True
+
+    def _client_view(self, client: "ClientInfo", state: dict, tick: int, now: float) -> dict:
+        """按兴趣过滤该客户端的子弹，新过滤掉的子弹记为针对该客户端的消失事件"""
+        if self.interest_radius is None or client.spectator or not state["bullets"]:
+            client.culled_bullets.clear()
+            return state
+        tank = next((t for t in state["tanks"] if t.get("id") == client.client_id), None)
+        if tank is None:
+            client.culled_bullets.clear()
+            return state
+
+        previous = self.snapshot_history.get(tick - 1)
+        previous_pos = {b.get("id"): b.get("pos") for b in previous["bullets"]} if previous else {}
+        kept = []
+        new_events = []
+        for bullet in state["bullets"]:
+            bullet_id = bullet.get("id")
+            culled_since = client.culled_bullets.get(bullet_id)
+            if bullet_out_of_interest(tank["pos"], bullet["pos"], previous_pos.get(bullet_id), self.interest_radius):
+                if culled_since is None:
+                    client.culled_bullets[bullet_id] = now
+                    new_events.append([tick, EVENT_DESPAWN, KIND_BULLET, bullet_id])
+                continue
+            if culled_since is not None:
+                if now - culled_since < CULL_HOLD_TIME:
+                    continue
+                del client.culled_bullets[bullet_id]
+            kept.append(bullet)
+
+        # 已消失的子弹不再记录
+        if client.culled_bullets:
+            live = {b.get("id") for b in state["bullets"]}
+            for bullet_id in [b for b in client.culled_bullets if b not in live]:
+                del client.culled_bullets[bullet_id]
+        client.cull_events.add(tick, new_events)
+
+        if len(kept) == len(state["bullets"]):
+            return state
+        return {**state, "bullets": kept}
 
     def broadcast_message(self, message: UDPMessage):
-        """广播消息给所有连接的客户端"""
+        """广播消息给所有连接的客户端
+
+        控制消息走各客户端的可靠通道，序号按客户端分配，无法共用序列化结果。
+        观众只接收快照，不接收这些消息。
+        """
+        if message.type in RELIABLE_TYPES:
+            for client in list(self.clients.values()):
+                if client.connected and not client.spectator:
+                    self._send_to_client(client, message)
+            return
+
         message_bytes = message.to_bytes()
         for client in self.clients.values():
-            if client.connected:
-                try:
-                    self.host_socket.sendto(message_bytes, client.address)
-                except Exception as e:
-                    print(f"广播消息给客户端失败: {e}")
+            if client.connected and not client.spectator:
+                self.send_batch.add(message_bytes, client.address, client)
+        if self.auto_flush:
+            self.flush_sends()
+
+    def flush_sends(self) -> int:
+        """发出批次中排队的数据报"""
+        return self.send_batch.flush(self.host_socket)
 
     def send_to_client(self, client_id: str, message: UDPMessage):
         """发送消息给指定客户端"""
@@ -202,43 +443,128 @@ class GameHost:
             self._send_to_client(client, message)
 
     def get_client_input(self, client_id: str) -> set:
-        """获取客户端当前输入状态"""
+        """获取客户端当前按住的控制指令"""
         if client_id in self.clients:
-            return self.clients[client_id].current_keys.copy()
+            return mask_controls(self.clients[client_id].input_mask)
         return set()
 
-    def _network_loop(self):
-        """网络处理主循环"""
-        while self.running:
-            try:
-                # 接收消息 - 增加缓冲区大小
-                data, addr = self.host_socket.recvfrom(8192)  # 从1024增加到8192
-                self._handle_client_message(data, addr)
-
-            except socket.timeout:
-                # 超时是正常的，继续循环
-                pass
-            except Exception as e:
-                if self.running:
-                    print(f"网络处理错误: {e}")
-
-            # 检查客户端超时
-            self._check_client_timeouts()
-
-            # 更新房间广播的玩家数量
-            self.room_advertiser.update_player_count(self.get_current_player_count())
+    def get_network_stats(self) -> dict:
+        """每个客户端的网络统计：往返时间优先使用客户端报告的ping结果，丢包率来自快照确认"""
+        clients = {}
+        for client in list(self.clients.values()):
+            stats = client.telemetry.stats()
+            if stats["rtt_ms"] is None and client.link.rtt is not None:
+                stats["rtt_ms"] = round(client.link.rtt * 1000, 1)
+            stats["loss"] = round(client.link.loss_rate, 3)
+            stats["name"] = client.player_name
+            stats["rate_divisor"] = client.rate_divisor
+            stats["send_errors"] = client.send_errors
+            stats["spectator"] = client.spectator
+            clients[client.client_id] = stats
+        return {"clients": clients, "decode_failures": self.decode_failures}
+
+    def start_telemetry_dump(self, path: Optional[str] = None, interval: float = 1.0,
+                             callback: Optional[Callable[[dict], None]] = None):
+        """按固定间隔把网络统计以JSON行写入path和/或交给callback"""
+        self.stop_telemetry_dump()
+        self.telemetry_dumper = TelemetryDumper(self.get_network_stats, path, interval, callback)
+        self.telemetry_dumper.start()
+
+    def stop_telemetry_dump(self):
+        if self.telemetry_dumper:
+            self.telemetry_dumper.stop()
+            self.telemetry_dumper = None
+
+    def schedule_timeout_check(self):
+        """在最早的客户端心跳截止时间安排下一次超时检查"""
+        self.timeout_timer = get_engine().call_later(self.next_timeout_delay(), self._on_timeout_timer)
+
+    def next_timeout_delay(self) -> float:
+        """距离最早的客户端超时还有多少秒（没有客户端时为一个完整的超时周期）"""
+        deadlines = [client.last_heartbeat + CLIENT_TIMEOUT
+                     for client in self.clients.values() if client.connected]
+        if not deadlines:
+            return CLIENT_TIMEOUT
+        return max(0.0, min(deadlines) - time.time()) + TIMEOUT_CHECK_SLACK
+
+    def _on_timeout_timer(self):
+        if not self.running:
+            return
+        self._check_client_timeouts()
+        self.schedule_timeout_check()
+
+    def service_reliable(self):
+        """重传到期的可靠消息并发出到期的单独确认"""
+        now = time.time()
+        for client in list(self.clients.values()):
+            for data in client.channel.poll(now):
+                try:
+                    self.host_socket.sendto(data, client.address)
+                    client.telemetry.on_sent(len(data), now)
+                except (OSError, AttributeError):
+                    client.send_errors += 1
+        self._schedule_reliable()
+
+    def _schedule_reliable(self):
+        """按所有客户端通道的最早截止时间安排下一次 service_reliable"""
+        if self.shared_socket or not self.running:
+            return
+        deadlines = [d for d in (c.channel.next_deadline() for c in list(self.clients.values())) if d is not None]
+        if deadlines:
+            self.reliable_timer.schedule(min(deadlines), time.time())
 
     def _handle_client_message(self, data: bytes, addr: Tuple[str, int]):
         """处理客户端消息"""
         try:
             message = UDPMessage.from_bytes(data)
+        except ValueError:
+            # 忽略无效消息
+            self.record_decode_failure(addr)
+            return
+        self.handle_message(message, addr, len(data))
+
+    def record_decode_failure(self, addr: Tuple[str, int]):
+        """无法解析的数据包计入来源客户端的遥测"""
+        client = next((c for c in self.clients.values() if c.address == addr), None)
+        if client is not None:
+            client.telemetry.on_decode_failure()
+        else:
+            self.decode_failures += 1
+
+    def handle_message(self, message: UDPMessage, addr: Tuple[str, int], size: int = 0):
+        """处理已解析的客户端消息（多房间服务器解析后按房间分发到这里）
+
+        size 为数据包字节数，计入发送方的遥测。
+        已加入的客户端的消息先经过其可靠通道：处理捎带的确认，可靠消息去重并按序交付。
+        """
+        if message.type == MessageType.JOIN_REQUEST:
+            self._dispatch_message(message, addr)
+            return
+
+        client = self.clients.get(message.player_id)
+        if client is not None and size:
+            client.telemetry.on_received(size)
+        if client is None or (message.reliable_seq is None and message.ack is None):
+            self._dispatch_message(message, addr)
+            return
+
+        delivered = client.channel.receive(message, time.time())
+        for ready in delivered:
+            self._dispatch_message(ready, addr)
+        self._schedule_reliable()
 
+    def _dispatch_message(self, message: UDPMessage, addr: Tuple[str, int]):
+        """按消息类型分发"""
+        try:
             if message.type == MessageType.JOIN_REQUEST:
                 self._handle_join_request(message, addr)
 
             elif message.type == MessageType.PLAYER_INPUT:
                 self._handle_player_input(message, addr)
 
+            elif message.type == MessageType.STATE_ACK:
+                self._handle_state_ack(message, addr)
+
             elif message.type == MessageType.HEARTBEAT:
                 self._handle_heartbeat(message, addr)
 
@@ -256,27 +582,46 @@ class GameHost:
     def _handle_join_request(self, message: UDPMessage, addr: Tuple[str, int]):
         """处理加入请求"""
         player_name = message.data.get("player_name", "Unknown Player")
+        spectator = bool(message.data.get("spectator"))
 
-        # 检查是否已满员
-        if self.get_current_player_count() >= self.max_players:
-            response = MessageFactory.create_join_response(
-                False, reason="房间已满"
-            )
+        # 客户端在收到响应前会重发加入请求；同一地址已经加入时由可靠通道重传响应
+        if any(client.address == addr for client in self.clients.values()):
+            return
+
+        # 检查是否已满员（观众有单独的名额）
+        if spectator and self.get_spectator_count() >= self.max_spectators:
+            reason = "观战人数已满"
+        elif not spectator and self.get_current_player_count() >= self.max_players:
+            reason = "房间已满"
+        else:
+            reason = None
+        if reason:
+            response = MessageFactory.create_join_response(False, reason=reason)
             self._send_to_address(addr, response)
             return
 
         # 生成客户端ID
-        client_id = f"client_{uuid.uuid4().hex[:8]}"
+        client_id = f"{'spectator' if spectator else 'client'}_{uuid.uuid4().hex[:8]}"
+
+        # 协商游戏状态编码格式（旧客户端不携带codecs字段，回退到JSON）
+        codec = negotiate_codec(message.data.get("codecs"), self.supported_codecs)
 
         # 创建客户端信息
-        client_info = ClientInfo(client_id, addr, player_name)
+        client_info = ClientInfo(client_id, addr, player_name, codec, spectator)
         self.clients[client_id] = client_info
 
-        # 发送成功响应
-        response = MessageFactory.create_join_response(True, client_id)
-        self._send_to_address(addr, response)
+        # 发送成功响应（可靠通道的第一条消息）
+        response = MessageFactory.create_join_response(True, client_id, codec=codec,
+                                                       map_index=self.map_index)
+        self._send_to_client(client_info, response)
+
+        if spectator:
+            # 观众不参与游戏逻辑
+            print(f"观众 {player_name} ({client_id}) 开始观战 (状态编码: {codec})")
+            return
 
-        print(f"玩家 {player_name} ({client_id}) 加入游戏")
+        self.room_advertiser.update_player_count(self.get_current_player_count())
+        print(f"玩家 {player_name} ({client_id}) 加入游戏 (状态编码: {codec})")
 
         # 通知游戏逻辑
         if self.client_join_callback:
@@ -290,21 +635,53 @@ class GameHost:
 
         client = self.clients[client_id]
         client.update_heartbeat()
+        if client.spectator:
+            return
 
-        # 更新输入状态
-        keys_pressed = message.data.get("keys_pressed", [])
-        keys_released = message.data.get("keys_released", [])
-        client.update_input(keys_pressed, keys_released)
+        seq = message.data.get("seq")
+        masks = message.data.get("cmds")
+        if not isinstance(seq, int) or not isinstance(masks, list):
+            return
+        commands = client.receive_commands(seq, masks)
+        if not commands:
+            client.telemetry.on_out_of_order()
+            return
 
-        # 通知游戏逻辑
+        # 通知游戏逻辑：新指令由游戏逻辑按tick逐条应用
         if self.input_received_callback:
-            self.input_received_callback(client_id, keys_pressed, keys_released)
+            self.input_received_callback(client_id, commands)
 
-    def _handle_heartbeat(self, message: UDPMessage, addr: Tuple[str, int]):
-        """处理心跳"""
+    def _handle_state_ack(self, message: UDPMessage, addr: Tuple[str, int]):
+        """处理游戏状态确认"""
         client_id = message.player_id
-        if client_id in self.clients:
-            self.clients[client_id].update_heartbeat()
+        if client_id not in self.clients:
+            return
+
+        client = self.clients[client_id]
+        client.update_heartbeat()
+
+        tick = message.data.get("tick")
+        if isinstance(tick, int) and tick <= self.state_tick:
+            if client.acked_tick is None or tick > client.acked_tick:
+                client.acked_tick = tick
+            else:
+                client.telemetry.on_out_of_order()
+            client.link.on_ack(tick, time.time())
+            if self.adaptive_rate:
+                client.rate_divisor = choose_rate_divisor(client.link.rtt, client.link.loss_rate)
+
+    def _handle_heartbeat(self, message: UDPMessage, addr: Tuple[str, int]):
+        """处理心跳：回应ping，记录客户端报告的往返时间和抖动"""
+        client = self.clients.get(message.player_id)
+        if client is None:
+            return
+        client.update_heartbeat()
+        if "rtt" in message.data or "jit" in message.data:
+            client.telemetry.on_report(message.data.get("rtt"), message.data.get("jit"))
+        if "ping" in message.data:
+            self._send_to_client(client, MessageFactory.create_heartbeat(
+                self.host_player_id, pong=message.data["ping"]
+            ))
 
     def _handle_disconnect(self, message: UDPMessage, addr: Tuple[str, int]):
         """处理断开连接"""
@@ -319,7 +696,10 @@ class GameHost:
             return
 
         # 更新客户端心跳
-        self.clients[client_id].update_heartbeat()
+        client = self.clients[client_id]
+        client.update_heartbeat()
+        if client.spectator:
+            return
 
         # 调用坦克选择回调
         if self.tank_selection_callback:
@@ -341,6 +721,11 @@ class GameHost:
             client = self.clients[client_id]
             client.connected = False
 
+            if client.spectator:
+                print(f"观众 {client.player_name} ({client_id}) 离开: {reason}")
+                del self.clients[client_id]
+                return
+
             print(f"玩家 {client.player_name} ({client_id}) 离开游戏: {reason}")
 
             # 通知游戏逻辑
@@ -349,14 +734,21 @@ class GameHost:
 
             # 从列表中删除
             del self.clients[client_id]
+            self.room_advertiser.update_player_count(self.get_current_player_count())
 
     def _send_to_client(self, client: ClientInfo, message: UDPMessage):
-        """发送消息给客户端"""
+        """发送消息给客户端：控制消息走可靠通道，其他消息捎带待发的确认"""
         try:
-            message_bytes = message.to_bytes()
+            if message.type in RELIABLE_TYPES:
+                message_bytes = client.channel.prepare(message, time.time())
+            else:
+                client.channel.stamp(message)
+                message_bytes = message.to_bytes()
             self.host_socket.sendto(message_bytes, client.address)
+            client.telemetry.on_sent(len(message_bytes))
         except Exception as e:
             print(f"发送消息给客户端失败: {e}")
+        self._schedule_reliable()
 
     def _send_to_address(self, addr: Tuple[str, int], message: UDPMessage):
         """发送消息到指定地址"""
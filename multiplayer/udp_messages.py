@@ -8,17 +8,23 @@ import json
 import time
 from typing import Dict, Any, Optional
 from enum import Enum
+from .state_codec import (CODEC_JSON, CODEC_BINARY, SUPPORTED_CODECS,
+                          is_binary_payload, encode_game_state, decode_game_state, append_ack)
 
 
 class MessageType:
     """消息类型常量"""
     ROOM_ADVERTISE = "room_advertise"    # 房间广播
+    ROOM_LIST_ADVERTISE = "room_list_advertise"  # 多房间服务器的房间列表广播
+    ROOM_QUERY = "room_query"            # 房间查询，主机立即以单播回复房间广播
     JOIN_REQUEST = "join_request"        # 加入请求
     JOIN_RESPONSE = "join_response"      # 加入响应
     PLAYER_INPUT = "player_input"        # 玩家输入
     GAME_STATE = "game_state"           # 游戏状态
+    STATE_ACK = "state_ack"             # 游戏状态确认（增量快照基准）
     PLAYER_DISCONNECT = "disconnect"     # 玩家断线
     HEARTBEAT = "heartbeat"             # 心跳包
+    RELIABLE_ACK = "reliable_ack"       # 可靠控制通道的单独确认
     GAME_START = "game_start"           # 游戏开始
     GAME_END = "game_end"               # 游戏结束
 
@@ -38,27 +44,50 @@ class UDPMessage:
         self.data = data
         self.player_id = player_id
         self.timestamp = time.time()
+        self.reliable_seq: Optional[int] = None  # 可靠控制通道序号 (见 reliable.py)
+        self.ack: Optional[int] = None           # 捎带的可靠通道累计确认
+
+    def to_bytes(self, codec: str = CODEC_JSON) -> bytes:
+        """将消息转换为字节数据
+
+        codec 为会话协商得到的编码格式，目前只有GAME_STATE支持二进制编码，
+        其他消息类型始终使用JSON。
+        """
+        if codec == CODEC_BINARY and self.type == MessageType.GAME_STATE:
+            payload = encode_game_state(self.data)
+            return payload if self.ack is None else append_ack(payload, self.ack)
 
-    def to_bytes(self) -> bytes:
-        """将消息转换为字节数据"""
         msg_dict = {
             "type": self.type,
             "data": self.data,
             "player_id": self.player_id,
             "timestamp": self.timestamp
         }
+        if self.reliable_seq is not None:
+            msg_dict["rseq"] = self.reliable_seq
+        if self.ack is not None:
+            msg_dict["rack"] = self.ack
         return json.dumps(msg_dict).encode('utf-8')
 
     @classmethod
     def from_bytes(cls, data: bytes) -> 'UDPMessage':
         """从字节数据创建消息对象"""
+        if is_binary_payload(data):
+            state = decode_game_state(data)
+            message = cls(MessageType.GAME_STATE, state)
+            message.ack = state.pop("rack", None)
+            return message
+
         try:
             msg_dict = json.loads(data.decode('utf-8'))
-            return cls(
+            message = cls(
                 msg_dict["type"],
                 msg_dict["data"],
                 msg_dict.get("player_id")
             )
+            message.reliable_seq = msg_dict.get("rseq")
+            message.ack = msg_dict.get("rack")
+            return message
         except (json.JSONDecodeError, KeyError, UnicodeDecodeError) as e:
             raise ValueError(f"Invalid message format: {e}")
 
@@ -68,57 +97,126 @@ class MessageFactory:
 
     @staticmethod
     def create_room_advertise(room_name: str, current_players: int, max_players: int,
-                            game_mode: str = "pvp") -> UDPMessage:
-        """创建房间广播消息"""
+                            game_mode: str = "pvp", host_port: int = None) -> UDPMessage:
+        """创建房间广播消息（host_port为游戏端口，不携带时客户端使用默认端口）"""
         data = {
             "room_name": room_name,
             "current_players": current_players,
             "max_players": max_players,
             "game_mode": game_mode
         }
+        if host_port is not None:
+            data["host_port"] = host_port
         return UDPMessage(MessageType.ROOM_ADVERTISE, data)
 
     @staticmethod
-    def create_join_request(player_name: str) -> UDPMessage:
-        """创建加入房间请求"""
-        data = {"player_name": player_name}
+    def create_room_list_advertise(rooms: list, host_port: int) -> UDPMessage:
+        """创建房间列表广播消息（rooms中每项包含room_id、room_name、current_players、max_players、game_mode）"""
+        data = {
+            "rooms": rooms,
+            "host_port": host_port
+        }
+        return UDPMessage(MessageType.ROOM_LIST_ADVERTISE, data)
+
+    @staticmethod
+    def create_room_query() -> UDPMessage:
+        """创建房间查询消息（"谁在开房间？"）"""
+        return UDPMessage(MessageType.ROOM_QUERY, {})
+
+    @staticmethod
+    def create_join_request(player_name: str, codecs: list = None, room_id: int = None,
+                            spectator: bool = False) -> UDPMessage:
+        """创建加入房间请求（room_id用于多房间服务器，单房间主机不需要；spectator表示以观众身份加入）"""
+        data = {
+            "player_name": player_name,
+            "codecs": codecs if codecs is not None else list(SUPPORTED_CODECS)
+        }
+        if room_id is not None:
+            data["room_id"] = room_id
+        if spectator:
+            data["spectator"] = True
         return UDPMessage(MessageType.JOIN_REQUEST, data)
 
     @staticmethod
     def create_join_response(success: bool, player_id: str = None,
-                           reason: str = None) -> UDPMessage:
-        """创建加入房间响应"""
+                           reason: str = None, codec: str = CODEC_JSON,
+                           map_index: int = None) -> UDPMessage:
+        """创建加入房间响应（map_index为主机选择的地图编号）"""
         data = {
             "success": success,
             "player_id": player_id,
-            "reason": reason
+            "reason": reason,
+            "codec": codec
         }
+        if map_index is not None:
+            data["map"] = map_index
         return UDPMessage(MessageType.JOIN_RESPONSE, data)
 
     @staticmethod
-    def create_player_input(player_id: str, keys_pressed: list,
-                          keys_released: list = None) -> UDPMessage:
-        """创建玩家输入消息"""
-        data = {
-            "keys_pressed": keys_pressed,
-            "keys_released": keys_released or []
-        }
-        return UDPMessage(MessageType.PLAYER_INPUT, data, player_id)
+    def create_player_input(player_id: str, seq: int, commands: list) -> UDPMessage:
+        """创建玩家输入消息：最新指令序号seq和最近几条指令的位掩码（从旧到新，见 input_commands.py）"""
+        return UDPMessage(MessageType.PLAYER_INPUT, {"seq": seq, "cmds": commands}, player_id)
 
     @staticmethod
-    def create_game_state(tanks: list, bullets: list, round_info: dict) -> UDPMessage:
-        """创建游戏状态消息"""
+    def create_game_state(tanks: list, bullets: list, round_info: dict,
+                          tick: int = None, events: list = None, state_hash: int = None,
+                          host_time: int = None) -> UDPMessage:
+        """创建游戏状态消息（events: [tick, 事件, 实体类型, 实体ID] 列表，state_hash: 快照内容校验值，
+        host_time: 主机发送时间(毫秒时间戳)）"""
         data = {
             "tanks": tanks,
             "bullets": bullets,
             "round_info": round_info
         }
+        if tick is not None:
+            data["tick"] = tick
+        if events:
+            data["events"] = events
+        if state_hash is not None:
+            data["h"] = state_hash
+        if host_time is not None:
+            data["t"] = host_time
+        return UDPMessage(MessageType.GAME_STATE, data)
+
+    @staticmethod
+    def create_game_state_delta(tick: int, base_tick: int, delta: dict,
+                                events: list = None, state_hash: int = None,
+                                host_time: int = None) -> UDPMessage:
+        """创建增量游戏状态消息（相对客户端已确认的base_tick快照，state_hash为还原后完整状态的校验值）"""
+        data = dict(delta)
+        data["tick"] = tick
+        data["base"] = base_tick
+        if events:
+            data["events"] = events
+        if state_hash is not None:
+            data["h"] = state_hash
+        if host_time is not None:
+            data["t"] = host_time
         return UDPMessage(MessageType.GAME_STATE, data)
 
     @staticmethod
-    def create_heartbeat(player_id: str) -> UDPMessage:
-        """创建心跳消息"""
-        return UDPMessage(MessageType.HEARTBEAT, {}, player_id)
+    def create_state_ack(player_id: str, tick: int) -> UDPMessage:
+        """创建游戏状态确认消息"""
+        data = {"tick": tick}
+        return UDPMessage(MessageType.STATE_ACK, data, player_id)
+
+    @staticmethod
+    def create_heartbeat(player_id: str, ping: float = None, pong: float = None,
+                         rtt_ms: float = None, jitter_ms: float = None) -> UDPMessage:
+        """创建心跳消息
+
+        ping: 发送方时间戳，对方立即回一个带 pong 的心跳；rtt_ms / jitter_ms: 发送方测得的往返时间和抖动
+        """
+        data = {}
+        if ping is not None:
+            data["ping"] = ping
+        if pong is not None:
+            data["pong"] = pong
+        if rtt_ms is not None:
+            data["rtt"] = rtt_ms
+        if jitter_ms is not None:
+            data["jit"] = jitter_ms
+        return UDPMessage(MessageType.HEARTBEAT, data, player_id)
 
     @staticmethod
     def create_disconnect(player_id: str, reason: str = "user_quit") -> UDPMessage:
@@ -187,8 +285,8 @@ EXAMPLE_MESSAGES = {
         "type": "player_input",
         "player_id": "client_001",
         "data": {
-            "keys_pressed": ["W", "SPACE"],
-            "keys_released": ["A"]
+            "seq": 1207,
+            "cmds": [1, 1, 17, 5]
         },
         "timestamp": 1234567890.123
     },
@@ -0,0 +1,392 @@
+"""
+比赛录像：记录与回放
+
+录像不保存画面，只保存重现比赛所需的最少信息：比赛开始时的设置（地图、玩家、坦克类型），
+每个tick的输入变化，以及定期的关键帧（capture_state 保存的完整状态）。回放时用无界面的
+Simulation 按记录的输入重新推进，得到与原比赛相同的过程。
+
+文件格式（只追加，可边录边读）：
+
+    b"TKRP" + 版本号(u8)
+    记录: [类型 u8][起始tick u32][结束tick u32][长度 u32][zlib压缩的内容]
+
+- 头记录：比赛设置的JSON
+- 数据块记录：一个关键帧和随后最多 keyframe_interval 个tick的输入。
+  关键帧为 [长度 u32][状态JSON]，之后是tick记录：[与上一条记录的tick差 变长整数][标记 u8]，
+  标记为输入时跟 [事件数 变长整数] 和每个事件一个字节（槽位<<4 | 控制指令序号<<1 | 是否按下），
+  标记为步长时跟一个double（只在步长变化时记录）。没有输入的tick不写任何内容。
+
+数据块在写满或关闭录像时整块压缩写入，进程崩溃最多丢失最后一块；读取时忽略不完整的末尾记录。
+跳转时先还原目标tick之前最近的关键帧再重新推进，最多推进一个关键帧间隔，与录像长度无关。
+Pymunk body有无法保存的内部状态，录制和回放在每个关键帧处都把body换成新的（Simulation.refresh_bodies），
+因此从关键帧还原后的推进与原比赛完全一致。回放到每个关键帧时比对状态哈希，
+不一致（例如服务器在比赛之间重置了比分）时直接还原关键帧。
+本模块不依赖arcade。
+"""
+
+import bisect
+import json
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from simulation import Simulation
+from tank_controls import CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT, CONTROL_FIRE
+
+REPLAY_MAGIC = b"TKRP"
+REPLAY_VERSION = 1
+REPLAY_EXTENSION = ".tkrp"
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+MAX_KEPT_REPLAYS = 20        # 本地自动录像最多保留的文件数
+KEYFRAME_INTERVAL = 600      # 关键帧间隔(tick)，60Hz下10秒
+CHUNK_CACHE_SIZE = 2         # 回放时缓存的解压数据块数（当前块和刚跳转/进入的块）
+
+RECORD_HEADER = 0
+RECORD_CHUNK = 1
+
+TAG_INPUTS = 0
+TAG_DT = 1
+
+# 输入事件中控制指令的编号（只能在末尾追加，否则旧录像无法读取）
+REPLAY_CONTROLS = (CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT, CONTROL_FIRE)
+_CONTROL_INDEX = {control: index for index, control in enumerate(REPLAY_CONTROLS)}
+
+_FILE_HEADER = struct.Struct("<4sB")
+_RECORD_HEADER = struct.Struct("<BIII")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+
+class ReplayFormatError(Exception):
+    """录像文件格式错误"""
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def default_replay_path(directory: str = REPLAY_DIR) -> str:
+    """按当前时间生成录像文件路径"""
+    return os.path.join(directory, time.strftime("match-%Y%m%d-%H%M%S") + REPLAY_EXTENSION)
+
+
+def list_replays(directory: str = REPLAY_DIR) -> List[str]:
+    """目录中的录像文件，按修改时间从旧到新排列"""
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(REPLAY_EXTENSION)]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def prune_replays(directory: str = REPLAY_DIR, keep: int = MAX_KEPT_REPLAYS):
+    """只保留最新的 keep 个录像文件"""
+    for path in list_replays(directory)[:-keep] if keep > 0 else list_replays(directory):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MatchRecorder:
+    """挂在 Simulation.on_step 上的录像器，录像从挂上时的状态开始"""
+
+    def __init__(self, simulation: Simulation, path: str, keyframe_interval: int = KEYFRAME_INTERVAL):
+        if keyframe_interval < 1:
+            raise ValueError("关键帧间隔至少为1个tick")
+        self.simulation = simulation
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.bytes_written = 0
+        self.ticks_recorded = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "wb")
+        self._write(_FILE_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION))
+        header = {
+            "mode": simulation.mode,
+            "player_ids": list(simulation.player_ids),
+            "tank_types": list(simulation.tank_types),
+            "map_layout": [list(wall) for wall in simulation.map_layout],
+            "max_score": simulation.max_score,
+            "seed": simulation.seed,
+            "keyframe_interval": keyframe_interval,
+        }
+        self._write_record(RECORD_HEADER, simulation.tick, simulation.tick, json.dumps(header).encode("utf-8"))
+
+        self._chunk: Optional[bytearray] = None
+        self._chunk_start = 0
+        self._last_tick = 0
+        self._last_dt: Optional[float] = None
+        self._force_keyframe = False
+        self._previous_on_step = simulation.on_step
+        simulation.on_step = self._on_step
+
+    def keyframe_next(self):
+        """下一步之前强制写关键帧（模拟在 step 之外被改变时调用，例如 reset_match 之后）"""
+        self._force_keyframe = True
+
+    def _on_step(self, tick: int, dt: float, inputs):
+        if self._previous_on_step:
+            self._previous_on_step(tick, dt, inputs)
+        if self._chunk is None or self._force_keyframe or tick - 1 - self._chunk_start >= self.keyframe_interval:
+            self._start_chunk()
+
+        if dt != self._last_dt:
+            self._chunk_tick(tick)
+            self._chunk.append(TAG_DT)
+            self._chunk += _F64.pack(dt)
+            self._last_dt = dt
+
+        events = bytearray()
+        for player_id, player_events in (inputs or {}).items():
+            slot = self.simulation.slot_of.get(player_id)
+            if slot is None:
+                continue  # 没有坦克的玩家的输入不影响模拟
+            for control, pressed in player_events:
+                index = _CONTROL_INDEX.get(control)
+                if index is not None:
+                    events.append(slot << 4 | index << 1 | int(bool(pressed)))
+        if events:
+            self._chunk_tick(tick)
+            self._chunk.append(TAG_INPUTS)
+            _write_varint(self._chunk, len(events))
+            self._chunk += events
+        self.ticks_recorded += 1
+
+    def _chunk_tick(self, tick: int):
+        _write_varint(self._chunk, tick - self._last_tick)
+        self._last_tick = tick
+
+    def _start_chunk(self):
+        """写出当前数据块，以当前状态为关键帧开始新块"""
+        self._flush_chunk()
+        self.simulation.refresh_bodies()  # 回放从关键帧还原时也是新的body
+        state = self.simulation.capture_state()
+        state["hash"] = self.simulation.state_hash()
+        keyframe = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        self._chunk = bytearray(_U32.pack(len(keyframe)) + keyframe)
+        self._chunk_start = self._last_tick = self.simulation.tick
+        self._last_dt = None  # 每块独立可读，块内第一步总是记录步长
+        self._force_keyframe = False
+
+    def _flush_chunk(self):
+        if self._chunk is None:
+            return
+        self._write_record(RECORD_CHUNK, self._chunk_start, self.simulation.tick, bytes(self._chunk))
+        self.file.flush()
+        self._chunk = None
+
+    def _write_record(self, kind: int, start_tick: int, end_tick: int, payload: bytes):
+        compressed = zlib.compress(payload, 9)
+        self._write(_RECORD_HEADER.pack(kind, start_tick, end_tick, len(compressed)) + compressed)
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        """写出最后一块并关闭文件（可重复调用），没有录到任何tick时删除文件"""
+        if self.file.closed:
+            return
+        self._flush_chunk()
+        self.file.close()
+        if self.simulation.on_step == self._on_step:
+            self.simulation.on_step = self._previous_on_step
+        if self.ticks_recorded == 0:
+            os.remove(self.path)
+
+
+class ReplayChunk:
+    """解码后的数据块：关键帧和按tick排列的记录"""
+
+    def __init__(self, start_tick: int, end_tick: int, payload: bytes):
+        self.start_tick = start_tick
+        self.end_tick = end_tick
+        (length,) = _U32.unpack_from(payload, 0)
+        self.keyframe = json.loads(payload[4:4 + length].decode("utf-8"))
+        self.state_hash = self.keyframe.pop("hash")
+        self.steps: Dict[int, Tuple[Optional[float], List[Tuple[int, str, bool]]]] = {}
+
+        offset = 4 + length
+        tick = start_tick
+        while offset < len(payload):
+            delta, offset = _read_varint(payload, offset)
+            tick += delta
+            tag = payload[offset]
+            offset += 1
+            dt, events = self.steps.get(tick, (None, []))
+            if tag == TAG_DT:
+                (dt,) = _F64.unpack_from(payload, offset)
+                offset += _F64.size
+            elif tag == TAG_INPUTS:
+                count, offset = _read_varint(payload, offset)
+                for byte in payload[offset:offset + count]:
+                    events.append((byte >> 4, REPLAY_CONTROLS[(byte >> 1) & 0x7], bool(byte & 1)))
+                offset += count
+            else:
+                raise ReplayFormatError(f"未知的tick记录标记: {tag}")
+            self.steps[tick] = (dt, events)
+
+
+class ReplayReader:
+    """读取录像文件：解析头记录并建立数据块索引（只读记录头，数据块在用到时才解压）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _FILE_HEADER.size:
+            raise ReplayFormatError("文件太短，不是录像文件")
+        magic, version = _FILE_HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC:
+            raise ReplayFormatError("不是录像文件")
+        if version != REPLAY_VERSION:
+            raise ReplayFormatError(f"不支持的录像版本: {version}")
+
+        self.header: Optional[dict] = None
+        self._chunks: List[Tuple[int, int, bytes]] = []  # (起始tick, 结束tick, 压缩内容)
+        offset = _FILE_HEADER.size
+        while offset + _RECORD_HEADER.size <= len(data):
+            kind, start_tick, end_tick, length = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+            if offset + length > len(data):
+                break  # 录制中或异常结束的文件，忽略不完整的末尾记录
+            payload = data[offset:offset + length]
+            offset += length
+            if kind == RECORD_HEADER:
+                self.header = json.loads(zlib.decompress(payload).decode("utf-8"))
+            elif kind == RECORD_CHUNK:
+                self._chunks.append((start_tick, end_tick, payload))
+        if self.header is None or not self._chunks:
+            raise ReplayFormatError("录像中没有可回放的内容")
+        self.chunk_starts = [start for start, _, _ in self._chunks]
+        self._cache: "OrderedDict[int, ReplayChunk]" = OrderedDict()  # 最近使用的数据块在末尾
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._chunks)
+
+    @property
+    def start_tick(self) -> int:
+        return self._chunks[0][0]
+
+    @property
+    def end_tick(self) -> int:
+        return self._chunks[-1][1]
+
+    def chunk_index_for(self, tick: int) -> int:
+        """包含tick的数据块（tick早于录像开始时返回第一块）"""
+        return max(0, bisect.bisect_right(self.chunk_starts, tick) - 1)
+
+    def chunk(self, index: int) -> ReplayChunk:
+        chunk = self._cache.get(index)
+        if chunk is not None:
+            self._cache.move_to_end(index)
+            return chunk
+        start_tick, end_tick, payload = self._chunks[index]
+        chunk = ReplayChunk(start_tick, end_tick, zlib.decompress(payload))
+        self._cache[index] = chunk
+        # 只缓存最近用到的几块，回放长录像时内存不随长度增长
+        while len(self._cache) > CHUNK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return chunk
+
+
+class ReplayPlayer:
+    """按录像重新推进模拟，支持跳转到任意tick"""
+
+    def __init__(self, reader: ReplayReader, **simulation_kwargs):
+        """simulation_kwargs 传给 Simulation（例如回放界面的 tank_factory、on_spawn 等回调）"""
+        self.reader = reader
+        header = reader.header
+        # 空槽位也需要一个ID，输入按槽位映射到玩家
+        player_ids = [pid if pid is not None else f"slot{slot + 1}" for slot, pid in enumerate(header["player_ids"])]
+        self.simulation = Simulation(
+            mode=header["mode"],
+            player_ids=player_ids,
+            map_layout=[tuple(wall) for wall in header["map_layout"]],
+            tank_types=header["tank_types"],
+            max_score=header["max_score"],
+            seed=header["seed"],
+            **simulation_kwargs
+        )
+        self.resyncs = 0  # 回放到关键帧时状态不一致而直接还原的次数
+        self.chunk_index = 0
+        self.dt: Optional[float] = None
+        self._restore_chunk(0)
+
+    @property
+    def tick(self) -> int:
+        return self.simulation.tick
+
+    @property
+    def finished(self) -> bool:
+        return self.tick >= self.reader.end_tick
+
+    def _restore_chunk(self, index: int):
+        chunk = self.reader.chunk(index)
+        self.simulation.restore_state(chunk.keyframe)
+        self.chunk_index = index
+        self.dt = None
+
+    def seek(self, tick: int):
+        """跳转到tick：还原之前最近的关键帧，再推进到目标tick"""
+        tick = max(self.reader.start_tick, min(tick, self.reader.end_tick))
+        index = self.reader.chunk_index_for(tick)
+        # 只用块索引判断能否从当前位置继续推进，不为判断而解压数据块
+        if not (index == self.chunk_index and self.reader.chunk_starts[index] <= self.tick <= tick):
+            self._restore_chunk(index)
+        while self.tick < tick:
+            self.step()
+
+    def advance(self, steps: int) -> int:
+        """向前推进最多steps个tick，返回实际推进的数量（录像结束后为0）"""
+        done = 0
+        while done < steps and not self.finished:
+            self.step()
+            done += 1
+        return done
+
+    def step(self):
+        chunk = self.reader.chunk(self.chunk_index)
+        if self.tick >= chunk.end_tick and self.chunk_index + 1 < self.reader.chunk_count:
+            self._enter_next_chunk()
+            chunk = self.reader.chunk(self.chunk_index)
+        next_tick = self.tick + 1
+        dt, events = chunk.steps.get(next_tick, (None, ()))
+        if dt is not None:
+            self.dt = dt
+        inputs = {}
+        for slot, control, pressed in events:
+            inputs.setdefault(self.simulation.player_ids[slot], []).append((control, pressed))
+        self.simulation.step(self.dt, inputs)
+
+    def _enter_next_chunk(self):
+        """进入下一块：状态与关键帧一致时继续推进，否则还原关键帧"""
+        index = self.chunk_index + 1
+        chunk = self.reader.chunk(index)
+        if self.tick != chunk.start_tick or self.simulation.state_hash() != chunk.state_hash:
+            self.resyncs += 1
+            self._restore_chunk(index)
+        else:
+            self.simulation.refresh_bodies()  # 与录制时在关键帧处的处理一致
+            self.chunk_index = index
@@ -0,0 +1,103 @@
+"""
+录像回放视图
+
+复用GameView的渲染，但不接受玩家输入：模拟由 ReplayPlayer 按录像中的输入推进。
+1/2/3 切换 1x/4x/16x 速度，空格暂停，左右方向键后退/前进5秒，Esc 返回模式选择。
+"""
+
+import arcade
+
+from game_views import GameView
+from fixed_timestep import FixedTimestep, MAX_STEPS_PER_FRAME, FIXED_STEP
+from replay import ReplayReader, ReplayPlayer
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, TOP_UI_PANEL_HEIGHT
+from tank_sprites import TANK_IMAGE_PATHS_BY_TYPE
+
+REPLAY_SPEEDS = {
+    arcade.key.KEY_1: 1,
+    arcade.key.KEY_2: 4,
+    arcade.key.KEY_3: 16,
+}
+SEEK_TICKS = 300  # 左右方向键每次跳转的tick数（60Hz下5秒）
+
+
+def format_ticks(ticks):
+    """tick数 -> mm:ss"""
+    seconds = int(ticks * FIXED_STEP)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ReplayView(GameView):
+    """ 录像回放视图 """
+    def __init__(self, replay_path):
+        self.reader = ReplayReader(replay_path)
+        header = self.reader.header
+        super().__init__(
+            mode=header["mode"],
+            tank_images=[TANK_IMAGE_PATHS_BY_TYPE.get(tank_type) for tank_type in header["tank_types"]],
+            player_ids=[pid if pid is not None else f"slot{slot + 1}" for slot, pid in enumerate(header["player_ids"])],
+        )
+        self.replay_path = replay_path
+        self.record_replay = False
+        self.player = None
+        self.speed = 1
+        self.paused = False
+        # 16倍速时每帧需要推进16步
+        self.timestep = FixedTimestep(max_steps=MAX_STEPS_PER_FRAME * max(REPLAY_SPEEDS.values()))
+
+    def _create_simulation(self):
+        self.player = ReplayPlayer(
+            self.reader,
+            tank_factory=self._create_tank_sprite,
+            bullet_factory=self._create_bullet_sprite,
+            on_spawn=self._on_entity_spawn,
+            on_despawn=self._on_entity_despawn,
+        )
+        return self.player.simulation
+
+    def on_update(self, delta_time):
+        """按回放速度推进录像，播放完后停在最后一帧"""
+        if self.paused or self.player.finished:
+            return
+        steps = self.timestep.advance(delta_time * self.speed)
+        for _ in range(steps):
+            if self.player.finished:
+                break
+            self.interpolator.capture(self._moving_sprites())
+            self.player.step()
+
+    def seek(self, tick):
+        """跳转到tick，跳转后不插值"""
+        self.player.seek(tick)
+        self.timestep.reset()
+        self.interpolator.clear()
+
+    def on_draw(self):
+        super().on_draw()
+        # 顶部中间显示回放进度和操作说明
+        start, end = self.reader.start_tick, self.reader.end_tick
+        progress = (self.player.tick - start) / max(1, end - start)
+        state = "暂停" if self.paused else ("结束" if self.player.finished else f"{self.speed}x")
+        arcade.draw_text(f"回放 {state}  {format_ticks(self.player.tick - start)} / {format_ticks(end - start)}"
+                         "   1/2/3: 速度  空格: 暂停  ←/→: 跳转",
+                         SCREEN_WIDTH / 2, SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT / 2,
+                         arcade.color.BLACK, font_size=14, anchor_x="center", anchor_y="center")
+        bar_top = SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT
+        arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH * progress, bar_top - 3, bar_top, arcade.color.DARK_BLUE)
+
+    def on_key_press(self, key, modifiers):
+        """ 回放控制按键，不转换为玩家输入 """
+        if key == arcade.key.ESCAPE:
+            from game_views import ModeSelectView
+            self.window.show_view(ModeSelectView())
+        elif key in REPLAY_SPEEDS:
+            self.speed = REPLAY_SPEEDS[key]
+        elif key == arcade.key.SPACE:
+            self.paused = not self.paused
+        elif key == arcade.key.LEFT:
+            self.seek(self.player.tick - SEEK_TICKS)
+        elif key == arcade.key.RIGHT:
+            self.seek(self.player.tick + SEEK_TICKS)
+
+    def on_key_release(self, key, modifiers):
+        pass
@@ -0,0 +1,638 @@
+"""
+无界面的权威游戏模拟
+
+Simulation 持有 Pymunk 物理空间、坦克、子弹、比分和回合状态，
+通过 step(dt, inputs) 推进，不依赖 arcade。GameView 和网络主机只是它的渲染层；
+专用服务器、机器人和基准测试可以在没有窗口的 Linux 机器上直接运行它。
+
+坦克和子弹按"鸭子类型"使用：只要有 pymunk_body / pymunk_shape / health 等属性即可。
+无界面时使用本模块的 SimTank / SimBullet，GameView 通过 tank_factory 传入 arcade 精灵。
+
+传入 seed 时进入确定性模式：地图由带种子的随机数生成器选择，每一步固定为 MAX_STEP，
+每步记录一次状态哈希。相同种子和相同输入序列的两次运行得到完全相同的哈希序列，
+可用于比对两端模拟是否一致和复现录像。
+
+capture_state() / restore_state() 把完整的权威状态保存为普通dict并还原，
+录像的关键帧和跳转使用它们；on_step(tick, dt, inputs) 在每步应用输入之前调用，录像器借此记录输入。
+"""
+
+import math
+import random
+import struct
+import zlib
+from collections import deque
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pymunk
+
+from entity_ids import EntityIdAllocator, KIND_TANK, KIND_BULLET
+from maps import get_random_map_layout, get_spawn_points
+from tank_controls import CONTROL_FIRE, apply_control_press, apply_control_release
+
+# --- 场地常量（与 game_views.py 的界面布局一致） ---
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+TOP_UI_PANEL_HEIGHT = 30
+BOTTOM_UI_PANEL_HEIGHT = 60
+GAME_AREA_BOTTOM_Y = BOTTOM_UI_PANEL_HEIGHT
+GAME_AREA_TOP_Y = SCREEN_HEIGHT - TOP_UI_PANEL_HEIGHT
+GAME_AREA_HEIGHT = GAME_AREA_TOP_Y - GAME_AREA_BOTTOM_Y
+WALL_THICKNESS = 10
+WALL_ELASTICITY = 0.7
+
+# Pymunk碰撞类型常量
+COLLISION_TYPE_BULLET = 1
+COLLISION_TYPE_WALL = 2
+COLLISION_TYPE_TANK = 3
+
+# 坦克与子弹参数
+TANK_MASS = 10
+TANK_MAX_HEALTH = 5
+TANK_SHOT_COOLDOWN = 0.4
+BULLET_RADIUS = 4
+BULLET_SPEED_MAGNITUDE = 16
+BULLET_MASS = 0.001
+BULLET_MAX_BOUNCES = 3
+BULLET_BARREL_OFFSET = 25 * 0.8  # 与 tank_sprites.PLAYER_SCALE 一致
+
+# 各类型坦克图片按0.08缩放后的尺寸 (宽, 高)，无界面时代替纹理尺寸
+TANK_TYPE_SIZES = {
+    "green": (34.56, 86.48),
+    "yellow": (34.16, 81.92),
+    "blue": (33.84, 84.56),
+    "grey": (34.0, 86.72),
+}
+
+# 规则参数
+MAX_PLAYERS = 8             # 一局比赛最多的玩家（坦克）数
+MAX_SCORE = 2               # 获胜需要的胜场数
+ROUND_OVER_DELAY = 2.0      # 回合结束后等待时间(秒)
+MAX_STEP = 1.0 / 60.0       # 单次物理步长上限（确定性模式下的固定步长）
+STATE_HASH_HISTORY = 600    # 确定性模式下保留的状态哈希条数（60Hz下10秒）
+
+# 每个玩家一辆坦克的对战模式（其他模式只有玩家1的坦克）
+VERSUS_MODES = ("pvp", "network_host", "network_client")
+
+
+def create_tank_physics(width: float, height: float, x: float, y: float,
+                        angle_degrees: float = 0) -> Tuple[pymunk.Body, pymunk.Poly]:
+    """创建坦克的Pymunk body和形状（width/height为缩放后的图片尺寸）"""
+    # Pymunk形状的局部X轴对应视觉高度，局部Y轴对应视觉宽度
+    half_x = height / 2
+    half_y = width / 2
+    vertices = [(-half_x, -half_y), (half_x, -half_y), (half_x, half_y), (-half_x, half_y)]
+    body = pymunk.Body(TANK_MASS, pymunk.moment_for_poly(TANK_MASS, vertices))
+    body.position = x, y
+    # 将Arcade的0度（向上）转换为Pymunk的math.pi/2（向上）
+    body.angle = math.radians(90 - angle_degrees)
+    body.linear_velocity_threshold = 0.1  # 启用连续碰撞检测，防止高速穿模
+
+    shape = pymunk.Poly(body, vertices)
+    shape.elasticity = 0.0  # 碰撞后立即停止，无反弹
+    shape.friction = 1
+    shape.collision_type = COLLISION_TYPE_TANK
+    shape.collision_bias = 0.01
+    body.damping = 1
+    body.angular_damping = 1
+    return body, shape
+
+
+def create_bullet_physics(radius: float, tank_x: float, tank_y: float, emission_angle_degrees: float,
+                          speed_magnitude: float,
+                          barrel_offset: float = BULLET_BARREL_OFFSET) -> Tuple[pymunk.Body, pymunk.Circle]:
+    """创建子弹的Pymunk body和形状，子弹从炮管位置沿发射角度飞出"""
+    body = pymunk.Body(BULLET_MASS, pymunk.moment_for_circle(BULLET_MASS, 0, radius, (0, 0)))
+    body.linear_velocity_threshold = 0.1  # 启用连续碰撞检测
+
+    emission_angle_rad = math.radians(emission_angle_degrees)
+    body.position = (
+        tank_x - barrel_offset * math.sin(emission_angle_rad),
+        tank_y + barrel_offset * math.cos(emission_angle_rad)
+    )
+    body.angle = emission_angle_rad
+
+    speed = speed_magnitude * 60
+    body.velocity = (-speed * math.sin(body.angle), speed * math.cos(body.angle))
+    body.damping = 1.0
+
+    shape = pymunk.Circle(body, radius, (0, 0))
+    shape.friction = 0.1
+    shape.elasticity = 1
+    shape.collision_type = COLLISION_TYPE_BULLET
+    return body, shape
+
+
+def tank_type_from_image(image_file: Optional[str]) -> str:
+    """根据坦克图片路径推断网络快照中的坦克类型"""
+    path = (image_file or "").lower()
+    if 'desert' in path or 'yellow' in path:
+        return "yellow"
+    if 'blue' in path:
+        return "blue"
+    if 'grey' in path:
+        return "grey"
+    return "green"
+
+
+class SimTank:
+    """无界面坦克"""
+
+    def __init__(self, center_x: float, center_y: float, tank_type: str = "green"):
+        self.tank_type = tank_type
+        self.center_x = center_x
+        self.center_y = center_y
+        self.angle = 0
+        self.health = TANK_MAX_HEALTH
+        self.max_health = TANK_MAX_HEALTH
+        self.player_id = None
+        self.entity_id = None
+        self.last_shot_time = -1.0
+        self.shot_cooldown = TANK_SHOT_COOLDOWN
+
+        width, height = TANK_TYPE_SIZES.get(tank_type, TANK_TYPE_SIZES["green"])
+        self.pymunk_body, self.pymunk_shape = create_tank_physics(width, height, center_x, center_y)
+        self.pymunk_body.sprite = self
+
+    def take_damage(self, amount):
+        self.health = max(0, self.health - amount)
+
+    def is_alive(self):
+        return self.health > 0
+
+    def sync_with_pymunk_body(self):
+        self.center_x = self.pymunk_body.position.x
+        self.center_y = self.pymunk_body.position.y
+        self.angle = 90 - math.degrees(self.pymunk_body.angle)
+
+    def shoot(self, current_time):
+        if current_time - self.last_shot_time < self.shot_cooldown:
+            return None
+        self.last_shot_time = current_time
+        return SimBullet(self, self.center_x, self.center_y, -self.angle)
+
+
+class SimBullet:
+    """无界面子弹"""
+
+    def __init__(self, owner, tank_center_x, tank_center_y, emission_angle_degrees,
+                 radius=BULLET_RADIUS, speed_magnitude=BULLET_SPEED_MAGNITUDE):
+        self.owner = owner
+        self.radius = radius
+        self.entity_id = None
+        self.bounce_count = 0
+        self.max_bounces = BULLET_MAX_BOUNCES
+        self.width = self.height = radius * 2
+        self.pymunk_body, self.pymunk_shape = create_bullet_physics(
+            radius, tank_center_x, tank_center_y, emission_angle_degrees, speed_magnitude)
+        self.pymunk_body.sprite = self
+        self.sync_with_pymunk_body()
+
+    def sync_with_pymunk_body(self):
+        self.center_x = self.pymunk_body.position.x
+        self.center_y = self.pymunk_body.position.y
+        self.angle = math.degrees(self.pymunk_body.angle)
+
+
+class Simulation:
+    """权威游戏模拟：物理、碰撞、比分和回合逻辑"""
+
+    def __init__(self, mode: str = "pvp", player_ids: Iterable[str] = ("player1", "player2"),
+                 map_layout: Optional[List[tuple]] = None,
+                 tank_factory: Optional[Callable] = None,
+                 tank_types: Iterable[str] = ("green", "yellow"),
+                 on_spawn: Optional[Callable] = None, on_despawn: Optional[Callable] = None,
+                 max_score: int = MAX_SCORE, seed: Optional[int] = None,
+                 bullet_factory: Optional[Callable] = None, on_step: Optional[Callable] = None):
+        self.mode = mode
+        self.seed = seed
+        self.deterministic = seed is not None
+        self.rng = random.Random(seed)  # 模拟内所有随机选择都使用它，不使用全局random
+        self.player_ids = list(player_ids)
+        if len(self.player_ids) > MAX_PLAYERS:
+            raise ValueError(f"一局比赛最多 {MAX_PLAYERS} 名玩家")
+        # 玩家ID -> 槽位，坦克、比分和出生点都按槽位存放
+        self.slot_of: Dict[str, int] = {pid: slot for slot, pid in enumerate(self.player_ids) if pid is not None}
+        self.tank_types = list(tank_types)
+        self.tank_factory = tank_factory or self._create_sim_tank
+        # 还原状态时重建子弹：bullet_factory(owner, x, y, 发射角度)，不经过 tank.shoot（不播放音效）
+        self.bullet_factory = bullet_factory or SimBullet
+        self.on_spawn = on_spawn      # on_spawn(kind, entity)
+        self.on_despawn = on_despawn  # on_despawn(kind, entity)
+        self.on_step = on_step        # on_step(tick, dt, inputs)，在推进第tick步之前调用
+
+        self.space = pymunk.Space()
+        self.space.gravity = (0, 0)
+        self.space.damping = 0.8  # 物理空间的阻尼，模拟空气阻力
+
+        self.entity_ids = EntityIdAllocator()
+        slots = len(self.player_ids) if mode in VERSUS_MODES else 1
+        self.tanks: List[Optional[object]] = [None] * slots  # 按玩家槽位
+        self.bullets: Dict[object, None] = {}  # 按发射顺序的有序集合，移除时O(1)
+        self.scores = [0] * max(2, slots)
+
+        self.round_over = False
+        self.round_over_timer = 0.0
+        self.round_over_delay = ROUND_OVER_DELAY
+        self.max_score = max_score
+        self.round_result_text = ""
+        self.game_over = False
+        self.winner: Optional[int] = None  # 获胜玩家槽位
+        self.total_time = 0.0              # 用于射击冷却
+        self.tick = 0                      # 已推进的步数
+        # 确定性模式下每步的 (tick, 状态哈希)
+        self.state_hashes: deque = deque(maxlen=STATE_HASH_HISTORY)
+
+        # 碰撞回调中不能修改空间，待移除的子弹和阵亡的坦克在step之后处理（dict作为有序集合）
+        self._bullets_to_remove: Dict[object, None] = {}
+        self._tanks_to_remove: Dict[object, None] = {}
+
+        self._setup_collision_handlers()
+        self.map_layout = map_layout if map_layout is not None else get_random_map_layout(self.rng)
+        self.spawn_points = get_spawn_points(self.map_layout, slots)
+        self._build_walls()
+        self.start_new_round()
+
+    # --- 查询 ---
+    def tank_for(self, player_id: str):
+        """返回玩家当前的坦克，不存在时返回None"""
+        slot = self.slot_of.get(player_id)
+        if slot is None or slot >= len(self.tanks):
+            return None
+        return self.tanks[slot]
+
+    def score_for(self, player_id: str) -> int:
+        """玩家的胜场数"""
+        slot = self.slot_of.get(player_id)
+        return self.scores[slot] if slot is not None and slot < len(self.scores) else 0
+
+    def live_tanks(self) -> List[object]:
+        return [tank for tank in self.tanks if tank is not None]
+
+    # --- 推进 ---
+    def step(self, dt: float, inputs: Optional[Dict[str, List[Tuple[str, bool]]]] = None):
+        """推进一帧。inputs: {玩家ID: [(控制指令, 是否按下), ...]}，按顺序在物理步进前应用"""
+        if self.deterministic:
+            dt = MAX_STEP  # 确定性模式与帧时间无关
+        if self.on_step:
+            self.on_step(self.tick + 1, dt, inputs)
+        self.tick += 1
+        self._advance(dt, inputs)
+        if self.deterministic:
+            self.state_hashes.append((self.tick, self.state_hash()))
+
+    def _advance(self, dt: float, inputs: Optional[Dict[str, List[Tuple[str, bool]]]]):
+        self.total_time += dt
+        if inputs:
+            for player_id, events in inputs.items():
+                for control, pressed in events:
+                    self.apply_input(player_id, control, pressed)
+
+        if self.game_over:
+            return
+        if self.round_over:
+            self.round_over_timer -= dt
+            if self.round_over_timer <= 0:
+                winner = next((slot for slot, score in enumerate(self.scores)
+                               if score >= self.max_score), None)
+                if winner is not None:
+                    self.game_over = True
+                    self.winner = winner
+                else:
+                    self.start_new_round()
+            return
+
+        self.space.step(min(dt, MAX_STEP))
+
+        for tank in self.live_tanks():
+            tank.sync_with_pymunk_body()
+        for bullet in self.bullets:
+            bullet.sync_with_pymunk_body()
+            # 飞出场地的子弹
+            pos = bullet.pymunk_body.position
+            if pos.y > GAME_AREA_TOP_Y + bullet.height or pos.y < GAME_AREA_BOTTOM_Y - bullet.height or \
+               pos.x < -bullet.width or pos.x > SCREEN_WIDTH + bullet.width:
+                self._bullets_to_remove[bullet] = None
+
+        for bullet in self._bullets_to_remove:
+            self._remove_bullet(bullet)
+        self._bullets_to_remove.clear()
+        for tank in self._tanks_to_remove:
+            if tank in self.tanks:
+                self._despawn_tank(self.tanks.index(tank))
+        self._tanks_to_remove.clear()
+
+    def state_hash(self) -> int:
+        """当前权威状态的CRC32：比分、回合状态、坦克和子弹的物理状态（浮点数按二进制精确参与）"""
+        header = (self.tick, int(self.round_over), int(self.game_over), len(self.bullets), *self.scores)
+        crc = zlib.crc32(struct.pack(f"<{len(header)}i", *header))
+        crc = zlib.crc32(struct.pack("<2d", self.total_time, self.round_over_timer), crc)
+        for slot, tank in enumerate(self.tanks):
+            if tank is None:
+                continue
+            body = tank.pymunk_body
+            crc = zlib.crc32(struct.pack("<3i6d", slot, tank.entity_id or 0, tank.health,
+                                         body.position.x, body.position.y, body.angle,
+                                         body.velocity.x, body.velocity.y, body.angular_velocity), crc)
+        for bullet in self.bullets:
+            body = bullet.pymunk_body
+            crc = zlib.crc32(struct.pack("<2i4d", bullet.entity_id or 0, bullet.bounce_count,
+                                         body.position.x, body.position.y,
+                                         body.velocity.x, body.velocity.y), crc)
+        return crc
+
+    def capture_state(self) -> dict:
+        """保存完整的权威状态（可JSON序列化），restore_state 还原后继续推进的结果与原模拟一致"""
+        def body_state(body):
+            return [body.position.x, body.position.y, body.angle,
+                    body.velocity.x, body.velocity.y, body.angular_velocity]
+
+        tanks = []
+        for tank in self.tanks:
+            if tank is None:
+                tanks.append(None)
+                continue
+            tanks.append({"eid": tank.entity_id, "hp": tank.health, "shot": tank.last_shot_time,
+                          "body": body_state(tank.pymunk_body)})
+        bullets = []
+        for bullet in self.bullets:
+            owner = self.tanks.index(bullet.owner) if bullet.owner in self.tanks else -1
+            bullets.append({"eid": bullet.entity_id, "own": owner, "bc": bullet.bounce_count,
+                            "body": body_state(bullet.pymunk_body)})
+        return {
+            "tick": self.tick,
+            "time": self.total_time,
+            "ro": self.round_over,
+            "rot": self.round_over_timer,
+            "rt": self.round_result_text,
+            "go": self.game_over,
+            "win": self.winner,
+            "sc": list(self.scores),
+            "next_id": self.entity_ids.next_id,
+            "tanks": tanks,
+            "bullets": bullets,
+        }
+
+    def restore_state(self, state: dict):
+        """还原 capture_state 保存的状态：重新生成所有坦克和子弹（触发 on_despawn/on_spawn）"""
+        for bullet in list(self.bullets):
+            self._remove_bullet(bullet)
+        self._bullets_to_remove.clear()
+        self._tanks_to_remove.clear()
+
+        self.tick = state["tick"]
+        self.total_time = state["time"]
+        self.round_over = state["ro"]
+        self.round_over_timer = state["rot"]
+        self.round_result_text = state["rt"]
+        self.game_over = state["go"]
+        self.winner = state["win"]
+        self.scores = list(state["sc"])
+
+        # 坦克和子弹都重新创建：Pymunk body内部还有无法读写的状态（例如上一步留下的位置修正速度）
+        for slot, saved in enumerate(state["tanks"][:len(self.tanks)]):
+            if self.tanks[slot] is not None:
+                self._despawn_tank(slot)
+            if saved is None:
+                continue
+            x, y = saved["body"][:2]
+            self._spawn_tank(slot, x, y)
+            tank = self.tanks[slot]
+            tank.health = saved["hp"]
+            tank.last_shot_time = saved["shot"]
+            self._set_body_state(tank.pymunk_body, saved["body"])
+            tank.sync_with_pymunk_body()
+
+        for saved in state["bullets"]:
+            owner = self.tanks[saved["own"]] if 0 <= saved["own"] < len(self.tanks) else None
+            x, y, angle = saved["body"][:3]
+            bullet = self.bullet_factory(owner, x, y, math.degrees(angle))
+            self._add_bullet(bullet)
+            bullet.bounce_count = saved["bc"]
+            self._set_body_state(bullet.pymunk_body, saved["body"])
+            bullet.sync_with_pymunk_body()
+
+        # 实体ID与保存时一致（坦克的ID在生成后改写，被占用的ID集合按存活实体重建）
+        for tank, saved in zip(self.tanks, state["tanks"]):
+            if tank is not None:
+                tank.entity_id = saved["eid"]
+        for bullet, saved in zip(self.bullets, state["bullets"]):
+            bullet.entity_id = saved["eid"]
+        entities = sorted(chain(self.live_tanks(), self.bullets), key=lambda entity: entity.entity_id)
+        self.entity_ids.live_ids = {entity.entity_id for entity in entities}
+        self.entity_ids.next_id = state["next_id"]
+        self.entity_ids.events.clear()
+
+        # 按创建顺序（实体ID）重新加入物理空间，与录制时关键帧处的顺序一致（见 refresh_bodies）
+        for entity in entities:
+            self.space.remove(entity.pymunk_body, *entity.pymunk_body.shapes)
+        for entity in entities:
+            self.space.add(entity.pymunk_body, *entity.pymunk_body.shapes)
+
+    def refresh_bodies(self):
+        """用状态相同的新body替换所有坦克和子弹的Pymunk body。
+        body内部有无法读写的状态（例如上一步留下的位置修正速度），录像在每个关键帧调用，
+        使原模拟与从关键帧还原的回放从完全相同的状态继续推进"""
+        for entity in sorted(chain(self.live_tanks(), self.bullets), key=lambda entity: entity.entity_id):
+            old_body = entity.pymunk_body
+            self.space.remove(old_body, *old_body.shapes)
+            del old_body.sprite  # 复制形状时会连同body一起复制，不能把精灵也复制一份
+            shape = entity.pymunk_shape.copy()
+            old_body.sprite = entity
+            shape.body.sprite = entity
+            entity.pymunk_body, entity.pymunk_shape = shape.body, shape
+            self.space.add(shape.body, shape)
+
+    @staticmethod
+    def _set_body_state(body, values):
+        x, y, angle, vx, vy, angular_velocity = values
+        body.position = x, y
+        body.angle = angle
+        body.velocity = vx, vy
+        body.angular_velocity = angular_velocity
+
+    def apply_input(self, player_id: str, control: str, pressed: bool):
+        """将一个控制指令作用于玩家的坦克"""
+        tank = self.tank_for(player_id)
+        if tank is None or not tank.pymunk_body:
+            return
+        if control == CONTROL_FIRE:
+            if pressed:
+                bullet = tank.shoot(self.total_time)
+                if bullet:  # 只有当shoot返回子弹时才添加
+                    self._add_bullet(bullet)
+        elif pressed:
+            apply_control_press(tank.pymunk_body, control)
+        else:
+            apply_control_release(tank.pymunk_body, control)
+
+    def set_player(self, slot: int, player_id: str):
+        """把槽位分配给玩家（专用服务器中玩家加入或替换离开的玩家时调用）"""
+        old_id = self.player_ids[slot]
+        if old_id is not None and self.slot_of.get(old_id) == slot:
+            del self.slot_of[old_id]
+        self.player_ids[slot] = player_id
+        if player_id is not None:
+            self.slot_of[player_id] = slot
+        tank = self.tanks[slot]
+        if tank is not None:
+            tank.player_id = player_id
+
+    def reset_match(self):
+        """清零比分并开始新的一局比赛"""
+        self.scores = [0] * len(self.scores)
+        self.game_over = False
+        self.winner = None
+        self.start_new_round()
+
+    def start_new_round(self):
+        """开始一个新回合：清空子弹，阵亡的坦克重生，存活的坦克回到出生点"""
+        self.round_result_text = ""
+        self.round_over = False
+        self.round_over_timer = 0.0
+        for bullet in list(self.bullets):
+            self._remove_bullet(bullet)
+        self._bullets_to_remove.clear()
+        self._tanks_to_remove.clear()
+
+        for slot in range(len(self.tanks)):
+            x, y = self.spawn_point(slot)
+            tank = self.tanks[slot]
+            if tank is not None and not tank.is_alive():
+                self._despawn_tank(slot)
+                tank = None
+            if tank is None:
+                self._spawn_tank(slot, x, y)
+            else:
+                tank.health = tank.max_health
+                body = tank.pymunk_body
+                body.position = x, y
+                body.angle = math.radians(90)
+                body.velocity = (0, 0)
+                body.angular_velocity = 0
+                tank.sync_with_pymunk_body()
+
+    def spawn_point(self, slot: int) -> Tuple[float, float]:
+        """槽位的出生点（由地图决定，见 maps.get_spawn_points）"""
+        return self.spawn_points[slot % len(self.spawn_points)]
+
+    # --- 实体管理 ---
+    def _create_sim_tank(self, slot: int, x: float, y: float):
+        tank_type = self.tank_types[slot] if slot < len(self.tank_types) else "green"
+        return SimTank(x, y, tank_type)
+
+    def _spawn_tank(self, slot: int, x: float, y: float):
+        tank = self.tank_factory(slot, x, y)
+        tank.player_id = self.player_ids[slot]
+        tank.entity_id = self.entity_ids.allocate(KIND_TANK)
+        self.space.add(tank.pymunk_body, tank.pymunk_shape)
+        self.tanks[slot] = tank
+        if self.on_spawn:
+            self.on_spawn(KIND_TANK, tank)
+
+    def _despawn_tank(self, slot: int):
+        tank = self.tanks[slot]
+        self.tanks[slot] = None
+        if tank.pymunk_body.space is self.space:
+            self.space.remove(tank.pymunk_body, *tank.pymunk_body.shapes)
+        self.entity_ids.release(KIND_TANK, tank.entity_id)
+        if self.on_despawn:
+            self.on_despawn(KIND_TANK, tank)
+
+    def _add_bullet(self, bullet):
+        bullet.entity_id = self.entity_ids.allocate(KIND_BULLET)
+        self.bullets[bullet] = None
+        if bullet.pymunk_body and bullet.pymunk_shape:
+            self.space.add(bullet.pymunk_body, bullet.pymunk_shape)
+        if self.on_spawn:
+            self.on_spawn(KIND_BULLET, bullet)
+
+    def _remove_bullet(self, bullet):
+        if bullet not in self.bullets:
+            return
+        del self.bullets[bullet]
+        if bullet.pymunk_body and bullet.pymunk_body.space is self.space:
+            self.space.remove(bullet.pymunk_body, *bullet.pymunk_body.shapes)
+        self.entity_ids.release(KIND_BULLET, bullet.entity_id)
+        if self.on_despawn:
+            self.on_despawn(KIND_BULLET, bullet)
+
+    # --- 场地与碰撞 ---
+    def _build_walls(self):
+        """创建边界墙和地图内部墙的静态形状"""
+        boundaries = [
+            ((0, GAME_AREA_BOTTOM_Y), (SCREEN_WIDTH, GAME_AREA_BOTTOM_Y)),  # 底部
+            ((0, GAME_AREA_TOP_Y), (SCREEN_WIDTH, GAME_AREA_TOP_Y)),        # 顶部
+            ((0, GAME_AREA_BOTTOM_Y), (0, GAME_AREA_TOP_Y)),                # 左侧
+            ((SCREEN_WIDTH, GAME_AREA_BOTTOM_Y), (SCREEN_WIDTH, GAME_AREA_TOP_Y)),  # 右侧
+        ]
+        for a, b in boundaries:
+            body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            shape = pymunk.Segment(body, a, b, WALL_THICKNESS / 2)
+            self._configure_wall(shape)
+            self.space.add(body, shape)
+
+        for cx, cy, w, h in self.map_layout:
+            half_w = w / 2
+            half_h = h / 2
+            points = [(-half_w, -half_h), (half_w, -half_h), (half_w, half_h), (-half_w, half_h)]
+            body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            body.position = (cx, cy)  # Pymunk body的position是形状的重心
+            shape = pymunk.Poly(body, points)
+            self._configure_wall(shape)
+            self.space.add(body, shape)
+
+    @staticmethod
+    def _configure_wall(shape):
+        shape.collision_type = COLLISION_TYPE_WALL
+        shape.friction = 0.8
+        shape.elasticity = WALL_ELASTICITY
+
+    def _setup_collision_handlers(self):
+        """设置Pymunk碰撞处理器"""
+        handler_bullet_wall = self.space.add_collision_handler(COLLISION_TYPE_BULLET, COLLISION_TYPE_WALL)
+        handler_bullet_wall.pre_solve = self._bullet_hit_wall_handler
+        handler_bullet_tank = self.space.add_collision_handler(COLLISION_TYPE_BULLET, COLLISION_TYPE_TANK)
+        handler_bullet_tank.pre_solve = self._bullet_hit_tank_handler
+
+    def _bullet_hit_wall_handler(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data):
+        """Pymunk回调：子弹撞墙，反弹次数用完后消失"""
+        bullet_shape, _ = arbiter.shapes
+        bullet = bullet_shape.body.sprite
+        bullet.bounce_count += 1
+        if bullet.bounce_count >= bullet.max_bounces:
+            self._bullets_to_remove[bullet] = None
+            return False  # 阻止碰撞的物理反弹，因为子弹要消失了
+        return True  # 由Pymunk的弹性处理反弹
+
+    def _bullet_hit_tank_handler(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data):
+        """Pymunk回调：子弹撞坦克"""
+        bullet_shape, tank_shape = arbiter.shapes
+        if bullet_shape.collision_type != COLLISION_TYPE_BULLET:
+            bullet_shape, tank_shape = tank_shape, bullet_shape
+        bullet = bullet_shape.body.sprite
+        tank = tank_shape.body.sprite
+
+        if bullet.owner is not tank and tank.is_alive() and not self.round_over:
+            tank.take_damage(1)
+            self._bullets_to_remove[bullet] = None
+            if not tank.is_alive():
+                self._on_tank_destroyed(tank)
+        return False  # 子弹击中坦克后消失，不发生物理反弹
+
+    def _on_tank_destroyed(self, tank):
+        """坦克被摧毁：只剩一辆坦克时结束回合并给它计一个胜场，否则阵亡的坦克退出本回合"""
+        if tank not in self.tanks or len(self.tanks) < 2:
+            self.round_over = True
+            self.round_over_timer = self.round_over_delay
+            return
+        survivors = [slot for slot, other in enumerate(self.tanks) if other is not None and other.is_alive()]
+        if len(survivors) > 1:
+            self._tanks_to_remove[tank] = None
+            return
+        self.round_over = True
+        self.round_over_timer = self.round_over_delay
+        if survivors:
+            winner = survivors[0]
+            self.scores[winner] += 1
+            self.round_result_text = f"玩家{winner + 1} 本回合胜利!"
@@ -0,0 +1,69 @@
+"""
+坦克控制规则
+
+把按键转换为坦克控制指令，并定义控制指令如何作用于坦克的Pymunk body。
+本地双人对战 (GameView)、主机处理远程输入以及客户端本地预测共用这一套规则，
+保证三者的移动结果一致。本模块不依赖arcade。
+"""
+
+import math
+
+PLAYER_MOVEMENT_SPEED = 5
+PLAYER_TURN_SPEED = 5  # 度/帧
+
+# 将每帧的速度换算为Pymunk使用的每秒速度（假设60FPS）
+PYMUNK_PLAYER_MAX_SPEED = PLAYER_MOVEMENT_SPEED * 60
+PYMUNK_PLAYER_TURN_RAD_PER_SEC = math.radians(PLAYER_TURN_SPEED * 60 * 1.0)
+
+# 控制指令
+CONTROL_FORWARD = "forward"
+CONTROL_BACKWARD = "backward"
+CONTROL_TURN_LEFT = "turn_left"
+CONTROL_TURN_RIGHT = "turn_right"
+CONTROL_FIRE = "fire"
+
+MOVEMENT_CONTROLS = (CONTROL_FORWARD, CONTROL_BACKWARD)
+TURN_CONTROLS = (CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT)
+
+# 网络按键名称 -> 控制指令（客户端无论用WASD还是方向键都控制自己的坦克）
+REMOTE_KEY_CONTROLS = {
+    "W": CONTROL_FORWARD,
+    "S": CONTROL_BACKWARD,
+    "A": CONTROL_TURN_LEFT,
+    "D": CONTROL_TURN_RIGHT,
+    "SPACE": CONTROL_FIRE,
+    "UP": CONTROL_FORWARD,
+    "DOWN": CONTROL_BACKWARD,
+    "LEFT": CONTROL_TURN_LEFT,
+    "RIGHT": CONTROL_TURN_RIGHT,
+    "ENTER": CONTROL_FIRE,
+}
+
+
+def apply_control_press(body, control: str):
+    """按下控制键：设置坦克body的速度或角速度（射击由调用方处理）"""
+    if body is None:
+        return
+    # Pymunk的0弧度是X轴正方向，逆时针为正；坦克图片默认向上对应math.pi/2
+    # 所以前进方向的X分量是cos(body.angle)，Y分量是sin(body.angle)
+    if control == CONTROL_FORWARD:
+        body.velocity = (PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle),
+                         PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle))
+    elif control == CONTROL_BACKWARD:
+        body.velocity = (-PYMUNK_PLAYER_MAX_SPEED * math.cos(body.angle),
+                         -PYMUNK_PLAYER_MAX_SPEED * math.sin(body.angle))
+    elif control == CONTROL_TURN_LEFT:  # Pymunk中正角速度是逆时针
+        body.angular_velocity = PYMUNK_PLAYER_TURN_RAD_PER_SEC
+    elif control == CONTROL_TURN_RIGHT:
+        body.angular_velocity = -PYMUNK_PLAYER_TURN_RAD_PER_SEC
+
+
+def apply_control_release(body, control: str):
+    """松开控制键：停止移动或旋转"""
+    if body is None:
+        return
+    if control in MOVEMENT_CONTROLS:
+        body.velocity = (0, 0)
+    elif control in TURN_CONTROLS:
+        body.angular_velocity = 0
+
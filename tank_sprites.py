@@ -1,14 +1,12 @@
 import arcade
 import math
 import os
-import pymunk # <--- 添加Pymunk导入
 
 # --- 常量 ---
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720 # 同上
 
-PLAYER_MOVEMENT_SPEED = 5
-PLAYER_TURN_SPEED = 5  # 度/帧
+from tank_controls import PLAYER_MOVEMENT_SPEED, PLAYER_TURN_SPEED  # 度/帧，与控制规则共用
 PLAYER_SCALE = 0.8  # 坦克图片的缩放比例
 
 
@@ -25,19 +23,36 @@ PLAYER_IMAGE_PATH_DESERT = os.path.join(BASE_DIR, "tank-img", "yellow_tank.png")
 PLAYER_IMAGE_PATH_BLUE = os.path.join(BASE_DIR, "tank-img", "blue_tank.png")
 PLAYER_IMAGE_PATH_GREY = os.path.join(BASE_DIR, "tank-img", "grey_tank.png")
 
+# 网络快照中的坦克类型 -> 坦克图片
+TANK_IMAGE_PATHS_BY_TYPE = {
+    "green": PLAYER_IMAGE_PATH_GREEN,
+    "yellow": PLAYER_IMAGE_PATH_DESERT,
+    "blue": PLAYER_IMAGE_PATH_BLUE,
+    "grey": PLAYER_IMAGE_PATH_GREY,
+}
+
 # 音效文件路径
 EXPLOSION_SOUND = os.path.join(BASE_DIR, "tank_voice", "explosion.wav")
 
-# Pymunk碰撞类型常量
-COLLISION_TYPE_BULLET = 1
-COLLISION_TYPE_WALL = 2
-COLLISION_TYPE_TANK = 3
+# Pymunk碰撞类型常量、子弹半径和速度（与无界面模拟共用）
+from simulation import (COLLISION_TYPE_BULLET, COLLISION_TYPE_WALL, COLLISION_TYPE_TANK,
+                        BULLET_RADIUS, BULLET_SPEED_MAGNITUDE, create_tank_physics, create_bullet_physics,
+                        tank_type_from_image)
+
+# 网络快照中的坦克类型 -> 子弹颜色（与Tank.shoot按图片路径选择的颜色一致）
+BULLET_COLORS_BY_TANK_TYPE = {
+    "green": (0, 255, 0),
+    "yellow": arcade.color.YELLOW_ORANGE,
+    "blue": (0, 0, 128),
+    "grey": (128, 128, 128),
+}
 
 class Tank(arcade.Sprite):
     """ 坦克类 """
     def __init__(self, image_file, scale, center_x, center_y, max_speed=PLAYER_MOVEMENT_SPEED, turn_speed_degrees=PLAYER_TURN_SPEED):
         # 存储图片文件路径，供后续使用
         self.tank_image_file = image_file
+        self.tank_type = tank_type_from_image(image_file)  # 网络快照中的坦克类型
 
         # 检查图片文件是否存在
         if image_file and os.path.exists(image_file):
@@ -65,6 +80,7 @@ class Tank(arcade.Sprite):
 
         # 玩家标识（用于网络游戏）
         self.player_id = None
+        self.entity_id = None # 由Simulation分配的稳定ID
 
         # 射击冷却时间属性
         self.last_shot_time = -1.0 # 上次射击的时间（初始化为负值，确保第一次射击可以成功）
@@ -72,7 +88,6 @@ class Tank(arcade.Sprite):
 
         self.pymunk_body = None
         self.pymunk_shape = None
-        mass = 10
 
         if self.texture and hasattr(self.texture, 'image') and self.texture.image:
             unscaled_width = self.texture.image.width
@@ -101,40 +116,10 @@ class Tank(arcade.Sprite):
         if isinstance(self.scale, tuple):
             current_scale_for_pymunk = self.scale[0]
 
-        # 再次微调Pymunk形状的尺寸，使其略小于缩放后的图片尺寸，以更精确地贴合坦克主体
-        # 尝试将尺寸缩小到缩放后图片尺寸的90%
-        # 再次微调Pymunk形状的尺寸，使其略小于缩放后的图片尺寸，以更精确地贴合坦克主体
-        # 尝试将尺寸缩小到缩放后图片尺寸的80%
-        # 坦克的视觉宽度对应图片的宽度 (calc_unscaled_width)
-        # 坦克的视觉高度对应图片的高度 (calc_unscaled_height)
-
-        # Pymunk形状的局部X轴尺寸 (对应视觉高度)
-        half_x_dim_for_pymunk_shape = (calc_unscaled_height * current_scale_for_pymunk ) / 2
-        # Pymunk形状的局部Y轴尺寸 (对应视觉宽度)
-        half_y_dim_for_pymunk_shape = (calc_unscaled_width * current_scale_for_pymunk ) / 2
-
-        # Pymunk的Poly形状顶点定义，对调尺寸以匹配视觉方向
-        vertices = [(-half_x_dim_for_pymunk_shape, -half_y_dim_for_pymunk_shape),
-                    (half_x_dim_for_pymunk_shape, -half_y_dim_for_pymunk_shape),
-                    (half_x_dim_for_pymunk_shape, half_y_dim_for_pymunk_shape),
-                    (-half_x_dim_for_pymunk_shape, half_y_dim_for_pymunk_shape)]
-        moment = pymunk.moment_for_poly(mass, vertices)
-
-        self.pymunk_body = pymunk.Body(mass, moment)
-        self.pymunk_body.position = center_x, center_y
-        # 将Arcade的0度（向上）转换为Pymunk的math.pi/2（向上）
-        self.pymunk_body.angle = math.radians(90 - self.angle)
-        # 为坦克启用连续碰撞检测 (CCD)
-        self.pymunk_body.linear_velocity_threshold = 0.1 # 设置一个小的阈值以启用CCD，防止高速穿模
-
-        self.pymunk_shape = pymunk.Poly(self.pymunk_body, vertices)
-        self.pymunk_shape.elasticity = 0.0 # 碰撞后立即停止，无反弹
-        self.pymunk_shape.friction = 1   # 1表示高摩擦力
-        self.pymunk_shape.collision_type = COLLISION_TYPE_TANK
-        self.pymunk_shape.collision_bias = 0.01 # 增加碰撞偏置，防止重叠
-
-        self.pymunk_body.damping = 1 # 线性阻尼，越大越快停止移动
-        self.pymunk_body.angular_damping = 1 # 角阻尼，越大越快停止旋转
+        # 物理形状与无界面模拟共用，尺寸取缩放后的图片尺寸
+        self.pymunk_body, self.pymunk_shape = create_tank_physics(
+            calc_unscaled_width * current_scale_for_pymunk, calc_unscaled_height * current_scale_for_pymunk,
+            center_x, center_y, self.angle)
         self.pymunk_body.sprite = self
 
     def take_damage(self, amount):
@@ -185,10 +170,6 @@ class Tank(arcade.Sprite):
             elif 'grey' in path: bullet_color = (128, 128, 128)
             elif 'blue' in path: bullet_color = (0, 0, 128)
 
-        # 定义子弹半径和速度
-        BULLET_RADIUS = 4
-        BULLET_SPEED_MAGNITUDE = 16
-
         bullet = Bullet(radius=BULLET_RADIUS,
                        owner=self,
                        tank_center_x=self.center_x,
@@ -209,40 +190,14 @@ class Bullet(arcade.SpriteCircle):
         self.center_y = tank_center_y
 
         self.owner = owner
+        self.entity_id = None # 由Simulation分配的稳定ID，用于网络同步
         self.angle = actual_emission_angle_degrees
         self.bounce_count = 0
         self.max_bounces = 3
 
-        self.pymunk_body = None
-        self.pymunk_shape = None
-        mass = 0.001
-
-        moment = pymunk.moment_for_circle(mass, 0, self.radius, (0,0))
-
-        self.pymunk_body = pymunk.Body(mass, moment)
-        # 为子弹启用连续碰撞检测 (CCD)
-        # 将阈值设置为子弹的实际速度大小，确保CCD始终启用
-        self.pymunk_body.linear_velocity_threshold = 0.1
-
-        barrel_offset = 25 * PLAYER_SCALE
-        emission_angle_rad = math.radians(actual_emission_angle_degrees)
-
-        self.pymunk_body.position = (
-            tank_center_x - barrel_offset * math.sin(emission_angle_rad),
-            tank_center_y + barrel_offset * math.cos(emission_angle_rad)
-        )
-        self.pymunk_body.angle = math.radians(actual_emission_angle_degrees)
-
-        pymunk_initial_speed = speed_magnitude * 60
-        vx = -pymunk_initial_speed * math.sin(self.pymunk_body.angle)
-        vy = pymunk_initial_speed * math.cos(self.pymunk_body.angle)
-        self.pymunk_body.velocity = (vx, vy)
-        self.pymunk_body.damping = 1.0
-
-        self.pymunk_shape = pymunk.Circle(self.pymunk_body, self.radius, (0,0))
-        self.pymunk_shape.friction = 0.1 # 0.1表示低摩擦力
-        self.pymunk_shape.elasticity = 1
-        self.pymunk_shape.collision_type = COLLISION_TYPE_BULLET
+        self.pymunk_body, self.pymunk_shape = create_bullet_physics(
+            self.radius, tank_center_x, tank_center_y, actual_emission_angle_degrees, speed_magnitude,
+            barrel_offset=25 * PLAYER_SCALE)
         self.pymunk_body.sprite = self
 
         self.sync_with_pymunk_body()
@@ -255,3 +210,20 @@ class Bullet(arcade.SpriteCircle):
             self.center_x = self.pymunk_body.position.x
             self.center_y = self.pymunk_body.position.y
             self.angle = math.degrees(self.pymunk_body.angle)
+
+
+class RenderBullet(arcade.SpriteCircle):
+    """ 客户端仅用于渲染的子弹：没有Pymunk对象，按主机快照原地更新 """
+    def __init__(self, entity_id, center_x, center_y, angle, color=arcade.color.YELLOW_ORANGE, radius=BULLET_RADIUS):
+        # SpriteCircle按(直径, 颜色)缓存纹理，同色子弹共用一张纹理
+        super().__init__(radius, color)
+        self.entity_id = entity_id
+        self.owner = None
+        self.pymunk_body = None
+        self.pymunk_shape = None
+        self.set_state(center_x, center_y, angle)
+
+    def set_state(self, center_x, center_y, angle):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.angle = angle
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+模拟链路条件下的网络基准测试
+
+启动一个专用服务器，两个客户端经 NetSimRelay 连接，客户端1周期性按下/松开按键，
+对每种链路条件（或脚本）统计：
+
+- 感知输入延迟：按键到收到回传了该输入序号（坦克 "seq"）的快照的时间
+- 快照陈旧度：每帧（60Hz）采样时，客户端最新快照距离服务器发出它已经过去的时间
+- 客户端每秒收到的快照数和中继的丢包统计
+
+    PYTHONPATH=. python test/test-May/benchmark_netsim.py --seconds 5
+    PYTHONPATH=. python test/test-May/benchmark_netsim.py --profiles lan,mobile --scripts mobile_handover
+"""
+
+import sys
+import os
+import argparse
+import statistics
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.netsim import NetSimRelay, PROFILES, SCRIPTS
+from multiplayer.server import GameServer, run_at_fixed_rate
+from multiplayer.udp_client import GameClient
+
+DEFAULT_PROFILES = ["loopback", "lan", "wifi", "dsl", "mobile", "congested"]
+KEY_INTERVAL = 0.25     # 按下/松开按键的间隔(秒)
+SAMPLE_INTERVAL = 1.0 / 60.0
+
+
+def _percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_profile(port, seconds, profile=None, script=None):
+    """在一种链路条件下运行一局，返回统计结果"""
+    server = GameServer("链路基准", port=port, tick_rate=60, map_index=0)
+    host = server.game_host
+    host.adaptive_rate = False  # 测量链路本身的影响，不按链路质量降频
+
+    # 记录每个tick第一次发出的时间
+    sent_at = {}
+    broadcast = host.broadcast_game_state
+
+    def recording_broadcast(state):
+        broadcast(state)
+        sent_at.setdefault(host.state_tick, time.time())
+    host.broadcast_game_state = recording_broadcast
+
+    server_thread = threading.Thread(target=run_at_fixed_rate, args=(server,), daemon=True)
+    server_thread.start()
+    while not server.running:
+        time.sleep(0.01)
+
+    relay = NetSimRelay(("127.0.0.1", port), profile or "loopback", seed=port)
+    relay.start()
+
+    clients = [GameClient(), GameClient()]
+    latest = {"tick": 0, "states": 0}
+    pending_inputs = {}   # 输入序号 -> 发送时间
+    input_latencies = []
+
+    def on_state(game_state):
+        latest["tick"] = clients[0].last_state_tick
+        latest["states"] += 1
+        now = time.time()
+        tank = next((t for t in game_state.get("tanks", []) if t.get("id") == clients[0].player_id), None)
+        if tank and "seq" in tank:
+            for seq in [s for s in pending_inputs if s <= tank["seq"]]:
+                input_latencies.append(now - pending_inputs.pop(seq))
+    clients[0].set_callbacks(game_state=on_state)
+
+    try:
+        for i, client in enumerate(clients):
+            if not client.connect_to_host("127.0.0.1", relay.port, f"基准客户端{i + 1}"):
+                raise RuntimeError("客户端无法经中继连接服务器")
+        if script:
+            relay.run_script(script)
+
+        staleness = []
+        pressed = False
+        next_key = time.time() + 0.5   # 等待比赛开始
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            now = time.time()
+            if now >= next_key:
+                seq = clients[0].send_key_release("W") if pressed else clients[0].send_key_press("W")
+                pressed = not pressed
+                if seq is not None:
+                    pending_inputs[seq] = now
+                next_key = now + KEY_INTERVAL
+            tick_sent = sent_at.get(latest["tick"])
+            if tick_sent is not None:
+                staleness.append(now - tick_sent)
+            time.sleep(SAMPLE_INTERVAL)
+    finally:
+        for client in clients:
+            client.disconnect()
+        relay_stats = relay.stats()
+        relay.stop()
+        server.running = False
+        server_thread.join(timeout=2.0)
+
+    return {
+        "input_mean": statistics.mean(input_latencies) if input_latencies else float("nan"),
+        "input_p95": _percentile(input_latencies, 0.95),
+        "inputs_lost": len(pending_inputs),
+        "stale_mean": statistics.mean(staleness) if staleness else float("nan"),
+        "stale_p95": _percentile(staleness, 0.95),
+        "snapshots_per_second": latest["states"] / seconds,
+        "relay": relay_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟链路条件下的网络基准测试")
+    parser.add_argument("--profiles", default=",".join(DEFAULT_PROFILES),
+                        help=f"逗号分隔的链路条件 (可选: {', '.join(PROFILES)})")
+    parser.add_argument("--scripts", default="", help=f"逗号分隔的脚本 (可选: {', '.join(SCRIPTS)})")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每组测试时长(秒)")
+    parser.add_argument("--port", type=int, default=12470, help="服务器端口")
+    args = parser.parse_args()
+
+    runs = [(name, {"profile": name}) for name in filter(None, args.profiles.split(","))]
+    runs += [(f"脚本:{name}", {"script": name}) for name in filter(None, args.scripts.split(","))]
+
+    print(f"{'链路条件':<22}{'输入延迟 均值/p95 (ms)':>24}{'快照陈旧度 均值/p95 (ms)':>26}{'快照/s':>9}{'下行丢包':>10}")
+    for label, options in runs:
+        result = run_profile(args.port, args.seconds, **options)
+        down = result["relay"]["downstream"]
+        lost = down.get("dropped", 0) + down.get("queue_drops", 0)
+        print(f"{label:<22}"
+              f"{result['input_mean'] * 1000:>14.1f} / {result['input_p95'] * 1000:<7.1f}"
+              f"{result['stale_mean'] * 1000:>16.1f} / {result['stale_p95'] * 1000:<7.1f}"
+              f"{result['snapshots_per_second']:>9.1f}"
+              f"{lost:>6}/{down.get('packets', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+分片服务器基准测试
+
+在 1..N 个工作进程中运行同样数量的比赛（两个机器人随机移动和开火），
+每个进程尽可能快地推进自己的房间，统计所有进程合计的每秒tick数：
+
+    PYTHONPATH=. python test/test-May/benchmark_sharding.py --rooms 32 --seconds 5
+
+合计tick/s随进程数接近线性增长（直到达到物理核心数）说明比赛不再受同一个GIL限制。
+"""
+
+import sys
+import os
+import argparse
+import multiprocessing
+import random
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.server import GameServer
+from multiplayer.sharded_server import _OutboxSocket
+from multiplayer.input_commands import InputCommandStream, keys_to_mask
+
+BOT_KEYS = ["W", "A", "S", "D", "SPACE"]
+
+
+def _bench_worker(room_count, seconds, tick_rate, result_queue):
+    """在一个进程中运行room_count场机器人比赛，返回完成的tick数"""
+    rng = random.Random(room_count)
+    rooms = []
+    bots = {}  # 机器人ID -> (输入指令流, 按住的按键)
+    for room_id in range(room_count):
+        room = GameServer(f"基准 #{room_id}", port=0, tick_rate=tick_rate, map_index=room_id % 3)
+        room.game_host.attach_socket(_OutboxSocket(), room.room_name)
+        for suffix in ("a", "b"):
+            bot = f"bot_{room_id}_{suffix}"
+            room._on_client_join(bot, "bot")
+            bots[bot] = (InputCommandStream(), set())
+        rooms.append(room)
+
+    ticks = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for room in rooms:
+            # 每个机器人每tick发送一条输入指令，偶尔按下或松开一个按键
+            for bot in room.slots:
+                if bot is None:
+                    continue
+                stream, keys = bots[bot]
+                if rng.random() < 0.1:
+                    keys ^= {rng.choice(BOT_KEYS)}
+                    stream.update(keys_to_mask(keys))
+                seq, masks = stream.sample()
+                room.pending_inputs.put((bot, [(seq, masks[-1])]))
+            room.tick(room.tick_interval)
+            room.game_host.host_socket.take()
+            ticks += 1
+    result_queue.put(ticks)
+
+
+def run_benchmark(room_count, worker_count, seconds, tick_rate=60):
+    """把room_count场比赛平均分到worker_count个进程，返回合计的每秒tick数"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    shares = [room_count // worker_count + (1 if i < room_count % worker_count else 0)
+              for i in range(worker_count)]
+    processes = [context.Process(target=_bench_worker, args=(share, seconds, tick_rate, results))
+                 for share in shares if share > 0]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / seconds
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="分片服务器基准测试")
+    parser.add_argument("--rooms", type=int, default=32, help="比赛数量")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每组测试时长(秒)")
+    parser.add_argument("--max-workers", type=int, default=cpu_count, help="最多工作进程数")
+    args = parser.parse_args()
+
+    print(f"📊 {args.rooms} 场比赛, CPU核心 {cpu_count}")
+    baseline = None
+    workers = 1
+    while workers <= args.max_workers:
+        rate = run_benchmark(args.rooms, workers, args.seconds)
+        baseline = baseline or rate
+        print(f"  {workers:>2} 个进程: {rate:10.0f} tick/s  (加速比 {rate / baseline:.2f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
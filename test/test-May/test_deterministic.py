@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+测试确定性模拟与状态哈希校验
+
+验证相同种子和输入得到相同的地图和逐tick哈希序列（与帧时间无关）、
+快照哈希在JSON/二进制编码和增量还原后保持一致，以及客户端丢弃校验失败的快照并在完整快照后恢复
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import Simulation
+from tank_controls import CONTROL_FIRE, CONTROL_FORWARD, CONTROL_TURN_LEFT
+from multiplayer.snapshot_delta import compute_delta, apply_delta
+from multiplayer.state_codec import CODEC_BINARY, CODEC_JSON, state_hash
+from multiplayer.udp_messages import MessageFactory, UDPMessage
+
+
+def _scripted_run(seed, frame_dt, steps=240, nudge_at=None):
+    """按固定脚本驱动两名玩家，返回模拟和逐tick哈希"""
+    sim = Simulation(mode="pvp", player_ids=("p1", "p2"), seed=seed)
+    for tick in range(1, steps + 1):
+        inputs = {}
+        if tick == 1:
+            inputs = {"p1": [(CONTROL_FORWARD, True), (CONTROL_TURN_LEFT, True)], "p2": [(CONTROL_TURN_LEFT, True)]}
+        elif tick % 20 == 0:
+            inputs = {"p1": [(CONTROL_FIRE, True), (CONTROL_FIRE, False)],
+                      "p2": [(CONTROL_FIRE, True), (CONTROL_FIRE, False)]}
+        if tick == nudge_at:
+            body = sim.tanks[1].pymunk_body
+            body.position = (body.position.x + 0.001, body.position.y)
+        sim.step(frame_dt, inputs)
+    return sim, list(sim.state_hashes)
+
+
+def _first_divergence(hashes_a, hashes_b):
+    return next((tick for (tick, a), (_, b) in zip(hashes_a, hashes_b) if a != b), None)
+
+
+def test_same_seed_same_hashes():
+    """相同种子选择相同地图；不同帧时间下哈希序列完全一致，扰动后从该tick开始不同"""
+    print("🧪 测试确定性模式...")
+    sim_a, hashes_a = _scripted_run(7, 1 / 60)
+    sim_b, hashes_b = _scripted_run(7, 1 / 144)
+    assert sim_a.map_layout is sim_b.map_layout
+    assert len(hashes_a) == 240 and hashes_a == hashes_b, "确定性模式的结果不应依赖帧时间"
+    assert sim_a.bullets, "脚本应让子弹留在场上参与哈希"
+
+    _, nudged = _scripted_run(7, 1 / 60, nudge_at=100)
+    assert _first_divergence(hashes_a, nudged) == 100, "应在被扰动的tick检测到不一致"
+
+    maps = {id(Simulation(mode="pvp", seed=seed).map_layout) for seed in range(12)}
+    assert len(maps) > 1, "不同种子应能选到不同地图"
+    print("✅ 确定性模式正确")
+
+
+def _make_state(bullet_x, angle=45.0):
+    return {
+        "tanks": [
+            {"id": "host", "eid": 1, "pos": [100.3, 200.7], "ang": angle, "hp": 5, "type": "green", "seq": 9, "at": 12},
+            {"id": "client_1", "eid": 2, "pos": [300.0, 400.0], "ang": 0.1, "hp": 4, "type": "blue"}
+        ],
+        "bullets": [{"id": 3, "pos": [bullet_x, 250.2], "ang": 123.4, "own": "host"}],
+        "round_info": {"sc": [1, 0], "ro": False, "go": False}
+    }
+
+
+def test_snapshot_hash_survives_codecs_and_deltas():
+    """客户端经任一编码、完整或增量还原的快照与主机的哈希相同；内容不同则哈希不同"""
+    base = _make_state(150.0)
+    current = _make_state(163.7, angle=271.3)
+    host_hash = state_hash(current)
+    assert state_hash(_make_state(163.8, angle=271.3)) != host_hash
+
+    for codec in (CODEC_JSON, CODEC_BINARY):
+        full = MessageFactory.create_game_state(current["tanks"], current["bullets"], current["round_info"],
+                                                5, state_hash=host_hash)
+        data = UDPMessage.from_bytes(full.to_bytes(codec)).data
+        assert data["h"] == host_hash and state_hash(data) == host_hash, f"{codec}: 完整快照校验失败"
+
+        decoded_base = UDPMessage.from_bytes(MessageFactory.create_game_state(
+            base["tanks"], base["bullets"], base["round_info"], 4).to_bytes(codec)).data
+        delta = MessageFactory.create_game_state_delta(5, 4, compute_delta(base, current), state_hash=host_hash)
+        data = UDPMessage.from_bytes(delta.to_bytes(codec)).data
+        assert state_hash(apply_delta(decoded_base, data)) == data["h"], f"{codec}: 增量还原后校验失败"
+
+
+def test_client_drops_mismatched_snapshot():
+    """客户端的基准被破坏时丢弃校验失败的增量且不确认，收到完整快照后恢复"""
+    print("🧪 测试快照校验与恢复...")
+    from multiplayer.udp_host import GameHost
+    from multiplayer.udp_client import GameClient
+
+    host = GameHost(host_port=12464)
+    host.broadcast_interval = 0
+    host.state_hash_interval = 1
+    received = []
+
+    def wait_for(predicate, timeout=2.0):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.02)
+        return predicate()
+
+    try:
+        assert host.start_hosting("校验测试房间")
+        client = GameClient()
+        client.set_callbacks(game_state=received.append)
+        assert client.connect_to_host("127.0.0.1", 12464, "校验测试客户端")
+        info = host.clients[client.player_id]
+
+        host.broadcast_game_state(_make_state(150.0))
+        assert wait_for(lambda: info.acked_tick == 1 and len(received) == 1)
+
+        # 破坏客户端保存的基准快照，之后的增量还原结果与主机不一致
+        client.snapshot_history.get(1)["tanks"][1]["hp"] -= 1
+        host.broadcast_game_state(_make_state(160.0))
+        assert wait_for(lambda: client.telemetry.desyncs == 1), "应检测到状态不一致"
+        time.sleep(0.1)
+        assert len(received) == 1 and info.acked_tick == 1, "校验失败的快照不应交给游戏逻辑或被确认"
+
+        # 基准过旧后主机发送完整快照，客户端恢复
+        host.state_tick += host.max_delta_age + 1
+        host.broadcast_game_state(_make_state(170.0))
+        assert wait_for(lambda: len(received) == 2)
+        assert received[-1]["bullets"][0]["pos"][0] == 170.0
+        assert client.get_network_stats()["host"]["desyncs"] == 1
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+    print("✅ 快照校验与恢复正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_same_seed_same_hashes,
+        test_snapshot_hash_survives_codecs_and_deltas,
+        test_client_drops_mismatched_snapshot,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有确定性测试通过")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试组播发现与房间查询
+
+验证房间发现启动时发出的查询由主机立即单播回复（不等待定期广播），
+IPv4/IPv6组播模式都能发现房间，以及通过IPv6发现的房间可以直接加入
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.udp_discovery import (RoomDiscovery, RoomAdvertiser, MultiRoomAdvertiser, DISCOVERY_BROADCAST,
+                                       DISCOVERY_MULTICAST, DISCOVERY_MULTICAST6)
+from multiplayer.udp_host import GameHost
+from multiplayer.udp_client import GameClient
+
+
+def _discover(port, mode, expected, timeout=1.0):
+    """启动房间发现，返回 (发现器, 发现expected个房间所用的秒数)"""
+    discovery = RoomDiscovery(broadcast_port=port, mode=mode)
+    started = time.time()
+    discovery.start_discovery()
+    while len(discovery.get_available_rooms()) < expected and time.time() - started < timeout:
+        time.sleep(0.002)
+    return discovery, time.time() - started
+
+
+def test_query_fills_room_list_immediately():
+    """定期广播间隔很长时，房间列表也在100毫秒内由查询回复填满"""
+    print("🧪 测试房间查询...")
+    advertiser = RoomAdvertiser(broadcast_port=12472, broadcast_interval=60.0)
+    multi = MultiRoomAdvertiser(broadcast_port=12472, broadcast_interval=60.0)
+    rooms = [{"room_id": i, "room_name": f"房间 #{i}", "current_players": 0,
+              "max_players": 2, "game_mode": "pvp"} for i in range(1, 11)]
+    discovery = None
+    try:
+        advertiser.start_advertising("查询测试房间", 1, 4, host_port=13001)
+        multi.start_advertising(13002, lambda: rooms)
+        time.sleep(0.2)  # 启动时的第一轮广播已经发出，之后60秒内不再广播
+
+        discovery, elapsed = _discover(12472, DISCOVERY_BROADCAST, 11)
+        found = discovery.get_available_rooms()
+        assert len(found) == 11, f"只发现 {len(found)} 个房间"
+        assert elapsed < 0.1, f"房间列表填满用了 {elapsed * 1000:.0f} 毫秒"
+        assert advertiser.queries_answered == 1 and multi.queries_answered == 1
+        assert {room.host_port for room in found.values()} == {13001, 13002}
+
+        assert discovery.query_rooms()
+        time.sleep(0.1)
+        assert advertiser.queries_answered == 2 and len(discovery.get_available_rooms()) == 11
+    finally:
+        if discovery:
+            discovery.stop_discovery()
+        advertiser.stop_advertising()
+        multi.stop_advertising()
+    print(f"✅ 查询回复在 {elapsed * 1000:.1f} 毫秒内填满房间列表")
+
+
+def test_multicast_modes():
+    """IPv4组播和IPv6组播模式下都能发现房间；广播模式的发现器也能收到IPv4组播的定期广播"""
+    for port, mode in ((12473, DISCOVERY_MULTICAST), (12474, DISCOVERY_MULTICAST6)):
+        advertiser = RoomAdvertiser(broadcast_port=port, broadcast_interval=0.2, mode=mode)
+        listener = RoomDiscovery(broadcast_port=port) if mode == DISCOVERY_MULTICAST else None
+        discovery = None
+        try:
+            advertiser.start_advertising(f"{mode}房间", 1, 4, host_port=13003)
+            discovery, elapsed = _discover(port, mode, 1)
+            rooms = list(discovery.get_available_rooms().values())
+            assert len(rooms) == 1 and rooms[0].room_name == f"{mode}房间", f"{mode}: 未发现房间"
+            assert (":" in rooms[0].host_ip) == (mode == DISCOVERY_MULTICAST6)
+            if listener:
+                # 广播模式的发现器不发组播查询，靠定期组播广播发现
+                listener.start_discovery()
+                deadline = time.time() + 1.0
+                while not listener.get_available_rooms() and time.time() < deadline:
+                    time.sleep(0.02)
+                assert listener.get_available_rooms(), "广播模式也应收到组播的房间广播"
+        finally:
+            if discovery:
+                discovery.stop_discovery()
+            if listener:
+                listener.stop_discovery()
+            advertiser.stop_advertising()
+
+
+def test_join_room_found_over_ipv6():
+    """IPv6组播模式的主机使用双栈套接字：IPv6发现到的地址和IPv4地址都能加入"""
+    print("🧪 测试通过IPv6加入房间...")
+    host = GameHost(host_port=12475, discovery_mode=DISCOVERY_MULTICAST6)
+    host.room_advertiser.broadcast_port = 12476
+    clients = []
+    discovery = None
+    try:
+        assert host.start_hosting("IPv6房间")
+        discovery, _ = _discover(12476, DISCOVERY_MULTICAST6, 1)
+        room = next(iter(discovery.get_available_rooms().values()))
+        assert room.host_port == 12475
+
+        for host_ip in (room.host_ip, "127.0.0.1"):
+            client = GameClient()
+            clients.append(client)
+            assert client.connect_to_host(host_ip, room.host_port, f"玩家@{host_ip}"), f"无法通过 {host_ip} 加入"
+        assert host.get_current_player_count() == 3
+    finally:
+        for client in clients:
+            client.disconnect()
+        if discovery:
+            discovery.stop_discovery()
+        host.stop_hosting()
+    print("✅ IPv6加入房间正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_query_fills_room_list_immediately,
+        test_multicast_modes,
+        test_join_room_found_over_ipv6,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有组播发现测试通过")
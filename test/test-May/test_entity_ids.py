@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+测试实体ID分配与生成/消失事件
+
+验证ID单调递增并跳过仍在使用的ID、事件在二进制快照中往返一致，
+以及增量快照携带客户端基准之后的所有事件
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_ids import EntityIdAllocator, EVENT_SPAWN, EVENT_DESPAWN, KIND_TANK, KIND_BULLET
+from multiplayer.state_codec import encode_game_state, decode_game_state
+from multiplayer.udp_messages import UDPMessage
+from multiplayer.udp_client import GameClient
+
+
+def test_ids_monotonic_and_wrap():
+    """ID单调递增，回绕后跳过仍存活的ID"""
+    print("🧪 测试实体ID分配...")
+    allocator = EntityIdAllocator(max_id=4)
+    ids = [allocator.allocate(KIND_BULLET) for _ in range(3)]
+    assert ids == [1, 2, 3], f"ID应单调递增: {ids}"
+    allocator.release(KIND_BULLET, 1)
+    allocator.release(KIND_BULLET, 3)
+    assert allocator.allocate(KIND_TANK) == 4
+    assert allocator.allocate(KIND_TANK) == 1, "回绕后应复用已释放的ID"
+    assert allocator.allocate(KIND_TANK) == 3, "回绕后应跳过仍在使用的ID 2"
+    assert not allocator.release(KIND_BULLET, 99), "释放未使用的ID应返回False"
+
+    events = allocator.drain_events()
+    assert events[0] == (EVENT_SPAWN, KIND_BULLET, 1)
+    assert (EVENT_DESPAWN, KIND_BULLET, 3) in events
+    assert allocator.drain_events() == [], "事件取出后应清空"
+    print("✅ 实体ID分配正确")
+
+
+def test_events_binary_roundtrip():
+    """事件与坦克实体ID在二进制快照中往返一致"""
+    state = {
+        "tick": 9,
+        "tanks": [{"id": "host", "eid": 12, "pos": [1.0, 2.0], "ang": 0.0, "hp": 5, "type": "green"}],
+        "bullets": [{"id": 40, "pos": [3.0, 4.0], "ang": 0.0, "own": "host"}],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False},
+        "events": [[8, "despawn", "tank", 11], [9, "spawn", "tank", 12], [9, "spawn", "bullet", 40]]
+    }
+    decoded = decode_game_state(encode_game_state(state))
+    assert decoded["tanks"][0]["eid"] == 12
+    assert decoded["events"] == state["events"], f"事件往返错误: {decoded['events']}"
+
+
+def test_delta_carries_events_since_baseline():
+    """增量携带基准之后所有tick的事件，节流期间的事件不会丢失"""
+    print("🧪 测试增量事件...")
+    from multiplayer.udp_host import GameHost, ClientInfo
+
+    host = GameHost(host_port=12448)
+    sent = []
+    host.host_socket = _FakeSocket(sent)
+    client = ClientInfo("client_1", ("127.0.0.1", 1), "测试")
+    host.clients[client.client_id] = client
+    host.broadcast_interval = 0
+
+    def state(bullets, events=()):
+        return {"tanks": [], "bullets": [{"id": b, "pos": [0.0, 0.0], "ang": 0.0, "own": None} for b in bullets],
+                "round_info": {"sc": [0, 0], "ro": False, "go": False}, "events": list(events)}
+
+    host.broadcast_game_state(state([1], [["spawn", "bullet", 1]]))    # tick 1 完整快照
+    client.acked_tick = 1
+    host.broadcast_game_state(state([1, 2], [["spawn", "bullet", 2]]))  # tick 2
+    host.broadcast_interval = 1000
+    host.broadcast_game_state(state([2], [["despawn", "bullet", 1]]))   # 节流，事件保留
+    host.broadcast_interval = 0
+    host.broadcast_game_state(state([2]))                               # tick 3
+
+    data = UDPMessage.from_bytes(sent[-1]).data
+    assert data["base"] == 1
+    assert data["events"] == [[2, "spawn", "bullet", 2], [3, "despawn", "bullet", 1]], \
+        f"增量事件不正确: {data.get('events')}"
+
+    # 客户端只保留尚未处理过的事件
+    game_client = GameClient()
+    game_client.client_socket = _FakeSocket([])
+    game_client.snapshot_history.add(1, {"tanks": [], "bullets": [], "round_info": {}})
+    game_client.last_state_tick = 2
+    resolved = game_client._resolve_game_state(data)
+    assert resolved["events"] == [[3, "despawn", "bullet", 1]], "已处理过的事件应被过滤"
+    assert [b["id"] for b in resolved["bullets"]] == [2]
+    assert not resolved.get("resync")
+    print("✅ 增量事件正确")
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self, sent):
+        self.sent = sent
+
+    def sendto(self, data, addr):
+        self.sent.append(data)
+        return len(data)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ids_monotonic_and_wrap,
+        test_events_binary_roundtrip,
+        test_delta_carries_events_since_baseline,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有实体ID测试通过")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+测试固定步长推进与渲染插值
+
+验证累加器在低帧率下补跑（有上限）、高帧率下不推进，不同帧率得到相同的模拟结果，
+每个固定步长之前调用 before_step（网络主机每步应用一条远程指令），以及绘制时的插值位姿和绘制后的恢复
+"""
+
+import sys
+import os
+import subprocess
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixed_timestep import FixedTimestep, PoseInterpolator, FIXED_STEP
+from game_views import GameView
+from simulation import Simulation
+from tank_controls import CONTROL_FIRE, CONTROL_TURN_LEFT
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 在无窗口的子进程中运行真实的联机主机视图：setup之后客户端的指令仍逐步长应用到模拟
+HOST_VIEW_SCRIPT = """
+import arcade
+from multiplayer.network_views import NetworkHostView
+from multiplayer.udp_host import ClientInfo
+from multiplayer.input_commands import CONTROL_BITS
+from fixed_timestep import FIXED_STEP
+from tank_controls import CONTROL_FORWARD
+
+window = arcade.Window(800, 600, visible=False)
+view = NetworkHostView()
+client = ClientInfo('client_1', ('127.0.0.1', 1), '玩家')
+client.connected = True
+view.game_host.clients['client_1'] = client
+view._start_game_with_selections()
+view.game_view.stop_recording()
+tank = view.game_view.simulation.tank_for('client_1')
+start_y = tank.center_y
+view._on_input_received('client_1', [(1, CONTROL_BITS[CONTROL_FORWARD])])
+for _ in range(10):
+    view.on_update(FIXED_STEP)
+assert view.applied_inputs.get('client_1', (None,))[0] == 1, '客户端指令没有应用到模拟'
+assert tank.center_y != start_y, '客户端坦克没有移动'
+"""
+
+
+def test_accumulator_steps_and_catch_up_limit():
+    """每帧推进的步数由累计时间决定，落后太多时只补跑上限步数"""
+    print("🧪 测试固定步长累加器...")
+    stepper = FixedTimestep(max_steps=4)
+    assert stepper.advance(FIXED_STEP / 2) == 0 and abs(stepper.alpha - 0.5) < 1e-6, "高帧率下有的帧不推进"
+    assert stepper.advance(FIXED_STEP / 2) == 1 and stepper.alpha < 1e-6
+    assert stepper.advance(FIXED_STEP * 2.25) == 2 and abs(stepper.alpha - 0.25) < 1e-6
+
+    assert stepper.advance(1.0) == 4, "卡顿一秒后不应补跑60步"
+    assert stepper.alpha < 1.0 and stepper.dropped_time > 0.9
+    assert stepper.steps == 7
+    print("✅ 固定步长累加器正确")
+
+
+def _run_at_frame_rate(fps, total_steps=150):
+    """按给定帧率驱动模拟：开局两辆坦克旋转开火，子弹在场地边界反弹"""
+    sim = Simulation(mode="pvp", player_ids=("p1", "p2"), map_layout=[])
+    stepper = FixedTimestep()
+    pending = {"p1": [(CONTROL_TURN_LEFT, True), (CONTROL_FIRE, True), (CONTROL_FIRE, False)],
+               "p2": [(CONTROL_FIRE, True), (CONTROL_FIRE, False)]}
+    while stepper.steps < total_steps:
+        steps = stepper.advance(1.0 / fps)
+        for _ in range(steps):
+            sim.step(stepper.substep_dt, pending)
+            pending = None
+    assert stepper.steps == total_steps
+    tanks = [(round(t.center_x, 6), round(t.center_y, 6), round(t.angle, 6)) for t in sim.live_tanks()]
+    bullets = [(round(b.center_x, 6), round(b.center_y, 6)) for b in sim.bullets]
+    return tanks, bullets
+
+
+def test_results_independent_of_frame_rate():
+    """30、60、144帧每秒下推进相同步数，坦克和子弹的状态完全一致"""
+    print("🧪 测试结果与帧率无关...")
+    reference = _run_at_frame_rate(60)
+    assert reference[1], "应有子弹在场上"
+    assert _run_at_frame_rate(30) == reference
+    assert _run_at_frame_rate(144) == reference
+    print("✅ 不同帧率下结果一致")
+
+
+def test_before_step_runs_once_per_fixed_step():
+    """一帧推进多步时每步取一条远程指令，本帧的按键只交给第一步；不推进的帧不取指令"""
+    step_inputs = []
+    simulation = SimpleNamespace(game_over=False, step=lambda dt, inputs: step_inputs.append(inputs))
+    view = SimpleNamespace(timestep=FixedTimestep(substeps=1), interpolator=PoseInterpolator(),
+                           simulation=simulation, pending_inputs={"p1": [(CONTROL_FIRE, True)]},
+                           game_over_shown=False, mode="network_host", _moving_sprites=lambda: [])
+    commands = [(CONTROL_TURN_LEFT, True), (CONTROL_FIRE, True), (CONTROL_TURN_LEFT, False), (CONTROL_FIRE, False)]
+    view.before_step = lambda: commands and view.pending_inputs.setdefault("c1", []).append(commands.pop(0))
+
+    GameView.on_update(view, FIXED_STEP / 2)
+    assert not step_inputs and len(commands) == 4, "不推进的帧不应取出指令"
+    GameView.on_update(view, FIXED_STEP * 3)
+    assert step_inputs == [
+        {"p1": [(CONTROL_FIRE, True)], "c1": [(CONTROL_TURN_LEFT, True)]},
+        {"c1": [(CONTROL_FIRE, True)]},
+        {"c1": [(CONTROL_TURN_LEFT, False)]},
+    ]
+    assert commands == [(CONTROL_FIRE, False)]
+
+
+def test_host_view_applies_client_commands():
+    """联机主机视图开始游戏（GameView.setup）之后，每步应用的客户端指令驱动客户端坦克"""
+    env = dict(os.environ, ARCADE_HEADLESS="1", PYTHONPATH=ROOT_DIR)
+    result = subprocess.run([sys.executable, "-c", HOST_VIEW_SCRIPT], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+def test_interpolated_pose_restored_after_draw():
+    """绘制时位于两次物理状态之间，瞬移和新出现的实体不插值，绘制后恢复"""
+    moving = SimpleNamespace(center_x=0.0, center_y=0.0, angle=170.0)
+    teleported = SimpleNamespace(center_x=0.0, center_y=0.0, angle=0.0)
+    interpolator = PoseInterpolator()
+    interpolator.capture([moving, teleported])
+    moving.center_x, moving.center_y, moving.angle = 10.0, 4.0, -170.0
+    teleported.center_x = 500.0
+    spawned = SimpleNamespace(center_x=7.0, center_y=7.0, angle=0.0)
+
+    interpolator.apply([moving, teleported, spawned], 0.5)
+    assert (moving.center_x, moving.center_y) == (5.0, 2.0)
+    assert moving.angle % 360.0 == 180.0, "角度按最短方向插值（经过180度而不是0度）"
+    assert teleported.center_x == 500.0 and spawned.center_x == 7.0
+
+    interpolator.restore()
+    assert (moving.center_x, moving.center_y, moving.angle) == (10.0, 4.0, -170.0)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_accumulator_steps_and_catch_up_limit,
+        test_results_independent_of_frame_rate,
+        test_before_step_runs_once_per_fixed_step,
+        test_host_view_applies_client_commands,
+        test_interpolated_pose_restored_after_draw,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有固定步长测试通过")
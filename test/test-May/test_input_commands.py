@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试逐tick输入指令流
+
+验证位掩码与控制事件的转换、采样之间的轻点不丢失、主机用冗余副本补上丢失的包、
+指令队列每tick应用一条并在积压时追赶，以及在丢包链路上松开按键最终一定送达
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.input_commands import (InputCommandStream, CommandQueue, CONTROL_BITS, MAX_QUEUED_COMMANDS,
+                                        keys_to_mask, mask_events)
+from multiplayer.netsim import ImpairedSocket, NetProfile
+from multiplayer.udp_host import GameHost, ClientInfo
+from multiplayer.udp_client import GameClient
+from tank_controls import CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_FIRE
+
+FORWARD = CONTROL_BITS[CONTROL_FORWARD]
+BACKWARD = CONTROL_BITS[CONTROL_BACKWARD]
+FIRE = CONTROL_BITS[CONTROL_FIRE]
+
+
+def test_stream_samples_held_and_tapped_controls():
+    """按键合并为位掩码；采样之间轻点的射击仍然置位，返回的序号是主机看到变化的指令"""
+    print("🧪 测试输入指令采样...")
+    assert keys_to_mask(["W", "UP", "SPACE", "X"]) == FORWARD | FIRE
+    assert mask_events(FORWARD, BACKWARD) == [(CONTROL_FORWARD, False), (CONTROL_BACKWARD, True)], "先松开后按下"
+    assert mask_events(FORWARD, FORWARD) == []
+
+    stream = InputCommandStream(redundancy=3)
+    assert stream.update(FORWARD) == 1
+    assert stream.update(FORWARD) is None, "按住状态没有变化"
+    assert stream.sample() == (1, [FORWARD])
+
+    assert stream.update(FORWARD | FIRE) == 2
+    assert stream.update(FORWARD) == 3, "同一tick内按下又松开，松开在再下一条指令中体现"
+    assert stream.sample() == (2, [FORWARD, FORWARD | FIRE])
+    assert stream.sample() == (3, [FORWARD, FORWARD | FIRE, FORWARD])
+    assert stream.sample() == (4, [FORWARD | FIRE, FORWARD, FORWARD]), "只保留最近几条指令"
+    print("✅ 输入指令采样正确")
+
+
+def test_host_recovers_lost_packets_from_redundancy():
+    """丢失的包由后续包中的冗余副本补上；超出冗余条数的指令丢失但状态仍然正确"""
+    info = ClientInfo("client_1", ("127.0.0.1", 1), "测试")
+    assert info.receive_commands(1, [FORWARD]) == [(1, FORWARD)]
+    # 序号2、3的包丢失，序号4的包携带2..4
+    assert info.receive_commands(4, [FORWARD, FORWARD | FIRE, 0]) == [(2, FORWARD), (3, FORWARD | FIRE), (4, 0)]
+    assert info.receive_commands(3, [FORWARD, FORWARD | FIRE]) == [], "旧包被丢弃"
+    # 连续丢包超过冗余条数
+    assert info.receive_commands(10, [0, BACKWARD]) == [(9, 0), (10, BACKWARD)]
+    assert info.input_mask == BACKWARD and info.last_input_seq == 10
+
+
+def test_queue_applies_one_command_per_tick():
+    """每tick应用一条指令，队列为空时保持状态，积压过多时一次追上"""
+    queue = CommandQueue()
+    queue.extend([(1, FORWARD), (2, FORWARD), (3, 0)])
+    assert queue.advance() == ([(CONTROL_FORWARD, True)], 1)
+    assert queue.advance() == ([], None)
+    assert queue.advance() == ([(CONTROL_FORWARD, False)], 3)
+    assert queue.advance() == ([], None), "没有新指令时保持上一条指令的状态"
+
+    queue.extend([(seq, 0 if seq % 2 else FIRE) for seq in range(4, 4 + MAX_QUEUED_COMMANDS + 3)])
+    events, changed = queue.advance()
+    assert len(queue.pending) == MAX_QUEUED_COMMANDS and queue.skipped == 2
+    assert events == [(CONTROL_FIRE, True), (CONTROL_FIRE, False), (CONTROL_FIRE, True)], "追赶时不丢失按键变化"
+    assert changed == 6
+
+
+def test_release_survives_lossy_link():
+    """客户端发出的包一半丢失，松开按键后主机最终看到全部松开"""
+    print("🧪 测试丢包链路上的输入指令...")
+    host = GameHost(host_port=12462)
+    received = []
+    host.set_callbacks(input_received=lambda client_id, commands: received.extend(commands))
+    client = GameClient()
+
+    try:
+        assert host.start_hosting("输入指令测试房间")
+        assert client.connect_to_host("127.0.0.1", 12462, "输入指令客户端")
+        client.client_socket = ImpairedSocket(client.client_socket, NetProfile(loss=0.5), seed=7)
+        client_info = host.clients[client.player_id]
+
+        client.send_key_press("W")
+        time.sleep(0.2)
+        release_seq = client.send_key_release("W")
+        deadline = time.time() + 2.0
+        while time.time() < deadline and client_info.last_input_seq < release_seq + 5:
+            time.sleep(0.02)
+
+        assert client_info.input_mask == 0, "松开按键必须送达"
+        seqs = [seq for seq, _ in received]
+        assert seqs == sorted(set(seqs)), "交给游戏逻辑的指令不重复且按序"
+        assert any(mask == FORWARD for _, mask in received)
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+    print("✅ 丢包链路上的输入指令正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stream_samples_held_and_tapped_controls,
+        test_host_recovers_lost_packets_from_redundancy,
+        test_queue_applies_one_command_per_tick,
+        test_release_survives_lossy_link,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有输入指令测试通过")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试客户端快照插值
+
+验证插值延迟、角度最短路径插值和有上限的外推
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.interpolation import SnapshotInterpolator
+
+
+def _state(x, ang=0.0, bullets=()):
+    return {
+        "tanks": [{"id": "host", "pos": [x, 100.0], "ang": ang, "hp": 5, "type": "green"}],
+        "bullets": [{"id": i, "pos": [bx, 50.0], "ang": 0.0, "own": "host"} for i, bx in bullets],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False}
+    }
+
+
+def test_interpolates_between_snapshots():
+    """渲染时刻位于两个快照之间时线性插值"""
+    print("🧪 测试快照插值...")
+    buffer = SnapshotInterpolator(interpolation_delay=0.1)
+    buffer.push(_state(0.0), 1.0)
+    buffer.push(_state(30.0), 1.1)
+
+    state = buffer.sample(now=1.15)  # 渲染时刻 1.05
+    assert abs(state["tanks"][0]["pos"][0] - 15.0) < 1e-6, f"插值位置错误: {state['tanks'][0]['pos']}"
+    print("✅ 快照插值正确")
+
+
+def test_angle_wraps_shortest_path():
+    """角度插值沿最短方向跨越0度"""
+    buffer = SnapshotInterpolator(interpolation_delay=0.0)
+    buffer.push(_state(0.0, ang=350.0), 1.0)
+    buffer.push(_state(0.0, ang=10.0), 2.0)
+    ang = buffer.sample(now=1.5)["tanks"][0]["ang"]
+    assert abs((ang % 360.0) - 0.0) < 1e-6 or abs((ang % 360.0) - 360.0) < 1e-6, f"角度插值错误: {ang}"
+
+
+def test_bounded_extrapolation():
+    """快照迟到时外推，且外推时间有上限"""
+    print("🧪 测试有上限的外推...")
+    buffer = SnapshotInterpolator(interpolation_delay=0.1, max_extrapolation=0.05)
+    buffer.push(_state(0.0), 1.0)
+    buffer.push(_state(10.0), 1.1)
+
+    x = buffer.sample(now=1.225)["tanks"][0]["pos"][0]  # 渲染时刻 1.125，外推25ms
+    assert abs(x - 12.5) < 1e-6, f"外推位置错误: {x}"
+    x = buffer.sample(now=2.0)["tanks"][0]["pos"][0]    # 外推被限制在50ms
+    assert abs(x - 15.0) < 1e-6, f"外推未被限制: {x}"
+    print("✅ 外推受限正确")
+
+
+def test_bullet_spawn_and_despawn():
+    """子弹以渲染时刻所在快照的实体集合为准"""
+    buffer = SnapshotInterpolator(interpolation_delay=0.0)
+    buffer.push(_state(0.0, bullets=[(0, 100.0)]), 1.0)
+    buffer.push(_state(0.0, bullets=[(1, 200.0)]), 2.0)
+
+    bullets = buffer.sample(now=1.5)["bullets"]
+    assert [b["id"] for b in bullets] == [0], "尚未到达的子弹不应提前出现"
+    bullets = buffer.sample(now=2.0)["bullets"]
+    assert [b["id"] for b in bullets] == [1], "到达新快照后应使用新实体集合"
+
+
+def test_prunes_old_snapshots():
+    """渲染时刻之前的旧快照被丢弃，乱序快照被忽略"""
+    buffer = SnapshotInterpolator(interpolation_delay=0.0)
+    for i in range(5):
+        buffer.push(_state(float(i)), float(i))
+    buffer.push(_state(99.0), 2.5)
+    buffer.sample(now=3.5)
+    assert len(buffer.snapshots) == 2, f"旧快照未被清理: {len(buffer.snapshots)}"
+    assert buffer.latest()["tanks"][0]["pos"][0] == 4.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_interpolates_between_snapshots,
+        test_angle_wraps_shortest_path,
+        test_bounded_extrapolation,
+        test_bullet_spawn_and_despawn,
+        test_prunes_old_snapshots,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有插值测试通过")
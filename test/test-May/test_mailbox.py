@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试网络线程到主线程的有界信箱
+
+验证信箱只保留最新的若干项并统计丢弃/合并数量、跨线程放入不丢失计数，
+以及专用服务器把收到的输入指令排队、每个tick应用一条
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.mailbox import Mailbox
+from multiplayer.server import GameServer
+from multiplayer.udp_host import ClientInfo
+from multiplayer.input_commands import CONTROL_BITS
+from tank_controls import CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_FIRE
+
+
+def test_mailbox_keeps_latest():
+    """信箱满时丢弃最旧的项，drain按从旧到新返回"""
+    print("🧪 测试有界信箱...")
+    mailbox = Mailbox(3)
+    for i in range(5):
+        mailbox.put(i)
+    assert len(mailbox) == 3
+    assert mailbox.drain() == [2, 3, 4], "应只保留最新的3项"
+    assert mailbox.dropped == 2 and mailbox.received == 5
+    assert mailbox.drain() == []
+
+    for i in range(3):
+        mailbox.put(i)
+    assert mailbox.take_latest() == 2
+    assert mailbox.coalesced == 2 and mailbox.take_latest() is None
+    assert mailbox.stats() == {"received": 8, "dropped": 2, "coalesced": 2, "pending": 0}
+    print("✅ 信箱只保留最新状态")
+
+
+def test_mailbox_cross_thread():
+    """生产者线程放入、消费者线程取出，取到的项加上丢弃数等于放入数"""
+    mailbox = Mailbox(64)
+    taken = []
+    done = threading.Event()
+
+    def producer():
+        for i in range(20000):
+            mailbox.put(i)
+        done.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    while not done.is_set():
+        taken.extend(mailbox.drain())
+    thread.join()
+    taken.extend(mailbox.drain())
+
+    assert taken == sorted(taken), "取出的项应保持放入顺序"
+    assert taken[-1] == 19999, "最新的一项不应丢失"
+    assert len(taken) + mailbox.dropped >= 20000
+
+
+def test_server_applies_one_command_per_tick():
+    """同一客户端的指令排队，每个tick应用一条；回传的序号是最近一次改变按住状态的指令"""
+    server = GameServer(port=12456, tick_rate=60, map_index=0)
+    for client_id in ("client_a", "client_b"):
+        server.game_host.clients[client_id] = ClientInfo(client_id, ("127.0.0.1", 1), client_id)
+        server._on_client_join(client_id, client_id)
+
+    forward, fire = CONTROL_BITS[CONTROL_FORWARD], CONTROL_BITS[CONTROL_FIRE]
+    server.pending_inputs.put(("client_a", [(1, forward)]))
+    server.pending_inputs.put(("client_a", [(1, forward), (2, forward), (3, forward | fire)]))
+    server.pending_inputs.put(("client_b", [(1, CONTROL_BITS[CONTROL_BACKWARD])]))
+    inputs = server._drain_inputs()
+    assert inputs == {"client_a": [(CONTROL_FORWARD, True)], "client_b": [(CONTROL_BACKWARD, True)]}
+    assert server.applied_inputs["client_a"][0] == 1
+
+    assert not server._drain_inputs(), "按住状态不变的指令不产生事件"
+    assert server._drain_inputs() == {"client_a": [(CONTROL_FIRE, True)]}
+    assert server.applied_inputs["client_a"][0] == 3
+    assert not server._drain_inputs(), "指令只应用一次"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_mailbox_keeps_latest,
+        test_mailbox_cross_thread,
+        test_server_applies_one_command_per_tick,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有信箱测试通过")
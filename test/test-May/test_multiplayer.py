@@ -73,7 +73,7 @@ class MultiplayerTestSuite:
             MessageFactory.create_room_advertise("测试房间", 2, 4, "pvp"),
             MessageFactory.create_join_request("测试玩家"),
             MessageFactory.create_join_response(True, "player_123"),
-            MessageFactory.create_player_input("player_123", ["W", "SPACE"], ["A"]),
+            MessageFactory.create_player_input("player_123", 3, [0, 1, 17]),
             MessageFactory.create_heartbeat("player_123"),
             MessageFactory.create_disconnect("player_123", "user_quit")
         ]
@@ -155,8 +155,8 @@ class MultiplayerTestSuite:
             print(f"    客户端离开: {client_id} ({reason})")
             connection_events['client_left'] = True
         
-        def on_input_received(client_id, keys_pressed, keys_released):
-            print(f"    收到输入 {client_id}: 按下={keys_pressed}")
+        def on_input_received(client_id, commands):
+            print(f"    收到输入 {client_id}: 指令={commands}")
             connection_events['input_received'] = True
         
         host.set_callbacks(
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试多人（多于两辆坦克）比赛
+
+验证出生点来自地图且互不重叠、玩家按ID映射到槽位、最后存活的坦克得分、
+快照携带所有玩家的比分，子弹集合按发射顺序增删，以及专用服务器按 --players 创建槽位
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maps import ALL_MAP_LAYOUTS, get_spawn_points, SPAWN_HALF_WIDTH, SPAWN_HALF_HEIGHT
+from simulation import Simulation, MAX_PLAYERS, ROUND_OVER_DELAY
+from tank_controls import CONTROL_FIRE
+from multiplayer.state_snapshot import build_game_state
+from multiplayer.server import GameServer, parse_args
+
+DT = 1 / 60
+
+
+def _make_sim(count, **kwargs):
+    return Simulation(mode="pvp", player_ids=[f"p{i + 1}" for i in range(count)], map_layout=[], **kwargs)
+
+
+def _destroy(sim, player_id):
+    """直接把玩家的坦克打到零血量（不依赖子弹轨迹）"""
+    tank = sim.tank_for(player_id)
+    tank.take_damage(tank.health)
+    sim._on_tank_destroyed(tank)
+    sim.step(DT)
+
+
+def test_spawn_points_clear_of_walls():
+    """每张地图为最多人数提供不与墙壁重叠的出生点，前两个与原来的双人出生点一致"""
+    print("🧪 测试地图出生点...")
+    for layout in ALL_MAP_LAYOUTS:
+        points = get_spawn_points(layout, MAX_PLAYERS)
+        assert len(points) == MAX_PLAYERS
+        assert points[:2] == [(30, 375), (1250, 375)]
+        assert len(set(points)) == MAX_PLAYERS, "人数不超过可用出生点时不应重复"
+        for x, y in points:
+            for cx, cy, w, h in layout:
+                overlap_x = abs(x - cx) < w / 2 + SPAWN_HALF_WIDTH
+                overlap_y = abs(y - cy) < h / 2 + SPAWN_HALF_HEIGHT
+                assert not (overlap_x and overlap_y), f"出生点 {(x, y)} 与墙壁重叠"
+    print("✅ 地图出生点正确")
+
+
+def test_last_tank_standing_scores():
+    """四人对战中阵亡的坦克退出本回合，只剩一辆坦克时它得分"""
+    print("🧪 测试最后存活者得分...")
+    despawned = []
+    sim = _make_sim(4, on_despawn=lambda kind, entity: despawned.append(entity))
+    assert len(sim.live_tanks()) == 4 and sim.scores == [0, 0, 0, 0]
+    assert sim.tank_for("p3") is sim.tanks[2]
+
+    _destroy(sim, "p1")
+    assert not sim.round_over and sim.tank_for("p1") is None, "还有多辆坦克存活时回合继续"
+    _destroy(sim, "p4")
+    assert not sim.round_over and len(sim.live_tanks()) == 2
+    _destroy(sim, "p2")
+    assert sim.round_over and sim.score_for("p3") == 1 and sim.scores == [0, 0, 1, 0]
+    assert sim.round_result_text == "玩家3 本回合胜利!"
+
+    for _ in range(int(ROUND_OVER_DELAY / DT) + 2):
+        sim.step(DT)
+    assert len(sim.live_tanks()) == 4, "新回合所有玩家重生"
+    assert len(despawned) >= 2
+    assert build_game_state(sim)["round_info"]["sc"] == [0, 0, 1, 0], "快照携带所有玩家的比分"
+    print("✅ 最后存活者得分正确")
+
+
+def test_player_limit_and_slot_reassignment():
+    """超过人数上限时报错；槽位换人后按新ID查找坦克和比分"""
+    try:
+        _make_sim(MAX_PLAYERS + 1)
+        assert False, "超过人数上限应报错"
+    except ValueError:
+        pass
+
+    sim = _make_sim(MAX_PLAYERS)
+    sim.scores[5] = 2
+    sim.set_player(5, "late")
+    assert sim.tank_for("p6") is None and sim.tank_for("late") is sim.tanks[5]
+    assert sim.score_for("late") == 2
+
+
+def test_bullets_keep_fire_order():
+    """所有坦克同时开火；移除中间的子弹后其余子弹保持发射顺序，重复移除无效"""
+    sim = _make_sim(MAX_PLAYERS)
+    sim.step(DT, {f"p{i + 1}": [(CONTROL_FIRE, True)] for i in range(MAX_PLAYERS)})
+    bullets = list(sim.bullets)
+    assert len(bullets) == MAX_PLAYERS
+    for bullet in bullets[1::2]:
+        sim._remove_bullet(bullet)
+    sim._remove_bullet(bullets[1])
+    assert list(sim.bullets) == bullets[::2]
+    assert [b.entity_id for b in sim.bullets] == sorted(b.entity_id for b in sim.bullets)
+
+
+def test_server_players_option():
+    """--players 决定专用服务器的槽位数和房间人数上限"""
+    assert parse_args([]).players == 2
+    assert parse_args(["--players", "6"]).players == 6
+    server = GameServer(port=12463, map_index=0, players=4)
+    assert len(server.slots) == 4 and len(server.simulation.tanks) == 4
+    assert server.game_host.max_players == 4
+
+    for slot in range(4):
+        server.pending_members.append((True, f"client_{slot}"))
+    server._process_members()
+    assert server.match_running and server.slots == [f"client_{slot}" for slot in range(4)]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_spawn_points_clear_of_walls,
+        test_last_tank_standing_scores,
+        test_player_limit_and_slot_reassignment,
+        test_bullets_keep_fire_order,
+        test_server_players_option,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有多人比赛测试通过")
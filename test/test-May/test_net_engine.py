@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+测试asyncio网络引擎
+
+验证端点收包回调、单次/周期定时器及取消、主机和客户端共用一个事件循环线程，
+以及主机按心跳截止时间检测客户端超时
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.net_engine import get_engine
+from multiplayer.udp_host import GameHost, CLIENT_TIMEOUT
+from multiplayer.udp_client import GameClient
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_endpoint_and_timers():
+    """端点在事件循环线程中回调；定时器按时触发并可取消"""
+    print("🧪 测试端点和定时器...")
+    engine = get_engine()
+    received = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    endpoint = engine.open_endpoint(sock, lambda data, addr: received.append((data, threading.current_thread())))
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.sendto(b"ping", sock.getsockname())
+    assert _wait_for(lambda: received), "端点应收到数据包"
+    assert received[0] == (b"ping", engine.thread)
+
+    ticks = []
+    once = []
+    repeating = engine.call_every(0.05, lambda: ticks.append(time.time()))
+    engine.call_later(0.05, lambda: once.append(1))
+    cancelled = engine.call_later(0.05, lambda: once.append(2))
+    cancelled.cancel()
+    time.sleep(0.3)
+    repeating.cancel()
+    count = len(ticks)
+    time.sleep(0.15)
+    assert 4 <= count <= 8 and len(ticks) == count, "周期定时器应按间隔触发，取消后停止"
+    assert once == [1], "取消的单次定时器不应触发"
+
+    endpoint.close()
+    sender.close()
+    print("✅ 端点和定时器正常")
+
+
+def test_host_and_client_share_engine_thread():
+    """主机和客户端不再各自创建网络线程，输入无需等待轮询即可送达"""
+    print("🧪 测试共用事件循环线程...")
+    host = GameHost(host_port=12454)
+    inputs = []
+    host.set_callbacks(input_received=lambda client_id, commands: inputs.extend(
+        time.perf_counter() for _, mask in commands if mask))
+    try:
+        assert host.start_hosting("引擎测试房间")
+        before = threading.active_count()
+        client = GameClient()
+        assert client.connect_to_host("127.0.0.1", 12454, "引擎测试客户端")
+        assert threading.active_count() == before, "客户端不应创建新线程"
+        assert host.endpoint.engine is client.endpoint.engine
+
+        sent_at = time.perf_counter()
+        client.send_key_press("W")
+        assert _wait_for(lambda: inputs), "主机应收到输入"
+        assert inputs[0] - sent_at < 0.05, "输入应在下一个指令tick发送而不是等待轮询"
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+    print("✅ 主机和客户端共用事件循环线程")
+
+
+def test_client_timeout_uses_deadline():
+    """超时检查安排在最早的心跳截止时间"""
+    host = GameHost(host_port=12455)
+    assert abs(host.next_timeout_delay() - CLIENT_TIMEOUT) < 1e-9, "没有客户端时等待一个完整周期"
+
+    try:
+        assert host.start_hosting("超时测试房间")
+        client = GameClient()
+        assert client.connect_to_host("127.0.0.1", 12455, "超时测试客户端")
+        client_id = client.player_id
+        delay = host.next_timeout_delay()
+        assert CLIENT_TIMEOUT - 0.5 < delay <= CLIENT_TIMEOUT + 0.1
+
+        # 停止心跳和输入指令流后在截止时间被移除
+        client.heartbeat_timer.cancel()
+        client.input_timer.cancel()
+        host.clients[client_id].last_heartbeat = time.time() - CLIENT_TIMEOUT + 0.2
+        host.timeout_timer.cancel()
+        host.schedule_timeout_check()
+        assert _wait_for(lambda: client_id not in host.clients, timeout=1.0), "超时客户端应被移除"
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_endpoint_and_timers,
+        test_host_and_client_share_engine_thread,
+        test_client_timeout_uses_deadline,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有网络引擎测试通过")
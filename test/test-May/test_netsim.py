@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试网络条件模拟器
+
+验证丢包/重复/抖动/乱序的统计特性、带宽限制下的排队与尾部丢弃、
+包装套接字的延迟发送，以及通过中继在模拟链路上完成加入和可靠控制消息
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.netsim import NetProfile, LinkImpairment, ImpairedSocket, NetSimRelay, PROFILES
+from multiplayer.udp_host import GameHost
+from multiplayer.udp_client import GameClient
+from multiplayer.udp_messages import MessageFactory
+
+
+class _FakeSocket:
+    """记录发送时间的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((time.time(), data, addr))
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def test_link_impairment_statistics():
+    """丢包、重复和延迟范围符合链路条件；带宽受限时按字节数排队，排队过长尾部丢弃"""
+    print("🧪 测试链路条件统计...")
+    link = LinkImpairment(NetProfile(latency=0.05, jitter=0.01, loss=0.2, duplicate=0.05), seed=1)
+    delays = []
+    for _ in range(5000):
+        delays.extend(at - 10.0 for at in link.plan(100, 10.0))
+    assert 0.17 < link.dropped / link.packets < 0.23
+    assert 0.03 < link.duplicated / (link.packets - link.dropped) < 0.07
+    assert all(0.04 - 1e-9 <= d <= 0.06 + 1e-9 for d in delays)
+
+    reorder = LinkImpairment(NetProfile(latency=0.01, reorder=1.0), seed=2)
+    assert reorder.plan(100, 0.0) == [0.04], "乱序的数据报至少额外延迟 REORDER_DELAY"
+
+    capped = LinkImpairment(NetProfile(bandwidth=10_000, queue_limit=0.35), seed=3)
+    times = [capped.plan(1000, 0.0) for _ in range(6)]
+    assert [round(t[0], 3) for t in times[:4]] == [0.1, 0.2, 0.3, 0.4], "每1000字节占用0.1秒"
+    assert times[4] == [] and capped.queue_drops >= 1, "排队超过queue_limit的数据报被丢弃"
+    print("✅ 链路条件统计正确")
+
+
+def test_impaired_socket_delays_sends():
+    """包装套接字立即返回，数据在延迟后由网络引擎发出；关闭后不再发送"""
+    raw = _FakeSocket()
+    sock = ImpairedSocket(raw, NetProfile(latency=0.05), seed=4)
+    start = time.time()
+    assert sock.sendto(b"abc", ("127.0.0.1", 1)) == 3
+    assert raw.sent == []
+    deadline = time.time() + 1.0
+    while not raw.sent and time.time() < deadline:
+        time.sleep(0.005)
+    assert raw.sent and raw.sent[0][0] - start >= 0.045
+
+    sock.sendto(b"late", ("127.0.0.1", 1))
+    sock.close()
+    time.sleep(0.1)
+    assert len(raw.sent) == 1, "关闭后排队的数据报应被丢弃"
+
+    sock.set_profile("blackout")
+    assert sock.link.profile is PROFILES["blackout"]
+
+
+def test_relay_lobby_over_lossy_link():
+    """客户端经中继连接主机，在丢包链路上完成加入并收到全部可靠消息"""
+    print("🧪 测试网络模拟中继...")
+    host = GameHost(host_port=12460)
+    relay = NetSimRelay(("127.0.0.1", 12460), "lossy", seed=5)
+    client = GameClient()
+    received = []
+    client.set_tank_selection_callback(lambda msg_type, data: received.append(data["ready_players"][0]))
+
+    try:
+        assert host.start_hosting("模拟链路测试房间")
+        assert relay.start() and relay.port != 12460
+        assert client.connect_to_host("127.0.0.1", relay.port, "中继客户端")
+        client_info = next(iter(host.clients.values()))
+        assert client_info.address[1] != client.client_socket.getsockname()[1], "主机看到的是中继的地址"
+
+        for i in range(20):
+            host.broadcast_message(MessageFactory.create_tank_selection_sync({}, [i]))
+        deadline = time.time() + 8.0
+        while len(received) < 20 and time.time() < deadline:
+            time.sleep(0.05)
+        assert received == list(range(20))
+
+        stats = relay.stats()
+        assert stats["downstream"]["packets"] >= 20 and stats["downstream"]["dropped"] > 0
+        client.disconnect()
+    finally:
+        relay.stop()
+        host.stop_hosting()
+    print("✅ 网络模拟中继正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_link_impairment_statistics,
+        test_impaired_socket_delays_sends,
+        test_relay_lobby_over_lossy_link,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有网络模拟测试通过")
@@ -92,7 +92,7 @@ class NetworkTestSuite:
         host = GameHost()
         latencies = []
         
-        def on_input_received(client_id, keys_pressed, keys_released):
+        def on_input_received(client_id, commands):
             # 记录接收时间
             receive_time = time.time()
             # 从消息中提取发送时间（这里简化处理）
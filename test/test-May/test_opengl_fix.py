@@ -20,6 +20,7 @@ def test_network_client_thread_safety():
     try:
         from multiplayer.network_views import NetworkClientView
         from multiplayer.udp_client import GameClient
+        from multiplayer.mailbox import Mailbox
         
         # 创建客户端视图
         client_view = NetworkClientView()
@@ -27,7 +28,7 @@ def test_network_client_thread_safety():
         # 验证初始化
         assert hasattr(client_view, 'pending_updates'), "缺少 pending_updates 属性"
         assert hasattr(client_view, 'pending_disconnection'), "缺少 pending_disconnection 属性"
-        assert isinstance(client_view.pending_updates, list), "pending_updates 应该是列表"
+        assert isinstance(client_view.pending_updates, Mailbox), "pending_updates 应该是有界信箱"
         
         print("✅ 客户端视图初始化正确")
         
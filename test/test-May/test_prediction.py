@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+测试客户端本地预测与服务器校正
+
+验证输入在下一个固定步长生效且每步应用一条指令、预测与主机一致时不校正、主机状态不同时从服务器状态重放，
+以及输入序号和应用时间在快照中的传递（应用时间不随tick变化，经过时间由客户端计算）
+"""
+
+import sys
+import os
+import math
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymunk
+
+from tank_controls import (CONTROL_FORWARD, CONTROL_TURN_LEFT, PYMUNK_PLAYER_MAX_SPEED,
+                           apply_control_press)
+from multiplayer.prediction import LocalTankPredictor
+from multiplayer.state_codec import encode_game_state, decode_game_state
+from multiplayer.state_snapshot import build_game_state
+from multiplayer.snapshot_delta import compute_delta
+from multiplayer.udp_client import GameClient
+from simulation import Simulation
+
+DT = 1 / 60
+
+
+def _make_world(x=100.0, y=100.0):
+    """创建与GameView相同阻尼的物理空间和一个坦克body"""
+    space = pymunk.Space()
+    space.damping = 0.8
+    body = pymunk.Body(1, pymunk.moment_for_box(1, (20, 20)))
+    body.position = (x, y)
+    body.angle = math.pi / 2  # 朝上
+    space.add(body, pymunk.Poly.create_box(body, (20, 20)))
+    return space, body
+
+
+def _server_view(body, seq, age_ms):
+    return {"id": "client_1", "pos": [body.position.x, body.position.y],
+            "ang": 90 - math.degrees(body.angle), "hp": 5, "seq": seq, "age": age_ms}
+
+
+def test_input_applies_immediately():
+    """按键在下一个固定步长改变本地坦克速度，不等待主机；不足一步的帧不推进"""
+    print("🧪 测试输入立即生效...")
+    space, body = _make_world()
+    predictor = LocalTankPredictor(body, space)
+    predictor.apply_input(1, CONTROL_FORWARD, True, now=0.0)
+    assert predictor.step(DT / 2, now=DT / 2) == 0 and body.velocity.y == 0
+    assert predictor.step(DT / 2, now=DT) == 1
+    assert body.velocity.y > PYMUNK_PLAYER_MAX_SPEED * 0.99, f"速度未设置: {body.velocity}"  # 步进后有阻尼
+    assert body.position.y > 100.0, "坦克应立即向前移动"
+    print("✅ 输入立即生效")
+
+
+def test_one_command_per_fixed_step():
+    """一帧推进多步时每步应用一条指令，预测帧都使用固定步长，结束时刻按步长倒推"""
+    space, body = _make_world()
+    predictor = LocalTankPredictor(body, space)
+    predictor.apply_input(1, CONTROL_FORWARD, True, now=0.0)
+    predictor.apply_input(2, CONTROL_TURN_LEFT, True, now=0.0)
+    predictor.apply_input(2, CONTROL_FORWARD, False, now=0.0)
+    assert predictor.step(DT * 3, now=1.0) == 3
+    frames = list(predictor.frames)
+    assert [[seq for seq, _, _ in frame.inputs] for frame in frames] == [[1], [2, 2], []]
+    assert all(abs(frame.dt - DT) < 1e-12 for frame in frames)
+    assert abs(frames[0].end_time - (1.0 - 2 * DT)) < 1e-9 and frames[-1].end_time == 1.0
+    assert body.velocity.length < 1e-6 and body.angular_velocity > 0
+
+
+def test_matching_server_state_needs_no_correction():
+    """主机按相同规则模拟得到的状态与预测一致时不重放"""
+    print("🧪 测试预测与主机一致...")
+    space, body = _make_world()
+    predictor = LocalTankPredictor(body, space)
+
+    server_space, server_body = _make_world()
+    predictor.apply_input(1, CONTROL_FORWARD, True, now=0.0)
+    apply_control_press(server_body, CONTROL_FORWARD)
+
+    for frame in range(1, 11):
+        predictor.step(DT, now=frame * DT)
+    for _ in range(5):
+        server_space.step(DT)
+
+    # 主机在处理输入5帧后发出快照
+    corrected = predictor.reconcile(_server_view(server_body, 1, 5 * DT * 1000 + 1))
+    assert not corrected, "状态一致时不应重放"
+    assert predictor.corrections == 0
+    assert len(predictor.frames) <= 6, "已确认时刻之前的旧帧应被丢弃"
+    print("✅ 预测一致时保持本地状态")
+
+
+def test_mismatch_replays_unacked_inputs():
+    """主机状态与预测不同（例如被撞开）时，从服务器状态重放未确认的输入"""
+    print("🧪 测试校正与重放...")
+    space, body = _make_world()
+    predictor = LocalTankPredictor(body, space)
+
+    predictor.apply_input(1, CONTROL_FORWARD, True, now=0.0)
+    for frame in range(1, 6):
+        predictor.step(DT, now=frame * DT)
+    predictor.apply_input(2, CONTROL_TURN_LEFT, True, now=5 * DT)
+    for frame in range(6, 11):
+        predictor.step(DT, now=frame * DT)
+    predicted_y = body.position.y
+
+    # 主机在第2帧结束时把坦克向右推开了50像素，只确认了输入1
+    server_space, server_body = _make_world(150.0, 100.0)
+    apply_control_press(server_body, CONTROL_FORWARD)
+    server_space.step(DT)
+    server_space.step(DT)
+    corrected = predictor.reconcile(_server_view(server_body, 1, 2 * DT * 1000 + 1))
+
+    assert corrected, "状态不一致时应进行重放"
+    assert abs(body.position.x - 150.0) < 1.0, f"应以服务器位置为起点: {body.position}"
+    assert abs(body.position.y - predicted_y) < 5.0, "重放后应保留未确认输入带来的移动"
+    assert body.angular_velocity > 0, "未确认的转向输入应被重放"
+    assert predictor.acked_seq == 1 and 1 in predictor.input_times
+    print("✅ 校正后重放未确认输入")
+
+
+def test_stale_snapshot_ignored():
+    """确认序号倒退的乱序快照被忽略"""
+    space, body = _make_world()
+    predictor = LocalTankPredictor(body, space)
+    predictor.apply_input(1, CONTROL_FORWARD, True, now=0.0)
+    predictor.apply_input(2, CONTROL_TURN_LEFT, True, now=0.0)
+    predictor.step(DT, now=DT)
+    predictor.reconcile({"pos": [body.position.x, body.position.y], "seq": 2, "age": 0})
+    assert not predictor.reconcile({"pos": [0.0, 0.0], "seq": 1, "age": 0})
+    assert body.position.x > 50.0, "旧快照不应改变本地坦克"
+
+
+def test_seq_and_applied_time_in_binary_snapshot():
+    """输入序号、应用时间和快照发送时间在二进制快照中往返一致"""
+    state = {
+        "tanks": [{"id": "client_1", "pos": [10.0, 20.0], "ang": 0.0, "hp": 5,
+                   "type": "blue", "seq": 70000, "at": 0xFFFFFFF0}],
+        "bullets": [],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False},
+        "t": 0x10
+    }
+    decoded = decode_game_state(encode_game_state(state))
+    tank = decoded["tanks"][0]
+    assert tank["seq"] == 70000 and tank["at"] == 0xFFFFFFF0, f"序号往返错误: {tank}"
+    assert decoded["t"] == 0x10
+
+
+def test_applied_time_not_resent_and_age_derived():
+    """应用时间只在序号变化时改变，增量不重发；客户端按快照发送时间算出经过的毫秒数（处理回绕）"""
+    sim = Simulation(mode="pvp", player_ids=["host", "client_1"], map_layout=[])
+    applied = {"client_1": (5, 1000.0)}
+    first = build_game_state(sim, applied)
+    sim.step(DT)
+    second = build_game_state(sim, applied)
+    assert not compute_delta(first, second).get("tanks"), "坦克静止且没有新输入时增量不应包含坦克"
+    applied["client_1"] = (6, 1000.5)
+    changes = compute_delta(second, build_game_state(sim, applied))["tanks"]
+    assert changes == [{"id": "client_1", "seq": 6, "at": 1000500}]
+
+    client = GameClient()
+    client._send = lambda message: None
+    data = {"tick": 1, "t": 0x10, "tanks": [{"id": "client_1", "pos": [1.0, 2.0], "seq": 6, "at": 0xFFFFFFF0},
+                                            {"id": "host", "pos": [3.0, 4.0]}],
+            "bullets": [], "round_info": {}}
+    tanks = client._resolve_game_state(data)["tanks"]
+    assert tanks[0]["age"] == 32 and "age" not in tanks[1]
+
+
+def test_host_ignores_out_of_order_input():
+    """主机丢弃序号倒退的输入指令"""
+    from multiplayer.udp_host import ClientInfo
+    info = ClientInfo("client_1", ("127.0.0.1", 1), "测试")
+    assert info.receive_commands(2, [1]) == [(2, 1)]
+    assert not info.receive_commands(1, [2]), "旧指令应被丢弃"
+    assert info.input_mask == 1 and info.last_input_seq == 2
+
+
+if __name__ == "__main__":
+    tests = [
+        test_input_applies_immediately,
+        test_one_command_per_fixed_step,
+        test_matching_server_state_needs_no_correction,
+        test_mismatch_replays_unacked_inputs,
+        test_stale_snapshot_ignored,
+        test_seq_and_applied_time_in_binary_snapshot,
+        test_applied_time_not_resent_and_age_derived,
+        test_host_ignores_out_of_order_input,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有预测测试通过")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+测试可靠控制通道
+
+验证乱序和重复的可靠消息按序只交付一次、累计确认清除待确认消息、超时按退避重传、
+确认优先捎带（包括主机二进制快照的包尾）否则单独发送，以及在10%丢包的链路上加入和坦克选择消息全部按序送达
+"""
+
+import sys
+import os
+import random
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.reliable import ReliableChannel, INITIAL_RTO, ACK_DELAY
+from multiplayer.udp_host import GameHost, ClientInfo
+from multiplayer.state_codec import CODEC_BINARY, CODEC_JSON
+from multiplayer.udp_client import GameClient
+from multiplayer.udp_messages import UDPMessage, MessageType, MessageFactory
+
+
+class _LossySocket:
+    """按给定概率丢弃发送数据的套接字包装，drop_first 指定无条件丢弃的前几个数据报"""
+
+    def __init__(self, sock, loss, seed, drop_first=0):
+        self.sock = sock
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.drop_first = drop_first
+        self.dropped = 0
+
+    def sendto(self, data, addr):
+        if self.drop_first > 0 or self.rng.random() < self.loss:
+            self.drop_first = max(0, self.drop_first - 1)
+            self.dropped += 1
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def _sync(index):
+    return MessageFactory.create_tank_selection_sync({"host": {"tank_type": "green", "index": index}}, [])
+
+
+def test_in_order_delivery_and_dedup():
+    """乱序到达的消息暂存到缺口补齐，重复消息丢弃但仍会确认"""
+    print("🧪 测试按序交付与去重...")
+    sender = ReliableChannel()
+    receiver = ReliableChannel("client_1")
+    packets = [sender.prepare(_sync(i), 0.0) for i in range(3)]
+    messages = [UDPMessage.from_bytes(p) for p in packets]
+
+    assert receiver.receive(messages[1], 0.0) == []
+    assert receiver.receive(messages[2], 0.0) == []
+    ready = receiver.receive(messages[0], 0.0)
+    assert [m.data["selected_tanks"]["host"]["index"] for m in ready] == [0, 1, 2]
+    assert receiver.receive(UDPMessage.from_bytes(packets[1]), 0.0) == []
+    assert receiver.duplicates == 1
+
+    # 捎带确认：下一条普通消息带上累计确认，发送方清除全部待确认消息
+    heartbeat = MessageFactory.create_heartbeat("client_1")
+    receiver.stamp(heartbeat)
+    assert heartbeat.ack == 3 and receiver.next_deadline() is None
+    passed = sender.receive(UDPMessage.from_bytes(heartbeat.to_bytes()), 0.0)
+    assert [m.type for m in passed] == [MessageType.HEARTBEAT], "普通消息原样交付"
+    assert not sender.unacked
+    print("✅ 按序交付与去重正确")
+
+
+def test_retransmit_backoff_and_explicit_ack():
+    """超时按退避重传；没有可捎带的消息时到期发出单独确认"""
+    sender = ReliableChannel()
+    receiver = ReliableChannel("client_1")
+    sender.prepare(_sync(0), 0.0)
+
+    assert sender.poll(INITIAL_RTO - 0.01) == []
+    assert len(sender.poll(INITIAL_RTO)) == 1
+    assert sender.poll(INITIAL_RTO + 0.1) == [], "第二次重传的超时应加倍"
+    retransmitted = sender.poll(INITIAL_RTO * 3)
+    assert len(retransmitted) == 1 and sender.retransmits == 2
+
+    receiver.receive(UDPMessage.from_bytes(retransmitted[0]), 1.0)
+    assert receiver.poll(1.0) == [], "确认先等待捎带"
+    acks = receiver.poll(1.0 + ACK_DELAY)
+    ack = UDPMessage.from_bytes(acks[0])
+    assert ack.type == MessageType.RELIABLE_ACK and ack.ack == 1 and ack.player_id == "client_1"
+    assert sender.receive(ack, 1.1) == [] and not sender.unacked
+
+
+class _RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append(data)
+        return len(data)
+
+
+def test_binary_snapshot_carries_ack():
+    """主机的二进制快照在包尾捎带各客户端自己的确认，不再单独发送确认；JSON会话仍单独确认"""
+    host = GameHost(host_port=12477)
+    host.broadcast_interval = 0
+    host.host_socket = _RecordingSocket()
+    clients = [ClientInfo("client_1", ("127.0.0.1", 1), "甲", codec=CODEC_BINARY),
+               ClientInfo("client_2", ("127.0.0.1", 2), "乙", codec=CODEC_BINARY),
+               ClientInfo("client_3", ("127.0.0.1", 3), "丙", codec=CODEC_JSON)]
+    senders = []
+    for client in clients:
+        host.clients[client.client_id] = client
+        sender = ReliableChannel(client.client_id)
+        senders.append(sender)
+        for i in range(2 if client.client_id == "client_1" else 1):
+            message = UDPMessage.from_bytes(sender.prepare(_sync(i), 0.0))
+            client.channel.receive(message, 0.0)
+
+    state = {"tanks": [], "bullets": [{"id": 1, "pos": [1.0, 2.0], "ang": 0.0, "own": None}],
+             "round_info": {"sc": [0, 0], "ro": False, "go": False}}
+    host.broadcast_game_state(state)
+    received = [UDPMessage.from_bytes(data) for data in host.host_socket.sent]
+    assert [m.ack for m in received] == [2, 1, None]
+    assert all(m.type == MessageType.GAME_STATE and m.data["bullets"][0]["id"] == 1 for m in received)
+    assert "rack" not in received[0].data
+    for sender, message in zip(senders, received):
+        sender.receive(message, 0.0)
+    assert not senders[0].unacked and not senders[1].unacked and senders[2].unacked
+    assert clients[0].channel.poll(1.0) == [], "确认已随快照发出"
+    assert UDPMessage.from_bytes(clients[2].channel.poll(1.0)[0]).type == MessageType.RELIABLE_ACK
+
+
+def test_lossy_lobby_flow():
+    """双向10%丢包：加入响应丢失时重发加入请求，坦克选择同步全部按序送达"""
+    print("🧪 测试丢包链路上的大厅流程...")
+    host = GameHost(host_port=12459)
+    client = GameClient()
+    received = []
+    client.set_tank_selection_callback(lambda msg_type, data: received.append(data["selected_tanks"]["host"]["index"]))
+    selections = []
+    host.set_tank_selection_callback(lambda client_id, msg_type, data: selections.append(data["tank_type"]))
+
+    try:
+        assert host.start_hosting("丢包测试房间")
+        host.host_socket = _LossySocket(host.host_socket, 0.1, seed=7, drop_first=1)
+        assert client.connect_to_host("127.0.0.1", 12459, "丢包测试客户端")
+        assert len(host.clients) == 1, "重发的加入请求不应产生第二个客户端"
+        client.client_socket = _LossySocket(client.client_socket, 0.1, seed=11, drop_first=1)
+
+        for i in range(30):
+            host.broadcast_message(_sync(i))
+        for tank_type in ["green", "blue", "yellow"]:
+            client.send_message(MessageFactory.create_tank_selected(client.player_id, tank_type, ""))
+
+        deadline = time.time() + 8.0
+        while time.time() < deadline and (len(received) < 30 or len(selections) < 3):
+            time.sleep(0.05)
+        assert received == list(range(30)), f"同步消息应按序各送达一次: {received}"
+        assert selections == ["green", "blue", "yellow"]
+        assert host.host_socket.dropped > 0 and client.client_socket.dropped > 0
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+    print("✅ 丢包链路上的大厅流程正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_in_order_delivery_and_dedup,
+        test_retransmit_backoff_and_explicit_ack,
+        test_binary_snapshot_carries_ack,
+        test_lossy_lobby_flow,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有可靠通道测试通过")
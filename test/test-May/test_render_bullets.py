@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试客户端渲染子弹
+
+验证客户端按实体ID原地更新渲染子弹和坦克，只在实体出现和消失时分配/释放，
+且渲染子弹不创建Pymunk对象
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arcade
+import pymunk
+
+from tank_sprites import RenderBullet, BULLET_COLORS_BY_TANK_TYPE
+from multiplayer.network_views import NetworkClientView
+
+
+def _state(bullets, host_eid=1):
+    return {
+        "tanks": [{"id": "host", "eid": host_eid, "pos": [100.0, 100.0], "ang": 0.0, "hp": 5, "type": "green"}],
+        "bullets": [{"id": i, "pos": [x, 50.0], "ang": 10.0, "own": "host"} for i, x in bullets],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False}
+    }
+
+
+def _make_client_view():
+    """只初始化_sync_game_state所需属性的客户端视图（无需窗口）"""
+    view = NetworkClientView.__new__(NetworkClientView)
+    simulation = SimpleNamespace(tanks=[], scores=[0, 0])
+    view.game_view = SimpleNamespace(player_list=arcade.SpriteList(), bullet_list=arcade.SpriteList(),
+                                     space=pymunk.Space(), simulation=simulation, round_over=False,
+                                     set_scores=lambda scores: setattr(simulation, "scores", list(scores)))
+    view.game_client = Mock()
+    view.game_client.get_player_id.return_value = "client_1"
+    view.predictor = None
+    view.local_tank = None
+    view.render_bullets = {}
+    view.tank_sprites = {}
+    view.resync_pending = False
+    return view
+
+
+def test_render_bullet_has_no_physics():
+    """渲染子弹不分配Pymunk对象，同色子弹共用纹理"""
+    a = RenderBullet(1, 10.0, 20.0, 45.0)
+    b = RenderBullet(2, 30.0, 40.0, 0.0)
+    assert a.pymunk_body is None and a.pymunk_shape is None
+    assert a.texture is b.texture, "同色子弹应共用缓存纹理"
+    a.set_state(11.0, 21.0, 90.0)
+    assert (a.center_x, a.center_y, a.angle) == (11.0, 21.0, 90.0)
+
+
+def test_bullets_updated_in_place():
+    """已有子弹原地更新，新子弹才创建，消失的子弹被移除"""
+    print("🧪 测试子弹原地更新...")
+    view = _make_client_view()
+
+    NetworkClientView._sync_game_state(view, _state([(0, 150.0), (1, 160.0)]))
+    first = view.render_bullets[0]
+    assert len(view.game_view.bullet_list) == 2
+    assert first.color[:3] == BULLET_COLORS_BY_TANK_TYPE["green"], "子弹颜色应取自发射者的坦克类型"
+
+    NetworkClientView._sync_game_state(view, _state([(0, 155.0), (1, 165.0), (2, 170.0)]))
+    assert view.render_bullets[0] is first, "同一ID的子弹应原地更新而不是重建"
+    assert first.center_x == 155.0
+    assert sorted(view.render_bullets) == [0, 1, 2], f"子弹集合不正确: {sorted(view.render_bullets)}"
+
+    # 消失事件移除子弹
+    view._despawn_entity("bullet", 1)
+    assert sorted(view.render_bullets) == [0, 2] and len(view.game_view.bullet_list) == 2
+
+    # 完整快照后按实体集合对齐
+    view.resync_pending = True
+    NetworkClientView._sync_game_state(view, _state([]))
+    assert not view.render_bullets and len(view.game_view.bullet_list) == 0
+    print("✅ 子弹按ID原地更新")
+
+
+def test_tanks_bound_by_entity_id():
+    """坦克按实体ID绑定精灵，重生后的新ID复用解除绑定的精灵"""
+    print("🧪 测试坦克实体绑定...")
+    view = _make_client_view()
+    NetworkClientView._sync_game_state(view, _state([], host_eid=1))
+    tank = view.tank_sprites[1]
+    assert len(view.game_view.player_list) == 1 and tank.player_id == "host"
+    assert tank.pymunk_body in view.game_view.space.bodies, "新建的坦克精灵应加入物理空间"
+
+    view._despawn_entity("tank", 1)
+    NetworkClientView._sync_game_state(view, _state([], host_eid=7))
+    assert view.tank_sprites[7] is tank, "重生的坦克应复用空闲精灵"
+    assert len(view.game_view.player_list) == 1
+    print("✅ 坦克按实体ID绑定")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_render_bullet_has_no_physics,
+        test_bullets_updated_in_place,
+        test_tanks_bound_by_entity_id,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有渲染子弹测试通过")
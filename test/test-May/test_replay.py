@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+测试比赛录像与回放
+
+验证回放逐tick重现原比赛（状态哈希一致）、跳转到任意tick的结果与顺序回放相同、
+跳转时只解压需要的数据块、比赛之间重置比分时回放通过关键帧恢复、录制中的文件可以读取，以及录像文件足够小
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import MatchRecorder, ReplayReader, ReplayPlayer, ReplayFormatError
+from simulation import Simulation
+from tank_controls import CONTROL_FIRE, CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT
+
+DT = 1 / 60
+MOVE_CONTROLS = (CONTROL_FORWARD, CONTROL_BACKWARD, CONTROL_TURN_LEFT, CONTROL_TURN_RIGHT)
+
+
+def _random_inputs(rng, held, player_ids=("p1", "p2")):
+    """随机切换按住的方向键并偶尔开火（比真人操作更频繁）"""
+    inputs = {}
+    for pid in player_ids:
+        if rng.random() < 0.05:
+            control = rng.choice(MOVE_CONTROLS)
+            held[(pid, control)] = not held.get((pid, control), False)
+            inputs.setdefault(pid, []).append((control, held[(pid, control)]))
+        if rng.random() < 0.03:
+            inputs.setdefault(pid, []).extend([(CONTROL_FIRE, True), (CONTROL_FIRE, False)])
+    return inputs
+
+
+def _record_match(path, ticks, keyframe_interval=120, **sim_kwargs):
+    """录制一局随机输入的比赛，返回逐tick的状态哈希"""
+    sim = Simulation(mode="pvp", player_ids=("p1", "p2"), **sim_kwargs)
+    recorder = MatchRecorder(sim, path, keyframe_interval=keyframe_interval)
+    rng, held, hashes = random.Random(1), {}, {}
+    for _ in range(ticks):
+        sim.step(DT, _random_inputs(rng, held))
+        hashes[sim.tick] = sim.state_hash()
+    recorder.close()
+    return hashes
+
+
+def test_replay_reproduces_match_and_seeks():
+    """顺序回放每个tick的状态哈希都与原比赛相同；向前、向后跳转后的状态也相同"""
+    print("🧪 测试录像回放与跳转...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "match.tkrp")
+        hashes = _record_match(path, 1500, seed=3)
+        reader = ReplayReader(path)
+        assert (reader.start_tick, reader.end_tick) == (0, 1500)
+        assert reader.chunk_count == 13, "每120个tick一个关键帧"
+
+        player = ReplayPlayer(reader)
+        while not player.finished:
+            player.step()
+            assert player.simulation.state_hash() == hashes[player.tick], f"tick {player.tick} 回放结果不同"
+        assert player.resyncs == 0
+
+        for target in (700, 123, 1499, 1000, 0, 241):
+            player.seek(target)
+            assert player.tick == target
+            if target:
+                assert player.simulation.state_hash() == hashes[target], f"跳转到 {target} 后状态不同"
+        assert player.advance(10_000) == 1500 - 241 and player.finished
+
+        # 在两个块之间来回跳转不重复解压；块内向前跳转不解压其他块
+        player.seek(130)
+        player.seek(250)
+        cached = dict(reader._cache)
+        for target in (135, 255, 140, 260):
+            player.seek(target)
+            assert player.simulation.state_hash() == hashes[target]
+        assert reader._cache == cached and all(reader._cache[i] is cached[i] for i in cached)
+        player.seek(265)
+        assert list(reader._cache) == [1, 2]
+    print("✅ 录像回放与跳转正确")
+
+
+def test_reset_between_matches_and_partial_file():
+    """模拟在step之外被重置时回放按关键帧恢复；录制中的文件只读到已写出的数据块"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "server.tkrp")
+        sim = Simulation(mode="network_host", player_ids=[None, None], map_layout=[])
+        recorder = MatchRecorder(sim, path, keyframe_interval=100)
+        sim.set_player(0, "client_1")  # 录像按槽位记录输入，与玩家ID无关
+        sim.set_player(1, "client_2")
+        rng, held = random.Random(2), {}
+        for tick in range(1, 251):
+            sim.step(DT, _random_inputs(rng, held, ("client_1", "client_2")))
+            if tick == 150:
+                sim.scores = [1, 1]
+                sim.reset_match()
+                recorder.keyframe_next()
+        final_hash = sim.state_hash()
+
+        partial = ReplayReader(path)
+        assert partial.end_tick == 150, "录制中的文件应能读取已写出的部分"
+        recorder.close()
+
+        player = ReplayPlayer(ReplayReader(path))
+        player.advance(250)
+        assert player.tick == 250 and player.simulation.state_hash() == final_hash
+        assert player.resyncs == 1, "重置比赛后应从关键帧恢复一次"
+        assert player.simulation.player_ids == ["slot1", "slot2"]
+
+        empty = MatchRecorder(Simulation(mode="pvp", map_layout=[]), os.path.join(tmp, "empty.tkrp"))
+        empty.close()
+        assert not os.path.exists(empty.path), "没有录到任何tick时不保留文件"
+        with open(os.path.join(tmp, "bad.tkrp"), "wb") as f:
+            f.write(b"not a replay")
+        try:
+            ReplayReader(os.path.join(tmp, "bad.tkrp"))
+            assert False, "非录像文件应报错"
+        except ReplayFormatError:
+            pass
+
+
+def test_server_records_matches():
+    """专用服务器 --record：比赛开始后的tick写入录像，stop时关闭文件"""
+    from multiplayer.server import GameServer, parse_args
+    assert parse_args(["--record", "m.tkrp"]).record == "m.tkrp"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "server.tkrp")
+        server = GameServer(port=12465, map_index=0, record_path=path)
+        server.tick(DT)  # 没有玩家时不推进也不录制
+        server.pending_members.extend([(True, "client_1"), (True, "client_2")])
+        for _ in range(30):
+            server.tick(DT)
+        server.stop()
+        reader = ReplayReader(path)
+        assert reader.end_tick == server.simulation.tick == 30
+        player = ReplayPlayer(reader)
+        player.advance(30)
+        assert player.simulation.state_hash() == server.simulation.state_hash()
+
+
+def test_ten_minute_match_is_kilobytes():
+    """10分钟（36000 tick）的比赛录像在默认关键帧间隔下只有几十KB"""
+    print("🧪 测试录像大小...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.tkrp")
+        sim = Simulation(mode="pvp", player_ids=("p1", "p2"), max_score=1000)
+        recorder = MatchRecorder(sim, path)
+        rng, held = random.Random(1), {}
+        for _ in range(36000):
+            sim.step(DT, _random_inputs(rng, held))
+        recorder.close()
+        size = os.path.getsize(path)
+        assert size < 64 * 1024, f"录像过大: {size} 字节"
+        assert ReplayReader(path).chunk_count == 60
+    print(f"✅ 10分钟比赛录像 {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_replay_reproduces_match_and_seeks,
+        test_reset_between_matches_and_partial_file,
+        test_server_records_matches,
+        test_ten_minute_match_is_kilobytes,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有录像测试通过")
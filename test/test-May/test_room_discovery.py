@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试按变化通知的房间发现
+
+验证重复的广播包不触发回调，房间出现、信息改变、满员和过期分别以新增/更新/移除通知，
+以及过期堆只移除超时的房间、收到过新广播的房间重新入堆
+"""
+
+import sys
+import os
+import socket
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.udp_discovery import RoomDiscovery, MultiRoomAdvertiser
+from multiplayer.udp_messages import MessageFactory
+
+
+def _advertise(room_name="测试房间", current_players=1, max_players=4):
+    return MessageFactory.create_room_advertise(room_name, current_players, max_players, "pvp", 12346).to_bytes()
+
+
+def _recording_discovery(**kwargs):
+    discovery = RoomDiscovery(**kwargs)
+    changes, updates = [], []
+    discovery.set_room_change_callback(
+        lambda added, updated, removed: changes.append((sorted(added), sorted(updated), sorted(removed))))
+    discovery.set_room_update_callback(updates.append)
+    return discovery, changes, updates
+
+
+def test_notifies_only_on_change():
+    """重复广播不通知；人数变化为更新，满员为移除，空出名额后重新新增"""
+    print("🧪 测试房间变化通知...")
+    discovery, changes, updates = _recording_discovery()
+    for _ in range(5):
+        discovery._handle_discovery_message(_advertise(), "10.0.0.2")
+    assert changes == [(["10.0.0.2"], [], [])], "重复的广播包不应触发回调"
+    assert len(updates) == 1 and list(updates[0]) == ["10.0.0.2"]
+
+    discovery._handle_discovery_message(_advertise(current_players=2), "10.0.0.2")
+    discovery._handle_discovery_message(_advertise(current_players=4), "10.0.0.2")
+    discovery._handle_discovery_message(_advertise(current_players=4), "10.0.0.2")
+    discovery._handle_discovery_message(_advertise(current_players=3), "10.0.0.2")
+    assert changes[1:] == [([], ["10.0.0.2"], []), ([], [], ["10.0.0.2"]), (["10.0.0.2"], [], [])]
+    discovery._handle_discovery_message(b"garbage", "10.0.0.9")
+    assert len(changes) == 4 and len(discovery.expiry_heap) == 1
+
+    # 一轮多房间广播只通知一次
+    rooms = [{"room_id": i, "room_name": f"房间 #{i}", "current_players": 0,
+              "max_players": 2, "game_mode": "pvp"} for i in range(1, 21)]
+    advertiser = MultiRoomAdvertiser()
+    advertiser.rooms_provider = lambda: rooms
+    for message in advertiser.build_messages():
+        discovery._handle_discovery_message(message.to_bytes(), "10.0.0.3")
+    assert len(changes) == 7 and sum(len(added) for added, _, _ in changes[4:]) == 20
+    for message in advertiser.build_messages():
+        discovery._handle_discovery_message(message.to_bytes(), "10.0.0.3")
+    assert len(changes) == 7
+    assert len(discovery.get_available_rooms()) == 21
+    print("✅ 房间变化通知正确")
+
+
+def test_expiry_heap_removes_only_stale_rooms():
+    """只有超时的房间被移除；之后收到过广播的房间按最后收到时间重新入堆"""
+    discovery, changes, _ = _recording_discovery(room_timeout=5.0)
+    discovery._handle_discovery_message(_advertise("甲"), "10.0.0.1")
+    discovery._handle_discovery_message(_advertise("乙"), "10.0.0.2")
+    discovery._handle_discovery_message(_advertise("丙", current_players=4), "10.0.0.3")  # 满员，不在列表中
+    for room in discovery.rooms.values():
+        room.last_seen = 100.0
+    discovery.expiry_heap = [(105.0, key) for key in sorted(discovery.rooms)]
+    discovery.rooms["10.0.0.2"].last_seen = 103.0  # 乙在之后又收到过广播
+    changes.clear()
+
+    assert discovery.expire_rooms(104.0) == {} and not changes
+    removed = discovery.expire_rooms(105.5)
+    assert sorted(removed) == ["10.0.0.1"], "满员的房间不在列表中，移除时不通知"
+    assert sorted(discovery.rooms) == ["10.0.0.2"]
+    assert discovery.expiry_heap == [(108.0, "10.0.0.2")]
+    assert changes == [([], [], ["10.0.0.1"])]
+
+    assert sorted(discovery.expire_rooms(108.0)) == ["10.0.0.2"]
+    assert not discovery.rooms and not discovery.expiry_heap and not discovery.get_available_rooms()
+
+
+def test_live_discovery_adds_and_expires():
+    """真实套接字：收到广播后新增房间，停止广播后由过期定时器移除"""
+    print("🧪 测试房间过期定时器...")
+    discovery, changes, _ = _recording_discovery(broadcast_port=12469, room_timeout=0.3)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        discovery.start_discovery()
+        assert discovery.running
+        for _ in range(3):
+            sender.sendto(_advertise(), ("127.0.0.1", 12469))
+        deadline = time.time() + 2.0
+        while len(changes) < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        assert [change[0] for change in changes[:1]] == [["127.0.0.1"]]
+        assert changes[1:] == [([], [], ["127.0.0.1"])], "停止广播后应过期移除"
+        assert discovery.expiry_timer is None, "没有房间时不安排检查"
+    finally:
+        sender.close()
+        discovery.stop_discovery()
+    print("✅ 房间过期定时器正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_notifies_only_on_change,
+        test_expiry_heap_removes_only_stale_rooms,
+        test_live_discovery_adds_and_expires,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有房间发现测试通过")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试多房间服务器
+
+验证各房间拥有独立的物理空间、共享套接字上的消息按房间分发、
+房间列表分包广播并被客户端发现，以及客户端通过真实套接字加入指定房间
+"""
+
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.room_server import MultiRoomServer
+from multiplayer.udp_discovery import MultiRoomAdvertiser, RoomDiscovery
+from multiplayer.udp_messages import UDPMessage, MessageFactory
+from multiplayer.udp_client import GameClient
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+        return len(data)
+
+
+def _attach_fake_socket(server):
+    sock = _FakeSocket()
+    server.server_socket = sock
+    for room in server.rooms.values():
+        room.game_host.attach_socket(sock, room.room_name)
+    return sock
+
+
+def test_rooms_are_independent():
+    """每个房间有自己的模拟和物理空间"""
+    server = MultiRoomServer(3, port=12450)
+    spaces = {id(room.simulation.space) for room in server.rooms.values()}
+    assert len(spaces) == 3, "各房间应使用独立的pymunk.Space"
+    assert [room["room_id"] for room in server.get_room_list()] == [1, 2, 3]
+
+
+def test_packets_routed_by_room():
+    """加入请求按room_id分发，之后的消息按客户端ID找到房间"""
+    print("🧪 测试按房间分发...")
+    server = MultiRoomServer(3, port=12450)
+    sock = _attach_fake_socket(server)
+    addr = ("127.0.0.1", 40000)
+
+    server.handle_packet(MessageFactory.create_join_request("A", room_id=2).to_bytes(), addr)
+    response = UDPMessage.from_bytes(sock.sent[-1][0])
+    assert response.data["success"], "加入存在的房间应成功"
+    client_id = response.data["player_id"]
+    assert server.client_rooms[client_id] == 2
+    assert client_id in server.rooms[2].game_host.clients
+    assert not server.rooms[1].game_host.clients and not server.rooms[3].game_host.clients
+
+    server.handle_packet(MessageFactory.create_join_request("B", room_id=9).to_bytes(), addr)
+    assert not UDPMessage.from_bytes(sock.sent[-1][0]).data["success"], "不存在的房间应拒绝"
+
+    server.handle_packet(MessageFactory.create_player_input(client_id, 1, [1]).to_bytes(), addr)
+    assert server.rooms[2].pending_inputs.drain() == [(client_id, [(1, 1)])], "输入应进入客户端所在房间"
+    assert not server.rooms[1].pending_inputs.drain()
+
+    server.handle_packet(MessageFactory.create_disconnect(client_id).to_bytes(), addr)
+    server._prune_client_rooms()
+    assert client_id not in server.client_rooms
+    print("✅ 按房间分发正确")
+
+
+def test_room_list_advertise_chunked_and_discovered():
+    """房间列表分包广播，客户端按 主机#房间 记录每个房间"""
+    rooms = [{"room_id": i, "room_name": f"房间 #{i}", "current_players": 0,
+              "max_players": 2, "game_mode": "pvp"} for i in range(1, 21)]
+    advertiser = MultiRoomAdvertiser()
+    advertiser.host_port = 13000
+    advertiser.rooms_provider = lambda: rooms
+    messages = advertiser.build_messages()
+    assert len(messages) == 3, "20个房间应分成3个广播包"
+
+    discovery = RoomDiscovery()
+    for message in messages:
+        discovery._handle_discovery_message(message.to_bytes(), "192.168.1.5")
+    found = discovery.get_available_rooms()
+    assert len(found) == 20
+    room = found["192.168.1.5#7"]
+    assert (room.room_id, room.host_port, room.room_name) == (7, 13000, "房间 #7")
+
+
+def test_clients_join_room_over_socket():
+    """两个客户端通过共享端口加入同一房间并收到快照"""
+    print("🧪 测试真实套接字加入房间...")
+    server = MultiRoomServer(4, port=12451, tick_rate=60, map_index=0)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    states = []
+    a, b = GameClient(), GameClient()
+    b.set_callbacks(game_state=states.append)
+    try:
+        assert a.connect_to_host("127.0.0.1", 12451, "A", room_id=3)
+        assert b.connect_to_host("127.0.0.1", 12451, "B", room_id=3)
+        deadline = time.time() + 3.0
+        while not states and time.time() < deadline:
+            time.sleep(0.05)
+        assert states, "客户端应收到房间3的快照"
+        assert {t["id"] for t in states[-1]["tanks"]} == {a.player_id, b.player_id}
+        assert server.rooms[3].match_running and not server.rooms[1].match_running
+    finally:
+        a.disconnect()
+        b.disconnect()
+        server.running = False
+        thread.join(timeout=3.0)
+    print("✅ 客户端加入指定房间")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_rooms_are_independent,
+        test_packets_routed_by_room,
+        test_room_list_advertise_chunked_and_discovered,
+        test_clients_join_room_over_socket,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有多房间服务器测试通过")
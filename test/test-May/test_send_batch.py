@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试批量发送层
+
+验证广播只序列化一次并在广播结束时一次性发出、发送失败计入客户端计数而不中断批次，
+以及多房间服务器每个tick只冲刷一次共享批次
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.room_server import MultiRoomServer
+from multiplayer.send_batch import SendBatch
+from multiplayer.udp_host import GameHost, ClientInfo
+from multiplayer.udp_messages import MessageFactory
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身，可指定发送失败的地址"""
+
+    def __init__(self, failing=()):
+        self.sent = []
+        self.failing = set(failing)
+
+    def sendto(self, data, addr):
+        if addr in self.failing:
+            raise OSError("网络不可达")
+        self.sent.append((data, addr))
+        return len(data)
+
+
+def _host_with_clients(count):
+    host = GameHost(host_port=12457)
+    host.broadcast_interval = 0
+    for i in range(count):
+        client_id = f"client_{i}"
+        host.clients[client_id] = ClientInfo(client_id, ("127.0.0.1", 41000 + i), client_id)
+    return host
+
+
+def test_broadcast_serializes_once():
+    """相同编码和基准的客户端共用一个序列化结果，广播结束时一次发出"""
+    print("🧪 测试批量广播...")
+    host = _host_with_clients(4)
+    host.host_socket = _FakeSocket()
+    host.broadcast_game_state({"tanks": [], "bullets": [], "round_info": {}})
+
+    assert len(host.host_socket.sent) == 4 and not host.send_batch.queue
+    assert len({id(data) for data, _ in host.host_socket.sent}) == 1, "应只序列化一次"
+    assert host.send_batch.flushes == 1 and host.send_batch.datagrams_sent == 4
+
+    host.broadcast_message(MessageFactory.create_heartbeat("host"))
+    assert len(host.host_socket.sent) == 8
+    print("✅ 广播只序列化一次")
+
+
+def test_send_errors_counted_per_client():
+    """发送失败计入客户端计数，其余客户端照常发送"""
+    host = _host_with_clients(3)
+    host.host_socket = _FakeSocket(failing=[("127.0.0.1", 41001)])
+    for _ in range(2):
+        host.broadcast_game_state({"tanks": [], "bullets": [], "round_info": {}})
+
+    assert host.clients["client_1"].send_errors == 2
+    assert host.clients["client_0"].send_errors == 0
+    assert len(host.host_socket.sent) == 4
+
+    batch = SendBatch()
+    batch.add(b"x", ("127.0.0.1", 41001))
+    assert batch.flush(_FakeSocket(failing=[("127.0.0.1", 41001)])) == 0
+    assert batch.errors_by_address == {("127.0.0.1", 41001): 1}, "没有客户端信息时按地址计数"
+
+
+def test_room_server_flushes_once_per_tick():
+    """多房间服务器的所有房间共用批次，tick结束时统一冲刷"""
+    server = MultiRoomServer(3, port=12457, map_index=0)
+    sock = _FakeSocket()
+    server.server_socket = sock
+    for room_id, room in server.rooms.items():
+        room.game_host.attach_socket(sock, room.room_name)
+        room.game_host.broadcast_interval = 0
+        for slot in range(2):
+            client_id = f"r{room_id}_{slot}"
+            room.game_host.clients[client_id] = ClientInfo(client_id, ("127.0.0.1", 42000 + room_id * 10 + slot), client_id)
+            room._on_client_join(client_id, client_id)
+
+    assert all(room.game_host.send_batch is server.send_batch for room in server.rooms.values())
+    server.tick(server.tick_interval)
+    assert len(sock.sent) == 6, "每个房间两个客户端各收到一个快照"
+    assert server.send_batch.flushes == 1, "一个tick只冲刷一次"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_broadcast_serializes_once,
+        test_send_errors_counted_per_client,
+        test_room_server_flushes_once_per_tick,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有批量发送测试通过")
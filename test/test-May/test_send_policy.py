@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试按客户端的自适应发送频率和兴趣过滤
+
+验证从确认估计往返时间和丢包率、链路差的客户端降低发送频率、
+远离坦克的子弹对该客户端过滤并以消失事件通知（直到确认前随增量重发），以及子弹回到兴趣范围后重新发送
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.send_policy import LinkQuality, choose_rate_divisor, bullet_out_of_interest
+from multiplayer.udp_host import GameHost, ClientInfo
+from multiplayer.udp_messages import UDPMessage
+import multiplayer.udp_host as udp_host
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+        return len(data)
+
+
+def _state(tank_pos, bullets):
+    return {
+        "tanks": [{"id": "client_1", "eid": 1, "pos": list(tank_pos), "ang": 0.0, "hp": 5, "type": "green"}],
+        "bullets": [{"id": bid, "pos": list(pos), "ang": 0.0, "own": "client_1"} for bid, pos in bullets],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False},
+    }
+
+
+def test_link_quality_and_rate():
+    """确认带来往返时间样本，跳过的tick计为丢失；链路差时降频"""
+    print("🧪 测试链路质量估计...")
+    link = LinkQuality()
+    for tick in range(1, 6):
+        link.on_sent(tick, 10.0 + tick * 0.1)
+    link.on_ack(1, 10.15)
+    assert abs(link.rtt - 0.05) < 1e-9 and link.loss_rate == 0.0
+    link.on_ack(4, 10.6)   # tick 2、3 未确认，视为丢失
+    assert 0.0 < link.loss_rate < 0.1 and list(link.sent_times) == [5]
+    link.on_ack(3, 10.7)   # 已计为丢失的乱序确认被忽略
+    assert list(link.sent_times) == [5]
+
+    assert choose_rate_divisor(0.05, 0.0) == 1
+    assert choose_rate_divisor(0.2, 0.0) == 2
+    assert choose_rate_divisor(0.05, 0.25) == 3
+    assert choose_rate_divisor(None, 0.0) == 1
+    print("✅ 链路质量与降频正确")
+
+
+def test_slow_client_gets_fewer_snapshots():
+    """降频的客户端只收到部分tick，其他客户端照常接收"""
+    host = GameHost(host_port=12458)
+    host.host_socket = _FakeSocket()
+    host.broadcast_interval = 1.0 / 30.0
+    good = ClientInfo("good", ("127.0.0.1", 43001), "good")
+    slow = ClientInfo("slow", ("127.0.0.1", 43002), "slow")
+    slow.rate_divisor = 3
+    host.clients = {"good": good, "slow": slow}
+
+    clock = [1000.0]
+    real_time = udp_host.time.time
+    udp_host.time.time = lambda: clock[0]
+    try:
+        for _ in range(9):
+            host.broadcast_game_state(_state((100, 100), []))
+            clock[0] += host.broadcast_interval + 1e-4
+    finally:
+        udp_host.time.time = real_time
+
+    counts = {addr: 0 for addr in (good.address, slow.address)}
+    for _, addr in host.host_socket.sent:
+        counts[addr] += 1
+    assert counts[good.address] == 9
+    assert counts[slow.address] == 3, f"降频客户端应只收到1/3的快照: {counts}"
+
+
+def test_far_receding_bullets_culled():
+    """远离坦克的子弹不再发送并产生消失事件；返回兴趣范围后重新发送"""
+    print("🧪 测试兴趣过滤...")
+    assert not bullet_out_of_interest((0, 0), (500, 0), None), "没有上一帧位置时不过滤"
+    assert bullet_out_of_interest((0, 0), (500, 0), (490, 0))
+    assert not bullet_out_of_interest((0, 0), (500, 0), (510, 0)), "正在接近的子弹不过滤"
+    assert not bullet_out_of_interest((0, 0), (200, 0), (190, 0)), "兴趣半径内不过滤"
+
+    host = GameHost(host_port=12458)
+    host.host_socket = _FakeSocket()
+    host.broadcast_interval = 0
+    client = ClientInfo("client_1", ("127.0.0.1", 43003), "client_1")
+    host.clients = {"client_1": client}
+
+    def last_message():
+        return UDPMessage.from_bytes(host.host_socket.sent[-1][0]).data
+
+    host.broadcast_game_state(_state((100, 100), [(7, (600, 100)), (8, (150, 100))]))
+    client.acked_tick = 1
+    host.broadcast_game_state(_state((100, 100), [(7, (616, 100)), (8, (166, 100))]))
+    data = last_message()
+    assert data["base"] == 1 and data["removed"] == [7], "远离的子弹应从该客户端的状态中移除"
+    assert [2, "despawn", "bullet", 7] in data["events"]
+
+    # 确认之前，过滤事件随后续增量重发
+    host.broadcast_game_state(_state((100, 100), [(7, (632, 100)), (8, (182, 100))]))
+    data = last_message()
+    assert [2, "despawn", "bullet", 7] in data["events"]
+    assert all(b["id"] != 7 for b in data["bullets"])
+
+    # 反弹后接近，保持时间过后重新作为新实体发送
+    client.culled_bullets[7] -= 1.0
+    client.acked_tick = 3
+    host.broadcast_game_state(_state((100, 100), [(7, (616, 100)), (8, (198, 100))]))
+    data = last_message()
+    assert not data.get("events")
+    returned = next(b for b in data["bullets"] if b["id"] == 7)
+    assert returned["pos"] == [616.0, 100.0] and "own" in returned, "重新进入的子弹应发送完整数据"
+    assert not client.culled_bullets
+    print("✅ 兴趣过滤正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_link_quality_and_rate,
+        test_slow_client_gets_fewer_snapshots,
+        test_far_receding_bullets_culled,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有发送策略测试通过")
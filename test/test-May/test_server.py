@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试专用无界面服务器
+
+验证多人模块在没有arcade时可以导入、服务器在两个槽位都有玩家时开始比赛、
+按客户端输入推进模拟并广播快照，以及命令行参数解析
+"""
+
+import sys
+import os
+import subprocess
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maps import ALL_MAP_LAYOUTS
+from multiplayer.server import GameServer, parse_args
+from multiplayer.udp_host import ClientInfo
+from multiplayer.udp_messages import UDPMessage
+from multiplayer.input_commands import CONTROL_BITS
+from tank_controls import CONTROL_FORWARD
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append(data)
+        return len(data)
+
+
+def _join(server, client_id):
+    """模拟客户端加入（不经过网络线程）"""
+    server.game_host.clients[client_id] = ClientInfo(client_id, ("127.0.0.1", 1), client_id)
+    server._on_client_join(client_id, client_id)
+
+
+def test_server_imports_without_arcade():
+    """没有arcade时多人模块和服务器仍可导入"""
+    code = ("import sys; sys.modules['arcade'] = None\n"
+            "import multiplayer, multiplayer.server\n"
+            "assert 'NetworkHostView' not in multiplayer.__all__")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_match_starts_and_runs_inputs():
+    """两个客户端加入后开始比赛，输入推进坦克并广播快照"""
+    print("🧪 测试专用服务器比赛流程...")
+    server = GameServer(port=12449, tick_rate=30, map_index=0)
+    assert server.substeps == 2, "30Hz下每个tick应分两个物理子步"
+    assert server.simulation.map_layout is ALL_MAP_LAYOUTS[0]
+    assert server.game_host.get_current_player_count() == 0, "专用服务器本身不占玩家名额"
+    socket = _FakeSocket()
+    server.game_host.host_socket = socket
+    server.game_host.broadcast_interval = 0
+
+    _join(server, "client_a")
+    server.tick(server.tick_interval)
+    assert not server.match_running and not socket.sent, "只有一个玩家时不应开始比赛"
+
+    _join(server, "client_b")
+    server.tick(server.tick_interval)
+    assert server.match_running and server.slots == ["client_a", "client_b"]
+
+    start_y = server.simulation.tank_for("client_a").center_y
+    server._on_input_received("client_a", [(1, CONTROL_BITS[CONTROL_FORWARD])])
+    for _ in range(15):
+        server.tick(server.tick_interval)
+    assert server.simulation.tank_for("client_a").center_y > start_y + 50, "输入应推进坦克"
+    assert abs(server.simulation.total_time - 16 * server.tick_interval) < 1e-9
+
+    state = UDPMessage.from_bytes(socket.sent[-1]).data
+    tank = next(t for t in state["tanks"] if t["id"] == "client_a")
+    assert tank["seq"] == 1, "快照应回传已应用的输入序号"
+
+    # 有玩家离开时暂停，新玩家补位后重新开始
+    server._on_client_leave("client_b", "timeout")
+    server.tick(server.tick_interval)
+    assert not server.match_running and server.slots == ["client_a", None]
+    _join(server, "client_c")
+    server.tick(server.tick_interval)
+    assert server.match_running and server.simulation.tank_for("client_c") is not None
+    print("✅ 专用服务器比赛流程正确")
+
+
+def test_parse_args():
+    """命令行参数：端口、房间名、地图和tick频率"""
+    args = parse_args(["--port", "13000", "--room", "局域网", "--map", "2", "--tick-rate", "30"])
+    assert (args.port, args.room, args.map, args.tick_rate) == (13000, "局域网", 2, 30)
+    assert parse_args([]).map is None, "默认随机地图"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_server_imports_without_arcade,
+        test_match_starts_and_runs_inputs,
+        test_parse_args,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有专用服务器测试通过")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+测试多进程分片服务器
+
+验证房间按负载分配到工作进程并在空出后释放、工作进程先通知成员变化再整批回传数据包，
+以及客户端通过共享端口加入运行在工作进程中的房间
+"""
+
+import sys
+import os
+import queue
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.server import parse_args
+from multiplayer.sharded_server import ShardedServer, ShardWorker
+from multiplayer.udp_messages import UDPMessage, MessageType, MessageFactory
+from multiplayer.udp_client import GameClient
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+        return len(data)
+
+
+def _supervisor(room_count, worker_count):
+    """不启动进程的主管服务器，工作进程收件队列用普通队列代替"""
+    server = ShardedServer(room_count, worker_count, port=12452, map_index=0)
+    server.worker_queues = [queue.Queue() for _ in range(worker_count)]
+    server.server_socket = _FakeSocket()
+    server.running = True
+    return server
+
+
+def _drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def test_rooms_assigned_to_least_loaded_worker():
+    """房间在第一次加入时分配给负载最小的工作进程，空出后释放"""
+    print("🧪 测试房间分配与释放...")
+    server = _supervisor(4, 2)
+    addr = ("127.0.0.1", 40000)
+    join = lambda room_id: server.handle_packet(
+        MessageFactory.create_join_request("A", room_id=room_id).to_bytes(), addr)
+
+    join(1)
+    join(2)
+    join(1)
+    assert (server.rooms[1].worker, server.rooms[2].worker) == (0, 1), "新房间应分配给负载最小的进程"
+    assert server.get_worker_loads() == [1, 1]
+    assert server.rooms[1].joins_forwarded == 2
+    kinds = [item[0] for item in _drain(server.worker_queues[0])]
+    assert kinds == ["open", "packet", "packet"], "房间先打开再转发数据包"
+
+    join(9)
+    assert not UDPMessage.from_bytes(server.server_socket.sent[-1][0]).data["success"], "不存在的房间应拒绝"
+
+    # 只处理了一个加入请求时不能释放，另一个请求还在路上
+    generation = server.rooms[1].generation
+    server._handle_outbound(("status", 0, {1: (generation, 0, 1)}))
+    assert server.rooms[1].worker == 0
+    server._handle_outbound(("client", 1, "client_x", True))
+    assert server.client_rooms["client_x"] == 1
+    server._handle_outbound(("status", 0, {1: (generation, 1, 2)}))
+    assert server.get_room_list()[0]["current_players"] == 1
+
+    server._handle_outbound(("client", 1, "client_x", False))
+    server._handle_outbound(("status", 0, {1: (generation, 0, 2)}))
+    assert server.rooms[1].worker is None and "client_x" not in server.client_rooms
+    assert _drain(server.worker_queues[0]) == [("close", 1, generation)]
+
+    # 旧分配迟到的状态被忽略；重新分配到当前负载最小的进程
+    server._handle_outbound(("status", 0, {1: (generation, 1, 2)}))
+    assert server.rooms[1].player_count == 0
+    join(3)
+    join(1)
+    assert server.get_worker_loads() == [2, 1] and server.rooms[1].generation > generation
+    print("✅ 房间按负载分配并在空出后释放")
+
+
+def test_worker_reports_members_before_packets():
+    """工作进程先回传成员变化，再整批回传发件箱"""
+    inbound, outbound = queue.Queue(), queue.Queue()
+    worker = ShardWorker(0, inbound, outbound, port=12452, tick_rate=30)
+    worker.handle(("open", 2, 7, "房间 #2", 0))
+    join = MessageFactory.create_join_request("A", room_id=2).to_bytes()
+    worker.handle(("packet", 2, join, ("127.0.0.1", 40000)))
+    worker.handle(("packet", 5, join, ("127.0.0.1", 40000)))  # 不在本进程的房间被忽略
+    worker.flush()
+
+    items = _drain(outbound)
+    assert [item[0] for item in items] == ["client", "send", "status"]
+    client_id = items[0][2]
+    response = UDPMessage.from_bytes(items[1][1][0][0])
+    assert response.type == MessageType.JOIN_RESPONSE and response.data["player_id"] == client_id
+    assert items[2] == ("status", 0, {2: (7, 1, 1)})
+
+    worker.flush()
+    assert not _drain(outbound), "状态没有变化时不重复回传"
+
+    worker.handle(("close", 2, 6))
+    assert 2 in worker.rooms, "旧代次的关闭请求应忽略"
+    worker.handle(("close", 2, 7))
+    assert not worker.rooms
+    assert ("client", 2, client_id, False) in _drain(outbound)
+
+
+def test_clients_join_sharded_room_over_socket():
+    """两个客户端加入运行在工作进程中的房间并收到快照"""
+    print("🧪 测试真实套接字加入分片房间...")
+    server = ShardedServer(4, 2, port=12453, tick_rate=60, map_index=0)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 20.0
+    while not server.running and time.time() < deadline:
+        time.sleep(0.05)
+    assert server.running, "工作进程应启动"
+
+    states = []
+    a, b = GameClient(), GameClient()
+    b.set_callbacks(game_state=states.append)
+    try:
+        assert a.connect_to_host("127.0.0.1", 12453, "A", room_id=3)
+        assert b.connect_to_host("127.0.0.1", 12453, "B", room_id=3)
+        deadline = time.time() + 5.0
+        while not states and time.time() < deadline:
+            time.sleep(0.05)
+        assert states, "客户端应收到房间3的快照"
+        assert {t["id"] for t in states[-1]["tanks"]} == {a.player_id, b.player_id}
+        assert server.rooms[3].worker is not None and server.rooms[1].worker is None
+        assert server.get_room_list()[2]["current_players"] == 2
+    finally:
+        a.disconnect()
+        b.disconnect()
+        server.running = False
+        thread.join(timeout=10.0)
+    print("✅ 客户端加入分片房间")
+
+
+def test_parse_workers():
+    """--workers 默认0（单进程）"""
+    assert parse_args([]).workers == 0
+    assert parse_args(["--rooms", "8", "--workers", "4"]).workers == 4
+
+
+if __name__ == "__main__":
+    tests = [
+        test_rooms_assigned_to_least_loaded_worker,
+        test_worker_reports_members_before_packets,
+        test_clients_join_sharded_room_over_socket,
+        test_parse_workers,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有分片服务器测试通过")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试无界面游戏模拟
+
+验证Simulation不依赖arcade、按输入推进物理、子弹命中计分，
+以及回合重置与比赛结束的判定
+"""
+
+import sys
+import os
+import subprocess
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import Simulation, SimTank, ROUND_OVER_DELAY
+from entity_ids import KIND_TANK
+from tank_controls import CONTROL_FORWARD, CONTROL_FIRE
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DT = 1 / 60
+
+
+def _make_sim(**kwargs):
+    """空地图的双人模拟，结果不受随机地图影响"""
+    return Simulation(mode="pvp", player_ids=("p1", "p2"), map_layout=[], **kwargs)
+
+
+def _face_off(sim, distance=150.0):
+    """把玩家2放到玩家1正前方（两辆坦克都朝上）"""
+    p1, p2 = sim.tanks
+    p2.pymunk_body.position = (p1.pymunk_body.position.x, p1.pymunk_body.position.y + distance)
+    p2.sync_with_pymunk_body()
+
+
+def _destroy_p2(sim, max_frames=600):
+    """玩家1持续开火直到回合结束"""
+    for frame in range(max_frames):
+        inputs = {"p1": [(CONTROL_FIRE, True), (CONTROL_FIRE, False)]} if frame % 30 == 0 else None
+        sim.step(DT, inputs)
+        if sim.round_over:
+            return
+    raise AssertionError("玩家2应在限定帧数内被击毁")
+
+
+def test_simulation_imports_without_arcade():
+    """模拟模块不导入arcade，可在无窗口环境运行"""
+    code = "import sys, simulation; assert 'arcade' not in sys.modules, 'simulation不应导入arcade'"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_step_applies_inputs():
+    """输入在物理步进前应用，坦克前进"""
+    print("🧪 测试按输入推进...")
+    spawned = []
+    sim = _make_sim(on_spawn=lambda kind, entity: spawned.append((kind, entity.entity_id)))
+    assert [kind for kind, _ in spawned] == [KIND_TANK, KIND_TANK], "开局应生成两辆坦克"
+    assert all(isinstance(tank, SimTank) for tank in sim.tanks)
+
+    start_y = sim.tanks[0].center_y
+    sim.step(DT, {"p1": [(CONTROL_FORWARD, True)]})
+    for _ in range(29):
+        sim.step(DT)
+    assert sim.tanks[0].center_y > start_y + 50, f"坦克应向上移动: {sim.tanks[0].center_y}"
+    assert abs(sim.total_time - 0.5) < 1e-9
+    print("✅ 按输入推进正确")
+
+
+def test_hits_score_and_round_reset():
+    """子弹击毁对手后得分，回合结束延迟后对手以新实体ID重生"""
+    print("🧪 测试命中与回合重置...")
+    sim = _make_sim()
+    _face_off(sim)
+    old_p2 = sim.tanks[1]
+    old_eid = old_p2.entity_id
+
+    _destroy_p2(sim)
+    assert sim.scores == [1, 0], f"玩家1应得分: {sim.scores}"
+    assert sim.round_result_text == "玩家1 本回合胜利!"
+    assert sim.tank_for("p2") is old_p2 and not old_p2.is_alive()
+
+    for _ in range(int(ROUND_OVER_DELAY / DT) + 2):
+        sim.step(DT)
+    assert not sim.round_over and not sim.bullets, "新回合应清空子弹"
+    new_p2 = sim.tank_for("p2")
+    assert new_p2 is not old_p2 and new_p2.health == new_p2.max_health
+    assert new_p2.entity_id != old_eid, "重生的坦克应分配新的实体ID"
+    assert old_p2.pymunk_body not in sim.space.bodies
+    print("✅ 命中计分和回合重置正确")
+
+
+def test_game_over_at_max_score():
+    """达到获胜胜场后比赛结束，不再开始新回合"""
+    sim = _make_sim()
+    sim.scores[0] = sim.max_score - 1
+    _face_off(sim)
+    _destroy_p2(sim)
+    for _ in range(int(ROUND_OVER_DELAY / DT) + 2):
+        sim.step(DT)
+    assert sim.game_over and sim.winner == 0
+    assert not sim.tank_for("p2").is_alive(), "比赛结束后不应重生"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_simulation_imports_without_arcade,
+        test_step_applies_inputs,
+        test_hits_score_and_round_reset,
+        test_game_over_at_max_score,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有模拟测试通过")
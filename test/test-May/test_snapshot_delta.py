@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+测试增量快照与客户端确认
+
+验证增量计算/还原、二进制增量编码以及主机按确认基准发送增量
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.snapshot_delta import SnapshotHistory, compute_delta, apply_delta
+from multiplayer.state_codec import CODEC_BINARY, CODEC_JSON
+from multiplayer.udp_messages import MessageFactory, UDPMessage
+
+
+def _make_state(bullets, host_pos=(100.0, 200.0), scores=(0, 0)):
+    return {
+        "tanks": [
+            {"id": "host", "pos": list(host_pos), "ang": 90.0, "hp": 5, "type": "green"},
+            {"id": "client_1", "pos": [300.0, 400.0], "ang": 0.0, "hp": 5, "type": "blue"}
+        ],
+        "bullets": [{"id": i, "pos": [x, 250.0], "ang": 45.0, "own": "host"} for i, x in bullets],
+        "round_info": {"sc": list(scores), "ro": False, "go": False}
+    }
+
+
+def test_delta_only_contains_changes():
+    """只有一颗子弹移动时，增量只包含这颗子弹的位置"""
+    print("🧪 测试增量内容...")
+    base = _make_state([(0, 150.0), (1, 160.0)])
+    current = _make_state([(0, 150.0), (1, 170.0)])
+
+    delta = compute_delta(base, current)
+    assert delta["tanks"] == [], "坦克未变化，不应出现在增量中"
+    assert delta["bullets"] == [{"id": 1, "pos": [170.0, 250.0]}], f"增量子弹不正确: {delta['bullets']}"
+    assert delta["removed"] == []
+    assert "round_info" not in delta and "order" not in delta
+    assert apply_delta(base, delta) == current, "还原后的快照应与当前快照一致"
+    print("✅ 增量只包含变化字段")
+
+
+def test_delta_spawn_despawn_and_round_info():
+    """子弹增删、坦克顺序和回合信息变化都能正确还原"""
+    print("🧪 测试增删与回合信息...")
+    base = _make_state([(0, 150.0), (1, 160.0)])
+    current = _make_state([(1, 160.0), (2, 180.0)], host_pos=(110.0, 200.0), scores=(1, 0))
+    current["tanks"].reverse()
+
+    delta = compute_delta(base, current)
+    assert delta["removed"] == [0]
+    assert delta["order"] == ["client_1", "host"]
+    assert delta["round_info"]["sc"] == [1, 0]
+
+    restored = apply_delta(base, delta)
+    assert restored["tanks"] == current["tanks"], "坦克还原错误"
+    assert sorted(b["id"] for b in restored["bullets"]) == [1, 2], "子弹还原错误"
+    assert restored["round_info"] == current["round_info"]
+    print("✅ 增删与回合信息还原正确")
+
+
+def test_binary_delta_roundtrip():
+    """增量消息在二进制编码下往返一致"""
+    print("🧪 测试二进制增量编码...")
+    base = _make_state([(0, 150.0), (1, 160.0)])
+    current = _make_state([(1, 170.0), (2, 180.0)], scores=(0, 1))
+    delta = compute_delta(base, current)
+    message = MessageFactory.create_game_state_delta(12, 10, delta)
+
+    for codec in (CODEC_JSON, CODEC_BINARY):
+        data = UDPMessage.from_bytes(message.to_bytes(codec)).data
+        assert data["tick"] == 12 and data["base"] == 10, f"{codec}: tick/base不匹配"
+        restored = apply_delta(base, data)
+        assert restored["tanks"] == current["tanks"], f"{codec}: 坦克还原错误"
+        assert {b["id"]: b["pos"] for b in restored["bullets"]} == {1: [170.0, 250.0], 2: [180.0, 250.0]}
+        assert restored["round_info"]["sc"] == [0, 1]
+
+    full_size = len(MessageFactory.create_game_state(
+        current["tanks"], current["bullets"], current["round_info"], 12).to_bytes(CODEC_BINARY))
+    delta_size = len(message.to_bytes(CODEC_BINARY))
+    print(f"📦 完整快照: {full_size} 字节, 增量: {delta_size} 字节")
+    assert delta_size < full_size
+    print("✅ 二进制增量往返一致")
+
+
+def test_snapshot_history_capacity():
+    """历史环超出容量时丢弃最旧快照"""
+    history = SnapshotHistory(capacity=3)
+    for tick in range(1, 6):
+        history.add(tick, {"tick": tick})
+    assert len(history) == 3
+    assert history.get(2) is None and history.get(3) == {"tick": 3}
+    assert history.get(None) is None
+
+
+def test_host_sends_delta_after_ack():
+    """客户端确认后主机改发增量，基准过旧时回退完整快照"""
+    print("🧪 测试主机增量广播...")
+    from multiplayer.udp_host import GameHost
+    from multiplayer.udp_client import GameClient
+
+    host = GameHost(host_port=12447)
+    host.broadcast_interval = 0
+    received = []
+
+    def wait_for(predicate, timeout=2.0):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.02)
+        return predicate()
+
+    try:
+        assert host.start_hosting("增量测试房间"), "主机启动失败"
+        client = GameClient()
+        client.set_callbacks(game_state=received.append)
+        assert client.connect_to_host("127.0.0.1", 12447, "增量测试客户端"), "客户端连接失败"
+        info = host.clients[client.player_id]
+
+        host.broadcast_game_state(_make_state([(0, 150.0)]))
+        assert wait_for(lambda: info.acked_tick == 1), "主机未收到确认"
+
+        sent = []
+        host.host_socket = _RecordingSocket(host.host_socket, sent)
+
+        host.broadcast_game_state(_make_state([(0, 160.0)]))
+        assert wait_for(lambda: len(received) == 2), "客户端未收到第二个快照"
+        assert "base" in UDPMessage.from_bytes(sent[-1]).data, "确认后应发送增量"
+        assert received[-1]["bullets"][0]["pos"][0] == 160.0, "客户端还原的快照不正确"
+        assert received[-1]["tanks"][1]["id"] == "client_1"
+
+        # 基准过旧时发送完整快照
+        info.acked_tick = 2
+        host.state_tick += host.max_delta_age + 1
+        host.broadcast_game_state(_make_state([(0, 170.0)]))
+        assert "base" not in UDPMessage.from_bytes(sent[-1]).data, "基准过旧应发送完整快照"
+        assert wait_for(lambda: len(received) == 3)
+
+        host.host_socket = host.host_socket.sock
+        client.disconnect()
+        print("✅ 主机增量广播测试通过")
+    finally:
+        host.stop_hosting()
+
+
+class _RecordingSocket:
+    """记录发送数据的套接字包装"""
+
+    def __init__(self, sock, sent):
+        self.sock = sock
+        self.sent = sent
+
+    def sendto(self, data, addr):
+        self.sent.append(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_delta_only_contains_changes,
+        test_delta_spawn_despawn_and_round_info,
+        test_binary_delta_roundtrip,
+        test_snapshot_history_capacity,
+        test_host_sends_delta_after_ack,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有增量快照测试通过")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+测试观战模式与观战中继
+
+验证观众不占玩家名额、不触发加入回调、不发送输入且收到不经兴趣过滤的快照，
+观众名额单独限制，以及中继按延迟把一路上游快照扇出给多名观众（间隔很近的快照也不丢）
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_ids import EVENT_SPAWN, KIND_BULLET
+from multiplayer.udp_host import GameHost
+from multiplayer.udp_client import GameClient
+from multiplayer.relay import SpectatorRelay, parse_args
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+def _make_state(bullet_x, client_id="client_1"):
+    return {
+        "tanks": [
+            {"id": "host", "eid": 1, "pos": [100.0, 100.0], "ang": 0.0, "hp": 5, "type": "green"},
+            {"id": client_id, "eid": 2, "pos": [700.0, 500.0], "ang": 90.0, "hp": 5, "type": "blue"}
+        ],
+        "bullets": [{"id": 3, "pos": [bullet_x, 110.0], "ang": 0.0, "own": "host"}],
+        "round_info": {"sc": [0, 0], "ro": False, "go": False}
+    }
+
+
+def test_spectator_joins_full_room():
+    """房间满员时观众仍可加入；观众不计入玩家、不触发回调、输入被忽略"""
+    print("🧪 测试观战模式...")
+    host = GameHost(host_port=12466, max_players=2, max_spectators=1)
+    host.broadcast_interval = 0
+    joined, inputs, received, player_received = [], [], [], []
+    host.set_callbacks(client_join=lambda cid, name: joined.append(cid),
+                       input_received=lambda cid, cmds: inputs.append(cid))
+    clients = []
+    try:
+        assert host.start_hosting("观战测试房间")
+        player = GameClient()
+        clients.append(player)
+        player.set_callbacks(game_state=player_received.append)
+        assert player.connect_to_host("127.0.0.1", 12466, "玩家")
+        late_player = GameClient()
+        clients.append(late_player)
+        assert not late_player.connect_to_host("127.0.0.1", 12466, "迟到的玩家"), "玩家名额已满"
+
+        spectator = GameClient()
+        clients.append(spectator)
+        spectator.set_callbacks(game_state=received.append)
+        assert spectator.connect_to_host("127.0.0.1", 12466, "观众", spectator=True)
+        assert spectator.player_id.startswith("spectator_")
+        assert joined == [player.player_id], "观众不应触发加入回调"
+        assert host.get_current_player_count() == 2 and host.get_spectator_count() == 1
+        assert spectator.player_id not in host.get_connected_players()
+        assert not GameClient().connect_to_host("127.0.0.1", 12466, "第二个观众", spectator=True), "观众名额已满"
+
+        assert spectator.send_key_press("W") is None and spectator.input_timer is None
+        # 远离玩家坦克的子弹对玩家被过滤，观众看到全部子弹
+        host.broadcast_game_state(_make_state(150.0, player.player_id))
+        host.broadcast_game_state(_make_state(140.0, player.player_id))
+        assert wait_for(lambda: len(received) == 2 and len(player_received) == 2)
+        assert len(received[1]["bullets"]) == 1 and not player_received[1]["bullets"]
+        assert wait_for(lambda: host.clients[spectator.player_id].acked_tick == 2)
+        player.send_key_press("W")
+        time.sleep(0.1)
+        assert inputs and set(inputs) == {player.player_id}, "只处理玩家的输入"
+        assert host.get_network_stats()["clients"][spectator.player_id]["spectator"]
+
+        spectator.disconnect()
+        assert wait_for(lambda: host.get_spectator_count() == 0)
+    finally:
+        for client in clients:
+            client.disconnect()
+        host.stop_hosting()
+    print("✅ 观战模式正确")
+
+
+def test_relay_fans_out_with_delay():
+    """主机只有中继一个观众；中继延迟后转发给所有观众，玩家不能加入中继"""
+    print("🧪 测试观战中继...")
+    assert parse_args(["--host", "10.0.0.1", "--delay", "3"]).delay == 3.0
+    host = GameHost(host_port=12467)
+    host.broadcast_interval = 0
+    relay = SpectatorRelay("127.0.0.1", 12467, listen_port=12468, delay=0.3)
+    spectators, received = [], {}
+    try:
+        assert host.start_hosting("中继上游")
+        assert relay.start()
+        for i in range(3):
+            spectator = GameClient()
+            spectators.append(spectator)
+            received[i] = []
+            spectator.set_callbacks(game_state=received[i].append)
+            assert spectator.connect_to_host("127.0.0.1", 12468, f"观众{i}", spectator=True)
+        assert not GameClient().connect_to_host("127.0.0.1", 12468, "玩家"), "中继只接受观众"
+        assert relay.get_spectator_count() == 3
+        assert len(host.clients) == 1, "观众人数不影响主机的发送对象"
+
+        sent_at = time.time()
+        host.broadcast_game_state({**_make_state(150.0), "events": [[EVENT_SPAWN, KIND_BULLET, 3]]})
+        assert wait_for(lambda: relay.received == 1)
+        assert all(not states for states in received.values()), "延迟期间不应转发"
+        assert wait_for(lambda: all(states for states in received.values()))
+        assert time.time() - sent_at >= 0.3
+        for states in received.values():
+            assert states[0]["bullets"][0]["pos"][0] == 150.0
+            assert [event[1:] for event in states[0]["events"]] == [[EVENT_SPAWN, KIND_BULLET, 3]]
+
+        host.broadcast_game_state(_make_state(160.0))
+        assert wait_for(lambda: all(len(states) == 2 for states in received.values()))
+        assert received[0][1]["bullets"][0]["pos"][0] == 160.0
+        assert host.send_batch.datagrams_sent == 2, "主机每个tick只发送一个快照"
+    finally:
+        for spectator in spectators:
+            spectator.disconnect()
+        relay.stop()
+        host.stop_hosting()
+    print("✅ 观战中继正确")
+
+
+def test_relay_merges_due_snapshots():
+    """同一轮到期的快照只转发最新的一个并合并事件；上游完整快照让观众也收到完整快照"""
+    relay = SpectatorRelay("127.0.0.1", delay=1.0)
+    downstream = relay.downstream
+    relay.buffer.extend([
+        (10.0, {**_make_state(150.0), "events": [[7, EVENT_SPAWN, KIND_BULLET, 3]]}),
+        (10.1, {**_make_state(160.0), "events": [[8, EVENT_SPAWN, KIND_BULLET, 4]], "resync": True}),
+        (10.5, _make_state(170.0)),
+    ])
+    assert relay.release_due(10.9) == 0
+    assert relay.release_due(11.2) == 2
+    assert downstream.state_tick == 1 and relay.relayed == 1
+    assert downstream.snapshot_history.get(1)["bullets"][0]["pos"][0] == 160.0
+    assert [event[2:] for event in downstream.event_history.get(1)] == [[KIND_BULLET, 3], [KIND_BULLET, 4]]
+    assert len(relay.buffer) == 1
+
+
+def test_relay_sends_closely_spaced_snapshots():
+    """相隔不到一个广播间隔释放的快照也都转发给观众，转发计数与实际发出的tick一致"""
+    relay = SpectatorRelay("127.0.0.1")
+    downstream = relay.downstream
+    assert downstream.broadcast_interval > 0.01
+    for i in range(5):
+        relay.buffer.append((0.0, _make_state(150.0 + i)))
+        assert relay.release_due() == 1
+    assert downstream.state_tick == 5 and relay.relayed == 5
+    assert downstream.snapshot_history.get(5)["bullets"][0]["pos"][0] == 154.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_spectator_joins_full_room,
+        test_relay_fans_out_with_delay,
+        test_relay_merges_due_snapshots,
+        test_relay_sends_closely_spaced_snapshots,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有观战测试通过")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试游戏状态二进制编解码
+
+验证二进制快照的往返精度、包大小以及握手协商
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.udp_messages import MessageFactory, MessageType, UDPMessage
+from multiplayer.state_codec import (CODEC_BINARY, CODEC_JSON, negotiate_codec,
+                                     encode_game_state, decode_game_state)
+
+
+def _make_game_state(bullet_count=2):
+    """构造典型的游戏状态数据"""
+    return {
+        "tanks": [
+            {"id": "host", "pos": [100.5, 200.25], "ang": 45.2, "hp": 5, "type": "green"},
+            {"id": "client_12345678", "pos": [300.1, 400.7], "ang": -90.0, "hp": 3, "type": "blue"}
+        ],
+        "bullets": [
+            {"id": i, "pos": [150.2 + i, 250.8], "ang": 45.5, "own": "host" if i % 2 else "client_12345678"}
+            for i in range(bullet_count)
+        ],
+        "round_info": {"sc": [1, 0], "ro": False, "go": False}
+    }
+
+
+def test_binary_roundtrip():
+    """测试二进制编码往返"""
+    print("🧪 测试二进制快照往返...")
+    state = _make_game_state()
+    message = MessageFactory.create_game_state(state["tanks"], state["bullets"], state["round_info"])
+
+    restored = UDPMessage.from_bytes(message.to_bytes(CODEC_BINARY))
+    assert restored.type == MessageType.GAME_STATE, "消息类型不匹配"
+
+    tanks = restored.data["tanks"]
+    assert [t["id"] for t in tanks] == ["host", "client_12345678"], "坦克ID不匹配"
+    assert abs(tanks[0]["pos"][0] - 100.5) <= 1 / 16, "位置量化误差过大"
+    assert abs(tanks[0]["pos"][1] - 200.25) <= 1 / 16, "位置量化误差过大"
+    assert abs(tanks[0]["ang"] - 45.2) < 0.01, "角度量化误差过大"
+    assert abs(tanks[1]["ang"] - 270.0) < 0.01, "负角度应归一化到 [0, 360)"
+    assert tanks[1]["hp"] == 3 and tanks[1]["type"] == "blue", "坦克属性不匹配"
+
+    bullets = restored.data["bullets"]
+    assert [b["id"] for b in bullets] == [0, 1], "子弹ID不匹配"
+    assert bullets[1]["own"] == "host", "子弹所有者不匹配"
+    assert restored.data["round_info"] == {"sc": [1, 0], "ro": False, "go": False}, "回合信息不匹配"
+    print("✅ 二进制往返测试通过")
+
+
+def test_non_state_messages_stay_json():
+    """非GAME_STATE消息即使协商了二进制也保持JSON"""
+    print("🧪 测试非状态消息回退JSON...")
+    message = MessageFactory.create_heartbeat("client_1")
+    data = message.to_bytes(CODEC_BINARY)
+    assert data.startswith(b"{"), "心跳消息应使用JSON编码"
+    assert UDPMessage.from_bytes(data).player_id == "client_1"
+    print("✅ 非状态消息使用JSON")
+
+
+def test_binary_size_reduction():
+    """测试二进制快照比JSON小数倍"""
+    print("🧪 对比JSON与二进制包大小...")
+    state = _make_game_state(bullet_count=20)
+    message = MessageFactory.create_game_state(state["tanks"], state["bullets"], state["round_info"])
+    json_size = len(message.to_bytes(CODEC_JSON))
+    binary_size = len(message.to_bytes(CODEC_BINARY))
+    print(f"📦 JSON: {json_size} 字节, 二进制: {binary_size} 字节 ({json_size / binary_size:.1f}x)")
+    assert binary_size * 4 < json_size, "二进制快照应至少小4倍"
+
+
+def test_invalid_binary_payload():
+    """截断的二进制数据应抛出ValueError"""
+    print("🧪 测试无效二进制数据...")
+    data = encode_game_state(_make_game_state())
+    try:
+        decode_game_state(data[:-3])
+    except ValueError:
+        print("✅ 截断数据被拒绝")
+        return
+    assert False, "截断数据应被拒绝"
+
+
+def test_codec_negotiation():
+    """测试编码协商规则"""
+    print("🧪 测试编码协商...")
+    assert negotiate_codec([CODEC_JSON, CODEC_BINARY]) == CODEC_BINARY
+    assert negotiate_codec([CODEC_JSON]) == CODEC_JSON
+    assert negotiate_codec(None) == CODEC_JSON, "旧客户端应回退到JSON"
+    assert negotiate_codec(["bin9"]) == CODEC_JSON
+    print("✅ 编码协商规则正确")
+
+
+def test_host_client_negotiation():
+    """测试主机与客户端握手协商二进制编码并接收快照"""
+    print("🧪 测试握手协商与快照接收...")
+    from multiplayer.udp_host import GameHost
+    from multiplayer.udp_client import GameClient
+
+    host = GameHost(host_port=12446)
+    received = []
+    try:
+        assert host.start_hosting("编码测试房间"), "主机启动失败"
+        client = GameClient()
+        client.set_callbacks(game_state=received.append)
+        assert client.connect_to_host("127.0.0.1", 12446, "编码测试客户端"), "客户端连接失败"
+        assert client.state_codec == CODEC_BINARY, "应协商为二进制编码"
+        assert host.clients[client.player_id].codec == CODEC_BINARY
+
+        host.broadcast_game_state(_make_game_state())
+        deadline = time.time() + 2.0
+        while not received and time.time() < deadline:
+            time.sleep(0.05)
+        assert received, "客户端未收到游戏状态"
+        assert received[0]["tanks"][0]["id"] == "host"
+        client.disconnect()
+        print("✅ 握手协商测试通过")
+    finally:
+        host.stop_hosting()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_binary_roundtrip,
+        test_non_state_messages_stay_json,
+        test_binary_size_reduction,
+        test_invalid_binary_payload,
+        test_codec_negotiation,
+        test_host_client_negotiation,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有编解码测试通过")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试网络遥测
+
+验证收发计数和滚动窗口速率、ping/pong往返时间、抖动和丢失、主机回应ping并记录客户端报告、
+乱序和解码失败计数，以及JSON导出
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplayer.telemetry import PeerTelemetry, TelemetryDumper, PING_TIMEOUT, WINDOW_SECONDS, format_stats
+from multiplayer.udp_host import GameHost, ClientInfo
+from multiplayer.udp_client import GameClient
+from multiplayer.udp_messages import UDPMessage, MessageType, MessageFactory
+
+
+class _FakeSocket:
+    """记录发送数据的套接字替身"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+        return len(data)
+
+
+def test_peer_counters_and_rtt():
+    """滚动窗口只统计最近几秒；pong更新往返时间和抖动，超时的ping计为丢失"""
+    print("🧪 测试对端统计...")
+    telemetry = PeerTelemetry()
+    for second in range(10):
+        telemetry.on_received(1000, 100.0 + second)
+        telemetry.on_sent(250, 100.0 + second)
+    stats = telemetry.stats(109.5)
+    assert stats["packets_received"] == 10 and stats["bytes_sent"] == 2500
+    assert stats["pps_in"] == 1.0 and stats["kbps_in"] == 8.0, "窗口内每秒1000字节"
+    assert telemetry.stats(109.5 + WINDOW_SECONDS)["pps_in"] == 0.0
+
+    telemetry.on_ping_sent(200.0)
+    telemetry.on_pong(200.0, 200.05)
+    telemetry.on_ping_sent(201.0)
+    telemetry.on_pong(201.0, 201.07)
+    telemetry.on_pong(201.0, 201.5)   # 重复的pong被忽略
+    stats = telemetry.stats(201.1)
+    assert 50.0 < stats["rtt_ms"] < 53.0 and stats["jitter_ms"] > 0 and stats["loss"] == 0.0
+
+    telemetry.on_ping_sent(202.0)
+    assert telemetry.stats(202.0 + PING_TIMEOUT)["loss"] > 0, "超时未回应的ping计为丢失"
+    line = format_stats("主机", telemetry.stats(202.0 + PING_TIMEOUT))
+    assert "RTT" in line and "丢包" in line
+    print("✅ 对端统计正确")
+
+
+def test_host_answers_pings_and_counts_anomalies():
+    """主机回应ping、记录客户端报告的往返时间，统计乱序输入和解码失败"""
+    host = GameHost(host_port=12461)
+    host.host_socket = _FakeSocket()
+    client = ClientInfo("client_1", ("127.0.0.1", 44001), "测试玩家")
+    host.clients = {"client_1": client}
+
+    heartbeat = MessageFactory.create_heartbeat("client_1", ping=123.25, rtt_ms=42.0, jitter_ms=3.0)
+    data = heartbeat.to_bytes()
+    host._handle_client_message(data, client.address)
+    pong = UDPMessage.from_bytes(host.host_socket.sent[-1][0])
+    assert pong.type == MessageType.HEARTBEAT and pong.data["pong"] == 123.25
+
+    for seq in (2, 1):
+        host.handle_message(MessageFactory.create_player_input("client_1", seq, [1]), client.address, 60)
+    host._handle_client_message(b"\xff garbage", client.address)
+    host._handle_client_message(b"\xff garbage", ("127.0.0.1", 9))
+
+    stats = host.get_network_stats()
+    info = stats["clients"]["client_1"]
+    assert info["rtt_ms"] == 42.0 and info["jitter_ms"] == 3.0
+    assert info["packets_received"] == 3 and info["bytes_received"] == len(data) + 120
+    assert info["out_of_order"] == 1 and info["decode_failures"] == 1
+    assert info["packets_sent"] == 1 and stats["decode_failures"] == 1
+
+
+def test_client_measures_rtt_and_dumps_json():
+    """客户端心跳测得往返时间并报告给主机；导出钩子写入JSON行"""
+    print("🧪 测试往返时间测量与导出...")
+    host = GameHost(host_port=12461)
+    client = GameClient()
+    client.heartbeat_interval = 0.1
+    records = []
+    path = os.path.join(tempfile.mkdtemp(), "telemetry.jsonl")
+
+    try:
+        assert host.start_hosting("遥测测试房间")
+        assert client.connect_to_host("127.0.0.1", 12461, "遥测客户端")
+        client.start_telemetry_dump(path, interval=0.1, callback=records.append)
+
+        deadline = time.time() + 3.0
+        client_info = host.clients[client.player_id]
+        while time.time() < deadline and (client_info.telemetry.reported_rtt is None or len(records) < 2):
+            time.sleep(0.05)
+        client_stats = client.get_network_stats()["host"]
+        assert client_stats["rtt_ms"] is not None and client_stats["packets_received"] > 0
+        assert host.get_network_stats()["clients"][client.player_id]["rtt_ms"] is not None
+
+        client.stop_telemetry_dump()
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) >= 2 and "host" in lines[0] and "time" in lines[0]
+        assert records[0]["host"]["packets_sent"] >= 1
+        client.disconnect()
+    finally:
+        host.stop_hosting()
+    print("✅ 往返时间测量与导出正确")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_peer_counters_and_rtt,
+        test_host_answers_pings_and_counts_anomalies,
+        test_client_measures_rtt_and_dumps_json,
+    ]
+    for test in tests:
+        test()
+        print()
+    print("🎉 所有网络遥测测试通过")